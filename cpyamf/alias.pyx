@@ -0,0 +1,287 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+C-extension for the per object methods of L{pyamf.alias.ClassAlias}.
+
+:since: 0.9
+"""
+
+from cpython cimport *
+
+# pyamf is still being initialised when this module is imported, so only
+# attributes that already exist may be looked up at this point.
+import pyamf
+
+
+cdef object _missing = object()
+
+
+cdef inline object get_properties(object obj):
+    """
+    @see: L{pyamf.util.get_properties}
+    """
+    if hasattr(obj, 'keys'):
+        return obj.keys()
+    elif hasattr(obj, '__dict__'):
+        return obj.__dict__.keys()
+
+    return []
+
+
+cdef int set_attrs(object obj, object attrs) except -1:
+    """
+    @see: L{pyamf.util.set_attrs}
+    """
+    cdef object o = setattr
+
+    if hasattr(obj, '__setitem__'):
+        o = type(obj).__setitem__
+
+    for k, v in attrs.iteritems():
+        o(obj, k, v)
+
+    return 0
+
+
+cdef int apply_synonyms(object attrs, object synonym_attrs,
+                        bint encoding) except -1:
+    """
+    Renames the keys in C{attrs} according to C{synonym_attrs}.
+    """
+    cdef object value
+
+    for k, v in synonym_attrs.iteritems():
+        if not encoding:
+            k, v = v, k
+
+        value = attrs.pop(k, _missing)
+
+        if value is _missing:
+            continue
+
+        attrs[v] = value
+
+    return 0
+
+
+cdef class BaseClassAlias(object):
+    """
+    The methods of L{ClassAlias<pyamf.alias.ClassAlias>} that are called for
+    every encoded or decoded object.
+
+    Attributes are read as normal Python attributes so that subclasses may
+    define and override them freely.
+    """
+
+    def getAttribute(self, obj, attr, codec=None):
+        """
+        Get the attribute `attr` from `obj`.
+
+        @param codec: The current `pyamf.codec.Codec` getting the attribute
+            (if there is one).
+        """
+        return getattr(obj, attr)
+
+    def getEncodableAttributes(self, obj, codec=None):
+        """
+        Must return a C{dict} of attributes to be encoded, even if its empty.
+
+        @param codec: An optional argument that will contain the encoder
+            instance calling this function.
+        """
+        cdef dict attrs
+        cdef object static_attrs
+        cdef object dynamic_props
+        cdef object get_attr = None
+        cdef bint dynamic
+        cdef bint shortcut_encode
+
+        if not self._compiled:
+            self.compile()
+
+        if self.is_dict:
+            return dict(obj)
+
+        dynamic = self.dynamic
+        shortcut_encode = self.shortcut_encode
+
+        if shortcut_encode and dynamic:
+            return obj.__dict__.copy()
+
+        if type(self).getAttribute is not BaseClassAlias.getAttribute:
+            get_attr = self.getAttribute
+
+        attrs = {}
+        static_attrs = self.static_attrs
+
+        if static_attrs:
+            for attr in static_attrs:
+                try:
+                    if get_attr is None:
+                        attrs[attr] = getattr(obj, attr)
+                    else:
+                        attrs[attr] = get_attr(obj, attr, codec=codec)
+                except AttributeError:
+                    attrs[attr] = pyamf.Undefined
+
+        if not dynamic:
+            dynamic_props = self.non_static_encodable_properties
+
+            if dynamic_props:
+                for attr in dynamic_props:
+                    if get_attr is None:
+                        attrs[attr] = getattr(obj, attr)
+                    else:
+                        attrs[attr] = get_attr(obj, attr, codec=codec)
+
+            return attrs
+
+        dynamic_props = get_properties(obj)
+
+        if not shortcut_encode:
+            dynamic_props = set(dynamic_props)
+
+            if self.encodable_properties:
+                dynamic_props.update(self.encodable_properties)
+
+            if static_attrs:
+                dynamic_props.difference_update(static_attrs)
+
+            if self.exclude_attrs:
+                dynamic_props.difference_update(self.exclude_attrs)
+
+        for attr in dynamic_props:
+            if get_attr is None:
+                attrs[attr] = getattr(obj, attr)
+            else:
+                attrs[attr] = get_attr(obj, attr, codec=codec)
+
+        proxy_attrs = self.proxy_attrs
+
+        if proxy_attrs is not None and attrs and codec:
+            context = codec.context
+
+            for k, v in attrs.items():
+                if k in proxy_attrs:
+                    attrs[k] = context.getProxyForObject(v)
+
+        synonym_attrs = self.synonym_attrs
+
+        if synonym_attrs:
+            apply_synonyms(attrs, synonym_attrs, 1)
+
+        return attrs
+
+    def getDecodableAttributes(self, obj, attrs, codec=None):
+        """
+        Returns a dictionary of attributes for C{obj} that has been filtered,
+        based on the supplied C{attrs}.
+
+        @param obj: The object that will recieve the attributes.
+        @param attrs: The C{attrs} dictionary that has been decoded.
+        @param codec: An optional argument that will contain the decoder
+            instance calling this function.
+        @return: A dictionary of attributes that can be applied to C{obj}
+        """
+        cdef bint changed = 0
+        cdef set props
+        cdef dict a
+
+        if not self._compiled:
+            self.compile()
+
+        props = set(attrs.keys())
+        static_attrs = self.static_attrs
+
+        if static_attrs:
+            missing_attrs = self.static_attrs_set.difference(props)
+
+            if missing_attrs:
+                raise AttributeError(
+                    'Static attributes %r expected when decoding %r' % (
+                        missing_attrs, self.klass
+                    )
+                )
+
+            props.difference_update(static_attrs)
+
+        if not props:
+            return attrs
+
+        if not self.dynamic:
+            decodable_properties = self.decodable_properties
+
+            if not decodable_properties:
+                props = set()
+            else:
+                props.intersection_update(decodable_properties)
+
+            changed = 1
+
+        readonly_attrs = self.readonly_attrs
+
+        if readonly_attrs:
+            props.difference_update(readonly_attrs)
+            changed = 1
+
+        exclude_attrs = self.exclude_attrs
+
+        if exclude_attrs:
+            props.difference_update(exclude_attrs)
+            changed = 1
+
+        proxy_attrs = self.proxy_attrs
+
+        if proxy_attrs is not None and codec:
+            context = codec.context
+
+            for k in proxy_attrs:
+                try:
+                    v = attrs[k]
+                except KeyError:
+                    continue
+
+                attrs[k] = context.getObjectForProxy(v)
+
+        if changed:
+            # apply all filters before synonyms
+            a = {}
+
+            for p in props:
+                a[p] = attrs[p]
+
+            attrs = a
+
+        synonym_attrs = self.synonym_attrs
+
+        if synonym_attrs:
+            apply_synonyms(attrs, synonym_attrs, 0)
+
+        return attrs
+
+    def applyAttributes(self, obj, attrs, codec=None):
+        """
+        Applies the collection of attributes C{attrs} to aliased object C{obj}.
+        Called when decoding reading aliased objects from an AMF byte stream.
+
+        @param codec: An optional argument that will contain the en/decoder
+            instance calling this function.
+        """
+        if not self._compiled:
+            self.compile()
+
+        if not self.shortcut_decode:
+            attrs = self.getDecodableAttributes(obj, attrs, codec=codec)
+        else:
+            if self.is_dict:
+                obj.update(attrs)
+
+                return
+
+            if not self.sealed:
+                obj.__dict__.update(attrs)
+
+                return
+
+        set_attrs(obj, attrs)
@@ -15,17 +15,22 @@ cdef class Decoder(codec.Decoder):
     cdef object readMixedArray(self)
     cdef object readReference(self)
     cdef object readTypedObject(self)
-    cdef void readObjectAttributes(self, object obj_attrs)
+    cdef int readObjectAttributes(self, object obj_attrs) except -1
+    cdef object readHookedObject(self, object hook)
     cdef object readBytes(self)
     cdef object readBoolean(self)
+    cdef Py_ssize_t countNumbers(self, Py_ssize_t size) except -1
+    cdef object readNumbers(self, Py_ssize_t count, bint as_array)
 
 
 cdef class Encoder(codec.Encoder):
     cdef public bint use_amf3
+    cdef public bint infer_traits
     cdef readonly Context context
     cdef amf3.Encoder amf3_encoder
 
     cdef inline int _writeEndObject(self) except -1
+    cdef int writeItems(self, object seq) except -1
     cdef int writeAMF3(self, o) except -1
     cdef int _writeDict(self, dict attrs) except -1
     cdef inline int writeReference(self, o) except -2
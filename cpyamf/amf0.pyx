@@ -8,6 +8,7 @@ C-extension for L{pyamf.amf3} Python module in L{PyAMF<pyamf>}.
 """
 
 from cpython cimport *
+from cpython cimport array
 from libc.stdlib cimport *
 from libc.string cimport *
 
@@ -15,9 +16,11 @@ cdef extern from "math.h":
     float floor(float)
 
 from cpyamf cimport codec, amf3
+from cpyamf.util cimport string_from_buffer
 
+import array
 import pyamf
-from pyamf import xml, util
+from pyamf import xml, util, records
 
 
 cdef char TYPE_NUMBER      = '\x00'
@@ -40,8 +43,17 @@ cdef char TYPE_TYPEDOBJECT = '\x10'
 cdef char TYPE_AMF3        = '\x11'
 
 
+#: The size of the buffer that lists of numbers are packed into. Every element
+#: takes 9 bytes.
+cdef enum:
+    NUMBERS_BUFFER_SIZE = 4608
+
+
 cdef object ASObject = pyamf.ASObject
+cdef object Record = records.Record
+cdef object fill_record = records.fill
 cdef object UnknownClassAlias = pyamf.UnknownClassAlias
+cdef array.array double_array = array.array('d')
 
 
 cdef class Context(codec.Context):
@@ -63,6 +75,9 @@ cdef class Decoder(codec.Decoder):
 
     def __init__(self, *args, **kwargs):
         self.use_amf3 = kwargs.pop('use_amf3', 0)
+        self.use_records = kwargs.pop('use_records', 0)
+        self.number_array = kwargs.pop('number_array', None)
+        self.object_hooks = kwargs.pop('object_hooks', None)
         self.context = kwargs.pop('context', None)
 
         if self.context is None:
@@ -75,13 +90,7 @@ cdef class Decoder(codec.Decoder):
 
         self.stream.read_double(&i)
 
-        if floor(i) == i:
-            try:
-                return int(i)
-            except OverflowError:
-                return i
-
-        return i
+        return check_for_int(i)
 
     cdef object readBoolean(self):
         cdef unsigned char b = self.stream.read_uchar()
@@ -110,7 +119,7 @@ cdef class Decoder(codec.Decoder):
 
         return PyUnicode_DecodeUTF8(b, <Py_ssize_t>l, 'strict')
 
-    cdef void readObjectAttributes(self, object obj_attrs):
+    cdef int readObjectAttributes(self, object obj_attrs) except -1:
         cdef object key
         cdef char *peek = NULL
 
@@ -118,6 +127,7 @@ cdef class Decoder(codec.Decoder):
             self.stream.peek(&peek, 3)
 
             if memcmp(peek, b'\x00\x00\x09', 3) == 0:
+                # discard the end marker (TYPE_OBJECTTERM)
                 self.stream.seek(3, 1)
 
                 break
@@ -126,19 +136,57 @@ cdef class Decoder(codec.Decoder):
 
             PyDict_SetItem(obj_attrs, key, self.readElement())
 
-        # discard the end marker (TYPE_OBJECTTERM)
+        return 0
+
+    cdef object readHookedObject(self, object hook):
+        """
+        Reads the attributes of an object and returns the result of passing
+        them to C{hook}.
+
+        :since: 0.9
+        """
+        cdef Py_ssize_t ref = self.context.addObject(None)
+        cdef dict attrs = {}
+
+        self.readObjectAttributes(attrs)
+
+        cdef object obj = hook(attrs)
+        self.context.replaceObject(ref, obj)
+
+        return obj
 
     cdef object readObject(self):
-        cdef object obj = ASObject()
+        cdef object obj
+        cdef dict attrs
+        cdef object hook = self.getObjectHook('')
+
+        if hook is not None:
+            return self.readHookedObject(hook)
+
+        if not self.use_records:
+            obj = ASObject()
+            self.context.addObject(obj)
+
+            self.readObjectAttributes(obj)
+
+            return obj
 
+        obj = Record()
         self.context.addObject(obj)
 
-        self.readObjectAttributes(obj)
+        attrs = {}
+        self.readObjectAttributes(attrs)
+
+        fill_record(obj, attrs)
 
         return obj
 
     cdef object readTypedObject(self):
         cdef object class_alias = self.readString()
+        cdef object hook = self.getObjectHook(class_alias)
+
+        if hook is not None:
+            return self.readHookedObject(hook)
 
         try:
             alias = self.context.getClassAlias(class_alias)
@@ -192,18 +240,87 @@ cdef class Decoder(codec.Decoder):
         return obj
 
     cdef object readList(self):
-        cdef list obj = []
+        cdef object obj
         cdef unsigned long l
         cdef unsigned long i
+        cdef Py_ssize_t count
 
-        self.context.addObject(obj)
         l = self.stream.read_ulong()
+        count = self.countNumbers(l)
+
+        # numbers do not add to the context, so the array can be added after
+        # they are read
+        if l > 0 and count == l and self.number_array is not None:
+            obj = self.getNumberArray(self.readNumbers(count, 1))
+            self.context.addObject(obj)
 
-        for i from 0 <= i < l:
+            return obj
+
+        obj = self.readNumbers(count, 0)
+        self.context.addObject(obj)
+
+        for i from count <= i < l:
             PyList_Append(obj, self.readElement())
 
         return obj
 
+    cdef Py_ssize_t countNumbers(self, Py_ssize_t size) except -1:
+        """
+        Returns how many of the next C{size} elements are numbers, stopping at
+        the first element that is not.
+
+        :since: 0.9
+        """
+        cdef char *buf = NULL
+        cdef Py_ssize_t available = self.stream.peek(
+            &buf,
+            self.stream.remaining()
+        )
+        cdef Py_ssize_t i = 0
+
+        if size > available / 9:
+            size = available / 9
+
+        while i < size and buf[i * 9] == TYPE_NUMBER:
+            i += 1
+
+        return i
+
+    cdef object readNumbers(self, Py_ssize_t count, bint as_array):
+        """
+        Reads the next C{count} numbers (see L{countNumbers}) into a C{list},
+        or straight into an C{array.array('d')} if C{as_array} is set.
+        Instrumented decoders read every number through L{readElement}.
+
+        :since: 0.9
+        """
+        cdef array.array numbers
+        cdef list result
+        cdef Py_ssize_t i
+        cdef double d
+
+        if as_array:
+            numbers = array.clone(double_array, count, 0)
+        else:
+            result = []
+
+        for i from 0 <= i < count:
+            if self.instrument is None:
+                self.stream.read_uchar()
+                self.stream.read_double(&d)
+            else:
+                d = self.readElement()
+
+            if as_array:
+                numbers.data.as_doubles[i] = d
+            else:
+                PyList_Append(result, check_for_int(d))
+
+        if as_array:
+            return numbers
+
+        return result
+
     cdef object readDate(self):
         cdef double ms = -1
         cdef short tz = -1
@@ -229,7 +346,7 @@ cdef class Decoder(codec.Decoder):
         l = self.stream.read_ulong()
 
         self.stream.read(&b, l)
-        s = PyString_FromStringAndSize(b, <Py_ssize_t>l)
+        s = string_from_buffer(b, <Py_ssize_t>l)
 
         if bytes:
             return s
@@ -255,7 +372,11 @@ cdef class Decoder(codec.Decoder):
             self.amf3_decoder = amf3.Decoder(
                 stream=self.stream,
                 context=self.context.amf3_context,
-                timezone_offset=self.timezone_offset)
+                timezone_offset=self.timezone_offset,
+                instrument=self.instrument or False,
+                use_records=self.use_records,
+                number_array=self.number_array,
+                object_hooks=self.object_hooks)
 
         return self.amf3_decoder.readElement()
 
@@ -304,6 +425,7 @@ cdef class Encoder(codec.Encoder):
 
     def __init__(self, *args, **kwargs):
         self.use_amf3 = kwargs.pop('use_amf3', 0)
+        self.infer_traits = kwargs.pop('infer_traits', 0)
 
         self.context = kwargs.pop('context', None)
 
@@ -346,44 +468,81 @@ cdef class Encoder(codec.Encoder):
         """
         Write array to the stream.
         """
-        cdef Py_ssize_t size = -1, i = -1
-        cdef PyObject *x = NULL
+        if self.writeReference(a) != -1:
+            return 0
+
+        self.context.addObject(a)
+
+        self.writeType(TYPE_ARRAY)
+        self.stream.write_ulong(PyList_GET_SIZE(a))
 
+        return self.writeItems(a)
+
+    cdef int writeTuple(self, object a) except -1:
         if self.writeReference(a) != -1:
             return 0
 
         self.context.addObject(a)
 
         self.writeType(TYPE_ARRAY)
-        size = PyList_GET_SIZE(a)
+        self.stream.write_ulong(PyTuple_GET_SIZE(a))
 
-        self.stream.write_ulong(size)
+        return self.writeItems(a)
 
-        for i from 0 <= i < size:
-            x = PyList_GET_ITEM(a, i)
+    cdef int writeItems(self, object seq) except -1:
+        """
+        Writes the elements of the C{list} or C{tuple} C{seq}. Numbers are
+        packed into a local buffer and written in chunks, strings skip the
+        type dispatch of L{writeElement}.
 
-            self.writeElement(<object>x)
+        :since: 0.9
+        """
+        cdef Py_ssize_t size = PySequence_Fast_GET_SIZE(seq)
+        cdef PyObject **items = PySequence_Fast_ITEMS(seq)
+        cdef int kind = codec.SEQUENCE_MIXED
+        cdef char buf[NUMBERS_BUFFER_SIZE]
+        cdef Py_ssize_t i, pos = 0
+        cdef double d
+        cdef object x
 
-        return 0
+        if not self.use_amf3:
+            kind = self.getSequenceKind(seq)
 
-    cdef int writeTuple(self, object a) except -1:
-        cdef Py_ssize_t size = -1, i = -1
-        cdef PyObject *x = NULL
+        if kind == codec.SEQUENCE_NUMBERS:
+            for i from 0 <= i < size:
+                x = <object>items[i]
+
+                if PyInt_CheckExact(x):
+                    d = <double>PyInt_AS_LONG(x)
+                else:
+                    d = PyFloat_AS_DOUBLE(x)
+
+                buf[pos] = TYPE_NUMBER
+                self.stream.pack_double(d, <unsigned char *>buf + pos + 1)
+                pos += 9
+
+                if pos > NUMBERS_BUFFER_SIZE - 9:
+                    self.stream.write(buf, pos)
+                    pos = 0
+
+            if pos > 0:
+                self.stream.write(buf, pos)
 
-        if self.writeReference(a) != -1:
             return 0
 
-        self.context.addObject(a)
+        if kind == codec.SEQUENCE_STRINGS:
+            for i from 0 <= i < size:
+                x = <object>items[i]
 
-        self.writeType(TYPE_ARRAY)
-        size = PyTuple_GET_SIZE(a)
+                if PyString_CheckExact(x):
+                    self.writeBytes(x)
+                else:
+                    self.writeString(x)
 
-        self.stream.write_ulong(size)
+            return 0
 
         for i from 0 <= i < size:
-            x = PyTuple_GET_ITEM(a, i)
-
-            self.writeElement(<object>x)
+            self.writeElement(<object>items[i])
 
         return 0
 
@@ -571,13 +730,42 @@ cdef class Encoder(codec.Encoder):
             self.amf3_encoder = amf3.Encoder(
                 stream=self.stream,
                 context=self.context.amf3_context,
-                timezone_offset=self.timezone_offset)
+                timezone_offset=self.timezone_offset,
+                instrument=self.instrument or False,
+                infer_traits=self.infer_traits)
 
         self.writeType(TYPE_AMF3)
         self.amf3_encoder.writeElement(o)
 
+    cdef int writeEncoded(self, object o) except -1:
+        if self.use_amf3 and o.amf3 is not None:
+            o = o.amf3
+
+        if o.encoding == pyamf.AMF3:
+            # writeAMF3 sets up the amf3 encoder and writes the AVM+ marker
+            return self.writeAMF3(o)
+
+        return codec.Encoder.writeEncoded(self, o)
+
     cdef inline int handleBasicTypes(self, object element, object py_type) except -1:
+        if py_type is pyamf.Encoded:
+            return self.writeEncoded(element)
+
         if self.use_amf3:
             return self.writeAMF3(element)
 
         return codec.Encoder.handleBasicTypes(self, element, py_type)
+
+
+cdef inline object check_for_int(double i):
+    """
+    AMF0 has no way to distinguish between integers and floats, so whole
+    numbers are returned as C{int}s.
+    """
+    if floor(i) == i:
+        try:
+            return int(i)
+        except OverflowError:
+            return i
+
+    return i
@@ -15,6 +15,7 @@ cdef class ClassDefinition(object):
     cdef Py_ssize_t encoded_ref_size
 
     cdef readonly list static_properties
+    cdef readonly list static_types
 
     cdef int writeReference(self, util.cBufferedByteStream stream)
 
@@ -41,21 +42,39 @@ cdef class Context(codec.Context):
 
 cdef class Decoder(codec.Decoder):
     cdef public bint use_proxies
+    cdef public object byte_array_view
     cdef readonly Context context
+    cdef object data_input
 
     cdef ClassDefinition _getClassDefinition(self, long ref)
     cdef int _readStatic(self, ClassDefinition class_def, dict obj) except -1
     cdef int _readDynamic(self, ClassDefinition class_def, dict obj) except -1
+    cdef object _readHookedObject(self, ClassDefinition class_def, object hook)
+    cdef object readTyped(self, object spec)
 
     cdef object readBytes(self)
     cdef object readInteger(self, int signed=?)
+    cdef Py_ssize_t countNumbers(self, Py_ssize_t size) except -1
+    cdef object readNumbers(self, Py_ssize_t count, bint as_array)
     cdef object readByteArray(self)
     cdef object readProxy(self, obj)
+    cdef object getDataInput(self)
 
 
 cdef class Encoder(codec.Encoder):
     cdef public bint use_proxies
+    cdef public bint infer_traits
     cdef readonly Context context
+    cdef object data_output
 
+    cdef int writeItems(self, object seq) except -1
+    cdef int writeSealedObject(self, object obj) except -1
     cdef int writeByteArray(self, object obj) except -1
+    cdef int isObject(self, object value, object klass) except -1
+    cdef int writeTyped(self, object value, object spec) except -1
+    cdef int writeTypedList(self, list n, object klass) except -1
     cdef int writeProxy(self, obj) except -1
+    cdef object getDataOutput(self)
+
+
+cdef int decode_int(util.cBufferedByteStream stream, int sign=*) except? -1
@@ -8,17 +8,26 @@ C-extension for L{pyamf.amf3} Python module in L{PyAMF<pyamf>}.
 """
 
 from cpython cimport *
+from cpython cimport array
 from libc.stdlib cimport malloc, free
 
 cimport cython
 
+cdef extern from "datetime.h":
+    void PyDateTime_IMPORT()
+    int PyDateTime_CheckExact(object)
+
 from cpyamf.util cimport cBufferedByteStream, BufferedByteStream
+from cpyamf.util cimport string_from_buffer
 from cpyamf cimport codec
+import array
 import pyamf
-from pyamf import util, amf3, xml
+from pyamf import util, amf3, xml, records, alias as alias_module
 import types
 
 
+PyDateTime_IMPORT
+
 try:
     import zlib
 except ImportError:
@@ -48,14 +57,31 @@ cdef long MAX_29B_INT = 0x0FFFFFFF
 #: The minimum that can be represented by an signed 29 bit integer.
 cdef long MIN_29B_INT = -0x10000000
 
+#: The size of the buffer that lists of numbers are packed into. Every element
+#: takes at most 9 bytes.
+cdef enum:
+    NUMBERS_BUFFER_SIZE = 4608
+
 cdef int OBJECT_ENCODING_STATIC = 0x00
 cdef int OBJECT_ENCODING_EXTERNAL = 0x01
 cdef int OBJECT_ENCODING_DYNAMIC = 0x02
 cdef int OBJECT_ENCODING_PROXY = 0x03
 
+cdef int SCHEMA_INT = alias_module.SCHEMA_TYPES['int']
+cdef int SCHEMA_DOUBLE = alias_module.SCHEMA_TYPES['double']
+cdef int SCHEMA_STRING = alias_module.SCHEMA_TYPES['string']
+cdef int SCHEMA_BOOLEAN = alias_module.SCHEMA_TYPES['boolean']
+cdef int SCHEMA_DATE = alias_module.SCHEMA_TYPES['date']
+cdef int SCHEMA_OBJECT = alias_module.SCHEMA_OBJECT
+cdef int SCHEMA_LIST = alias_module.SCHEMA_LIST
+
 cdef object ByteArrayType = amf3.ByteArray
 cdef object DataInput = amf3.DataInput
 cdef object DataOutput = amf3.DataOutput
+cdef object ASObject = pyamf.ASObject
+cdef object Record = records.Record
+cdef object fill_record = records.fill
+cdef array.array double_array = array.array('d')
 cdef str empty_string = str('')
 cdef unicode empty_unicode = empty_string.decode('utf-8')
 cdef object undefined = pyamf.Undefined
@@ -81,10 +107,12 @@ cdef class ClassDefinition(object):
 
         self.attr_len = 0
         self.static_properties = []
+        self.static_types = None
 
         if alias.static_attrs:
             self.attr_len = len(alias.static_attrs)
             self.static_properties = alias.static_attrs
+            self.static_types = alias.getStaticTypes()
 
         self.encoding = OBJECT_ENCODING_DYNAMIC
 
@@ -164,26 +192,75 @@ cdef class Context(codec.Context):
         return 0
 
     cpdef object getString(self, Py_ssize_t ref):
+        if self.ref_hook is not None and self.ref_hook_decoding:
+            self.ref_hook('string', True)
+
         return self.strings.getByReference(ref)
 
     cpdef Py_ssize_t getStringReference(self, object s) except -2:
-        return self.strings.getReferenceTo(s)
+        cdef Py_ssize_t ref = self.strings.getReferenceTo(s)
+
+        if self.ref_hook is not None and not self.ref_hook_decoding:
+            self.ref_hook('string', ref != -1)
+
+        return ref
 
     cpdef Py_ssize_t addString(self, object s) except -1:
         """
         Returns -2 which signifies that s was empty
         """
+        if self.ref_hook is not None and self.ref_hook_decoding:
+            self.ref_hook('string', False)
+
         return self.strings.append(s)
 
+    def getReferenceCounts(self):
+        """
+        Returns the number of entries in the object, string and class
+        definition reference tables.
+
+        @since: 0.9
+        """
+        return (len(self.objects), len(self.strings), self.class_idx)
+
+    def reserveReferences(self, Py_ssize_t objects=0, Py_ssize_t strings=0,
+                          Py_ssize_t classes=0):
+        """
+        Adds placeholder entries to the reference tables for data that was
+        written to (or read from) the stream without going through this
+        context.
+
+        @since: 0.9
+        """
+        cdef Py_ssize_t i
+
+        codec.Context.reserveReferences(self, objects)
+
+        for i from 0 <= i < strings:
+            self.strings.append(object())
+
+        self.class_idx += classes
+
     cpdef object getClassByReference(self, Py_ssize_t ref):
+        if self.ref_hook is not None and self.ref_hook_decoding:
+            self.ref_hook('class', True)
+
         return self.class_ref.get(ref, None)
 
     cpdef ClassDefinition getClass(self, object klass):
-        return self.classes.get(klass, None)
+        cdef object ret = self.classes.get(klass, None)
+
+        if self.ref_hook is not None and not self.ref_hook_decoding:
+            self.ref_hook('class', ret is not None)
+
+        return ret
 
     cpdef Py_ssize_t addClass(self, ClassDefinition alias, klass) except? -1:
         cdef object ref = self.class_idx
 
+        if self.ref_hook is not None and self.ref_hook_decoding:
+            self.ref_hook('class', False)
+
         self.class_ref[ref] = alias
         self.classes[klass] = alias
 
@@ -254,6 +331,10 @@ cdef class Decoder(codec.Decoder):
 
     def __init__(self, *args, **kwargs):
         context = kwargs.pop('context', None)
+        self.byte_array_view = kwargs.pop('byte_array_view', None)
+        self.use_records = kwargs.pop('use_records', 0)
+        self.number_array = kwargs.pop('number_array', None)
+        self.object_hooks = kwargs.pop('object_hooks', None)
 
         if context is None:
             context = Context()
@@ -342,6 +423,7 @@ cdef class Decoder(codec.Decoder):
         """
         cdef int size = _read_ref(self.stream)
         cdef int i
+        cdef Py_ssize_t count
         cdef list result
         cdef object tmp
         cdef unicode key
@@ -354,10 +436,20 @@ cdef class Decoder(codec.Decoder):
 
         if PyUnicode_GetSize(key) == 0:
             # integer indexes only -> python list
-            result = []
+            count = self.countNumbers(size)
+
+            # numbers do not add to the context, so the array can be added
+            # after they are read
+            if size > 0 and count == size and self.number_array is not None:
+                tmp = self.getNumberArray(self.readNumbers(count, 1))
+                self.context.addObject(tmp)
+
+                return tmp
+
+            result = self.readNumbers(count, 0)
             self.context.addObject(result)
 
-            for i from 0 <= i < size:
+            for i from count <= i < size:
                 result.append(self.readElement())
 
             return result
@@ -375,6 +467,92 @@ cdef class Decoder(codec.Decoder):
 
         return tmp
 
+    cdef Py_ssize_t countNumbers(self, Py_ssize_t size) except -1:
+        """
+        Returns how many of the next C{size} elements are integers or numbers,
+        stopping at the first element that is not.
+
+        :since: 0.9
+        """
+        cdef char *buf = NULL
+        cdef Py_ssize_t available = self.stream.peek(
+            &buf,
+            self.stream.remaining()
+        )
+        cdef Py_ssize_t i = 0, pos = 0, n
+
+        while i < size and pos < available:
+            if buf[pos] == TYPE_NUMBER:
+                pos += 9
+            elif buf[pos] == TYPE_INTEGER:
+                pos += 1
+                n = 0
+
+                # a U29 has up to 3 bytes with the high bit set plus one more
+                while n < 3 and pos < available and buf[pos] & 0x80:
+                    pos += 1
+                    n += 1
+
+                pos += 1
+            else:
+                break
+
+            if pos > available:
+                # truncated
+                break
+
+            i += 1
+
+        return i
+
+    cdef object readNumbers(self, Py_ssize_t count, bint as_array):
+        """
+        Reads the next C{count} integers and numbers (see L{countNumbers}) into
+        a C{list}, or straight into an C{array.array('d')} if C{as_array} is
+        set. Instrumented decoders read every element through L{readElement}.
+
+        :since: 0.9
+        """
+        cdef array.array numbers
+        cdef list result
+        cdef Py_ssize_t i
+        cdef double d
+        cdef object x
+
+        if as_array:
+            numbers = array.clone(double_array, count, 0)
+        else:
+            result = []
+
+        for i from 0 <= i < count:
+            if self.instrument is not None:
+                x = self.readElement()
+            elif self.stream.read_char() == TYPE_NUMBER:
+                self.stream.read_double(&d)
+
+                if as_array:
+                    numbers.data.as_doubles[i] = d
+
+                    continue
+
+                x = d
+            elif as_array:
+                numbers.data.as_doubles[i] = decode_int(self.stream, 1)
+
+                continue
+            else:
+                x = decode_int(self.stream, 1)
+
+            if as_array:
+                numbers.data.as_doubles[i] = x
+            else:
+                PyList_Append(result, x)
+
+        if as_array:
+            return numbers
+
+        return result
+
     cdef ClassDefinition _getClassDefinition(self, long ref):
         """
         Reads class definition from the stream.
@@ -394,7 +572,7 @@ cdef class Decoder(codec.Decoder):
         try:
             alias = self.context.getClassAlias(name)
         except pyamf.UnknownClassAlias:
-            if self.strict:
+            if self.strict and self.getObjectHook(name) is None:
                 raise
 
             alias = pyamf.TypedObjectClassAlias(name)
@@ -409,6 +587,13 @@ cdef class Decoder(codec.Decoder):
             for i from 0 <= i < class_def.attr_len:
                 class_def.static_properties.append(self.readString())
 
+        class_def.static_types = None
+
+        if alias.schema:
+            class_def.static_types = [
+                alias.schema.get(attr) for attr in class_def.static_properties
+            ]
+
         self.context.addClass(class_def, alias.klass)
 
         return class_def
@@ -416,12 +601,79 @@ cdef class Decoder(codec.Decoder):
     @cython.boundscheck(False)
     cdef int _readStatic(self, ClassDefinition class_def, dict obj) except -1:
         cdef Py_ssize_t i
+        cdef list static_types = class_def.static_types
+
+        if static_types is None or self.instrument is not None:
+            for 0 <= i < class_def.attr_len:
+                obj[class_def.static_properties[i]] = self.readElement()
+
+            return 0
 
         for 0 <= i < class_def.attr_len:
-            obj[class_def.static_properties[i]] = self.readElement()
+            obj[class_def.static_properties[i]] = self.readTyped(
+                static_types[i]
+            )
 
         return 0
 
+    cdef object readTyped(self, object spec):
+        """
+        Reads the value of a schema attribute. If the type marker in the
+        stream matches the schema, the value is read without going through
+        L{readElement}.
+        """
+        cdef char *buf = NULL
+        cdef int code
+        cdef char t
+
+        if spec is None or self.stream.peek(&buf, 1) != 1:
+            return self.readElement()
+
+        code = (<tuple>spec)[0]
+        t = buf[0]
+
+        if code == SCHEMA_INT:
+            if t == TYPE_INTEGER:
+                self.stream.seek(1, 1)
+
+                return self.readInteger(1)
+        elif code == SCHEMA_DOUBLE:
+            if t == TYPE_NUMBER:
+                self.stream.seek(1, 1)
+
+                return self.readNumber()
+        elif code == SCHEMA_STRING:
+            if t == TYPE_STRING:
+                self.stream.seek(1, 1)
+
+                return self.readString()
+        elif code == SCHEMA_BOOLEAN:
+            if t == TYPE_BOOL_TRUE:
+                self.stream.seek(1, 1)
+
+                return True
+            elif t == TYPE_BOOL_FALSE:
+                self.stream.seek(1, 1)
+
+                return False
+        elif code == SCHEMA_DATE:
+            if t == TYPE_DATE:
+                self.stream.seek(1, 1)
+
+                return self.readDate()
+        elif code == SCHEMA_OBJECT:
+            if t == TYPE_OBJECT:
+                self.stream.seek(1, 1)
+
+                return self.readObject()
+        elif code == SCHEMA_LIST:
+            if t == TYPE_ARRAY:
+                self.stream.seek(1, 1)
+
+                return self.readList()
+
+        return self.readElement()
+
     cdef int _readDynamic(self, ClassDefinition class_def, dict obj) except -1:
         cdef object attr
         cdef char *peek = NULL
@@ -441,6 +693,27 @@ cdef class Decoder(codec.Decoder):
 
         return 0
 
+    cdef object _readHookedObject(self, ClassDefinition class_def,
+                                  object hook):
+        """
+        Reads the attributes of an object and returns the result of passing
+        them to C{hook}.
+
+        :since: 0.9
+        """
+        cdef Py_ssize_t ref = self.context.addObject(None)
+        cdef dict obj_attrs = {}
+
+        self._readStatic(class_def, obj_attrs)
+
+        if class_def.encoding == OBJECT_ENCODING_DYNAMIC:
+            self._readDynamic(class_def, obj_attrs)
+
+        cdef object obj = hook(obj_attrs)
+        self.context.replaceObject(ref, obj)
+
+        return obj
+
     cdef object readObject(self):
         """
         Reads an object from the stream.
@@ -465,8 +738,23 @@ cdef class Decoder(codec.Decoder):
 
         cdef ClassDefinition class_def = self._getClassDefinition(ref >> 1)
         cdef object alias = class_def.alias
+        cdef object hook = None
+
+        if self.object_hooks is not None and (
+                class_def.encoding == OBJECT_ENCODING_DYNAMIC or
+                class_def.encoding == OBJECT_ENCODING_STATIC):
+            hook = self.getObjectHook(alias.alias)
+
+            if hook is not None:
+                return self._readHookedObject(class_def, hook)
+
+        cdef bint is_record = self.use_records and alias.klass is ASObject
+
+        if is_record:
+            obj = Record()
+        else:
+            obj = alias.createInstance(codec=self)
 
-        obj = alias.createInstance(codec=self)
         cdef dict obj_attrs = {}
 
         self.context.addObject(obj)
@@ -477,7 +765,7 @@ cdef class Decoder(codec.Decoder):
         elif class_def.encoding == OBJECT_ENCODING_STATIC:
             self._readStatic(class_def, obj_attrs)
         elif class_def.encoding == OBJECT_ENCODING_EXTERNAL or class_def.encoding == OBJECT_ENCODING_PROXY:
-            obj.__readamf__(DataInput(self))
+            obj.__readamf__(self.getDataInput())
 
             if self.use_proxies == 1:
                 return self.readProxy(obj)
@@ -486,7 +774,10 @@ cdef class Decoder(codec.Decoder):
         else:
             raise pyamf.DecodeError("Unknown object encoding")
 
-        alias.applyAttributes(obj, obj_attrs, codec=self)
+        if is_record:
+            fill_record(obj, obj_attrs)
+        else:
+            alias.applyAttributes(obj, obj_attrs, codec=self)
 
         if self.use_proxies:
             return self.readProxy(obj)
@@ -540,7 +831,7 @@ cdef class Decoder(codec.Decoder):
         ref >>= 1
 
         self.stream.read(&buf, ref)
-        s = PyString_FromStringAndSize(buf, ref)
+        s = string_from_buffer(buf, ref)
 
         if zlib:
             if ref > 2 and buf[0] == '\x78' and buf[1] == '\x9c':
@@ -549,7 +840,10 @@ cdef class Decoder(codec.Decoder):
                 except zlib.error:
                     pass
 
-        s = (<object>ByteArrayType)(s)
+        if self.byte_array_view is not None:
+            s = self.byte_array_view(s)
+        else:
+            s = (<object>ByteArrayType)(s)
 
         self.context.addObject(s)
 
@@ -563,6 +857,19 @@ cdef class Decoder(codec.Decoder):
         """
         return self.context.getObjectForProxy(obj)
 
+    cdef object getDataInput(self):
+        """
+        Returns the L{DataInput} that is handed to externalised objects. It is
+        reused for as long as the stream stays the same.
+
+        :since: 0.9
+        """
+        if (self.data_input is None or
+                self.data_input.stream is not self.stream):
+            self.data_input = DataInput(self)
+
+        return self.data_input
+
     cdef object readConcreteElement(self, char t):
         if t == TYPE_STRING:
             return self.readString()
@@ -601,6 +908,7 @@ cdef class Encoder(codec.Encoder):
 
     def __init__(self, *args, **kwargs):
         self.use_proxies = kwargs.pop('use_proxies', amf3.use_proxies_default)
+        self.infer_traits = kwargs.pop('infer_traits', 0)
         context = kwargs.pop('context', None)
 
         if context is None:
@@ -701,8 +1009,6 @@ cdef class Encoder(codec.Encoder):
 
     cpdef int writeList(self, object n, bint is_proxy=0) except -1:
         cdef Py_ssize_t ref = self.context.getObjectReference(n)
-        cdef Py_ssize_t i
-        cdef PyObject *x
 
         if self.use_proxies == 1 and not is_proxy:
             # Encode lists as ArrayCollections
@@ -720,17 +1026,10 @@ cdef class Encoder(codec.Encoder):
 
         self.writeType('\x01')
 
-        for i from 0 <= i < ref:
-            x = PyList_GET_ITEM(n, i)
-
-            self.writeElement(<object>x)
-
-        return 0
+        return self.writeItems(n)
 
     cdef int writeTuple(self, object n) except -1:
         cdef Py_ssize_t ref = self.context.getObjectReference(n)
-        cdef Py_ssize_t i
-        cdef PyObject *x
 
         self.writeType(TYPE_ARRAY)
 
@@ -744,10 +1043,73 @@ cdef class Encoder(codec.Encoder):
         _encode_integer(self.stream, (ref << 1) | REFERENCE_BIT)
         self.writeType('\x01')
 
-        for i from 0 <= i < ref:
-            x = PyTuple_GET_ITEM(n, i)
+        return self.writeItems(n)
 
-            self.writeElement(<object>x)
+    cdef int writeItems(self, object seq) except -1:
+        """
+        Writes the elements of the C{list} or C{tuple} C{seq}. Numbers are
+        packed into a local buffer and written in chunks, strings skip the
+        type dispatch of L{writeElement}.
+
+        :since: 0.9
+        """
+        cdef Py_ssize_t size = PySequence_Fast_GET_SIZE(seq)
+        cdef PyObject **items = PySequence_Fast_ITEMS(seq)
+        cdef int kind = self.getSequenceKind(seq)
+        cdef char buf[NUMBERS_BUFFER_SIZE]
+        cdef Py_ssize_t i, pos = 0
+        cdef long n
+        cdef double d
+        cdef object x
+
+        if kind == codec.SEQUENCE_NUMBERS:
+            for i from 0 <= i < size:
+                x = <object>items[i]
+
+                if PyInt_CheckExact(x):
+                    n = PyInt_AS_LONG(x)
+
+                    if MIN_29B_INT <= n <= MAX_29B_INT:
+                        buf[pos] = TYPE_INTEGER
+                        pos += 1 + pack_int(n, buf + pos + 1)
+                    else:
+                        d = <double>n
+                        buf[pos] = TYPE_NUMBER
+                        self.stream.pack_double(
+                            d,
+                            <unsigned char *>buf + pos + 1
+                        )
+                        pos += 9
+                else:
+                    buf[pos] = TYPE_NUMBER
+                    self.stream.pack_double(
+                        PyFloat_AS_DOUBLE(x),
+                        <unsigned char *>buf + pos + 1
+                    )
+                    pos += 9
+
+                if pos > NUMBERS_BUFFER_SIZE - 9:
+                    self.stream.write(buf, pos)
+                    pos = 0
+
+            if pos > 0:
+                self.stream.write(buf, pos)
+
+            return 0
+
+        if kind == codec.SEQUENCE_STRINGS:
+            for i from 0 <= i < size:
+                x = <object>items[i]
+
+                if PyString_CheckExact(x):
+                    self.writeBytes(x)
+                else:
+                    self.writeString(x)
+
+            return 0
+
+        for i from 0 <= i < size:
+            self.writeElement(<object>items[i])
 
         return 0
 
@@ -768,6 +1130,9 @@ cdef class Encoder(codec.Encoder):
 
         self.context.addObject(obj)
 
+        if self.infer_traits and self.writeSealedObject(obj):
+            return 0
+
         cdef bint class_ref = 0
         cdef ClassDefinition definition = self.context.getClass(dict)
 
@@ -862,6 +1227,9 @@ cdef class Encoder(codec.Encoder):
         cdef PyObject *key
         cdef PyObject *value
         cdef object attrs
+        cdef object attr_value
+        cdef list static_types
+        cdef Py_ssize_t i
 
         if self.use_proxies and not is_proxy:
             return self.writeProxy(obj)
@@ -879,6 +1247,11 @@ cdef class Encoder(codec.Encoder):
 
         # object is not referenced, serialise it
         kls = obj.__class__
+
+        if self.infer_traits and (kls is ASObject or isinstance(obj, Record)):
+            if self.writeSealedObject(obj):
+                return 0
+
         definition = self.context.getClass(kls)
 
         if definition:
@@ -904,7 +1277,7 @@ cdef class Encoder(codec.Encoder):
             # again.
 
         if alias.external:
-            obj.__writeamf__(DataOutput(self))
+            obj.__writeamf__(self.getDataOutput())
 
             return 0
 
@@ -918,16 +1291,29 @@ cdef class Encoder(codec.Encoder):
                 for attr in definition.static_properties:
                     self.serialiseString(attr)
 
-            for attr in definition.static_properties:
+            static_types = definition.static_types
+
+            if self.instrument is not None:
+                static_types = None
+
+            for i from 0 <= i < definition.attr_len:
+                attr = definition.static_properties[i]
                 value = PyDict_GetItem(attrs, attr)
 
                 if value == NULL:
                     raise KeyError
 
+                # the dict may hold the only reference to the value (e.g. one
+                # returned by a property), so take our own before deleting
+                attr_value = <object>value
+
                 if PyDict_DelItem(attrs, attr) == -1:
                     return -1
 
-                self.writeElement(<object>value)
+                if static_types is None:
+                    self.writeElement(attr_value)
+                else:
+                    self.writeTyped(attr_value, static_types[i])
 
             if definition.encoding == OBJECT_ENCODING_STATIC:
                 return 0
@@ -945,6 +1331,134 @@ cdef class Encoder(codec.Encoder):
 
         return 0
 
+    cdef int writeSealedObject(self, object obj) except -1:
+        """
+        Writes the traits and values of the anonymous object C{obj}. The
+        traits are sealed and shared with every other object that has the
+        same keys.
+
+        @return: 1 if C{obj} was written. Nothing is written (and 0 returned)
+            if a key is not a non-empty string.
+        :since: 0.9
+        """
+        cdef object keys = frozenset(obj)
+        cdef ClassDefinition definition = self.context.getClass(keys)
+        cdef bint class_ref = definition is not None
+        cdef object attr
+
+        if not class_ref:
+            for attr in keys:
+                if not PyString_Check(attr) and not PyUnicode_Check(attr):
+                    return 0
+
+                if not attr:
+                    return 0
+
+            definition = ClassDefinition(pyamf.ClassAlias(
+                ASObject,
+                static_attrs=list(obj),
+                dynamic=False
+            ))
+
+            self.context.addClass(definition, keys)
+
+        definition.writeReference(self.stream)
+
+        if not class_ref:
+            # anonymous
+            self.stream.write(&REF_CHAR, 1)
+
+            for attr in definition.static_properties:
+                self.serialiseString(attr)
+
+        for attr in definition.static_properties:
+            self.writeElement(obj[attr])
+
+        return 1
+
+    cdef int isObject(self, object value, object klass) except -1:
+        """
+        Whether C{value} is a C{klass} that L{writeElement} would hand to
+        L{writeObject}.
+        """
+        cdef object py_type = type(value)
+
+        return py_type is klass and PySequence_Contains(
+            self.use_write_object,
+            py_type
+        )
+
+    cdef int writeTyped(self, object value, object spec) except -1:
+        """
+        Writes the value of a schema attribute. If C{value} has the type
+        declared in the schema, it is written without going through
+        L{writeElement}.
+        """
+        cdef int code
+
+        if spec is None:
+            return self.writeElement(value)
+
+        code = (<tuple>spec)[0]
+
+        if code == SCHEMA_INT:
+            if PyInt_CheckExact(value):
+                return self.writeInt(value)
+        elif code == SCHEMA_DOUBLE:
+            if PyFloat_CheckExact(value):
+                return self.writeNumber(value)
+        elif code == SCHEMA_STRING:
+            if PyUnicode_CheckExact(value):
+                return self.writeString(value)
+            elif PyString_CheckExact(value):
+                return self.writeBytes(value)
+        elif code == SCHEMA_BOOLEAN:
+            if value is True:
+                return self.writeType(TYPE_BOOL_TRUE)
+            elif value is False:
+                return self.writeType(TYPE_BOOL_FALSE)
+        elif code == SCHEMA_DATE:
+            if PyDateTime_CheckExact(value):
+                return self.writeDateTime(value)
+        elif code == SCHEMA_OBJECT:
+            if self.isObject(value, (<tuple>spec)[1]):
+                return self.writeObject(value)
+        elif code == SCHEMA_LIST:
+            if PyList_CheckExact(value) and not self.use_proxies:
+                return self.writeTypedList(value, (<tuple>spec)[1])
+
+        return self.writeElement(value)
+
+    cdef int writeTypedList(self, list n, object klass) except -1:
+        """
+        Writes a list of C{klass} instances declared in a schema.
+        """
+        cdef Py_ssize_t ref = self.context.getObjectReference(n)
+        cdef Py_ssize_t i
+        cdef object x
+
+        self.writeType(TYPE_ARRAY)
+
+        if ref != -1:
+            return _encode_integer(self.stream, ref << 1)
+
+        self.context.addObject(n)
+        ref = PyList_GET_SIZE(n)
+
+        _encode_integer(self.stream, (ref << 1) | REFERENCE_BIT)
+
+        self.writeType('\x01')
+
+        for i from 0 <= i < ref:
+            x = <object>PyList_GET_ITEM(n, i)
+
+            if self.isObject(x, klass):
+                self.writeObject(x)
+            else:
+                self.writeElement(x)
+
+        return 0
+
     cdef int writeByteArray(self, object obj) except -1:
         """
         Writes a L{ByteArray} to the data stream.
@@ -954,6 +1468,7 @@ cdef class Encoder(codec.Encoder):
         """
         cdef Py_ssize_t ref
         cdef object buf
+        cdef cBufferedByteStream b
 
         self.writeType(TYPE_BYTEARRAY)
 
@@ -966,6 +1481,16 @@ cdef class Encoder(codec.Encoder):
 
         self.context.addObject(obj)
 
+        if (isinstance(obj, cBufferedByteStream) and obj is not self.stream and
+                not obj.compressed):
+            # write straight from the byte array, which may be borrowed
+            b = <cBufferedByteStream>obj
+
+            _encode_integer(self.stream, (b.length << 1) | REFERENCE_BIT)
+            self.stream.write(b.buffer, b.length)
+
+            return 0
+
         buf = str(obj)
         l = PyString_GET_SIZE(buf)
 
@@ -998,6 +1523,22 @@ cdef class Encoder(codec.Encoder):
 
         return 0
 
+    cdef int writeEncoded(self, object o) except -1:
+        if o.amf3 is not None:
+            o = o.amf3
+
+        if o.encoding != pyamf.AMF3:
+            if o.value is None:
+                raise pyamf.EncodeError(
+                    'Unable to write an AMF%d fragment to an AMF3 stream' % (
+                        o.encoding,
+                    )
+                )
+
+            return self.writeElement(o.value)
+
+        return codec.Encoder.writeEncoded(self, o)
+
     cdef int writeDateTime(self, obj) except -1:
         """
         Writes an L{datetime.datetime} object to the stream
@@ -1030,6 +1571,19 @@ cdef class Encoder(codec.Encoder):
 
         return self.writeObject(proxy, 1)
 
+    cdef object getDataOutput(self):
+        """
+        Returns the L{DataOutput} that is handed to externalised objects. It
+        is reused for as long as the stream stays the same.
+
+        :since: 0.9
+        """
+        if (self.data_output is None or
+                self.data_output.stream is not self.stream):
+            self.data_output = DataOutput(self)
+
+        return self.data_output
+
     cdef int handleBasicTypes(self, object element, object py_type) except -1:
         cdef int ret = codec.Encoder.handleBasicTypes(self, element, py_type)
 
@@ -1040,58 +1594,48 @@ cdef class Encoder(codec.Encoder):
         return ret
 
 
-cdef int encode_int(long i, char **buf) except -1:
+cdef int pack_int(long i, char *buf):
+    """
+    Packs C{i} as a U29 into C{buf}, which must have room for 4 bytes.
+
+    @return: The number of bytes written.
+    """
     # Use typecasting to get the twos complement representation of i
     cdef unsigned long n = (<unsigned long*>(<void *>(&i)))[0]
 
     cdef unsigned long real_value = n
     cdef unsigned char count = 0
-    cdef char *bytes = NULL
 
     if n > 0x1fffff:
-        bytes = <char *>malloc(4)
-
-        if bytes == NULL:
-            PyErr_NoMemory()
-
         n = n >> 1
-        bytes[count] = 0x80 | ((n >> 21) & 0xff)
+        buf[count] = 0x80 | ((n >> 21) & 0xff)
         count += 1
 
     if n > 0x3fff:
-        if bytes == NULL:
-            bytes = <char *>malloc(3)
-
-            if bytes == NULL:
-                PyErr_NoMemory()
-
-        bytes[count] = 0x80 | ((n >> 14) & 0xff)
+        buf[count] = 0x80 | ((n >> 14) & 0xff)
         count += 1
 
     if n > 0x7f:
-        if bytes == NULL:
-            bytes = <char *>malloc(2)
+        buf[count] = 0x80 | ((n >> 7) & 0xff)
+        count += 1
 
-            if bytes == NULL:
-                PyErr_NoMemory()
+    if real_value > 0x1fffff:
+        buf[count] = real_value & 0xff
+    else:
+        buf[count] = real_value & 0x7f
 
-        bytes[count] = 0x80 | ((n >> 7) & 0xff)
-        count += 1
+    return count + 1
 
-    if bytes == NULL:
-        bytes = <char *>malloc(1)
 
-        if bytes == NULL:
-            PyErr_NoMemory()
+cdef int encode_int(long i, char **buf) except -1:
+    cdef char *bytes = <char *>malloc(4)
 
-    if real_value > 0x1fffff:
-        bytes[count] = real_value & 0xff
-    else:
-        bytes[count] = real_value & 0x7f
+    if bytes == NULL:
+        PyErr_NoMemory()
 
     buf[0] = bytes
 
-    return count + 1
+    return pack_int(i, bytes)
 
 
 cdef int decode_int(cBufferedByteStream stream, int sign=0) except? -1:
@@ -1125,15 +1669,9 @@ cdef int decode_int(cBufferedByteStream stream, int sign=0) except? -1:
 
 
 cdef inline int _encode_integer(cBufferedByteStream stream, int i) except -1:
-    cdef char *buf = NULL
-    cdef int size = 0
-
-    try:
-        size = encode_int(i, &buf)
+    cdef char buf[4]
 
-        return stream.write(buf, size)
-    finally:
-        free(buf)
+    return stream.write(buf, pack_int(i, buf))
 
 
 cdef inline Py_ssize_t _read_ref(cBufferedByteStream stream) except -1:
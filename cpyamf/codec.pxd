@@ -8,6 +8,12 @@ cdef extern from "Python.h":
 
 from cpyamf cimport util
 
+# what the elements of a list or tuple are, see Encoder.getSequenceKind
+cdef enum:
+    SEQUENCE_MIXED = 0
+    SEQUENCE_NUMBERS = 1
+    SEQUENCE_STRINGS = 2
+
 cdef class IndexedCollection(object):
     """
     Provides reference functionality for amf contexts.
@@ -27,6 +33,7 @@ cdef class IndexedCollection(object):
     cpdef object getByReference(self, Py_ssize_t ref)
     cpdef Py_ssize_t getReferenceTo(self, object obj) except -2
     cpdef Py_ssize_t append(self, object obj) except -1
+    cpdef int replace(self, Py_ssize_t ref, object obj) except -1
 
 
 cdef class ByteStringReferenceCollection(IndexedCollection):
@@ -52,6 +59,8 @@ cdef class Context(object):
     cdef public dict extra
     cdef public bint forbid_dtd
     cdef public bint forbid_entities
+    cdef object ref_hook
+    cdef bint ref_hook_decoding
 
     cpdef int clear(self) except -1
     cpdef object getClassAlias(self, object klass)
@@ -59,6 +68,7 @@ cdef class Context(object):
     cpdef object getObject(self, Py_ssize_t ref)
     cpdef Py_ssize_t getObjectReference(self, object obj) except -2
     cpdef Py_ssize_t addObject(self, object obj) except -1
+    cpdef int replaceObject(self, Py_ssize_t ref, object obj) except -1
 
     cpdef unicode getStringForBytes(self, object s)
     cpdef str getBytesForString(self, object u)
@@ -73,11 +83,17 @@ cdef class Codec(object):
     cdef util.cBufferedByteStream stream
     cdef public bint strict
     cdef public object timezone_offset
+    cdef public object instrument
 
 
 cdef class Decoder(Codec):
     cdef unsigned int depth
+    cdef public bint use_records
+    cdef public object number_array
+    cdef public object object_hooks
 
+    cdef object getNumberArray(self, object numbers)
+    cdef object getObjectHook(self, object alias)
     cdef object readDate(self)
     cpdef object readString(self)
     cdef object readObject(self)
@@ -88,6 +104,7 @@ cdef class Decoder(Codec):
     cdef object readXML(self)
 
     cdef object _readElement(self)
+    cdef int recordRead(self, Py_ssize_t start_pos, object element) except -1
     cpdef object readElement(self)
     cdef object readConcreteElement(self, char t)
 
@@ -119,13 +136,16 @@ cdef class Encoder(Codec):
     cpdef int writeList(self, object o, bint is_proxy=?) except -1
     cdef int writeTuple(self, object o) except -1
     cdef int writeSequence(self, object iterable) except -1
+    cdef int getSequenceKind(self, object seq) except -1
     cpdef int writeObject(self, object o, bint is_proxy=?) except -1
     cdef int writeDict(self, dict o) except -1
     cdef int writeMixedArray(self, object o) except -1
     cdef int writeGenerator(self, object) except -1
+    cdef int writeEncoded(self, object o) except -1
 
     cdef int handleBasicTypes(self, object element, object py_type) except -1
     cdef int checkBadTypes(self, object element, object py_type) except -1
+    cdef int _writeElement(self, object element) except -1
     cpdef int writeElement(self, object element) except -1
 
     cpdef int send(self, data) except -1
@@ -20,15 +20,17 @@ cdef extern from "Python.h":
     bint PyClass_Check(object)
 
 from cpyamf.util cimport cBufferedByteStream, BufferedByteStream
+from cpyamf.util cimport string_from_buffer
 
 import types
 import pyamf
-from pyamf import util, xml
+from pyamf import util, xml, instrumentation
 import datetime
 
 
 cdef object MixedArray = pyamf.MixedArray
 cdef object Undefined = pyamf.Undefined
+cdef object Encoded = pyamf.Encoded
 cdef object BuiltinFunctionType = types.BuiltinFunctionType
 cdef object GeneratorType = types.GeneratorType
 
@@ -147,6 +149,24 @@ cdef class IndexedCollection(object):
 
         return self.length - 1
 
+    cpdef int replace(self, Py_ssize_t ref, object obj) except -1:
+        if ref < 0 or ref >= self.length:
+            raise IndexError(ref)
+
+        cdef object old = <object>self.data[ref]
+        cdef object h = self._ref(old)
+
+        if self.refs.get(h, None) == ref:
+            del self.refs[h]
+
+        self.refs[self._ref(obj)] = <object>ref
+
+        Py_INCREF(obj)
+        self.data[ref] = <PyObject *>obj
+        Py_DECREF(old)
+
+        return 0
+
     def __iter__(self):
         cdef list x = []
         cdef Py_ssize_t idx
@@ -231,6 +251,8 @@ cdef class Context(object):
         self.objects = IndexedCollection()
         self.forbid_entities = True
         self.forbid_dtd = True
+        self.ref_hook = None
+        self.ref_hook_decoding = 0
 
         self.clear()
 
@@ -250,15 +272,71 @@ cdef class Context(object):
 
         return 0
 
+    def setReferenceHook(self, hook, bint decoding=False):
+        """
+        Sets a callable that is called with the name of the reference table
+        and whether the lookup was a hit each time a reference table is
+        consulted. Used by L{pyamf.instrumentation}.
+
+        @param decoding: Whether the context belongs to a decoder. Decoders
+            report hits when a reference is resolved and misses when an entry
+            is added, encoders report the result of each lookup.
+        @since: 0.9
+        """
+        self.ref_hook = hook
+        self.ref_hook_decoding = decoding
+
     cpdef object getObject(self, Py_ssize_t ref):
+        if self.ref_hook is not None and self.ref_hook_decoding:
+            self.ref_hook('object', True)
+
         return self.objects.getByReference(ref)
 
     cpdef Py_ssize_t getObjectReference(self, object obj) except -2:
-        return self.objects.getReferenceTo(obj)
+        cdef Py_ssize_t ref = self.objects.getReferenceTo(obj)
+
+        if self.ref_hook is not None and not self.ref_hook_decoding:
+            self.ref_hook('object', ref != -1)
+
+        return ref
 
     cpdef Py_ssize_t addObject(self, object obj) except -1:
+        if self.ref_hook is not None and self.ref_hook_decoding:
+            self.ref_hook('object', False)
+
         return self.objects.append(obj)
 
+    cpdef int replaceObject(self, Py_ssize_t ref, object obj) except -1:
+        """
+        Replaces the object stored at C{ref} with C{obj}.
+
+        :since: 0.9
+        """
+        return self.objects.replace(ref, obj)
+
+    def getReferenceCounts(self):
+        """
+        Returns the number of entries in the object, string and class
+        definition reference tables.
+
+        @since: 0.9
+        """
+        return (self.objects.length, 0, 0)
+
+    def reserveReferences(self, Py_ssize_t objects=0, Py_ssize_t strings=0,
+                          Py_ssize_t classes=0):
+        """
+        Adds placeholder entries to the reference tables for data that was
+        written to (or read from) the stream without going through this
+        context.
+
+        @since: 0.9
+        """
+        cdef Py_ssize_t i
+
+        for i from 0 <= i < objects:
+            self.objects.append(object())
+
     cpdef object getClassAlias(self, object klass):
         """
         Gets a class alias based on the supplied C{klass}.
@@ -345,9 +423,10 @@ cdef class Codec(object):
         self.stream = None
         self.strict = 0
         self.timezone_offset = None
+        self.instrument = None
 
     def __init__(self, stream=None, strict=False, timezone_offset=None,
-                 forbid_entities=True, forbid_dtd=True):
+                 forbid_entities=True, forbid_dtd=True, instrument=None):
         if not isinstance(stream, BufferedByteStream):
             stream = BufferedByteStream(stream)
 
@@ -359,6 +438,11 @@ cdef class Codec(object):
         self.context.forbid_entities = <bint>forbid_entities
         self.context.forbid_dtd = <bint>forbid_dtd
 
+        self.instrument = instrumentation.resolve(instrument)
+
+        if self.instrument is not None:
+            instrumentation.attach(self, self.instrument)
+
 
 cdef class Decoder(Codec):
     """
@@ -392,6 +476,29 @@ cdef class Decoder(Codec):
     cdef object readXML(self):
         raise NotImplementedError
 
+    cdef object getNumberArray(self, object numbers):
+        """
+        Returns the decoded value for an array that only holds C{numbers}, an
+        C{array.array('d')}, when C{number_array} is set.
+
+        :since: 0.9
+        """
+        if self.number_array is True:
+            return numbers
+
+        return self.number_array(numbers)
+
+    cdef object getObjectHook(self, object alias):
+        """
+        Returns the object hook for the class C{alias} name or C{None}.
+
+        :since: 0.9
+        """
+        if self.object_hooks is None:
+            return None
+
+        return self.object_hooks.get(alias, None)
+
     cdef object _readElement(self):
         """
         Reads an element from the data stream.
@@ -411,8 +518,22 @@ cdef class Decoder(Codec):
 
             raise
 
+    cdef int recordRead(self, Py_ssize_t start_pos, object element) except -1:
+        """
+        Reports a decoded element to L{instrument}.
+        """
+        self.instrument.recordRead(
+            self,
+            PyString_FromStringAndSize(self.stream.buffer + start_pos, 1),
+            self.stream.tell() - start_pos,
+            element
+        )
+
+        return 0
+
     cpdef object readElement(self):
         cdef object element
+        cdef Py_ssize_t start_pos = self.stream.tell()
 
         self.depth += 1
 
@@ -421,6 +542,9 @@ cdef class Decoder(Codec):
         finally:
             self.depth -= 1
 
+        if self.instrument is not None:
+            self.recordRead(start_pos, element)
+
         if self.depth == 0:
             element = self.finalise(element)
 
@@ -533,6 +657,22 @@ cdef class Encoder(Codec):
             except StopIteration:
                 return 0
 
+    cdef int writeEncoded(self, object o) except -1:
+        """
+        Writes a pre-encoded fragment straight to the stream.
+
+        @see: L{pyamf.encoded.Encoded}
+        """
+        buf, references = o.getFragment(self.context, self.timezone_offset)
+
+        if not PyString_CheckExact(buf):
+            raise TypeError('Expected string for encoded fragment')
+
+        self.stream.write(PyString_AS_STRING(buf), PyString_GET_SIZE(buf))
+        self.context.reserveReferences(*references)
+
+        return 0
+
     cdef int writeSequence(self, object iterable) except -1:
         """
         Encodes an iterable. The default is to write If the iterable has an al
@@ -551,6 +691,49 @@ cdef class Encoder(Codec):
 
         return self.writeList(list(iterable))
 
+    cdef int getSequenceKind(self, object seq) except -1:
+        """
+        Returns C{SEQUENCE_NUMBERS} if every element of the C{list} or C{tuple}
+        C{seq} is an C{int} or a C{float}, C{SEQUENCE_STRINGS} if every
+        element is a C{str} or a C{unicode} and C{SEQUENCE_MIXED} otherwise.
+        Subclasses encode the first two kinds in bulk, skipping the type
+        dispatch of L{writeElement}.
+
+        Instrumented encoders always get C{SEQUENCE_MIXED} so that every
+        element is reported.
+
+        :since: 0.9
+        """
+        cdef Py_ssize_t size = PySequence_Fast_GET_SIZE(seq)
+        cdef PyObject **items = PySequence_Fast_ITEMS(seq)
+        cdef Py_ssize_t i
+        cdef object x
+
+        if size < 2 or self.instrument is not None:
+            return SEQUENCE_MIXED
+
+        x = <object>items[0]
+
+        if PyInt_CheckExact(x) or PyFloat_CheckExact(x):
+            for i from 1 <= i < size:
+                x = <object>items[i]
+
+                if not PyInt_CheckExact(x) and not PyFloat_CheckExact(x):
+                    return SEQUENCE_MIXED
+
+            return SEQUENCE_NUMBERS
+
+        if PyString_CheckExact(x) or PyUnicode_CheckExact(x):
+            for i from 1 <= i < size:
+                x = <object>items[i]
+
+                if not PyString_CheckExact(x) and not PyUnicode_CheckExact(x):
+                    return SEQUENCE_MIXED
+
+            return SEQUENCE_STRINGS
+
+        return SEQUENCE_MIXED
+
     cpdef int writeObject(self, object o, bint is_proxy=0) except -1:
         raise NotImplementedError
 
@@ -591,6 +774,8 @@ cdef class Encoder(Codec):
             ret = self.writeDate(element)
         elif py_type is MixedArray:
             ret = self.writeMixedArray(element)
+        elif py_type is Encoded:
+            ret = self.writeEncoded(element)
         elif py_type is GeneratorType:
             ret = self.writeGenerator(element)
         elif PySequence_Contains(self.use_write_object, py_type):
@@ -621,6 +806,26 @@ cdef class Encoder(Codec):
         return 0
 
     cpdef int writeElement(self, object element) except -1:
+        cdef Py_ssize_t start_pos
+        cdef int ret
+
+        if self.instrument is None:
+            return self._writeElement(element)
+
+        start_pos = self.stream.tell()
+        ret = self._writeElement(element)
+
+        if self.stream.tell() > start_pos:
+            self.instrument.recordWrite(
+                self,
+                PyString_FromStringAndSize(self.stream.buffer + start_pos, 1),
+                self.stream.tell() - start_pos,
+                element
+            )
+
+        return ret
+
+    cdef int _writeElement(self, object element) except -1:
         cdef int ret = 0
         cdef object py_type = type(element)
         cdef object func = None
@@ -678,7 +883,7 @@ cdef class Encoder(Codec):
 
         self.stream.read(&buf, end_pos - start_pos)
 
-        return PyString_FromStringAndSize(buf, end_pos - start_pos)
+        return string_from_buffer(buf, end_pos - start_pos)
 
     def __iter__(self):
         return self
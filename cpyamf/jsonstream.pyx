@@ -0,0 +1,674 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+C-extension for L{pyamf.jsonstream} Python module in L{PyAMF<pyamf>}.
+
+The transcoders write the same JSON as their pure Python counterparts. Values
+are read straight from the C{cBufferedByteStream} and the JSON is built in a
+C{cBufferedByteStream} that is handed to the writer once per value.
+
+:since: 0.9
+"""
+
+from cpython cimport *
+from libc.stdio cimport sprintf
+from libc.string cimport strlen
+
+cdef extern from "Python.h":
+    bint Py_IS_FINITE(double)
+    char *PyOS_double_to_string(double, char, int, int, int *) except NULL
+    int Py_DTSF_ADD_DOT_0
+
+cdef extern from "math.h":
+    double floor(double)
+    double fabs(double)
+
+from cpyamf.util cimport cBufferedByteStream, BufferedByteStream
+from cpyamf.amf3 cimport decode_int
+
+import pyamf
+from pyamf import jsonstream, amf0
+
+
+cdef char TYPE_NUMBER = '\x00'
+cdef char TYPE_BOOL = '\x01'
+cdef char TYPE_STRING = '\x02'
+cdef char TYPE_OBJECT = '\x03'
+cdef char TYPE_NULL = '\x05'
+cdef char TYPE_UNDEFINED = '\x06'
+cdef char TYPE_REFERENCE = '\x07'
+cdef char TYPE_MIXEDARRAY = '\x08'
+cdef char TYPE_OBJECTTERM = '\x09'
+cdef char TYPE_ARRAY = '\x0A'
+cdef char TYPE_DATE = '\x0B'
+cdef char TYPE_LONGSTRING = '\x0C'
+cdef char TYPE_UNSUPPORTED = '\x0D'
+cdef char TYPE_XML = '\x0F'
+cdef char TYPE_TYPEDOBJECT = '\x10'
+cdef char TYPE_AMF3 = '\x11'
+
+cdef char AMF3_TYPE_UNDEFINED = '\x00'
+cdef char AMF3_TYPE_NULL = '\x01'
+cdef char AMF3_TYPE_BOOL_FALSE = '\x02'
+cdef char AMF3_TYPE_BOOL_TRUE = '\x03'
+cdef char AMF3_TYPE_INTEGER = '\x04'
+cdef char AMF3_TYPE_NUMBER = '\x05'
+cdef char AMF3_TYPE_STRING = '\x06'
+cdef char AMF3_TYPE_XML = '\x07'
+cdef char AMF3_TYPE_DATE = '\x08'
+cdef char AMF3_TYPE_ARRAY = '\x09'
+cdef char AMF3_TYPE_OBJECT = '\x0A'
+cdef char AMF3_TYPE_XMLSTRING = '\x0B'
+cdef char AMF3_TYPE_BYTEARRAY = '\x0C'
+
+cdef unsigned int REFERENCE_BIT = 0x01
+cdef int OBJECT_ENCODING_EXTERNAL = 0x01
+cdef int OBJECT_ENCODING_DYNAMIC = 0x02
+
+# integral doubles up to this magnitude are written with sprintf
+cdef double MAX_EXACT_INT = 9007199254740992.0
+
+cdef object escape = jsonstream.escape
+cdef object format_number = jsonstream.format_number
+cdef object check_for_int = amf0._check_for_int
+cdef object format_date = jsonstream.format_date
+cdef object format_bytes = jsonstream.format_bytes
+cdef object get_object = jsonstream.get_object
+cdef object read_external = jsonstream.read_external
+cdef tuple PROXY_ALIASES = tuple(jsonstream.PROXY_ALIASES)
+cdef str ALIAS_PREFIX = '{%s:' % (escape(jsonstream.ALIAS_KEY),)
+cdef str empty_string = str('')
+cdef object DecodeError = pyamf.DecodeError
+cdef object ReferenceError = pyamf.ReferenceError
+
+
+cdef inline bint is_plain(char *buf, Py_ssize_t size):
+    """
+    Whether the bytes can be written in a JSON string without escaping.
+    """
+    cdef Py_ssize_t i
+    cdef unsigned char c
+
+    for i from 0 <= i < size:
+        c = <unsigned char>buf[i]
+
+        if c < 0x20 or c > 0x7e or c == '"' or c == '\\':
+            return 0
+
+    return 1
+
+
+cdef class Transcoder(object):
+    """
+    Base class for the AMF to JSON transcoders.
+    """
+
+    cdef readonly cBufferedByteStream stream
+    cdef public object writer
+    cdef public bint strict
+    cdef public object timezone_offset
+    cdef public list objects
+
+    cdef cBufferedByteStream buffer
+
+    def __cinit__(self):
+        self.buffer = cBufferedByteStream()
+        self.objects = []
+
+    def __init__(self, stream, writer, strict=False, timezone_offset=None):
+        if not isinstance(stream, BufferedByteStream):
+            stream = BufferedByteStream(stream)
+
+        self.stream = <cBufferedByteStream>stream
+        self.writer = writer
+        self.strict = strict
+        self.timezone_offset = timezone_offset
+
+    def clear(self):
+        """
+        Clears the reference tables.
+        """
+        self.objects = []
+
+    cpdef int flush(self) except -1:
+        """
+        Writes the buffered JSON to the writer.
+        """
+        if self.buffer.length == 0:
+            return 0
+
+        self.writer.write(self.buffer.getvalue())
+        self.buffer.truncate()
+
+        return 0
+
+    def writeElement(self):
+        """
+        Reads a value from the stream and writes it as JSON.
+
+        @raise EOFError: The end of the stream has been reached.
+        """
+        if self.stream.at_eof():
+            raise EOFError
+
+        self._writeElement()
+        self.flush()
+
+    cdef int _writeElement(self) except -1:
+        raise NotImplementedError
+
+    cdef inline int out(self, char *buf, Py_ssize_t size) except -1:
+        return self.buffer.write(buf, size)
+
+    cdef inline int sep(self, bint empty) except -1:
+        if empty:
+            return self.out('{', 1)
+
+        return self.out(',', 1)
+
+    cdef inline int outString(self, object s) except -1:
+        return self.buffer.write(PyString_AS_STRING(s), PyString_GET_SIZE(s))
+
+    cdef int outBytes(self, char *buf, Py_ssize_t size) except -1:
+        """
+        Writes the UTF-8 C{buf} as a JSON string.
+        """
+        if not is_plain(buf, size):
+            return self.outString(
+                escape(PyString_FromStringAndSize(buf, size))
+            )
+
+        self.out('"', 1)
+        self.out(buf, size)
+
+        return self.out('"', 1)
+
+    cdef inline int outStr(self, object s) except -1:
+        return self.outBytes(PyString_AS_STRING(s), PyString_GET_SIZE(s))
+
+    cdef int outDouble(self, double d) except -1:
+        """
+        Writes C{d} as C{repr} would.
+        """
+        cdef char *buf
+
+        if not Py_IS_FINITE(d):
+            return self.outString(format_number(d))
+
+        buf = PyOS_double_to_string(d, 'r', 0, Py_DTSF_ADD_DOT_0, NULL)
+
+        try:
+            return self.out(buf, strlen(buf))
+        finally:
+            PyMem_Free(buf)
+
+    cdef int outText(self, object text) except -1:
+        """
+        Writes C{text} and adds it to the reference table.
+        """
+        self.objects.append(text)
+
+        return self.outString(text)
+
+
+cdef class AMF3Transcoder(Transcoder):
+    """
+    Transcodes AMF3 to JSON.
+    """
+
+    cdef public list strings
+    cdef public list classes
+    cdef public object external
+
+    def __cinit__(self):
+        self.strings = []
+        self.classes = []
+
+    def clear(self):
+        Transcoder.clear(self)
+
+        self.strings = []
+        self.classes = []
+        self.external = None
+
+    cdef object readBytes(self):
+        cdef int ref = decode_int(self.stream)
+        cdef char *buf = NULL
+        cdef object s
+
+        if ref & REFERENCE_BIT == 0:
+            try:
+                return self.strings[ref >> 1]
+            except IndexError:
+                raise ReferenceError('Unknown reference %d' % (ref >> 1,))
+
+        ref >>= 1
+
+        if ref == 0:
+            return empty_string
+
+        self.stream.read(&buf, ref)
+        s = PyString_FromStringAndSize(buf, ref)
+
+        self.strings.append(s)
+
+        return s
+
+    cdef int readReference(self) except -2:
+        """
+        Returns the length of the inline value that follows, or writes the
+        referenced value and returns C{-1}.
+        """
+        cdef int ref = decode_int(self.stream)
+
+        if ref & REFERENCE_BIT == 0:
+            self.outString(get_object(self.objects, ref >> 1))
+
+            return -1
+
+        return ref >> 1
+
+    cdef int writeString(self) except -1:
+        cdef int ref = decode_int(self.stream)
+        cdef char *buf = NULL
+
+        if ref & REFERENCE_BIT == 0:
+            try:
+                return self.outStr(self.strings[ref >> 1])
+            except IndexError:
+                raise ReferenceError('Unknown reference %d' % (ref >> 1,))
+
+        ref >>= 1
+
+        if ref == 0:
+            return self.out('""', 2)
+
+        self.stream.read(&buf, ref)
+        self.strings.append(PyString_FromStringAndSize(buf, ref))
+
+        return self.outBytes(buf, ref)
+
+    cdef int writeInteger(self) except -1:
+        cdef char buf[16]
+        cdef int n = sprintf(buf, '%d', decode_int(self.stream, 1))
+
+        return self.out(buf, n)
+
+    cdef int writeNumber(self) except -1:
+        cdef double d
+
+        self.stream.read_double(&d)
+
+        return self.outDouble(d)
+
+    cdef int writeDate(self) except -1:
+        cdef double d
+
+        if self.readReference() == -1:
+            return 0
+
+        self.stream.read_double(&d)
+
+        return self.outText(format_date(d, self.timezone_offset))
+
+    cdef int writeXML(self) except -1:
+        cdef int size = self.readReference()
+        cdef char *buf = NULL
+
+        if size == -1:
+            return 0
+
+        self.stream.read(&buf, size)
+
+        return self.outText(escape(PyString_FromStringAndSize(buf, size)))
+
+    cdef int writeByteArray(self) except -1:
+        cdef int size = self.readReference()
+        cdef char *buf = NULL
+
+        if size == -1:
+            return 0
+
+        self.stream.read(&buf, size)
+
+        return self.outText(
+            format_bytes(PyString_FromStringAndSize(buf, size))
+        )
+
+    cdef int writeArray(self) except -1:
+        cdef int size = self.readReference()
+        cdef int i
+        cdef object key
+        cdef char buf[32]
+
+        if size == -1:
+            return 0
+
+        self.objects.append(None)
+
+        key = self.readBytes()
+
+        if PyString_GET_SIZE(key) == 0:
+            self.out('[', 1)
+
+            for i from 0 <= i < size:
+                if i:
+                    self.out(',', 1)
+
+                self._writeElement()
+
+            return self.out(']', 1)
+
+        self.out('{', 1)
+
+        while True:
+            self.outStr(key)
+            self.out(':', 1)
+            self._writeElement()
+
+            key = self.readBytes()
+
+            if PyString_GET_SIZE(key) == 0:
+                break
+
+            self.out(',', 1)
+
+        for i from 0 <= i < size:
+            self.out(buf, sprintf(buf, ',"%d":', i))
+            self._writeElement()
+
+        return self.out('}', 1)
+
+    cdef tuple readClassDefinition(self, int ref):
+        cdef tuple class_def
+        cdef list static
+        cdef int i
+
+        if ref & REFERENCE_BIT == 0:
+            try:
+                return self.classes[ref >> 1]
+            except IndexError:
+                raise ReferenceError('Unknown class reference %d' % (
+                    ref >> 1,
+                ))
+
+        ref >>= 1
+
+        name = self.readBytes()
+        static = []
+
+        for i from 0 <= i < ref >> 2:
+            static.append(self.readBytes())
+
+        class_def = (name, ref & 0x03, static)
+
+        self.classes.append(class_def)
+
+        return class_def
+
+    cdef int writeObject(self) except -1:
+        cdef int ref = self.readReference()
+        cdef tuple class_def
+        cdef object name, key
+        cdef int encoding
+        cdef list static
+        cdef bint empty = 1
+
+        if ref == -1:
+            return 0
+
+        class_def = self.readClassDefinition(ref)
+        name, encoding, static = class_def
+
+        if encoding & OBJECT_ENCODING_EXTERNAL:
+            if name in PROXY_ALIASES:
+                self.objects.append(None)
+
+                return self._writeElement()
+
+            return self.outString(read_external(self, name))
+
+        self.objects.append(None)
+
+        if PyString_GET_SIZE(name):
+            self.outString(ALIAS_PREFIX)
+            self.outStr(name)
+
+            empty = 0
+
+        for key in static:
+            self.sep(empty)
+            self.outStr(key)
+            self.out(':', 1)
+            self._writeElement()
+
+            empty = 0
+
+        if encoding == OBJECT_ENCODING_DYNAMIC:
+            key = self.readBytes()
+
+            while PyString_GET_SIZE(key):
+                self.sep(empty)
+                self.outStr(key)
+                self.out(':', 1)
+                self._writeElement()
+
+                empty = 0
+                key = self.readBytes()
+
+        if empty:
+            self.out('{', 1)
+
+        return self.out('}', 1)
+
+    cdef int _writeElement(self) except -1:
+        cdef char *buf = NULL
+        cdef char t
+
+        self.stream.read(&buf, 1)
+        t = buf[0]
+
+        if t == AMF3_TYPE_STRING:
+            return self.writeString()
+        elif t == AMF3_TYPE_OBJECT:
+            return self.writeObject()
+        elif t == AMF3_TYPE_INTEGER:
+            return self.writeInteger()
+        elif t == AMF3_TYPE_NUMBER:
+            return self.writeNumber()
+        elif t == AMF3_TYPE_UNDEFINED or t == AMF3_TYPE_NULL:
+            return self.out('null', 4)
+        elif t == AMF3_TYPE_BOOL_FALSE:
+            return self.out('false', 5)
+        elif t == AMF3_TYPE_BOOL_TRUE:
+            return self.out('true', 4)
+        elif t == AMF3_TYPE_ARRAY:
+            return self.writeArray()
+        elif t == AMF3_TYPE_DATE:
+            return self.writeDate()
+        elif t == AMF3_TYPE_BYTEARRAY:
+            return self.writeByteArray()
+        elif t == AMF3_TYPE_XML or t == AMF3_TYPE_XMLSTRING:
+            return self.writeXML()
+
+        raise DecodeError('Unsupported ActionScript type %r' % (
+            PyString_FromStringAndSize(&t, 1),
+        ))
+
+
+cdef class AMF0Transcoder(Transcoder):
+    """
+    Transcodes AMF0 to JSON.
+    """
+
+    cdef public AMF3Transcoder amf3
+
+    def clear(self):
+        Transcoder.clear(self)
+
+        if self.amf3 is not None:
+            self.amf3.clear()
+
+    cdef int writeBytes(self, Py_ssize_t size) except -1:
+        cdef char *buf = NULL
+
+        self.stream.read(&buf, size)
+
+        return self.outBytes(buf, size)
+
+    cdef int writeNumber(self) except -1:
+        cdef double d
+        cdef char buf[32]
+
+        self.stream.read_double(&d)
+
+        if d == 0:
+            return self.out('0', 1)
+
+        if floor(d) != d:
+            return self.outDouble(d)
+
+        if fabs(d) <= MAX_EXACT_INT:
+            return self.out(buf, sprintf(buf, '%.0f', d))
+
+        return self.outString(format_number(check_for_int(d)))
+
+    cdef int writeAttributes(self, bint empty) except -1:
+        cdef char *key = NULL
+        cdef char *buf = NULL
+        cdef Py_ssize_t size
+
+        while True:
+            size = self.stream.read_ushort()
+            self.stream.read(&key, size)
+
+            if self.stream.peek(&buf, 1) == 1 and buf[0] == TYPE_OBJECTTERM:
+                break
+
+            self.sep(empty)
+            self.outBytes(key, size)
+            self.out(':', 1)
+            self._writeElement()
+
+            empty = 0
+
+        # discard the end marker
+        self.stream.seek(1, 1)
+
+        if empty:
+            self.out('{', 1)
+
+        return self.out('}', 1)
+
+    cdef int writeTypedObject(self) except -1:
+        cdef Py_ssize_t size = self.stream.read_ushort()
+        cdef char *buf = NULL
+
+        self.stream.read(&buf, size)
+        self.objects.append(None)
+
+        self.outString(ALIAS_PREFIX)
+        self.outBytes(buf, size)
+
+        return self.writeAttributes(0)
+
+    cdef int writeList(self) except -1:
+        cdef unsigned long size = self.stream.read_ulong()
+        cdef unsigned long i
+
+        self.objects.append(None)
+        self.out('[', 1)
+
+        for i from 0 <= i < size:
+            if i:
+                self.out(',', 1)
+
+            self._writeElement()
+
+        return self.out(']', 1)
+
+    cdef int writeDate(self) except -1:
+        cdef double d
+
+        self.stream.read_double(&d)
+
+        # the timezone is ignored
+        self.stream.read_short()
+
+        return self.outText(format_date(d, self.timezone_offset))
+
+    cdef int writeXML(self) except -1:
+        cdef Py_ssize_t size = self.stream.read_ulong()
+        cdef char *buf = NULL
+
+        self.stream.read(&buf, size)
+
+        return self.outText(escape(PyString_FromStringAndSize(buf, size)))
+
+    cdef int writeAMF3(self) except -1:
+        if self.amf3 is None:
+            self.amf3 = AMF3Transcoder(
+                self.stream,
+                self.writer,
+                strict=self.strict,
+                timezone_offset=self.timezone_offset
+            )
+
+        self.amf3._writeElement()
+
+        # the AMF3 transcoder has its own buffer
+        self.buffer.write(self.amf3.buffer.buffer, self.amf3.buffer.length)
+        self.amf3.buffer.truncate()
+
+        return 0
+
+    cdef int _writeElement(self) except -1:
+        cdef char *buf = NULL
+        cdef char t
+
+        self.stream.read(&buf, 1)
+        t = buf[0]
+
+        if t == TYPE_STRING:
+            return self.writeBytes(self.stream.read_ushort())
+        elif t == TYPE_NUMBER:
+            return self.writeNumber()
+        elif t == TYPE_BOOL:
+            if self.stream.read_uchar():
+                return self.out('true', 4)
+
+            return self.out('false', 5)
+        elif t == TYPE_OBJECT:
+            self.objects.append(None)
+
+            return self.writeAttributes(1)
+        elif t == TYPE_NULL or t == TYPE_UNDEFINED or t == TYPE_UNSUPPORTED:
+            return self.out('null', 4)
+        elif t == TYPE_REFERENCE:
+            return self.outString(get_object(
+                self.objects,
+                self.stream.read_ushort()
+            ))
+        elif t == TYPE_ARRAY:
+            return self.writeList()
+        elif t == TYPE_MIXEDARRAY:
+            # the length is not reliable
+            self.stream.read_ulong()
+            self.objects.append(None)
+
+            return self.writeAttributes(1)
+        elif t == TYPE_TYPEDOBJECT:
+            return self.writeTypedObject()
+        elif t == TYPE_DATE:
+            return self.writeDate()
+        elif t == TYPE_LONGSTRING:
+            return self.writeBytes(self.stream.read_ulong())
+        elif t == TYPE_XML:
+            return self.writeXML()
+        elif t == TYPE_AMF3:
+            return self.writeAMF3()
+
+        raise DecodeError('Unsupported ActionScript type %r' % (
+            PyString_FromStringAndSize(&t, 1),
+        ))
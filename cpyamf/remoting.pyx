@@ -0,0 +1,285 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+C-extension for the envelope framing of the L{pyamf.remoting} Python module.
+
+The functions have the same signatures as their pure Python counterparts in
+L{pyamf.remoting} and delegate to them for streams and codecs that are not
+part of C{cpyamf}.
+
+:since: 0.9
+"""
+
+from cpython cimport *
+
+from cpyamf.util cimport cBufferedByteStream
+from cpyamf cimport codec, amf0
+
+import sys
+
+import pyamf
+import pyamf.remoting
+
+# this module is imported by pyamf.remoting before it has finished
+# initialising, so it is not yet available as an attribute of pyamf.
+remoting = sys.modules['pyamf.remoting']
+
+
+cdef char TYPE_ARRAY = '\x0A'
+cdef char TYPE_AMF3 = '\x11'
+
+cdef object Request = remoting.Request
+cdef object Response = remoting.Response
+cdef object ASObject = pyamf.ASObject
+cdef object DecodeError = pyamf.DecodeError
+cdef object STATUS_OK = remoting.STATUS_OK
+cdef object STATUS_ERROR = remoting.STATUS_ERROR
+
+#: C{(code, suffix)} pairs, in the same order as the pure Python version
+#: iterates L{remoting.STATUS_CODES}.
+cdef tuple STATUS_SUFFIXES = tuple([
+    (code, unicode(suffix))
+    for code, suffix in remoting.STATUS_CODES.iteritems()
+])
+
+#: Maps status codes to the suffixes written after the name of a response.
+cdef dict STATUS_CODES = dict(STATUS_SUFFIXES)
+
+
+cdef inline bint accepts(object stream, object c, object klass):
+    """
+    Whether C{c} is a C{cpyamf} codec of type C{klass} that reads from or
+    writes to C{stream}.
+    """
+    if not isinstance(stream, cBufferedByteStream):
+        return 0
+
+    if not isinstance(c, klass):
+        return 0
+
+    return (<codec.Codec>c).stream is stream
+
+
+cdef object _read_header(cBufferedByteStream stream, amf0.Decoder decoder,
+                         bint strict):
+    cdef object name = stream.read_utf8_string(stream.read_ushort())
+    cdef bint required = stream.read_uchar() != 0
+    cdef unsigned long data_len = stream.read_ulong()
+    cdef Py_ssize_t pos = stream.pos
+    cdef object data = decoder.readElement()
+
+    if strict and pos + <Py_ssize_t>data_len != stream.pos:
+        raise DecodeError(
+            "Data read from stream does not match header length")
+
+    return (name, bool(required), data)
+
+
+cdef object _read_args(cBufferedByteStream stream, amf0.Decoder decoder):
+    cdef char *buf = NULL
+    cdef unsigned long count
+    cdef unsigned long i
+    cdef list ret
+
+    if stream.peek(&buf, 1) == 1:
+        if buf[0] == TYPE_AMF3:
+            if not decoder.use_amf3:
+                raise DecodeError(
+                    "Unexpected AMF3 type with incorrect message type")
+
+            return decoder.readElement()
+
+        if buf[0] == TYPE_ARRAY:
+            stream.read(&buf, 1)
+            count = stream.read_ulong()
+            ret = []
+
+            for i from 0 <= i < count:
+                ret.append(decoder.readElement())
+
+            return ret
+
+    raise DecodeError("Array type required for request body")
+
+
+cdef object _read_body(cBufferedByteStream stream, amf0.Decoder decoder,
+                       bint strict, object logger):
+    cdef object target = stream.read_utf8_string(stream.read_ushort())
+    cdef object response = stream.read_utf8_string(stream.read_ushort())
+    cdef object status = STATUS_OK
+    cdef bint is_request = 1
+    cdef unsigned long data_len
+    cdef Py_ssize_t pos
+    cdef object data
+
+    for code, suffix in STATUS_SUFFIXES:
+        if not target.endswith(suffix):
+            continue
+
+        is_request = 0
+        status = code
+        target = target[:0 - len(suffix)]
+
+    data_len = stream.read_ulong()
+    pos = stream.pos
+
+    if is_request:
+        data = _read_args(stream, decoder)
+    else:
+        data = decoder.readElement()
+
+    if strict and pos + <Py_ssize_t>data_len != stream.pos:
+        raise DecodeError(
+            "Data read from stream does not match body length (%d != %d)" % (
+                pos + data_len, stream.pos,
+            )
+        )
+
+    if is_request:
+        return response, Request(target, body=data)
+
+    if status == STATUS_ERROR and isinstance(data, ASObject):
+        data = remoting.get_fault(data)
+
+    return target, Response(data, status)
+
+
+cdef int _write_length(cBufferedByteStream stream, Py_ssize_t write_pos,
+                       Py_ssize_t old_pos) except -1:
+    """
+    Writes the number of bytes written since C{old_pos} at C{write_pos}.
+    """
+    cdef Py_ssize_t new_pos = stream.pos
+
+    stream.seek(write_pos)
+    stream.write_ulong(new_pos - old_pos)
+
+    return stream.seek(new_pos)
+
+
+cdef int _write_header(object name, object header, object required,
+                       cBufferedByteStream stream, amf0.Encoder encoder,
+                       bint strict) except -1:
+    cdef Py_ssize_t write_pos
+    cdef Py_ssize_t old_pos
+
+    stream.write_ushort(len(name))
+    stream.write_utf8_string(name)
+
+    stream.write_uchar(required)
+    write_pos = stream.pos
+
+    stream.write_ulong(0)
+    old_pos = stream.pos
+    encoder.writeElement(header)
+
+    if strict:
+        _write_length(stream, write_pos, old_pos)
+
+    return 0
+
+
+cdef int _write_body(object name, object message, cBufferedByteStream stream,
+                     amf0.Encoder encoder, bint strict) except -1:
+    cdef bint is_request = isinstance(message, Request)
+    cdef object target
+    cdef object response = 'null'
+    cdef object body
+    cdef Py_ssize_t write_pos
+    cdef Py_ssize_t old_pos
+
+    if not is_request and not isinstance(message, Response):
+        raise TypeError("Unknown message type")
+
+    if is_request:
+        target = unicode(message.target).encode('utf8')
+        response = name
+    else:
+        try:
+            target = STATUS_CODES[message.status]
+        except KeyError:
+            raise ValueError("Unknown status code")
+
+        target = (u"%s%s" % (name, target)).encode('utf8')
+
+    stream.write_ushort(len(target))
+    stream.write_utf8_string(target)
+
+    stream.write_ushort(len(response))
+    stream.write_utf8_string(response)
+
+    write_pos = stream.pos
+    stream.write_ulong(0)
+    old_pos = stream.pos
+
+    if is_request:
+        body = message.body
+
+        stream.write_uchar(TYPE_ARRAY)
+        stream.write_ulong(len(body))
+
+        for x in body:
+            encoder.writeElement(x)
+    else:
+        encoder.writeElement(message.body)
+
+    if strict:
+        _write_length(stream, write_pos, old_pos)
+
+    return 0
+
+
+def read_header(stream, decoder, strict=False):
+    """
+    Read AMF L{Message} header from the stream.
+
+    @see: L{pyamf.remoting._py_read_header}
+    """
+    if not accepts(stream, decoder, amf0.Decoder):
+        return remoting._py_read_header(stream, decoder, strict)
+
+    return _read_header(stream, decoder, strict)
+
+
+def read_body(stream, decoder, strict=False, logger=None):
+    """
+    Read an AMF message body from the stream.
+
+    @see: L{pyamf.remoting._py_read_body}
+    """
+    if not accepts(stream, decoder, amf0.Decoder):
+        return remoting._py_read_body(stream, decoder, strict, logger)
+
+    return _read_body(stream, decoder, strict, logger)
+
+
+def write_header(name, header, required, stream, encoder, strict=False):
+    """
+    Write AMF message header.
+
+    @see: L{pyamf.remoting._py_write_header}
+    """
+    if not accepts(stream, encoder, amf0.Encoder):
+        return remoting._py_write_header(
+            name,
+            header,
+            required,
+            stream,
+            encoder,
+            strict
+        )
+
+    _write_header(name, header, required, stream, encoder, strict)
+
+
+def write_body(name, message, stream, encoder, strict=False):
+    """
+    Write AMF message body.
+
+    @see: L{pyamf.remoting._py_write_body}
+    """
+    if not accepts(stream, encoder, amf0.Encoder):
+        return remoting._py_write_body(name, message, stream, encoder, strict)
+
+    _write_body(name, message, stream, encoder, strict)
@@ -2,6 +2,10 @@
 # See LICENSE.txt for details.
 
 
+cdef int copy_bytes(void *dest, void *src, Py_ssize_t size) except -1
+cdef object string_from_buffer(char *buf, Py_ssize_t size)
+
+
 cdef class cBufferedByteStream:
     """
     The c version of BufferedByteStream.
@@ -15,10 +19,16 @@ cdef class cBufferedByteStream:
     cdef Py_ssize_t size # total size of the alloc'd buffer
     cdef Py_ssize_t length
     cdef Py_ssize_t min_buf_size
+    cdef bint borrowed # buffer belongs to the exporter of view
+    cdef bint changed # contents changed since _dirty was cleared
+    cdef Py_buffer view
 
     cpdef Py_ssize_t tell(self) except -1
     cdef int write(self, char *buf, Py_ssize_t size) except -1
     cdef inline int _init_buffer(self) except -1
+    cdef int _free_buffer(self) except -1
+    cdef int borrow(self, object obj) except -1
+    cdef int _own_buffer(self) except -1
     cdef int _actually_increase_buffer(self, Py_ssize_t size) except -1
     cdef int _increase_buffer(self, Py_ssize_t size) except -1
     cdef inline bint has_available(self, Py_ssize_t size) except -1
@@ -52,6 +62,7 @@ cdef class cBufferedByteStream:
     cpdef object read_utf8_string(self, Py_ssize_t)
     cpdef int write_utf8_string(self, object obj) except -1
     cdef int read_double(self, double *obj) except -1
+    cdef int pack_double(self, double val, unsigned char *buf) except -1
     cpdef int write_double(self, double val) except -1
     cdef int read_float(self, float *x) except -1
     cpdef int write_float(self, float c) except -1
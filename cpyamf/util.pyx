@@ -21,6 +21,8 @@ cdef extern from "Python.h":
     int _PyFloat_Pack8(double, unsigned char *, int) except? -1
     double _PyFloat_Unpack4(unsigned char *, int) except? -1.0
     double _PyFloat_Unpack8(unsigned char *, int) except? -1.0
+    bint PyObject_CheckReadBuffer(object)
+    int PyObject_AsReadBuffer(object, const void **, Py_ssize_t *) except -1
 
 
 from pyamf import python
@@ -54,6 +56,76 @@ cdef object pyamf_NegInf = python.NegInf
 cdef object pyamf_PosInf = python.PosInf
 cdef object empty_unicode = unicode('')
 
+# copies of at least this many bytes are made without holding the GIL so that
+# other threads may run in the meantime, see set_nogil_threshold.
+cdef Py_ssize_t nogil_threshold = 1 << 16
+
+
+cdef int copy_bytes(void *dest, void *src, Py_ssize_t size) except -1:
+    """
+    C{memcpy} that releases the GIL for large copies.
+
+    Only use this to copy between buffers that the stream owns (or holds a
+    C{Py_buffer} export for). Caller supplied memory, e.g. the storage of an
+    C{array.array}, may be resized by another thread while the GIL is
+    released so it must be copied while holding it. A stream must not be
+    shared between threads while it is being read or written.
+
+    :since: 0.9
+    """
+    if size < nogil_threshold:
+        memcpy(dest, src, size)
+    else:
+        with nogil:
+            memcpy(dest, src, size)
+
+    return 0
+
+
+cdef object string_from_buffer(char *buf, Py_ssize_t size):
+    """
+    Returns the C{size} bytes at C{buf} as a C{str}, copying large buffers
+    without holding the GIL. C{buf} must point into a stream's buffer, see
+    L{copy_bytes}.
+
+    :since: 0.9
+    """
+    cdef object ret
+
+    if size < nogil_threshold:
+        return PyString_FromStringAndSize(buf, size)
+
+    ret = PyString_FromStringAndSize(NULL, size)
+    copy_bytes(PyString_AS_STRING(ret), buf, size)
+
+    return ret
+
+
+def get_nogil_threshold():
+    """
+    Returns the size in bytes above which buffers owned by a stream are
+    copied without holding the GIL.
+
+    :since: 0.9
+    """
+    return nogil_threshold
+
+
+def set_nogil_threshold(Py_ssize_t size):
+    """
+    Sets the size in bytes above which buffers owned by a stream are copied
+    without holding the GIL. Releasing and reacquiring the GIL has a cost of
+    its own so small copies are always made while holding it.
+
+    :since: 0.9
+    """
+    global nogil_threshold
+
+    if size < 0:
+        raise ValueError('size must be >= 0')
+
+    nogil_threshold = size
+
 
 @cython.profile(False)
 cdef int _memcpy_ensure_endian(void *src, void *dest, unsigned int size) nogil:
@@ -198,20 +270,26 @@ cdef class cBufferedByteStream(object):
     def __cinit__(self):
         self.endian = ENDIAN_NETWORK
         self.buffer = NULL
+        self.borrowed = 0
         self.min_buf_size = 512
         self.size = 0
 
     def __dealloc__(self):
-        if self.buffer != NULL:
+        self._free_buffer()
+
+    cdef int _free_buffer(self) except -1:
+        if self.borrowed:
+            self.borrowed = 0
+            PyBuffer_Release(&self.view)
+        elif self.buffer != NULL:
             free(self.buffer)
 
         self.buffer = NULL
 
-    cdef inline int _init_buffer(self) except -1:
-        if self.buffer != NULL:
-            free(self.buffer)
+        return 0
 
-            self.buffer = NULL
+    cdef inline int _init_buffer(self) except -1:
+        self._free_buffer()
 
         self.pos = 0
         self.length = 0
@@ -222,14 +300,78 @@ cdef class cBufferedByteStream(object):
         if self.buffer == NULL:
             PyErr_NoMemory()
 
+        self.changed = 1
+
         return 0
 
+    property _dirty:
+        """
+        Set whenever the contents of the stream change and, as the exporter
+        can change them, for as long as they are borrowed. Cleared by whoever
+        caches something derived from the contents (see L{amf3.ByteArray}).
+
+        :since: 0.9
+        """
+        def __get__(self):
+            return bool(self.changed or self.borrowed)
+
+        def __set__(self, value):
+            self.changed = bool(value)
+
     cpdef Py_ssize_t tell(self) except -1:
         """
         Returns the position of the stream pointer.
         """
         return self.pos
 
+    cdef int borrow(self, object obj) except -1:
+        """
+        Makes the bytes of C{obj}, which must support the buffer protocol, the
+        contents of this stream without copying them. They are only copied
+        when the stream is first written to, until then the stream sees any
+        change made to C{obj}.
+
+        :since: 0.9
+        """
+        self._free_buffer()
+
+        PyObject_GetBuffer(obj, &self.view, PyBUF_SIMPLE)
+
+        self.borrowed = 1
+        self.buffer = <char *>self.view.buf
+        self.length = self.size = self.view.len
+        self.pos = 0
+        self.changed = 1
+
+        return 0
+
+    cdef int _own_buffer(self) except -1:
+        """
+        Copies a borrowed buffer so that it can be written to.
+
+        :since: 0.9
+        """
+        cdef Py_ssize_t size = self.length
+        cdef char *buf
+
+        if size < self.min_buf_size:
+            size = self.min_buf_size
+
+        buf = <char *>malloc(size)
+
+        if buf == NULL:
+            PyErr_NoMemory()
+
+        copy_bytes(buf, self.buffer, self.length)
+
+        self.borrowed = 0
+        PyBuffer_Release(&self.view)
+
+        self.buffer = buf
+        self.size = size
+
+        return 0
+
     cdef int _actually_increase_buffer(self, Py_ssize_t new_size) except -1:
         if self.size == 0:
             self._init_buffer()
@@ -243,7 +385,15 @@ cdef class cBufferedByteStream(object):
         if requested_size > new_size + MAX_BUFFER_EXTENSION:
             requested_size = new_size + MAX_BUFFER_EXTENSION
 
-        buf = <char *>realloc(self.buffer, sizeof(char *) * requested_size)
+        if requested_size < nogil_threshold:
+            buf = <char *>realloc(self.buffer, sizeof(char *) * requested_size)
+        else:
+            # growing a large buffer may move (and so copy) it
+            with nogil:
+                buf = <char *>realloc(
+                    self.buffer,
+                    sizeof(char *) * requested_size
+                )
 
         if buf == NULL:
             PyErr_NoMemory()
@@ -273,11 +423,17 @@ cdef class cBufferedByteStream(object):
         if size == 0:
             return 0
 
+        if self.borrowed:
+            self._own_buffer()
+
         self._increase_buffer(size)
 
+        # buf is caller supplied, it is not safe to release the GIL while
+        # reading from it (see copy_bytes)
         memcpy(self.buffer + self.pos, buf, size)
 
         self.pos += size
+        self.changed = 1
 
         if self.pos > self.length:
             self.length = self.pos
@@ -365,7 +521,7 @@ cdef class cBufferedByteStream(object):
         """
         Get raw data from buffer.
         """
-        return PyString_FromStringAndSize(self.buffer, self.length)
+        return string_from_buffer(self.buffer, self.length)
 
     cdef Py_ssize_t peek(self, char **buf, Py_ssize_t size) except -1:
         """
@@ -400,7 +556,7 @@ cdef class cBufferedByteStream(object):
         if buf == NULL:
             PyErr_NoMemory()
 
-        memcpy(buf, self.buffer, self.length)
+        copy_bytes(buf, self.buffer, self.length)
 
         try:
             self._init_buffer()
@@ -432,7 +588,7 @@ cdef class cBufferedByteStream(object):
             if buf == NULL:
                 PyErr_NoMemory()
 
-            memcpy(buf, peek_buf, size)
+            copy_bytes(buf, peek_buf, size)
 
         try:
             self._init_buffer()
@@ -799,6 +955,28 @@ cdef class cBufferedByteStream(object):
 
         return 0
 
+    cdef int pack_double(self, double val, unsigned char *buf) except -1:
+        """
+        Packs C{val} into the 8 bytes at C{buf} in the endian of this stream.
+
+        :since: 0.9
+        """
+        if float_broken == 1:
+            if (memcmp(&val, &system_nan, 8) == 0 or
+                    memcmp(&val, &system_posinf, 8) == 0 or
+                    memcmp(&val, &system_neginf, 8) == 0):
+                memcpy(buf, &val, 8)
+
+                if is_big_endian(SYSTEM_ENDIAN) != is_big_endian(self.endian):
+                    if swap_bytes(buf, 8) == -1:
+                        PyErr_NoMemory()
+
+                return 0
+
+        _PyFloat_Pack8(val, buf, not is_big_endian(self.endian))
+
+        return 0
+
     cpdef int write_double(self, double val) except -1:
         """
         Writes an 8 byte float to the stream.
@@ -806,48 +984,11 @@ cdef class cBufferedByteStream(object):
         @param val: 8 byte float
         @type val: C{float}
         """
-        cdef unsigned char *buf
-        cdef unsigned char *foo
-        cdef int done = 0
+        cdef unsigned char buf[8]
 
-        buf = <unsigned char *>malloc(sizeof(double))
+        self.pack_double(val, buf)
 
-        if buf == NULL:
-            PyErr_NoMemory()
-
-        try:
-            if float_broken == 1:
-                if memcmp(&val, &system_nan, 8) == 0:
-                    memcpy(buf, &val, 8)
-
-                    done = 1
-                elif memcmp(&val, &system_posinf, 8) == 0:
-                    memcpy(buf, &val, 8)
-
-                    done = 1
-                elif memcmp(&val, &system_neginf, 8) == 0:
-                    memcpy(buf, &val, 8)
-
-                    done = 1
-
-                if done == 1:
-                    if is_big_endian(SYSTEM_ENDIAN):
-                        if not is_big_endian(self.endian):
-                            if swap_bytes(buf, 8) == -1:
-                                PyErr_NoMemory()
-                    else:
-                        if is_big_endian(self.endian):
-                            if swap_bytes(buf, 8) == -1:
-                                PyErr_NoMemory()
-
-            if done == 0:
-                _PyFloat_Pack8(val, <unsigned char *>buf, not is_big_endian(self.endian))
-
-            self.write(<char *>buf, 8)
-        finally:
-            free(buf)
-
-        return 0
+        return self.write(<char *>buf, 8)
 
     cdef int read_float(self, float *x) except -1:
         """
@@ -913,6 +1054,7 @@ cdef class BufferedByteStream(cBufferedByteStream):
     def __init__(self, buf=None, min_buf_size=512):
         cdef Py_ssize_t i
         cdef cBufferedByteStream x
+        cdef const void *ptr = NULL
 
         self.min_buf_size = min_buf_size
 
@@ -930,6 +1072,13 @@ cdef class BufferedByteStream(cBufferedByteStream):
             buf.seek(0)
             self.write(buf.read())
             buf.seek(old_pos)
+        elif PyObject_CheckBuffer(buf):
+            self.borrow(buf)
+        elif PyObject_CheckReadBuffer(buf):
+            # old style buffers (e.g. array.array) can be resized while they
+            # are referenced, so they are copied.
+            PyObject_AsReadBuffer(buf, &ptr, &i)
+            self.write(<char *>ptr, i)
         else:
             raise TypeError("Unable to coerce buf->StringIO")
 
@@ -967,7 +1116,7 @@ cdef class BufferedByteStream(cBufferedByteStream):
 
         cBufferedByteStream.read(self, &buf, s)
 
-        return PyString_FromStringAndSize(buf, s)
+        return string_from_buffer(buf, s)
 
     def write(self, x, size=-1):
         """
@@ -1006,7 +1155,7 @@ cdef class BufferedByteStream(cBufferedByteStream):
 
         size = cBufferedByteStream.peek(self, &buf, size)
 
-        return PyString_FromStringAndSize(buf, size)
+        return string_from_buffer(buf, size)
 
     def write_char(self, x):
         """
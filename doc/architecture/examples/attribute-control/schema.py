@@ -0,0 +1,14 @@
+import pyamf
+
+class Person(object):
+    class __amf__:
+        static = ('id', 'name', 'dob', 'manager', 'reports')
+        schema = {
+            'id': 'int',
+            'name': 'string',
+            'dob': 'date',
+            'manager': 'com.acme.app.Person',
+            'reports': ['com.acme.app.Person']
+        }
+
+pyamf.register_class(Person, 'com.acme.app.Person')
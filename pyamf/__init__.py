@@ -18,6 +18,7 @@ from pyamf import util, _version
 from pyamf.adapters import register_adapters, get_adapter
 from pyamf import python
 from pyamf.alias import ClassAlias, UnknownClassAlias
+from pyamf.encoded import Encoded
 
 
 __all__ = [
@@ -26,6 +27,7 @@ __all__ = [
     'get_adapter',
     'encode',
     'decode',
+    'Encoded',
     '__version__',
     'version'
 ]
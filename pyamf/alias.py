@@ -13,6 +13,23 @@ import pyamf
 from pyamf import python, util
 
 
+#: Maps the names of the primitive types that may be declared in a
+#: L{ClassAlias} schema to their codes.
+SCHEMA_TYPES = {
+    'int': 1,
+    'double': 2,
+    'string': 3,
+    'boolean': 4,
+    'date': 5,
+}
+
+#: The code of a schema attribute that holds an instance of a class.
+SCHEMA_OBJECT = 6
+
+#: The code of a schema attribute that holds a list of instances of a class.
+SCHEMA_LIST = 7
+
+
 class UnknownClassAlias(Exception):
     """
     Raised if the AMF stream specifies an Actionscript class that does not
@@ -22,7 +39,214 @@ class UnknownClassAlias(Exception):
     """
 
 
-class ClassAlias(object):
+class BaseClassAlias(object):
+    """
+    The methods of L{ClassAlias} that are called for every encoded or decoded
+    object. Replaced by the C{cpyamf.alias} extension when it is available.
+    Subclasses of L{ClassAlias} may override any of these methods.
+
+    @since: 0.9
+    """
+
+    def getAttribute(self, obj, attr, codec=None):
+        """
+        Get the attribute `attr` from `obj`. If no attribute exists,
+        `pyamf.Undefined` is returned.
+
+        @param codec: The current `pyamf.codec.Codec` getting the attribute
+            (if there is one).
+        """
+        return getattr(obj, attr)
+
+    def getEncodableAttributes(self, obj, codec=None):
+        """
+        Must return a C{dict} of attributes to be encoded, even if its empty.
+
+        @param codec: An optional argument that will contain the encoder
+            instance calling this function.
+        @since: 0.5
+        """
+        if not self._compiled:
+            self.compile()
+
+        if self.is_dict:
+            return dict(obj)
+
+        if self.shortcut_encode and self.dynamic:
+            return obj.__dict__.copy()
+
+        attrs = {}
+
+        if self.static_attrs:
+            for attr in self.static_attrs:
+                try:
+                    attrs[attr] = self.getAttribute(obj, attr, codec=codec)
+                except AttributeError:
+                    attrs[attr] = pyamf.Undefined
+
+        if not self.dynamic:
+            if self.non_static_encodable_properties:
+                for attr in self.non_static_encodable_properties:
+                    attrs[attr] = self.getAttribute(obj, attr, codec=codec)
+
+            return attrs
+
+        dynamic_props = util.get_properties(obj)
+
+        if not self.shortcut_encode:
+            dynamic_props = set(dynamic_props)
+
+            if self.encodable_properties:
+                dynamic_props.update(self.encodable_properties)
+
+            if self.static_attrs:
+                dynamic_props.difference_update(self.static_attrs)
+
+            if self.exclude_attrs:
+                dynamic_props.difference_update(self.exclude_attrs)
+
+        for attr in dynamic_props:
+            attrs[attr] = self.getAttribute(obj, attr, codec=codec)
+
+        if self.proxy_attrs is not None and attrs and codec:
+            context = codec.context
+
+            for k, v in attrs.copy().iteritems():
+                if k in self.proxy_attrs:
+                    attrs[k] = context.getProxyForObject(v)
+
+        if self.synonym_attrs:
+            missing = object()
+
+            for k, v in self.synonym_attrs.iteritems():
+                value = attrs.pop(k, missing)
+
+                if value is missing:
+                    continue
+
+                attrs[v] = value
+
+        return attrs
+
+    def getDecodableAttributes(self, obj, attrs, codec=None):
+        """
+        Returns a dictionary of attributes for C{obj} that has been filtered,
+        based on the supplied C{attrs}. This allows for fine grain control
+        over what will finally end up on the object or not.
+
+        @param obj: The object that will recieve the attributes.
+        @param attrs: The C{attrs} dictionary that has been decoded.
+        @param codec: An optional argument that will contain the decoder
+            instance calling this function.
+        @return: A dictionary of attributes that can be applied to C{obj}
+        @since: 0.5
+        """
+        if not self._compiled:
+            self.compile()
+
+        changed = False
+
+        props = set(attrs.keys())
+
+        if self.static_attrs:
+            missing_attrs = self.static_attrs_set.difference(props)
+
+            if missing_attrs:
+                raise AttributeError(
+                    'Static attributes %r expected when decoding %r' % (
+                        missing_attrs, self.klass
+                    )
+                )
+
+            props.difference_update(self.static_attrs)
+
+        if not props:
+            return attrs
+
+        if not self.dynamic:
+            if not self.decodable_properties:
+                props = set()
+            else:
+                props.intersection_update(self.decodable_properties)
+
+            changed = True
+
+        if self.readonly_attrs:
+            props.difference_update(self.readonly_attrs)
+            changed = True
+
+        if self.exclude_attrs:
+            props.difference_update(self.exclude_attrs)
+            changed = True
+
+        if self.proxy_attrs is not None and codec:
+            context = codec.context
+
+            for k in self.proxy_attrs:
+                try:
+                    v = attrs[k]
+                except KeyError:
+                    continue
+
+                attrs[k] = context.getObjectForProxy(v)
+
+        if changed:
+            # apply all filters before synonyms
+            a = {}
+
+            [a.__setitem__(p, attrs[p]) for p in props]
+            attrs = a
+
+        if self.synonym_attrs:
+            missing = object()
+
+            for k, v in self.synonym_attrs.iteritems():
+                value = attrs.pop(v, missing)
+
+                if value is missing:
+                    continue
+
+                attrs[k] = value
+
+        return attrs
+
+    def applyAttributes(self, obj, attrs, codec=None):
+        """
+        Applies the collection of attributes C{attrs} to aliased object C{obj}.
+        Called when decoding reading aliased objects from an AMF byte stream.
+
+        Override this to provide fine grain control of application of
+        attributes to C{obj}.
+
+        @param codec: An optional argument that will contain the en/decoder
+            instance calling this function.
+        """
+        if not self._compiled:
+            self.compile()
+
+        if not self.shortcut_decode:
+            attrs = self.getDecodableAttributes(obj, attrs, codec=codec)
+        else:
+            if self.is_dict:
+                obj.update(attrs)
+
+                return
+
+            if not self.sealed:
+                obj.__dict__.update(attrs)
+
+                return
+
+        util.set_attrs(obj, attrs)
+
+
+try:
+    from cpyamf.alias import BaseClassAlias
+except ImportError:
+    pass
+
+
+class ClassAlias(BaseClassAlias):
     """
     Class alias. Provides class/instance meta data to the En/Decoder to allow
     fine grain control and some performance increases.
@@ -48,6 +272,7 @@ class ClassAlias(object):
         self.external = kwargs.pop('external', None)
         self.dynamic = kwargs.pop('dynamic', None)
         self.synonym_attrs = kwargs.pop('synonym_attrs', {})
+        self.schema = kwargs.pop('schema', None)
 
         self._compiled = False
         self.anonymous = False
@@ -109,6 +334,7 @@ class ClassAlias(object):
         self.static_attrs = list(self.static_attrs or [])
         self.static_attrs_set = set(self.static_attrs)
         self.proxy_attrs = set(self.proxy_attrs or [])
+        self.schema = self._compileSchema(self.schema or {})
 
         self.sealed = util.is_class_sealed(self.klass)
 
@@ -193,6 +419,11 @@ class ClassAlias(object):
             self.synonym_attrs = alias.synonym_attrs.copy()
             self.synonym_attrs.update(x)
 
+        if alias.schema:
+            x = self.schema
+            self.schema = alias.schema.copy()
+            self.schema.update(x)
+
     def _finalise_compile(self):
         if self.dynamic is None:
             self.dynamic = True
@@ -231,6 +462,23 @@ class ClassAlias(object):
                 if a not in self.static_attrs:
                     self.static_attrs.remove(a)
 
+        self.static_types = None
+
+        if self.schema:
+            for attr in self.schema:
+                if attr not in self.static_attrs_set:
+                    raise ValueError(
+                        'Schema attribute %r of %r is not static' % (
+                            attr, self.klass
+                        )
+                    )
+
+            self.static_types = [
+                self.schema.get(attr) for attr in self.static_attrs
+            ]
+        else:
+            self.schema = None
+
         if not self.exclude_attrs:
             self.exclude_attrs = None
         else:
@@ -300,6 +548,79 @@ class ClassAlias(object):
 
         self._compiled = True
 
+    def _compileSchema(self, schema):
+        """
+        Returns the C{dict} of C{attr: (code, klass)} for the declared
+        C{schema}. C{klass} is C{None} for the primitive L{SCHEMA_TYPES} and
+        is left as the alias for classes named by alias, see
+        L{getStaticTypes}.
+        """
+        compiled = {}
+
+        for attr, type_ in schema.iteritems():
+            code = SCHEMA_OBJECT
+
+            if isinstance(type_, (list, tuple)):
+                if len(type_) != 1:
+                    raise ValueError(
+                        'Expected a single item type for %r, got %r' % (
+                            attr, type_
+                        )
+                    )
+
+                code = SCHEMA_LIST
+                type_ = type_[0]
+            elif isinstance(type_, python.str_types) and type_ in SCHEMA_TYPES:
+                compiled[attr] = (SCHEMA_TYPES[type_], None)
+
+                continue
+
+            if not isinstance(type_, python.str_types + python.class_types):
+                raise TypeError('Unknown schema type %r for %r' % (
+                    type_, attr
+                ))
+
+            compiled[attr] = (code, type_)
+
+        return compiled
+
+    def getStaticTypes(self):
+        """
+        Returns C{static_types} with the classes that the schema names by
+        alias resolved. This is done on first use rather than in L{compile} so
+        that a schema can name a class that is registered later.
+
+        @raise UnknownClassAlias: A class named in the schema is not
+            registered and cannot be loaded.
+        @since: 0.9
+        """
+        if not self._compiled:
+            self.compile()
+
+        if self.static_types is None:
+            return None
+
+        for spec in self.static_types:
+            if spec is not None and isinstance(spec[1], python.str_types):
+                break
+        else:
+            return self.static_types
+
+        resolved = {}
+
+        for attr, (code, klass) in self.schema.iteritems():
+            if isinstance(klass, python.str_types):
+                klass = pyamf.get_class_alias(klass).klass
+
+            resolved[attr] = (code, klass)
+
+        self.schema = resolved
+        self.static_types = [
+            self.schema.get(attr) for attr in self.static_attrs
+        ]
+
+        return self.static_types
+
     def is_compiled(self):
         return self._compiled
 
@@ -376,197 +697,6 @@ class ClassAlias(object):
             )
         )
 
-    def getAttribute(self, obj, attr, codec=None):
-        """
-        Get the attribute `attr` from `obj`. If no attribute exists,
-        `pyamf.Undefined` is returned.
-
-        @param codec: The current `pyamf.codec.Codec` getting the attribute
-            (if there is one).
-        """
-        return getattr(obj, attr)
-
-    def getEncodableAttributes(self, obj, codec=None):
-        """
-        Must return a C{dict} of attributes to be encoded, even if its empty.
-
-        @param codec: An optional argument that will contain the encoder
-            instance calling this function.
-        @since: 0.5
-        """
-        if not self._compiled:
-            self.compile()
-
-        if self.is_dict:
-            return dict(obj)
-
-        if self.shortcut_encode and self.dynamic:
-            return obj.__dict__.copy()
-
-        attrs = {}
-
-        if self.static_attrs:
-            for attr in self.static_attrs:
-                try:
-                    attrs[attr] = self.getAttribute(obj, attr, codec=codec)
-                except AttributeError:
-                    attrs[attr] = pyamf.Undefined
-
-        if not self.dynamic:
-            if self.non_static_encodable_properties:
-                for attr in self.non_static_encodable_properties:
-                    attrs[attr] = self.getAttribute(obj, attr, codec=codec)
-
-            return attrs
-
-        dynamic_props = util.get_properties(obj)
-
-        if not self.shortcut_encode:
-            dynamic_props = set(dynamic_props)
-
-            if self.encodable_properties:
-                dynamic_props.update(self.encodable_properties)
-
-            if self.static_attrs:
-                dynamic_props.difference_update(self.static_attrs)
-
-            if self.exclude_attrs:
-                dynamic_props.difference_update(self.exclude_attrs)
-
-        for attr in dynamic_props:
-            attrs[attr] = self.getAttribute(obj, attr, codec=codec)
-
-        if self.proxy_attrs is not None and attrs and codec:
-            context = codec.context
-
-            for k, v in attrs.copy().iteritems():
-                if k in self.proxy_attrs:
-                    attrs[k] = context.getProxyForObject(v)
-
-        if self.synonym_attrs:
-            missing = object()
-
-            for k, v in self.synonym_attrs.iteritems():
-                value = attrs.pop(k, missing)
-
-                if value is missing:
-                    continue
-
-                attrs[v] = value
-
-        return attrs
-
-    def getDecodableAttributes(self, obj, attrs, codec=None):
-        """
-        Returns a dictionary of attributes for C{obj} that has been filtered,
-        based on the supplied C{attrs}. This allows for fine grain control
-        over what will finally end up on the object or not.
-
-        @param obj: The object that will recieve the attributes.
-        @param attrs: The C{attrs} dictionary that has been decoded.
-        @param codec: An optional argument that will contain the decoder
-            instance calling this function.
-        @return: A dictionary of attributes that can be applied to C{obj}
-        @since: 0.5
-        """
-        if not self._compiled:
-            self.compile()
-
-        changed = False
-
-        props = set(attrs.keys())
-
-        if self.static_attrs:
-            missing_attrs = self.static_attrs_set.difference(props)
-
-            if missing_attrs:
-                raise AttributeError(
-                    'Static attributes %r expected when decoding %r' % (
-                        missing_attrs, self.klass
-                    )
-                )
-
-            props.difference_update(self.static_attrs)
-
-        if not props:
-            return attrs
-
-        if not self.dynamic:
-            if not self.decodable_properties:
-                props = set()
-            else:
-                props.intersection_update(self.decodable_properties)
-
-            changed = True
-
-        if self.readonly_attrs:
-            props.difference_update(self.readonly_attrs)
-            changed = True
-
-        if self.exclude_attrs:
-            props.difference_update(self.exclude_attrs)
-            changed = True
-
-        if self.proxy_attrs is not None and codec:
-            context = codec.context
-
-            for k in self.proxy_attrs:
-                try:
-                    v = attrs[k]
-                except KeyError:
-                    continue
-
-                attrs[k] = context.getObjectForProxy(v)
-
-        if changed:
-            # apply all filters before synonyms
-            a = {}
-
-            [a.__setitem__(p, attrs[p]) for p in props]
-            attrs = a
-
-        if self.synonym_attrs:
-            missing = object()
-
-            for k, v in self.synonym_attrs.iteritems():
-                value = attrs.pop(v, missing)
-
-                if value is missing:
-                    continue
-
-                attrs[k] = value
-
-        return attrs
-
-    def applyAttributes(self, obj, attrs, codec=None):
-        """
-        Applies the collection of attributes C{attrs} to aliased object C{obj}.
-        Called when decoding reading aliased objects from an AMF byte stream.
-
-        Override this to provide fine grain control of application of
-        attributes to C{obj}.
-
-        @param codec: An optional argument that will contain the en/decoder
-            instance calling this function.
-        """
-        if not self._compiled:
-            self.compile()
-
-        if not self.shortcut_decode:
-            attrs = self.getDecodableAttributes(obj, attrs, codec=codec)
-        else:
-            if self.is_dict:
-                obj.update(attrs)
-
-                return
-
-            if not self.sealed:
-                obj.__dict__.update(attrs)
-
-                return
-
-        util.set_attrs(obj, attrs)
-
     def getCustomProperties(self):
         """
         Overrride this to provide known static properties based on the aliased
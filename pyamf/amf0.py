@@ -19,7 +19,7 @@ LocalConnection, SharedObjects and other classes in the Adobe Flash Player.
 import datetime
 
 import pyamf
-from pyamf import util, codec, xml, python
+from pyamf import util, codec, xml, python, records
 
 
 #: Represented as 9 bytes: 1 byte for C{0x00} and 8 bytes a double
@@ -90,6 +90,17 @@ TYPE_TYPEDOBJECT = '\x10'
 TYPE_AMF3 = '\x11'
 
 
+def _get_use_ext(stream):
+    """
+    The C{cpyamf} codecs copy any stream that they do not support, so AMF3
+    data embedded in other streams must be handled by the pure Python codecs.
+    """
+    if isinstance(stream, util.BufferedByteStream):
+        return None
+
+    return False
+
+
 class Context(codec.Context):
     """
     """
@@ -116,7 +127,10 @@ class Context(codec.Context):
         encoder = pyamf.get_encoder(
             pyamf.AMF3,
             stream=amf0_encoder.stream,
-            timezone_offset=amf0_encoder.timezone_offset
+            timezone_offset=amf0_encoder.timezone_offset,
+            instrument=amf0_encoder.instrument or False,
+            infer_traits=amf0_encoder.infer_traits,
+            use_ext=_get_use_ext(amf0_encoder.stream)
         )
 
         self.extra['amf3_encoder'] = encoder
@@ -132,7 +146,12 @@ class Context(codec.Context):
         decoder = pyamf.get_decoder(
             pyamf.AMF3,
             stream=amf0_decoder.stream,
-            timezone_offset=amf0_decoder.timezone_offset
+            timezone_offset=amf0_decoder.timezone_offset,
+            instrument=amf0_decoder.instrument or False,
+            use_records=amf0_decoder.use_records,
+            number_array=amf0_decoder.number_array,
+            object_hooks=amf0_decoder.object_hooks,
+            use_ext=_get_use_ext(amf0_decoder.stream)
         )
 
         self.extra['amf3_decoder'] = decoder
@@ -257,15 +276,45 @@ class Decoder(codec.Decoder):
         """
         Read a C{list} from the data stream.
         """
-        obj = []
-        self.context.addObject(obj)
         l = self.stream.read_ulong()
+        numbers = self.readNumbers(l)
 
-        for i in xrange(l):
+        # numbers do not add to the context, so the array can be added after
+        # they are read
+        if l and len(numbers) == l and self.number_array is not None:
+            obj = self.getNumberArray(numbers)
+            self.context.addObject(obj)
+
+            return obj
+
+        obj = map(_check_for_int, numbers)
+        self.context.addObject(obj)
+
+        for i in xrange(l - len(numbers)):
             obj.append(self.readElement())
 
         return obj
 
+    def readNumbers(self, size):
+        """
+        Reads the numbers at the start of a strict array of C{size} elements.
+        Unless the decoder is instrumented, they are unpacked in one go (see
+        L{readDoubles<codec.Decoder.readDoubles>}).
+
+        @return: The numbers that were read, which may be fewer than C{size}.
+        @rtype: C{list}
+        @since: 0.9
+        """
+        if self.instrument is not None:
+            numbers = []
+
+            while len(numbers) < size and self.stream.peek() == TYPE_NUMBER:
+                numbers.append(self.readElement())
+
+            return numbers
+
+        return self.readDoubles(TYPE_NUMBER, size)
+
     def readTypedObject(self):
         """
         Reads an aliased ActionScript object from the stream and attempts to
@@ -274,6 +323,10 @@ class Decoder(codec.Decoder):
         @see: L{pyamf.register_class}
         """
         class_alias = self.readString()
+        hook = self.getObjectHook(class_alias)
+
+        if hook is not None:
+            return self.readHookedObject(hook)
 
         try:
             alias = self.context.getClassAlias(class_alias)
@@ -313,16 +366,44 @@ class Decoder(codec.Decoder):
 
         return obj_attrs
 
+    def readHookedObject(self, hook):
+        """
+        Reads the attributes of an object and returns the result of passing
+        them to C{hook}. See L{object_hooks<codec.Decoder.object_hooks>}.
+
+        @since: 0.9
+        """
+        ref = self.context.addObject(None)
+
+        obj = hook(self.readObjectAttributes(None))
+        self.context.replaceObject(ref, obj)
+
+        return obj
+
     def readObject(self):
         """
         Reads an anonymous object from the data stream.
 
-        @rtype: L{ASObject<pyamf.ASObject>}
+        @rtype: L{ASObject<pyamf.ASObject>} or L{Record<records.Record>}
         """
-        obj = pyamf.ASObject()
+        hook = self.getObjectHook('')
+
+        if hook is not None:
+            return self.readHookedObject(hook)
+
+        if self.use_records:
+            obj = records.Record()
+        else:
+            obj = pyamf.ASObject()
+
         self.context.addObject(obj)
 
-        obj.update(self.readObjectAttributes(obj))
+        attrs = self.readObjectAttributes(obj)
+
+        if self.use_records:
+            records.fill(obj, attrs)
+        else:
+            obj.update(attrs)
 
         return obj
 
@@ -398,9 +479,14 @@ class Encoder(codec.Encoder):
     @ivar use_amf3: A flag to determine whether this encoder should default to
         using AMF3. Defaults to C{False}
     @type use_amf3: C{bool}
+    @ivar infer_traits: Passed on to the encoder for AMF3 data, see
+        L{amf3.Encoder<pyamf.amf3.Encoder>}. Since 0.9
+    @type infer_traits: C{bool}
     """
 
     def __init__(self, *args, **kwargs):
+        self.infer_traits = kwargs.pop('infer_traits', False)
+
         codec.Encoder.__init__(self, *args, **kwargs)
 
         self.use_amf3 = kwargs.pop('use_amf3', False)
@@ -409,11 +495,14 @@ class Encoder(codec.Encoder):
         return Context(**kwargs)
 
     def getTypeFunc(self, data):
+        t = type(data)
+
+        if t is pyamf.Encoded:
+            return self.writeEncoded
+
         if self.use_amf3:
             return self.writeAMF3
 
-        t = type(data)
-
         if t is pyamf.MixedArray:
             return self.writeMixedArray
 
@@ -456,8 +545,27 @@ class Encoder(codec.Encoder):
         self.writeType(TYPE_ARRAY)
         self.stream.write_ulong(len(a))
 
-        for data in a:
-            self.writeElement(data)
+        kind = codec.SEQUENCE_MIXED
+
+        if not self.use_amf3:
+            kind = self.getSequenceKind(a)
+
+        if kind == codec.SEQUENCE_NUMBERS:
+            write = self.stream.write
+            write_double = self.stream.write_double
+
+            for data in a:
+                write(TYPE_NUMBER)
+                write_double(float(data))
+        elif kind == codec.SEQUENCE_STRINGS:
+            for data in a:
+                if type(data) is str:
+                    self.writeBytes(data)
+                else:
+                    self.writeString(data)
+        else:
+            for data in a:
+                self.writeElement(data)
 
     def writeNumber(self, n):
         """
@@ -673,6 +781,25 @@ class Encoder(codec.Encoder):
 
         self.context.getAMF3Encoder(self).writeElement(data)
 
+    def writeEncoded(self, data):
+        """
+        Writes a L{pre-encoded fragment<pyamf.encoded.Encoded>}. AMF3
+        fragments are written in L{AMF3<pyamf.amf3>} format.
+
+        @since: 0.9
+        """
+        if self.use_amf3 and data.amf3 is not None:
+            data = data.amf3
+
+        if data.encoding == pyamf.AMF3:
+            self.writeType(TYPE_AMF3)
+
+            self.context.getAMF3Encoder(self).writeEncoded(data)
+
+            return
+
+        codec.Encoder.writeEncoded(self, data)
+
 
 class RecordSet(object):
     """
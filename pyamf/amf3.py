@@ -25,7 +25,7 @@ import datetime
 import zlib
 
 import pyamf
-from pyamf import codec, util, xml, python
+from pyamf import codec, util, xml, python, records
 
 
 __all__ = [
@@ -499,6 +499,11 @@ class ByteArray(util.BufferedByteStream, DataInput, DataOutput):
 
     Supports C{zlib} compression.
 
+    Any object that supports the buffer protocol (C{bytearray},
+    C{memoryview}, C{numpy} arrays etc.) can be wrapped. With the C{cpyamf}
+    extension its bytes are not copied until the byte array is written to and
+    are encoded straight from the wrapped object.
+
     Possible uses of the C{ByteArray} class:
      - Creating a custom protocol to connect to a client.
      - Writing your own AMF/Remoting packet.
@@ -509,19 +514,59 @@ class ByteArray(util.BufferedByteStream, DataInput, DataOutput):
     """
 
     _zlib_header = '\x78\x9c'
+    # compressed bytes of the last call to __str__, reused until the stream
+    # is dirtied by a write or truncate
+    _deflated = None
 
     class __amf__:
         amf3 = True
 
     def __init__(self, buf=None):
-        self.context = Context()
-
         util.BufferedByteStream.__init__(self, buf)
-        DataInput.__init__(self, Decoder(self, self.context))
-        DataOutput.__init__(self, Encoder(self, self.context))
+
+        # most byte arrays are only ever read or written as raw bytes (e.g.
+        # the uuids in the flex messages) so the codecs are created lazily.
+        self.stream = self
+        self._context = None
+        self._decoder = None
+        self._encoder = None
 
         self.compressed = self.peek(2) == ByteArray._zlib_header
 
+    @property
+    def context(self):
+        """
+        The L{Context} shared by the decoder and encoder of this byte array.
+
+        @since: 0.9
+        """
+        if self._context is None:
+            self._context = Context()
+
+        return self._context
+
+    @property
+    def decoder(self):
+        """
+        @see: L{DataInput.decoder}
+        @since: 0.9
+        """
+        if self._decoder is None:
+            self._decoder = Decoder(self, self.context)
+
+        return self._decoder
+
+    @property
+    def encoder(self):
+        """
+        @see: L{DataOutput.encoder}
+        @since: 0.9
+        """
+        if self._encoder is None:
+            self._encoder = Encoder(self, self.context)
+
+        return self._encoder
+
     def readObject(self):
         self.context.clear()
 
@@ -539,14 +584,21 @@ class ByteArray(util.BufferedByteStream, DataInput, DataOutput):
         return cmp(self.getvalue(), other)
 
     def __str__(self):
-        buf = self.getvalue()
-
         if not self.compressed:
-            return buf
+            return self.getvalue()
 
-        buf = zlib.compress(buf)
+        # the same byte array is often encoded many times
+        if self._deflated is not None and not self._dirty:
+            return self._deflated
+
+        ret = zlib.compress(self.getvalue())
         # FIXME nick: hacked
-        return buf[0] + '\xda' + buf[2:]
+        ret = ret[0] + '\xda' + ret[2:]
+
+        self._deflated = ret
+        self._dirty = False
+
+        return ret
 
     def compress(self):
         """
@@ -672,6 +724,30 @@ class Context(codec.Context):
 
         return self.strings.append(s)
 
+    def getReferenceCounts(self):
+        """
+        Returns the number of entries in the object, string and class
+        definition reference tables.
+
+        @since: 0.9
+        """
+        return (len(self._objects), len(self.strings), self.class_idx)
+
+    def reserveReferences(self, objects=0, strings=0, classes=0):
+        """
+        Adds placeholder entries to the reference tables for data that was
+        written to (or read from) the stream without going through this
+        context.
+
+        @since: 0.9
+        """
+        codec.Context.reserveReferences(self, objects)
+
+        for i in xrange(strings):
+            self.strings.append(object())
+
+        self.class_idx += classes
+
     def getClassByReference(self, ref):
         """
         Return class reference.
@@ -758,10 +834,18 @@ class Context(codec.Context):
 class Decoder(codec.Decoder):
     """
     Decodes an AMF3 data stream.
+
+    @ivar byte_array_view: If set, a callable that is passed the bytes of
+        every decoded byte array and returns the object to use in place of a
+        L{ByteArray}, e.g. C{memoryview} or C{numpy.frombuffer} for a read
+        only view that shares the bytes rather than copying them again.
+        Compressed byte arrays are decompressed first.
     """
 
     def __init__(self, *args, **kwargs):
         self.use_proxies = kwargs.pop('use_proxies', use_proxies_default)
+        self.byte_array_view = kwargs.pop('byte_array_view', None)
+        self._data_input = None
 
         codec.Decoder.__init__(self, *args, **kwargs)
 
@@ -935,10 +1019,19 @@ class Decoder(codec.Decoder):
 
         if key == '':
             # integer indexes only -> python list
-            result = []
+            result = self.readNumbers(size)
+
+            # numbers do not add to the context, so the array can be added
+            # after they are read
+            if size and len(result) == size and self.number_array is not None:
+                result = self.getNumberArray(result)
+                self.context.addObject(result)
+
+                return result
+
             self.context.addObject(result)
 
-            for i in xrange(size):
+            for i in xrange(size - len(result)):
                 result.append(self.readElement())
 
             return result
@@ -956,6 +1049,53 @@ class Decoder(codec.Decoder):
 
         return result
 
+    def readNumbers(self, size):
+        """
+        Reads the integers and numbers at the start of the dense portion of an
+        array of C{size} elements. Unless the decoder is instrumented, they
+        are read without looking up the function for every type marker and
+        runs of numbers are unpacked in one go (see
+        L{readDoubles<codec.Decoder.readDoubles>}).
+
+        @return: The numbers that were read, which may be fewer than C{size}.
+        @rtype: C{list}
+        @since: 0.9
+        """
+        stream = self.stream
+        numbers = []
+        # runs of doubles are read in chunks that grow while the run lasts
+        chunk = 8
+
+        while len(numbers) < size:
+            t = stream.peek()
+
+            if t != TYPE_NUMBER and t != TYPE_INTEGER:
+                break
+
+            if self.instrument is not None:
+                numbers.append(self.readElement())
+            elif t == TYPE_NUMBER:
+                run = self.readDoubles(
+                    TYPE_NUMBER,
+                    min(chunk, size - len(numbers))
+                )
+
+                if not run:
+                    # truncated, let readElement raise the error
+                    break
+
+                numbers.extend(run)
+
+                if len(run) == chunk:
+                    chunk = min(chunk * 2, 0x10000)
+                else:
+                    chunk = 8
+            else:
+                stream.read(1)
+                numbers.append(decode_int(stream, True))
+
+        return numbers
+
     def _getClassDefinition(self, ref):
         """
         Reads class definition from the stream.
@@ -977,7 +1117,7 @@ class Decoder(codec.Decoder):
         try:
             alias = pyamf.get_class_alias(name)
         except pyamf.UnknownClassAlias:
-            if self.strict:
+            if self.strict and self.getObjectHook(name) is None:
                 raise
 
             alias = pyamf.TypedObjectClassAlias(name)
@@ -1009,6 +1149,40 @@ class Decoder(codec.Decoder):
             obj[attr] = self.readElement()
             attr = self.readBytes()
 
+    def _getDataInput(self):
+        """
+        Returns the L{DataInput} that is handed to externalised objects. It is
+        reused for as long as the stream stays the same.
+
+        @since: 0.9
+        """
+        data_input = self._data_input
+
+        if data_input is None or data_input.stream is not self.stream:
+            data_input = self._data_input = DataInput(self)
+
+        return data_input
+
+    def _readHookedObject(self, class_def, hook):
+        """
+        Reads the attributes of an object and returns the result of passing
+        them to C{hook}. See L{object_hooks<codec.Decoder.object_hooks>}.
+
+        @since: 0.9
+        """
+        ref = self.context.addObject(None)
+        obj_attrs = {}
+
+        self._readStatic(class_def, obj_attrs)
+
+        if class_def.encoding == ObjectEncoding.DYNAMIC:
+            self._readDynamic(class_def, obj_attrs)
+
+        obj = hook(obj_attrs)
+        self.context.replaceObject(ref, obj)
+
+        return obj
+
     def readObject(self):
         """
         Reads an object from the stream.
@@ -1035,8 +1209,20 @@ class Decoder(codec.Decoder):
 
         class_def = self._getClassDefinition(ref)
         alias = class_def.alias
+        hook = self.getObjectHook(alias.alias)
+
+        if hook is not None and class_def.encoding in (
+                ObjectEncoding.DYNAMIC,
+                ObjectEncoding.STATIC):
+            return self._readHookedObject(class_def, hook)
+
+        is_record = self.use_records and alias.klass is pyamf.ASObject
+
+        if is_record:
+            obj = records.Record()
+        else:
+            obj = alias.createInstance(codec=self)
 
-        obj = alias.createInstance(codec=self)
         obj_attrs = dict()
 
         self.context.addObject(obj)
@@ -1044,7 +1230,7 @@ class Decoder(codec.Decoder):
         if class_def.encoding in (
                 ObjectEncoding.EXTERNAL,
                 ObjectEncoding.PROXY):
-            obj.__readamf__(DataInput(self))
+            obj.__readamf__(self._getDataInput())
 
             if self.use_proxies is True:
                 obj = self.readProxy(obj)
@@ -1058,7 +1244,10 @@ class Decoder(codec.Decoder):
         else:
             raise pyamf.DecodeError("Unknown object encoding")
 
-        alias.applyAttributes(obj, obj_attrs, codec=self)
+        if is_record:
+            records.fill(obj, obj_attrs)
+        else:
+            alias.applyAttributes(obj, obj_attrs, codec=self)
 
         if self.use_proxies is True:
             obj = self.readProxy(obj)
@@ -1121,8 +1310,11 @@ class Decoder(codec.Decoder):
             except zlib.error:
                 pass
 
-        obj = ByteArray(buffer)
-        obj.compressed = compressed
+        if self.byte_array_view is not None:
+            obj = self.byte_array_view(buffer)
+        else:
+            obj = ByteArray(buffer)
+            obj.compressed = compressed
 
         self.context.addObject(obj)
 
@@ -1132,11 +1324,20 @@ class Decoder(codec.Decoder):
 class Encoder(codec.Encoder):
     """
     Encodes an AMF3 data stream.
+
+    @ivar infer_traits: Whether anonymous objects (C{dict}s,
+        L{ASObject<pyamf.ASObject>}s and L{Record<pyamf.records.Record>}s)
+        are written with sealed traits that are shared by every object with
+        the same keys, rather than as dynamic objects that repeat their keys.
+        Since 0.9
+    @type infer_traits: C{bool}
     """
 
     def __init__(self, *args, **kwargs):
         self.use_proxies = kwargs.pop('use_proxies', use_proxies_default)
         self.string_references = kwargs.pop('string_references', True)
+        self.infer_traits = kwargs.pop('infer_traits', False)
+        self._data_output = None
 
         codec.Encoder.__init__(self, *args, **kwargs)
 
@@ -1330,7 +1531,26 @@ class Encoder(codec.Encoder):
         self._writeInteger((len(n) << 1) | REFERENCE_BIT)
         self.stream.write('\x01')
 
-        [self.writeElement(x) for x in n]
+        kind = self.getSequenceKind(n)
+
+        if kind == codec.SEQUENCE_NUMBERS:
+            write = self.stream.write
+            write_double = self.stream.write_double
+
+            for x in n:
+                if type(x) is int and MIN_29B_INT <= x <= MAX_29B_INT:
+                    write(TYPE_INTEGER + encode_int(x))
+                else:
+                    write(TYPE_NUMBER)
+                    write_double(float(x))
+        elif kind == codec.SEQUENCE_STRINGS:
+            for x in n:
+                if type(x) is str:
+                    self.writeBytes(x)
+                else:
+                    self.writeString(x)
+        else:
+            [self.writeElement(x) for x in n]
 
     def writeDict(self, n):
         """
@@ -1413,6 +1633,20 @@ class Encoder(codec.Encoder):
 
         self.writeObject(proxy, is_proxy=True)
 
+    def _getDataOutput(self):
+        """
+        Returns the L{DataOutput} that is handed to externalised objects. It
+        is reused for as long as the stream stays the same.
+
+        @since: 0.9
+        """
+        data_output = self._data_output
+
+        if data_output is None or data_output.stream is not self.stream:
+            data_output = self._data_output = DataOutput(self)
+
+        return data_output
+
     def writeObject(self, obj, is_proxy=False):
         """
         Writes an object to the stream.
@@ -1435,6 +1669,12 @@ class Encoder(codec.Encoder):
 
         # object is not referenced, serialise it
         kls = obj.__class__
+
+        if self.infer_traits and (kls is dict or kls is pyamf.ASObject or
+                                  isinstance(obj, records.Record)):
+            if self.writeSealedObject(obj):
+                return
+
         definition = self.context.getClass(kls)
         alias = None
         class_ref = False  # if the class definition is a reference
@@ -1479,7 +1719,7 @@ class Encoder(codec.Encoder):
             # again.
 
         if alias.external:
-            obj.__writeamf__(DataOutput(self))
+            obj.__writeamf__(self._getDataOutput())
 
             return
 
@@ -1508,6 +1748,56 @@ class Encoder(codec.Encoder):
 
             self.stream.write('\x01')
 
+    def writeSealedObject(self, obj):
+        """
+        Writes the traits and values of the anonymous object C{obj}. The
+        traits are sealed and shared with every other object that has the
+        same keys (see L{infer_traits}).
+
+        @return: Whether C{obj} was written. Nothing is written if a key is
+            not a non-empty string.
+        @since: 0.9
+        """
+        keys = frozenset(obj)
+        definition = self.context.getClass(keys)
+
+        if definition:
+            self.stream.write(definition.reference)
+        else:
+            for key in keys:
+                if not key or not isinstance(key, python.str_types):
+                    return False
+
+            alias = pyamf.ClassAlias(
+                pyamf.ASObject,
+                static_attrs=list(obj),
+                dynamic=False
+            )
+            definition = ClassDefinition(alias)
+
+            self.context.addClass(definition, keys)
+
+            self.stream.write(encode_int(
+                definition.attr_len << 4 |
+                definition.encoding << 2 |
+                REFERENCE_BIT << 1 |
+                REFERENCE_BIT
+            ))
+
+            definition.reference = encode_int(
+                definition.reference << 2 | REFERENCE_BIT)
+
+            # anonymous
+            self.stream.write('\x01')
+
+            for attr in alias.static_attrs:
+                self.serialiseString(attr)
+
+        for attr in definition.alias.static_attrs:
+            self.writeElement(obj[attr])
+
+        return True
+
     def writeByteArray(self, n):
         """
         Writes a L{ByteArray} to the data stream.
@@ -1550,6 +1840,32 @@ class Encoder(codec.Encoder):
 
         self.serialiseString(xml.tostring(n).encode('utf-8'))
 
+    def writeEncoded(self, data):
+        """
+        Writes a L{pre-encoded fragment<pyamf.encoded.Encoded>} straight to
+        the stream. AMF0 fragments cannot be embedded in an AMF3 stream so
+        their L{AMF3 counterpart<pyamf.encoded.Encoded.amf3>} or the original
+        value is encoded instead (if it is available).
+
+        @since: 0.9
+        """
+        if data.amf3 is not None:
+            data = data.amf3
+
+        if data.encoding != pyamf.AMF3:
+            if data.value is None:
+                raise pyamf.EncodeError(
+                    'Unable to write an AMF%d fragment to an AMF3 stream' % (
+                        data.encoding,
+                    )
+                )
+
+            self.writeElement(data.value)
+
+            return
+
+        codec.Encoder.writeEncoded(self, data)
+
 
 def encode_int(n):
     """
@@ -0,0 +1,315 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Codec benchmarks.
+
+Measures the encoding and decoding throughput of the pure Python
+(L{pyamf.amf0}, L{pyamf.amf3}) and extension (C{cpyamf}) codecs against the
+L{payload corpus<pyamf.benchmarks.corpus>} and optionally compares the
+results against a baseline stored by a previous run.
+
+From the command line::
+
+    python -m pyamf.benchmarks --save-baseline baseline.json
+    # ... change the code ...
+    python -m pyamf.benchmarks --baseline baseline.json
+
+See C{--help} for all options.
+
+@since: 0.9
+"""
+
+import gc
+import sys
+import time
+
+import pyamf
+
+
+__all__ = [
+    'Result',
+    'BACKENDS',
+    'get_backends',
+    'measure',
+    'run',
+    'compare',
+]
+
+#: Maps the name of a backend to the C{use_ext} value supplied to
+#: L{pyamf._get_amf_module}.
+BACKENDS = {
+    'pure': False,
+    'ext': True,
+}
+
+#: The operations that are benchmarked.
+OPERATIONS = ('encode', 'decode')
+
+#: The default minimum number of seconds that each timing repeat runs for.
+DEFAULT_MIN_TIME = 0.2
+
+#: The default number of timing repeats. The fastest repeat is reported.
+DEFAULT_REPEAT = 3
+
+#: Results that are slower than the baseline by more than this proportion
+#: are reported as regressions.
+DEFAULT_TOLERANCE = 0.1
+
+#: Used as the timer, C{time.clock} is more accurate on Windows.
+if hasattr(time, 'perf_counter'):
+    timer = time.perf_counter
+elif sys.platform == 'win32':
+    timer = time.clock
+else:
+    timer = time.time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+class Result(object):
+    """
+    The result of benchmarking a single operation.
+
+    @ivar name: Identifies the benchmark, C{payload/amfN/backend/operation}.
+    @ivar ops: The number of operations per second.
+    @type ops: C{float}
+    @ivar size: The size of the encoded payload in bytes.
+    @type size: C{int}
+    @ivar allocations: The number of memory blocks allocated by a single
+        operation (if C{tracemalloc} is available), otherwise the number of
+        objects tracked by the garbage collector that were created by a single
+        operation and are still alive when it returns (for decoding, this is
+        the size of the decoded object graph).
+    @type allocations: C{int}
+    """
+
+    def __init__(self, name, ops, size, allocations):
+        self.name = name
+        self.ops = ops
+        self.size = size
+        self.allocations = allocations
+
+    def __repr__(self):
+        return '<%s %s ops=%.1f>' % (
+            self.__class__.__name__,
+            self.name,
+            self.ops
+        )
+
+    @property
+    def bytes_per_sec(self):
+        """
+        The number of encoded bytes produced (or consumed) per second.
+        """
+        return self.ops * self.size
+
+    def toDict(self):
+        return {
+            'ops': self.ops,
+            'size': self.size,
+            'allocations': self.allocations,
+        }
+
+
+def get_backends(names=None):
+    """
+    Returns the names of the requested backends that are available. The
+    C{ext} backend is unavailable if C{cpyamf} has not been compiled.
+
+    @raise ValueError: Unknown backend name.
+    """
+    ret = []
+
+    for name in names or sorted(BACKENDS.keys(), reverse=True):
+        if name not in BACKENDS:
+            raise ValueError('Unknown backend %r' % (name,))
+
+        try:
+            pyamf._get_amf_module(pyamf.AMF3, use_ext=BACKENDS[name])
+        except ImportError:
+            continue
+
+        ret.append(name)
+
+    return ret
+
+
+def _get_op(module, operation, value, data):
+    if operation == 'encode':
+        def op():
+            encoder = module.Encoder()
+            encoder.writeElement(value)
+
+            return encoder.stream.getvalue()
+    else:
+        def op():
+            return module.Decoder(data).readElement()
+
+    return op
+
+
+def _count_allocations(op):
+    if tracemalloc is not None:
+        tracemalloc.start()
+
+        try:
+            before = tracemalloc.take_snapshot()
+            ret = op()
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+
+        del ret
+
+        return sum([
+            max(stat.count_diff, 0)
+            for stat in after.compare_to(before, 'lineno')
+        ])
+
+    gc.collect()
+    enabled = gc.isenabled()
+    gc.disable()
+
+    try:
+        before = len(gc.get_objects())
+        ret = op()
+        after = len(gc.get_objects())
+    finally:
+        if enabled:
+            gc.enable()
+
+    del ret
+
+    # the list returned by the first call to gc.get_objects
+    return max(after - before - 1, 0)
+
+
+def measure(op, min_time=DEFAULT_MIN_TIME, repeat=DEFAULT_REPEAT):
+    """
+    Returns the number of times per second C{op} can be called.
+
+    The number of calls per repeat is calibrated so that each repeat takes
+    at least C{min_time} seconds, the fastest repeat is used.
+    """
+    number = 1
+
+    while True:
+        start = timer()
+
+        for i in xrange(number):
+            op()
+
+        elapsed = timer() - start
+
+        if elapsed >= min_time:
+            break
+
+        number *= 2
+
+    best = elapsed
+
+    for i in xrange(repeat - 1):
+        start = timer()
+
+        for i in xrange(number):
+            op()
+
+        best = min(best, timer() - start)
+
+    return number / max(best, 1e-9)
+
+
+def run(payloads=None, backends=None, encodings=None, operations=None,
+        min_time=DEFAULT_MIN_TIME, repeat=DEFAULT_REPEAT, callback=None):
+    """
+    Runs the benchmarks.
+
+    @param payloads: The names of the payloads to run. Defaults to all of
+        L{corpus.PAYLOADS<pyamf.benchmarks.corpus.PAYLOADS>}.
+    @param backends: The names of the backends to run. Defaults to all
+        available L{BACKENDS}.
+    @param encodings: The AMF encodings to run. Defaults to all.
+    @param operations: The operations to run. Defaults to L{OPERATIONS}.
+    @param callback: Called with each L{Result} as it becomes available.
+    @return: A list of L{Result}s.
+    """
+    from pyamf.benchmarks import corpus
+
+    results = []
+
+    for payload in corpus.get_payloads(payloads):
+        value = payload.build()
+
+        for encoding in payload.encodings:
+            if encodings and encoding not in encodings:
+                continue
+
+            # the reference encoding is always produced by the pure codec so
+            # that the decoders are fed identical bytes.
+            data = _get_op(
+                pyamf._get_amf_module(encoding, use_ext=False),
+                'encode',
+                value,
+                None
+            )()
+
+            for backend in get_backends(backends):
+                module = pyamf._get_amf_module(
+                    encoding,
+                    use_ext=BACKENDS[backend]
+                )
+
+                for operation in operations or OPERATIONS:
+                    op = _get_op(module, operation, value, data)
+
+                    result = Result(
+                        '%s/amf%d/%s/%s' % (
+                            payload.name,
+                            encoding,
+                            backend,
+                            operation
+                        ),
+                        measure(op, min_time, repeat),
+                        len(data),
+                        _count_allocations(op)
+                    )
+
+                    results.append(result)
+
+                    if callback:
+                        callback(result)
+
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compares C{results} against a baseline.
+
+    @param baseline: A C{dict} mapping benchmark names to C{dict}s as
+        returned by L{Result.toDict}.
+    @param tolerance: The proportion by which a benchmark may be slower than
+        the baseline before it is considered to be a regression.
+    @return: A list of C{(result, ratio, regressed)} tuples, where C{ratio}
+        is the number of operations per second relative to the baseline (or
+        C{None} if the benchmark is not in the baseline).
+    """
+    ret = []
+
+    for result in results:
+        base = baseline.get(result.name, None)
+
+        if not base or not base.get('ops'):
+            ret.append((result, None, False))
+
+            continue
+
+        ratio = result.ops / base['ops']
+
+        ret.append((result, ratio, ratio < 1 - tolerance))
+
+    return ret
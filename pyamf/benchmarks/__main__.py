@@ -0,0 +1,15 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Allows the benchmarks to be run with C{python -m pyamf.benchmarks}.
+
+@since: 0.9
+"""
+
+import sys
+
+from pyamf.benchmarks import cli
+
+
+sys.exit(cli.main())
@@ -0,0 +1,183 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Command line interface for the codec benchmarks.
+
+Usage::
+
+    python -m pyamf.benchmarks [options]
+
+@since: 0.9
+"""
+
+import sys
+import optparse
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import pyamf
+from pyamf import benchmarks
+from pyamf.benchmarks import corpus
+
+
+def get_parser():
+    parser = optparse.OptionParser(
+        usage='%prog [options] [payload ...]',
+        description='Benchmarks the PyAMF codecs. Payloads: ' + ', '.join([
+            p.name for p in corpus.PAYLOADS
+        ])
+    )
+
+    parser.add_option(
+        '-b', '--backend', action='append', dest='backends',
+        choices=sorted(benchmarks.BACKENDS.keys()),
+        help='Backend to run (pure or ext), may be repeated. Default: all '
+             'available backends'
+    )
+    parser.add_option(
+        '-e', '--encoding', action='append', dest='encodings', type='int',
+        help='AMF encoding to run (0 or 3), may be repeated. Default: both'
+    )
+    parser.add_option(
+        '-o', '--operation', action='append', dest='operations',
+        choices=list(benchmarks.OPERATIONS),
+        help='Operation to run (encode or decode), may be repeated. '
+             'Default: both'
+    )
+    parser.add_option(
+        '-t', '--min-time', type='float', dest='min_time',
+        default=benchmarks.DEFAULT_MIN_TIME,
+        help='Minimum number of seconds per timing repeat [%default]'
+    )
+    parser.add_option(
+        '-r', '--repeat', type='int', dest='repeat',
+        default=benchmarks.DEFAULT_REPEAT,
+        help='Number of timing repeats, the fastest is reported [%default]'
+    )
+    parser.add_option(
+        '--baseline', dest='baseline',
+        help='Compare the results against this baseline file'
+    )
+    parser.add_option(
+        '--save-baseline', dest='save_baseline',
+        help='Save the results to this baseline file'
+    )
+    parser.add_option(
+        '--tolerance', type='float', dest='tolerance',
+        default=benchmarks.DEFAULT_TOLERANCE,
+        help='Proportion by which a benchmark may be slower than the '
+             'baseline before it is reported as a regression [%default]'
+    )
+
+    return parser
+
+
+def format_result(result, ratio=None, regressed=False):
+    line = '%-40s %12.1f ops/s %10.2f MB/s %9s allocs' % (
+        result.name,
+        result.ops,
+        result.bytes_per_sec / (1024.0 * 1024.0),
+        result.allocations
+    )
+
+    if ratio is not None:
+        line += ' %6.2fx' % (ratio,)
+
+        if regressed:
+            line += ' REGRESSION'
+
+    return line
+
+
+def load_baseline(filename):
+    f = open(filename, 'rb')
+
+    try:
+        return json.load(f)['results']
+    finally:
+        f.close()
+
+
+def save_baseline(filename, results):
+    data = {
+        'pyamf': str(pyamf.version),
+        'python': sys.version.split()[0],
+        'results': dict([(r.name, r.toDict()) for r in results]),
+    }
+
+    f = open(filename, 'wb')
+
+    try:
+        json.dump(data, f, indent=2, sort_keys=True)
+    finally:
+        f.close()
+
+
+def main(args=None, out=sys.stdout):
+    """
+    Runs the benchmarks. Returns C{1} if any regressions were found.
+    """
+    parser = get_parser()
+    options, payloads = parser.parse_args(args)
+
+    try:
+        backends = benchmarks.get_backends(options.backends)
+        corpus.get_payloads(payloads)
+    except ValueError, e:
+        parser.error(str(e))
+
+    if not backends:
+        parser.error('None of the requested backends are available')
+
+    baseline = None
+
+    if options.baseline:
+        baseline = load_baseline(options.baseline)
+
+    def callback(result):
+        if baseline is None:
+            out.write(format_result(result) + '\n')
+        else:
+            out.write(format_result(*benchmarks.compare(
+                [result],
+                baseline,
+                options.tolerance
+            )[0]) + '\n')
+
+        out.flush()
+
+    results = benchmarks.run(
+        payloads,
+        backends,
+        options.encodings,
+        options.operations,
+        options.min_time,
+        options.repeat,
+        callback
+    )
+
+    if options.save_baseline:
+        save_baseline(options.save_baseline, results)
+
+    if baseline is None:
+        return 0
+
+    regressions = [
+        x for x in benchmarks.compare(results, baseline, options.tolerance)
+        if x[2]
+    ]
+
+    if regressions:
+        out.write('\n%d regression(s) found\n' % (len(regressions),))
+
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
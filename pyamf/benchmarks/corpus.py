@@ -0,0 +1,314 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+The payloads used by the codec benchmarks.
+
+Each payload is built deterministically so that results are comparable
+between runs and machines.
+
+@since: 0.9
+"""
+
+import datetime
+import random
+import uuid
+
+import pyamf
+from pyamf import amf0, amf3
+from pyamf.flex import messaging
+
+
+__all__ = [
+    'Payload',
+    'PAYLOADS',
+    'get_payloads',
+]
+
+#: Seed for the pseudo random data in the payloads.
+SEED = 0x414d46
+
+
+class Person(object):
+    class __amf__:
+        static = ('id', 'name', 'email', 'age', 'active')
+
+    def __init__(self, id=None, name=None, email=None, age=None,
+                 active=None):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.age = age
+        self.active = active
+
+
+class Product(object):
+    class __amf__:
+        static = ('sku', 'title', 'price')
+
+    def __init__(self, sku=None, title=None, price=None):
+        self.sku = sku
+        self.title = title
+        self.price = price
+
+
+class OrderLine(object):
+    class __amf__:
+        static = ('product', 'quantity', 'total')
+
+    def __init__(self, product=None, quantity=None, total=None):
+        self.product = product
+        self.quantity = quantity
+        self.total = total
+
+
+class Order(object):
+    class __amf__:
+        static = ('id', 'customer', 'created', 'lines', 'notes')
+
+    def __init__(self, id=None, customer=None, created=None, lines=None,
+                 notes=None):
+        self.id = id
+        self.customer = customer
+        self.created = created
+        self.lines = lines
+        self.notes = notes
+
+
+pyamf.register_package(
+    [Person, Product, OrderLine, Order],
+    'org.pyamf.benchmarks'
+)
+
+
+def _people(rnd, count):
+    return [
+        Person(
+            i,
+            u'Person %d' % (i,),
+            u'person%d@example.com' % (i,),
+            rnd.randint(18, 90),
+            rnd.random() > 0.5
+        )
+        for i in xrange(count)
+    ]
+
+
+def typed_flat(rnd):
+    """
+    A list of 500 flat typed objects.
+    """
+    return _people(rnd, 500)
+
+
+def typed_nested(rnd):
+    """
+    100 orders, each with a customer and 5 order lines referring to a shared
+    set of products.
+    """
+    customers = _people(rnd, 20)
+    products = [
+        Product(u'SKU%05d' % (i,), u'Product %d' % (i,), i * 1.25)
+        for i in xrange(50)
+    ]
+    orders = []
+    created = datetime.datetime(2010, 1, 1)
+
+    for i in xrange(100):
+        lines = []
+
+        for j in xrange(5):
+            product = rnd.choice(products)
+            quantity = rnd.randint(1, 10)
+
+            lines.append(
+                OrderLine(product, quantity, quantity * product.price)
+            )
+
+        orders.append(Order(
+            i,
+            rnd.choice(customers),
+            created + datetime.timedelta(hours=i),
+            lines,
+            u'Order notes %d' % (i,)
+        ))
+
+    return orders
+
+
+def string_dict(rnd):
+    """
+    A dict of 2000 string keys to string values, a third of which repeat.
+    """
+    words = [u'word%d' % (i,) for i in xrange(100)]
+    ret = {}
+
+    for i in xrange(2000):
+        if i % 3:
+            value = u' '.join([rnd.choice(words) for j in xrange(8)])
+        else:
+            value = rnd.choice(words)
+
+        ret['key_%d' % (i,)] = value
+
+    return ret
+
+
+def numeric_array(rnd):
+    """
+    5000 floats followed by 5000 integers.
+    """
+    return (
+        [rnd.uniform(-1e6, 1e6) for i in xrange(5000)] +
+        [rnd.randint(-2 ** 28, 2 ** 28 - 1) for i in xrange(5000)]
+    )
+
+
+def dates(rnd):
+    """
+    1000 distinct datetimes.
+    """
+    start = datetime.datetime(2000, 1, 1)
+
+    return [
+        start + datetime.timedelta(seconds=rnd.randint(0, 10 ** 9))
+        for i in xrange(1000)
+    ]
+
+
+def byte_array(rnd):
+    """
+    A 256KB ByteArray.
+    """
+    return amf3.ByteArray(''.join([
+        chr(rnd.randint(0, 255)) for i in xrange(256 * 1024)
+    ]))
+
+
+def flex_messages(rnd):
+    """
+    20 flex acknowledgement messages, each carrying a list of 25 typed
+    objects.
+    """
+    ret = []
+
+    for i in xrange(20):
+        msg = messaging.AcknowledgeMessage(
+            body=_people(rnd, 25),
+            correlationId='%032x' % (rnd.getrandbits(128),),
+            messageId='%032x' % (rnd.getrandbits(128),),
+            clientId='%032x' % (rnd.getrandbits(128),),
+            destination='benchmark',
+            timestamp=1262304000000 + i,
+            headers={'DSId': '%032x' % (rnd.getrandbits(128),)}
+        )
+
+        ret.append(msg)
+
+    return ret
+
+
+def small_messages(rnd):
+    """
+    200 small (externalised) flex acknowledgement and command messages, the
+    messages exchanged for every RemoteObject call.
+    """
+    ret = []
+    start = datetime.datetime(2010, 1, 1)
+
+    def get_uuid():
+        return uuid.UUID(int=rnd.getrandbits(128))
+
+    for i in xrange(100):
+        ret.append(messaging.AcknowledgeMessageExt(
+            body=i,
+            correlationId=get_uuid(),
+            messageId=get_uuid(),
+            clientId=get_uuid(),
+            destination='benchmark',
+            timestamp=start + datetime.timedelta(seconds=i),
+            headers={'DSId': str(get_uuid())}
+        ))
+
+        ret.append(messaging.CommandMessageExt(
+            operation=messaging.CommandMessage.PING_OPERATION,
+            messageId=get_uuid(),
+            correlationId=u'',
+            timestamp=start + datetime.timedelta(seconds=i),
+            headers={'DSMessagingVersion': 1}
+        ))
+
+    return ret
+
+
+def record_set(rnd):
+    """
+    A RecordSet of 10 columns and 500 rows.
+    """
+    columns = ['column%d' % (i,) for i in xrange(10)]
+    items = [
+        [rnd.choice([i, u'value %d' % (i,), i * 0.5, None]) for j in columns]
+        for i in xrange(500)
+    ]
+
+    return amf0.RecordSet(columns, items)
+
+
+class Payload(object):
+    """
+    A named benchmark payload.
+
+    @ivar name: The name of the payload.
+    @ivar description: A description of the payload.
+    @ivar encodings: The AMF encodings that the payload is benchmarked with.
+    """
+
+    def __init__(self, name, factory, encodings=pyamf.ENCODING_TYPES):
+        self.name = name
+        self.factory = factory
+        self.description = (factory.__doc__ or '').strip()
+        self.encodings = encodings
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, self.name)
+
+    def build(self):
+        """
+        Returns the Python value of the payload.
+        """
+        return self.factory(random.Random(SEED))
+
+
+#: All payloads, in the order they are run.
+PAYLOADS = [
+    Payload('typed_flat', typed_flat),
+    Payload('typed_nested', typed_nested),
+    Payload('string_dict', string_dict),
+    Payload('numeric_array', numeric_array),
+    Payload('dates', dates),
+    Payload('byte_array', byte_array),
+    Payload('flex_messages', flex_messages),
+    Payload('small_messages', small_messages, (pyamf.AMF3,)),
+    Payload('record_set', record_set),
+]
+
+
+def get_payloads(names=None):
+    """
+    Returns the payloads with the supplied names or all payloads.
+
+    @raise ValueError: Unknown payload name.
+    """
+    if not names:
+        return list(PAYLOADS)
+
+    by_name = dict([(p.name, p) for p in PAYLOADS])
+    ret = []
+
+    for name in names:
+        try:
+            ret.append(by_name[name])
+        except KeyError:
+            raise ValueError('Unknown payload %r' % (name,))
+
+    return ret
@@ -0,0 +1,189 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Compares encoding and decoding a remoting envelope serially against
+L{pyamf.remoting.parallel}.
+
+Each payload of the L{corpus<pyamf.benchmarks.corpus>} is batched into an
+AMF3 envelope and every operation is timed in-process and in pools with the
+requested numbers of processes.
+
+Usage::
+
+    python -m pyamf.benchmarks.parallel --processes 2 --processes 8
+
+@since: 0.9
+"""
+
+import sys
+import optparse
+import multiprocessing
+
+import pyamf
+from pyamf import remoting, benchmarks
+from pyamf.benchmarks import corpus
+
+
+#: The default number of bodies in the benchmarked envelope.
+DEFAULT_BODIES = 16
+
+
+def build_envelope(payload, bodies=DEFAULT_BODIES):
+    """
+    Returns an AMF3 envelope holding C{bodies} responses, each containing
+    the value of C{payload}.
+    """
+    value = payload.build()
+    envelope = remoting.Envelope(pyamf.AMF3)
+
+    for i in xrange(bodies):
+        envelope['/%d' % (i,)] = remoting.Response(value)
+
+    return envelope
+
+
+def _get_op(envelope, data, operation, pool):
+    if operation == 'encode':
+        def op():
+            return remoting.encode(envelope, strict=True, pool=pool)
+    else:
+        def op():
+            return remoting.decode(data, strict=True, pool=pool)
+
+    return op
+
+
+def run(payloads=None, processes=None, bodies=DEFAULT_BODIES,
+        operations=None, min_time=benchmarks.DEFAULT_MIN_TIME,
+        repeat=benchmarks.DEFAULT_REPEAT, callback=None):
+    """
+    Runs the benchmarks.
+
+    @param processes: A list of pool sizes. Defaults to the number of CPUs.
+    @param callback: Called with each L{Result<pyamf.benchmarks.Result>} as
+        it becomes available.
+    @return: A list of L{Result<pyamf.benchmarks.Result>}s. The results are
+        named C{payload/operation/serial} and C{payload/operation/pN}.
+    """
+    pools = [('serial', None)]
+
+    for count in processes or [multiprocessing.cpu_count()]:
+        pools.append(('p%d' % (count,), multiprocessing.Pool(count)))
+
+    results = []
+
+    try:
+        for payload in corpus.get_payloads(payloads):
+            envelope = build_envelope(payload, bodies)
+            data = remoting.encode(envelope, strict=True).getvalue()
+
+            for operation in operations or benchmarks.OPERATIONS:
+                for name, pool in pools:
+                    op = _get_op(envelope, data, operation, pool)
+
+                    result = benchmarks.Result(
+                        '%s/%s/%s' % (payload.name, operation, name),
+                        benchmarks.measure(op, min_time, repeat),
+                        len(data),
+                        None
+                    )
+
+                    results.append(result)
+
+                    if callback:
+                        callback(result)
+    finally:
+        for name, pool in pools:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+    return results
+
+
+def get_parser():
+    parser = optparse.OptionParser(
+        usage='%prog [options] [payload ...]',
+        description='Compares serial and multiprocess encoding/decoding of '
+                    'remoting envelopes. Payloads: ' + ', '.join([
+                        p.name for p in corpus.PAYLOADS
+                    ])
+    )
+
+    parser.add_option(
+        '-p', '--processes', action='append', dest='processes', type='int',
+        help='Number of processes in the pool, may be repeated. Default: '
+             'the number of CPUs'
+    )
+    parser.add_option(
+        '-n', '--bodies', type='int', dest='bodies', default=DEFAULT_BODIES,
+        help='Number of bodies in the envelope [%default]'
+    )
+    parser.add_option(
+        '-o', '--operation', action='append', dest='operations',
+        choices=list(benchmarks.OPERATIONS),
+        help='Operation to run (encode or decode), may be repeated. '
+             'Default: both'
+    )
+    parser.add_option(
+        '-t', '--min-time', type='float', dest='min_time',
+        default=benchmarks.DEFAULT_MIN_TIME,
+        help='Minimum number of seconds per timing repeat [%default]'
+    )
+    parser.add_option(
+        '-r', '--repeat', type='int', dest='repeat',
+        default=benchmarks.DEFAULT_REPEAT,
+        help='Number of timing repeats, the fastest is reported [%default]'
+    )
+
+    return parser
+
+
+def main(args=None, out=sys.stdout):
+    """
+    Runs the benchmarks, reporting the speedup of each pool relative to the
+    serial path.
+    """
+    parser = get_parser()
+    options, payloads = parser.parse_args(args)
+
+    try:
+        corpus.get_payloads(payloads)
+    except ValueError, e:
+        parser.error(str(e))
+
+    serial = {}
+
+    def callback(result):
+        prefix, name = result.name.rsplit('/', 1)
+
+        if name == 'serial':
+            serial[prefix] = result.ops
+            ratio = ''
+        else:
+            ratio = ' %6.2fx' % (result.ops / serial[prefix],)
+
+        out.write('%-40s %10.1f ops/s %10.2f MB/s%s\n' % (
+            result.name,
+            result.ops,
+            result.bytes_per_sec / (1024.0 * 1024.0),
+            ratio
+        ))
+        out.flush()
+
+    run(
+        payloads,
+        options.processes,
+        options.bodies,
+        options.operations,
+        options.min_time,
+        options.repeat,
+        callback
+    )
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
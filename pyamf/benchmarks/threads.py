@@ -0,0 +1,235 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Compares decoding (or encoding) independent payloads serially against
+decoding them in parallel threads.
+
+Codecs and streams are not thread safe but nothing is shared between two
+codecs, so independent payloads may be decoded concurrently by giving each
+thread its own L{Decoder<pyamf.codec.Decoder>}::
+
+    from multiprocessing.pool import ThreadPool
+
+    def decode(data):
+        return pyamf.decode(data, encoding=pyamf.AMF3).next()
+
+    results = ThreadPool(4).map(decode, payloads)
+
+The C{cpyamf} streams copy buffers of at least
+C{cpyamf.util.get_nogil_threshold()} bytes (64KB by default) without holding
+the GIL, so threads spending most of their time moving large strings and
+C{ByteArray}s (e.g. the C{byte_array} payload) run alongside each other.
+Building the decoded object graph always holds the GIL; for payloads made of
+many small objects use processes instead (see L{pyamf.remoting.parallel}).
+
+Usage::
+
+    python -m pyamf.benchmarks.threads --threads 2 --threads 4 byte_array
+
+@since: 0.9
+"""
+
+import sys
+import optparse
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+import pyamf
+from pyamf import benchmarks
+from pyamf.benchmarks import corpus
+
+
+#: The default number of payloads handled by each operation.
+DEFAULT_JOBS = 16
+
+
+def _get_op(module, operation, value, data, jobs, pool):
+    if operation == 'encode':
+        def work(value):
+            encoder = module.Encoder()
+            encoder.writeElement(value)
+
+            return encoder.stream.getvalue()
+
+        args = [value] * jobs
+    else:
+        def work(data):
+            return module.Decoder(data).readElement()
+
+        args = [data] * jobs
+
+    if pool is None:
+        def op():
+            return map(work, args)
+    else:
+        def op():
+            return pool.map(work, args)
+
+    return op
+
+
+def run(payloads=None, threads=None, backends=None, jobs=DEFAULT_JOBS,
+        operations=None, min_time=benchmarks.DEFAULT_MIN_TIME,
+        repeat=benchmarks.DEFAULT_REPEAT, callback=None):
+    """
+    Runs the benchmarks against AMF3.
+
+    @param threads: A list of pool sizes. Defaults to the number of CPUs.
+    @param jobs: The number of independent payloads handled by each
+        operation.
+    @param callback: Called with each L{Result<pyamf.benchmarks.Result>} as
+        it becomes available.
+    @return: A list of L{Result<pyamf.benchmarks.Result>}s. The results are
+        named C{payload/backend/operation/serial} and
+        C{payload/backend/operation/tN}.
+    """
+    pools = [('serial', None)]
+
+    for count in threads or [multiprocessing.cpu_count()]:
+        pools.append(('t%d' % (count,), ThreadPool(count)))
+
+    results = []
+
+    try:
+        for payload in corpus.get_payloads(payloads):
+            if pyamf.AMF3 not in payload.encodings:
+                continue
+
+            value = payload.build()
+            data = pyamf.encode(value, encoding=pyamf.AMF3).getvalue()
+
+            for backend in benchmarks.get_backends(backends):
+                module = pyamf._get_amf_module(
+                    pyamf.AMF3,
+                    use_ext=benchmarks.BACKENDS[backend]
+                )
+
+                for operation in operations or benchmarks.OPERATIONS:
+                    for name, pool in pools:
+                        op = _get_op(
+                            module,
+                            operation,
+                            value,
+                            data,
+                            jobs,
+                            pool
+                        )
+
+                        result = benchmarks.Result(
+                            '%s/%s/%s/%s' % (
+                                payload.name,
+                                backend,
+                                operation,
+                                name
+                            ),
+                            benchmarks.measure(op, min_time, repeat),
+                            len(data) * jobs,
+                            None
+                        )
+
+                        results.append(result)
+
+                        if callback:
+                            callback(result)
+    finally:
+        for name, pool in pools:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+    return results
+
+
+def get_parser():
+    parser = optparse.OptionParser(
+        usage='%prog [options] [payload ...]',
+        description='Compares serial and multithreaded AMF3 '
+                    'encoding/decoding of independent payloads. Payloads: ' +
+                    ', '.join([p.name for p in corpus.PAYLOADS])
+    )
+
+    parser.add_option(
+        '-T', '--threads', action='append', dest='threads', type='int',
+        help='Number of threads in the pool, may be repeated. Default: '
+             'the number of CPUs'
+    )
+    parser.add_option(
+        '-b', '--backend', action='append', dest='backends',
+        choices=sorted(benchmarks.BACKENDS.keys()),
+        help='Backend to run (pure or ext), may be repeated. Default: all '
+             'available'
+    )
+    parser.add_option(
+        '-j', '--jobs', type='int', dest='jobs', default=DEFAULT_JOBS,
+        help='Number of payloads handled by each operation [%default]'
+    )
+    parser.add_option(
+        '-o', '--operation', action='append', dest='operations',
+        choices=list(benchmarks.OPERATIONS),
+        help='Operation to run (encode or decode), may be repeated. '
+             'Default: both'
+    )
+    parser.add_option(
+        '-t', '--min-time', type='float', dest='min_time',
+        default=benchmarks.DEFAULT_MIN_TIME,
+        help='Minimum number of seconds per timing repeat [%default]'
+    )
+    parser.add_option(
+        '-r', '--repeat', type='int', dest='repeat',
+        default=benchmarks.DEFAULT_REPEAT,
+        help='Number of timing repeats, the fastest is reported [%default]'
+    )
+
+    return parser
+
+
+def main(args=None, out=sys.stdout):
+    """
+    Runs the benchmarks, reporting the speedup of each pool relative to the
+    serial path.
+    """
+    parser = get_parser()
+    options, payloads = parser.parse_args(args)
+
+    try:
+        corpus.get_payloads(payloads)
+        benchmarks.get_backends(options.backends)
+    except ValueError, e:
+        parser.error(str(e))
+
+    serial = {}
+
+    def callback(result):
+        prefix, name = result.name.rsplit('/', 1)
+
+        if name == 'serial':
+            serial[prefix] = result.ops
+            ratio = ''
+        else:
+            ratio = ' %6.2fx' % (result.ops / serial[prefix],)
+
+        out.write('%-40s %10.1f ops/s %10.2f MB/s%s\n' % (
+            result.name,
+            result.ops,
+            result.bytes_per_sec / (1024.0 * 1024.0),
+            ratio
+        ))
+        out.flush()
+
+    run(
+        payloads,
+        options.threads,
+        options.backends,
+        options.jobs,
+        options.operations,
+        options.min_time,
+        options.repeat,
+        callback
+    )
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,11 +5,13 @@
 Provides basic functionality for all pyamf.amf?.[De|E]ncoder classes.
 """
 
+import sys
 import types
+import array
 import datetime
 
 import pyamf
-from pyamf import util, python, xml
+from pyamf import util, python, xml, instrumentation
 
 __all__ = [
     'IndexedCollection',
@@ -26,6 +28,16 @@ except NameError:
     str = bytes
 
 
+#: The kinds of C{list}s that the encoders write in bulk, see
+#: L{Encoder.getSequenceKind}.
+SEQUENCE_MIXED = 0
+SEQUENCE_NUMBERS = 1
+SEQUENCE_STRINGS = 2
+
+_number_types = frozenset([int, float])
+_string_types = frozenset([str, unicode])
+
+
 class IndexedCollection(object):
     """
     Store references to objects and provides an api to query references.
@@ -92,6 +104,20 @@ class IndexedCollection(object):
 
         return idx
 
+    def replace(self, ref, obj):
+        """
+        Replaces the object stored at C{ref} with C{obj}.
+
+        @since: 0.9
+        """
+        old = self.func(self.list[ref])
+
+        if self.dict.get(old) == ref:
+            del self.dict[old]
+
+        self.list[ref] = obj
+        self.dict[self.func(obj)] = ref
+
     def __eq__(self, other):
         if isinstance(other, list):
             return self.list == other
@@ -210,6 +236,35 @@ class Context(object):
         """
         return self._objects.append(obj)
 
+    def replaceObject(self, ref, obj):
+        """
+        Replaces the object stored at C{ref} with C{obj}. Used when the final
+        version of an object is only known once it has been fully decoded.
+
+        @since: 0.9
+        """
+        self._objects.replace(ref, obj)
+
+    def getReferenceCounts(self):
+        """
+        Returns the number of entries in the object, string and class
+        definition reference tables.
+
+        @since: 0.9
+        """
+        return (len(self._objects), 0, 0)
+
+    def reserveReferences(self, objects=0, strings=0, classes=0):
+        """
+        Adds placeholder entries to the reference tables for data that was
+        written to (or read from) the stream without going through this
+        context, e.g. a L{pre-encoded fragment<pyamf.encoded.Encoded>}.
+
+        @since: 0.9
+        """
+        for i in xrange(objects):
+            self._objects.append(object())
+
     def getClassAlias(self, klass):
         """
         Gets a class alias based on the supplied C{klass}. If one is not found
@@ -286,10 +341,13 @@ class _Codec(object):
     @ivar timezone_offset: The offset from I{UTC} for any C{datetime} objects
         being encoded. Default to C{None} means no offset.
     @type timezone_offset: C{datetime.timedelta} or C{int} or C{None}
+    @ivar instrument: The L{Instrument<pyamf.instrumentation.Instrument>}
+        collecting statistics for this codec or C{None}. Since 0.9
     """
 
     def __init__(self, stream=None, context=None, strict=False,
-                 timezone_offset=None, forbid_dtd=True, forbid_entities=True):
+                 timezone_offset=None, forbid_dtd=True, forbid_entities=True,
+                 instrument=None):
         if isinstance(stream, basestring) or stream is None:
             stream = util.BufferedByteStream(stream)
 
@@ -303,6 +361,11 @@ class _Codec(object):
 
         self._func_cache = {}
 
+        self.instrument = instrumentation.resolve(instrument)
+
+        if self.instrument is not None:
+            instrumentation.attach(self, self.instrument)
+
     def buildContext(self, **kwargs):
         """
         A context factory.
@@ -328,13 +391,87 @@ class Decoder(_Codec):
         being this relates to typed objects in the stream that do not have a
         registered alias. Introduced in 0.4.
     @type strict: C{bool}
+    @ivar use_records: Whether anonymous objects are decoded as compact
+        L{Record<pyamf.records.Record>}s rather than
+        L{ASObject<pyamf.ASObject>}s. Introduced in 0.9.
+    @type use_records: C{bool}
+    @ivar number_array: Arrays that only hold numbers are decoded as an
+        C{array.array('d')} if this is C{True}. If it is a callable, it is
+        passed that C{array.array} and returns the decoded value, e.g.
+        C{numpy.frombuffer}. C{None} (the default) decodes them as C{list}s.
+        Introduced in 0.9.
+    @ivar object_hooks: Maps class alias names (C{''} for anonymous objects)
+        to callables that are passed the C{dict} of decoded attributes and
+        return the object, in place of the usual L{ClassAlias
+        <pyamf.ClassAlias>} instance or L{ASObject<pyamf.ASObject>}. Aliases
+        with a hook do not need to be registered. The attributes of an object
+        with a hook cannot refer back to that object. Externalised objects
+        are not passed to hooks. Introduced in 0.9.
+    @type object_hooks: C{dict} or C{None}
     """
 
     def __init__(self, *args, **kwargs):
+        self.use_records = kwargs.pop('use_records', False)
+        self.number_array = kwargs.pop('number_array', None)
+        self.object_hooks = kwargs.pop('object_hooks', None)
+
         _Codec.__init__(self, *args, **kwargs)
 
         self.__depth = 0
 
+    def getNumberArray(self, numbers):
+        """
+        Returns the decoded value for an array that only holds C{numbers}
+        when L{number_array} is set.
+
+        @since: 0.9
+        """
+        numbers = array.array('d', numbers)
+
+        if self.number_array is True:
+            return numbers
+
+        return self.number_array(numbers)
+
+    def getObjectHook(self, alias):
+        """
+        Returns the L{object hook<object_hooks>} for the class C{alias} name
+        or C{None}.
+
+        @since: 0.9
+        """
+        if self.object_hooks is None:
+            return None
+
+        return self.object_hooks.get(alias, None)
+
+    def readDoubles(self, marker, count):
+        """
+        Reads up to C{count} consecutive doubles that are each preceded by the
+        type C{marker}, stopping at the first element that is not. The run is
+        unpacked in one go rather than one element at a time.
+
+        @return: The doubles that were read.
+        @rtype: C{list} of C{float}s
+        @since: 0.9
+        """
+        stream = self.stream
+        count = min(count, stream.remaining() // 9)
+        data = stream.read(count * 9)
+        run = count - len(data[::9].lstrip(marker))
+
+        stream.seek((run - count) * 9, 1)
+
+        # drop the type markers, AMF is big endian
+        values = array.array('d', ''.join([
+            data[i:i + 8] for i in xrange(1, run * 9, 9)
+        ]))
+
+        if sys.byteorder == 'little':
+            values.byteswap()
+
+        return values.tolist()
+
     def send(self, data):
         """
         Add data for the decoder to work on.
@@ -471,6 +608,21 @@ class Encoder(_Codec):
     writeXML = _write_type
     writeObject = _write_type
 
+    def writeEncoded(self, data):
+        """
+        Writes a L{pre-encoded fragment<pyamf.encoded.Encoded>} straight to
+        the stream.
+
+        @since: 0.9
+        """
+        bytes, references = data.getFragment(
+            self.context,
+            self.timezone_offset
+        )
+
+        self.stream.write(bytes)
+        self.context.reserveReferences(*references)
+
     def writeSequence(self, iterable):
         """
         Encodes an iterable. The default is to write If the iterable has an al
@@ -491,6 +643,31 @@ class Encoder(_Codec):
 
         self.writeList(list(iterable))
 
+    def getSequenceKind(self, seq):
+        """
+        Returns L{SEQUENCE_NUMBERS} if every element of C{seq} is an C{int} or
+        a C{float}, L{SEQUENCE_STRINGS} if every element is a C{str} or a
+        C{unicode} and L{SEQUENCE_MIXED} otherwise. Subclasses write the
+        first two kinds without looking up the type of every element.
+
+        Instrumented encoders always get L{SEQUENCE_MIXED} so that every
+        element is reported.
+
+        @since: 0.9
+        """
+        if len(seq) < 2 or self.instrument is not None:
+            return SEQUENCE_MIXED
+
+        seq_types = set(map(type, seq))
+
+        if seq_types <= _number_types:
+            return SEQUENCE_NUMBERS
+
+        if seq_types <= _string_types:
+            return SEQUENCE_STRINGS
+
+        return SEQUENCE_MIXED
+
     def writeGenerator(self, gen):
         """
         Iterates over a generator object and encodes all that is returned.
@@ -532,6 +709,8 @@ class Encoder(_Codec):
             return self.writeUndefined
         elif t in (datetime.date, datetime.datetime, datetime.time):
             return self.writeDate
+        elif t is pyamf.Encoded:
+            return self.writeEncoded
         elif xml.is_xml(data):
             return self.writeXML
 
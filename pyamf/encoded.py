@@ -0,0 +1,337 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Support for splicing pre-encoded AMF fragments into an encoded stream.
+
+Large values that are the same for every request (reference data,
+configuration trees etc.) can be encoded once and wrapped in an L{Encoded}
+instance. When the encoder meets an L{Encoded} value, it writes the stored
+bytes straight to the stream instead of walking the value again.
+
+AMF streams refer back to previously encoded objects, strings and class
+definitions by index. A fragment that contains no such references can be
+spliced anywhere in a stream, the encoder simply accounts for the entries the
+fragment adds to each reference table. A fragment that does contain
+references is only valid at the reference table offsets it was encoded for.
+If the original value is available, the encoder transparently re-encodes it
+for any other offsets and remembers the result for next time.
+
+Use L{encode} to produce fragments (or L{validate} for bytes that were encoded
+elsewhere) and L{EncodedCache} to reuse fragments for the same object.
+
+@since: 0.9
+"""
+
+import pyamf
+from pyamf import util
+
+
+__all__ = [
+    'Encoded',
+    'EncodedCache',
+    'encode',
+    'validate',
+]
+
+#: The maximum number of fragments (encoded at different reference table
+#: offsets) held by a single L{Encoded} instance.
+MAX_FRAGMENTS = 8
+
+
+class Encoded(object):
+    """
+    A pre-encoded AMF value.
+
+    Instances are immutable once created (apart from the fragments that are
+    added by the encoders) and can be shared between threads.
+
+    @ivar encoding: The AMF encoding of the fragments. One of
+        L{pyamf.ENCODING_TYPES}.
+    @ivar value: The original Python value. If supplied, it is used to
+        re-encode the value when a stored fragment cannot be used at the
+        current position of the stream.
+    @ivar amf3: An AMF3 L{Encoded} of the same value, for AMF0 fragments.
+        Encoders that write AMF3 (including AMF0 encoders with C{use_amf3}
+        set) write it instead of re-encoding C{value}. Set it before the
+        fragment is shared.
+    """
+
+    amf3 = None
+
+    def __init__(self, bytes, encoding, value=None, references=(0, 0, 0),
+                 offsets=(None, None, None)):
+        """
+        @param bytes: The encoded fragment.
+        @type bytes: C{str}
+        @param references: The number of objects, strings and class
+            definitions that decoding the fragment adds to the reference
+            tables.
+        @param offsets: The size of the object, string and class definition
+            reference tables that the fragment refers to or C{None} for each
+            table that is not referred to.
+        """
+        if encoding not in pyamf.ENCODING_TYPES:
+            raise ValueError('Unknown encoding %r' % (encoding,))
+
+        self.encoding = encoding
+        self.value = value
+
+        self._fragments = [(tuple(offsets), bytes, tuple(references))]
+
+    @property
+    def bytes(self):
+        """
+        The encoded bytes of the original fragment.
+        """
+        return self._fragments[0][1]
+
+    def __len__(self):
+        return len(self.bytes)
+
+    def __repr__(self):
+        return '<%s.%s encoding=%r len=%d at 0x%x>' % (
+            self.__class__.__module__,
+            self.__class__.__name__,
+            self.encoding,
+            len(self),
+            id(self)
+        )
+
+    def getFragment(self, context, timezone_offset=None):
+        """
+        Returns the fragment that can be written at the current position of
+        a stream, encoding a new one if required.
+
+        @param context: The context of the encoder that will write the
+            fragment.
+        @param timezone_offset: Used when the value needs to be re-encoded.
+        @return: A tuple containing the encoded bytes and the number of
+            objects, strings and class definitions to reserve in C{context}
+            after the bytes have been written.
+        @raise pyamf.EncodeError: The fragment cannot be used at the current
+            position and the original value is not available.
+        """
+        counts = context.getReferenceCounts()
+
+        for offsets, bytes, references in self._fragments:
+            for offset, count in zip(offsets, counts):
+                if offset is not None and offset != count:
+                    break
+            else:
+                return bytes, references
+
+        if self.value is None:
+            raise pyamf.EncodeError(
+                'Encoded fragment contains references and cannot be '
+                'written at this position of the stream'
+            )
+
+        encoder = pyamf.get_encoder(
+            self.encoding,
+            timezone_offset=timezone_offset,
+            instrument=False
+        )
+        encoder.context.reserveReferences(*counts)
+        encoder.writeElement(self.value)
+
+        new_counts = encoder.context.getReferenceCounts()
+        references = tuple([y - x for x, y in zip(counts, new_counts)])
+        bytes = encoder.stream.getvalue()
+
+        if len(self._fragments) < MAX_FRAGMENTS:
+            self._fragments.append((counts, bytes, references))
+
+        return bytes, references
+
+
+def _get_validation_context(encoding):
+    """
+    Returns a pure Python context that records which reference tables are
+    used while decoding.
+    """
+    if encoding == pyamf.AMF0:
+        from pyamf import amf0
+
+        class Context(amf0.Context):
+            def clear(self):
+                amf0.Context.clear(self)
+
+                self.used = set()
+
+            def getObject(self, ref):
+                self.used.add(0)
+
+                return amf0.Context.getObject(self, ref)
+
+            def getAMF3Decoder(self, amf0_decoder):
+                raise pyamf.EncodeError(
+                    'AMF0 fragments cannot contain AMF3 data')
+
+        return Context()
+
+    from pyamf import amf3
+
+    class Context(amf3.Context):
+        def clear(self):
+            amf3.Context.clear(self)
+
+            self.used = set()
+
+        def getObject(self, ref):
+            self.used.add(0)
+
+            return amf3.Context.getObject(self, ref)
+
+        def getString(self, ref):
+            self.used.add(1)
+
+            return amf3.Context.getString(self, ref)
+
+        def getClassByReference(self, ref):
+            self.used.add(2)
+
+            return amf3.Context.getClassByReference(self, ref)
+
+    return Context()
+
+
+def validate(bytes, encoding=None, value=None):
+    """
+    Checks that C{bytes} contains exactly one AMF element and works out which
+    reference tables it uses.
+
+    @param bytes: The encoded fragment. The fragment must have been encoded
+        with a fresh context.
+    @type bytes: C{str}
+    @param encoding: The encoding of C{bytes}. Defaults to
+        L{pyamf.DEFAULT_ENCODING}.
+    @param value: The original Python value, if known.
+    @rtype: L{Encoded}
+    @raise pyamf.DecodeError: C{bytes} is not a valid AMF element.
+    @raise pyamf.EncodeError: C{bytes} does not contain exactly one element.
+    """
+    if encoding is None:
+        encoding = pyamf.DEFAULT_ENCODING
+
+    context = _get_validation_context(encoding)
+    stream = util.BufferedByteStream(bytes)
+
+    decoder = pyamf._get_amf_module(encoding, use_ext=False).Decoder(
+        stream,
+        context=context,
+        instrument=False
+    )
+
+    decoder.readElement()
+
+    if not stream.at_eof():
+        raise pyamf.EncodeError(
+            'Encoded fragment must contain exactly one element')
+
+    offsets = tuple([
+        (0 if i in context.used else None) for i in xrange(3)
+    ])
+
+    return Encoded(
+        bytes,
+        encoding,
+        value=value,
+        references=context.getReferenceCounts(),
+        offsets=offsets
+    )
+
+
+def encode(value, encoding=None, keep_value=True, **kwargs):
+    """
+    Encodes C{value} and returns the fragment.
+
+    @param encoding: The AMF encoding to use. Defaults to
+        L{pyamf.DEFAULT_ENCODING}.
+    @param keep_value: Whether the returned fragment should hold on to
+        C{value} so that it can be re-encoded when the fragment contains
+        references and is written at a different position of a stream.
+    @param kwargs: Passed to the encoder, e.g. C{timezone_offset}.
+    @rtype: L{Encoded}
+    """
+    if encoding is None:
+        encoding = pyamf.DEFAULT_ENCODING
+
+    kwargs.setdefault('instrument', False)
+
+    encoder = pyamf.get_encoder(encoding, **kwargs)
+    encoder.writeElement(value)
+
+    return validate(
+        encoder.stream.getvalue(),
+        encoding,
+        value=value if keep_value else None
+    )
+
+
+class EncodedCache(object):
+    """
+    Caches L{Encoded} fragments of values that are encoded repeatedly.
+
+    Fragments are keyed on the identity of the value (or an explicit C{key})
+    and the encoding and are encoded again when the supplied C{version}
+    changes. The cache holds a reference to each value until it is removed.
+    """
+
+    def __init__(self, **kwargs):
+        """
+        @param kwargs: Passed to the encoder, e.g. C{timezone_offset}.
+        """
+        self.kwargs = kwargs
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, value, encoding=None, version=None, key=None):
+        """
+        Returns the L{Encoded} fragment for C{value}.
+
+        @param version: If this differs from the version of the cached
+            fragment, C{value} is encoded again.
+        @param key: Used instead of the identity of C{value} to key the
+            cache. The identity of C{value} is not checked in this case.
+        """
+        if encoding is None:
+            encoding = pyamf.DEFAULT_ENCODING
+
+        check_identity = key is None
+
+        if check_identity:
+            key = id(value)
+
+        entry = self._entries.get((key, encoding), None)
+
+        if entry is not None:
+            cached_value, cached_version, fragment = entry
+
+            if cached_version == version and (
+                    not check_identity or cached_value is value):
+                return fragment
+
+        fragment = encode(value, encoding, **self.kwargs)
+
+        self._entries[(key, encoding)] = (value, version, fragment)
+
+        return fragment
+
+    def remove(self, value=None, key=None):
+        """
+        Removes all fragments for C{value} (or C{key}) from the cache.
+        """
+        if key is None:
+            key = id(value)
+
+        for encoding in pyamf.ENCODING_TYPES:
+            self._entries.pop((key, encoding), None)
+
+    def clear(self):
+        """
+        Removes all fragments from the cache.
+        """
+        self._entries.clear()
@@ -31,6 +31,12 @@ NAMESPACE = 'flex.messaging.messages'
 
 SMALL_FLAG_MORE = 0x80
 
+#: The small attributes that are encoded as milliseconds since the epoch.
+SMALL_DATE_ATTRIBUTES = frozenset(['timestamp', 'timeToLive'])
+#: The small attributes that may be encoded as a C{ByteArray} of a
+#: C{uuid.UUID}.
+SMALL_UUID_ATTRIBUTES = frozenset(['clientId', 'messageId'])
+
 
 class AbstractMessage(object):
     """
@@ -102,6 +108,14 @@ class AbstractMessage(object):
         ['clientId', 'messageId']
     ))
 
+    #: The C{(flag, attr)} pairs of the small attributes and uuids, in the
+    #: order they are read and written. Worked out once rather than for every
+    #: message.
+    #:
+    #: @since: 0.9
+    SMALL_ATTRIBUTE_TABLE = tuple(zip(SMALL_ATTRIBUTE_FLAGS, __amf__.static))
+    SMALL_UUID_TABLE = tuple(zip(SMALL_UUID_FLAGS, ['clientId', 'messageId']))
+
     def __new__(cls, *args, **kwargs):
         obj = object.__new__(cls)
 
@@ -132,7 +146,7 @@ class AbstractMessage(object):
         """
         obj = input.readObject()
 
-        if attr in ['timestamp', 'timeToLive']:
+        if attr in SMALL_DATE_ATTRIBUTES:
             return pyamf.util.get_datetime(obj / 1000.0)
 
         return obj
@@ -146,9 +160,9 @@ class AbstractMessage(object):
         if not obj:
             return obj
 
-        if attr in ['timestamp', 'timeToLive']:
+        if attr in SMALL_DATE_ATTRIBUTES:
             return pyamf.util.get_timestamp(obj) * 1000.0
-        elif attr in ['clientId', 'messageId']:
+        elif attr in SMALL_UUID_ATTRIBUTES:
             if isinstance(obj, uuid.UUID):
                 return None
 
@@ -165,39 +179,37 @@ class AbstractMessage(object):
                 )
             )
 
-        for index, byte in enumerate(flags):
-            if index == 0:
-                for flag in self.SMALL_ATTRIBUTE_FLAGS:
-                    if flag & byte:
-                        attr = self.SMALL_ATTRIBUTES[flag]
-                        setattr(
-                            self,
-                            attr,
-                            self.decodeSmallAttribute(attr, input)
-                        )
-            elif index == 1:
-                for flag in self.SMALL_UUID_FLAGS:
-                    if flag & byte:
-                        attr = self.SMALL_UUIDS[flag]
-                        setattr(self, attr, decode_uuid(input.readObject()))
+        byte = flags[0]
+
+        if byte:
+            decode = self.decodeSmallAttribute
+
+            for flag, attr in self.SMALL_ATTRIBUTE_TABLE:
+                if flag & byte:
+                    setattr(self, attr, decode(attr, input))
+
+        if len(flags) == 2:
+            byte = flags[1]
+
+            for flag, attr in self.SMALL_UUID_TABLE:
+                if flag & byte:
+                    setattr(self, attr, decode_uuid(input.readObject()))
 
     def __writeamf__(self, output):
+        encode = self.encodeSmallAttribute
         flag_attrs = []
         uuid_attrs = []
+        flags = 0
         byte = 0
 
-        for flag in self.SMALL_ATTRIBUTE_FLAGS:
-            value = self.encodeSmallAttribute(self.SMALL_ATTRIBUTES[flag])
+        for flag, attr in self.SMALL_ATTRIBUTE_TABLE:
+            value = encode(attr)
 
             if value:
-                byte |= flag
+                flags |= flag
                 flag_attrs.append(value)
 
-        flags = byte
-        byte = 0
-
-        for flag in self.SMALL_UUID_FLAGS:
-            attr = self.SMALL_UUIDS[flag]
+        for flag, attr in self.SMALL_UUID_TABLE:
             value = getattr(self, attr)
 
             if not value:
@@ -206,16 +218,17 @@ class AbstractMessage(object):
             byte |= flag
             uuid_attrs.append(amf3.ByteArray(value.bytes))
 
-        del attr
-
         if not byte:
             output.writeUnsignedByte(flags)
         else:
             output.writeUnsignedByte(flags | SMALL_FLAG_MORE)
             output.writeUnsignedByte(byte)
 
-        [output.writeObject(attr) for attr in flag_attrs]
-        [output.writeObject(attr) for attr in uuid_attrs]
+        for value in flag_attrs:
+            output.writeObject(value)
+
+        for value in uuid_attrs:
+            output.writeObject(value)
 
     def getSmallMessage(self):
         """
@@ -0,0 +1,484 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Optional instrumentation of the AMF encoders and decoders.
+
+An L{Instrument} collects, per direction (encode/decode):
+
+ - the number of elements written/read per AMF type;
+ - the number of elements and bytes written/read per class alias (the size
+   of an object includes the size of any nested elements);
+ - the hit rate of the object, string and class definition reference tables.
+
+This is useful to find the classes that bloat payloads and the types that
+miss the fast paths of the codecs.
+
+An instrument can be supplied to a codec directly (via the C{instrument}
+keyword argument) or installed globally using L{install}, in which case only
+a sample of the codecs (see L{Instrument.sample_rate}) are instrumented. When
+no instrument is active, the codecs are left untouched and there is no
+overhead.
+
+Example::
+
+    from pyamf import instrumentation
+
+    instrument = instrumentation.Instrument(sample_rate=0.01)
+    instrumentation.install(instrument)
+
+    # ... later ...
+
+    encoded, decoded = instrument.snapshot()
+    print encoded.alias_bytes
+
+@since: 0.9
+"""
+
+import random
+import threading
+
+import pyamf
+
+
+__all__ = [
+    'Instrument',
+    'Statistics',
+    'install',
+    'uninstall',
+    'get_installed',
+]
+
+#: The instrument used by codecs that were not supplied one explicitly.
+_installed = None
+
+#: Maps encoding -> AMF type marker -> type name.
+_type_names = {}
+
+#: Maps codec class -> encoding.
+_codec_encodings = {}
+
+#: The AMF type markers that denote (typed or anonymous) objects.
+_object_markers = {
+    pyamf.AMF0: ('\x03', '\x10'),
+    pyamf.AMF3: ('\x0a',),
+}
+
+#: The context methods that are watched to calculate reference table hit
+#: rates. Maps method name -> (table, hit) where hit is C{True}, C{False} or
+#: a callable that returns whether the result of the method was a hit.
+_encode_hooks = {
+    'getObjectReference': ('object', lambda ref: ref != -1),
+    'getStringReference': ('string', lambda ref: ref != -1),
+    'getClass': ('class', lambda ref: ref is not None),
+}
+
+_decode_hooks = {
+    'getObject': ('object', True),
+    'addObject': ('object', False),
+    'getString': ('string', True),
+    'addString': ('string', lambda ref: False if ref >= 0 else None),
+    'getClassByReference': ('class', True),
+    'addClass': ('class', False),
+}
+
+
+class Statistics(object):
+    """
+    The data collected by an L{Instrument} for one direction.
+
+    @ivar types: The number of elements per C{(encoding, type name)}.
+    @ivar aliases: The number of objects per class alias. Objects without an
+        alias are reported under the fully qualified name of their class.
+    @ivar alias_bytes: The number of bytes per class alias.
+    @ivar references: Maps the name of a reference table (C{object},
+        C{string} or C{class}) to a C{[hits, misses]} list.
+    """
+
+    def __init__(self):
+        self.types = {}
+        self.aliases = {}
+        self.alias_bytes = {}
+        self.references = {}
+
+    def getHitRate(self, table):
+        """
+        Returns the proportion of lookups in the reference C{table} that
+        found an existing entry or C{None} if there were no lookups.
+
+        @rtype: C{float} or C{None}
+        """
+        hits, misses = self.references.get(table, (0, 0))
+
+        if not hits + misses:
+            return None
+
+        return float(hits) / (hits + misses)
+
+    def copy(self):
+        s = Statistics()
+
+        s.types = dict(self.types)
+        s.aliases = dict(self.aliases)
+        s.alias_bytes = dict(self.alias_bytes)
+        s.references = dict([
+            (k, list(v)) for k, v in self.references.iteritems()
+        ])
+
+        return s
+
+
+class Instrument(object):
+    """
+    Collects statistics from the codecs it is attached to. Thread safe.
+
+    @ivar sample_rate: The proportion of codecs (between C{0} and C{1}) that
+        are instrumented when this instrument is L{installed<install>}. A
+        codec is either instrumented for its whole lifetime or not at all, so
+        for remoting this samples whole messages.
+    @type sample_rate: C{float}
+    """
+
+    def __init__(self, sample_rate=1.0):
+        self.sample_rate = sample_rate
+
+        self._lock = threading.Lock()
+
+        self.reset()
+
+    def reset(self):
+        """
+        Discards all of the collected data.
+        """
+        self._lock.acquire()
+
+        try:
+            self.encoded = Statistics()
+            self.decoded = Statistics()
+        finally:
+            self._lock.release()
+
+    def sample(self):
+        """
+        Decides whether a codec should be instrumented.
+
+        @rtype: C{bool}
+        """
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def snapshot(self):
+        """
+        Returns a consistent copy of the collected data.
+
+        @return: A tuple containing the encode and decode L{Statistics}.
+        """
+        self._lock.acquire()
+
+        try:
+            return self.encoded.copy(), self.decoded.copy()
+        finally:
+            self._lock.release()
+
+    def _record(self, stats, codec, marker, size, obj):
+        encoding = get_encoding(codec)
+        name = get_type_name(encoding, marker)
+        alias = None
+
+        if marker in _object_markers.get(encoding, ()):
+            alias = get_alias_name(codec.context, obj)
+
+        self._lock.acquire()
+
+        try:
+            key = (encoding, name)
+            stats.types[key] = stats.types.get(key, 0) + 1
+
+            if alias is not None:
+                stats.aliases[alias] = stats.aliases.get(alias, 0) + 1
+                stats.alias_bytes[alias] = (
+                    stats.alias_bytes.get(alias, 0) + size
+                )
+        finally:
+            self._lock.release()
+
+    def recordWrite(self, encoder, marker, size, data):
+        """
+        Called by an encoder after it has written an element.
+
+        @param marker: The AMF type marker of the element.
+        @type marker: C{str}
+        @param size: The number of bytes that were written.
+        @param data: The element.
+        """
+        self._record(self.encoded, encoder, marker, size, data)
+
+    def recordRead(self, decoder, marker, size, obj):
+        """
+        Called by a decoder after it has read an element.
+
+        @param marker: The AMF type marker of the element.
+        @type marker: C{str}
+        @param size: The number of bytes that were read.
+        @param obj: The decoded element.
+        """
+        self._record(self.decoded, decoder, marker, size, obj)
+
+    def recordReference(self, direction, table, hit):
+        """
+        Called when a reference table is consulted.
+
+        @param direction: C{encode} or C{decode}.
+        @param table: C{object}, C{string} or C{class}.
+        @param hit: Whether an existing entry was found.
+        """
+        if direction == 'encode':
+            stats = self.encoded
+        else:
+            stats = self.decoded
+
+        self._lock.acquire()
+
+        try:
+            counts = stats.references.get(table, None)
+
+            if counts is None:
+                counts = stats.references[table] = [0, 0]
+
+            if hit:
+                counts[0] += 1
+            else:
+                counts[1] += 1
+        finally:
+            self._lock.release()
+
+
+def install(instrument):
+    """
+    Installs C{instrument} for all codecs that are not explicitly supplied
+    one.
+
+    @type instrument: L{Instrument}
+    """
+    global _installed
+
+    _installed = instrument
+
+
+def uninstall():
+    """
+    Removes the installed instrument.
+    """
+    global _installed
+
+    _installed = None
+
+
+def get_installed():
+    """
+    Returns the installed instrument or C{None}.
+    """
+    return _installed
+
+
+def resolve(instrument=None):
+    """
+    Returns the instrument that a new codec should use or C{None}.
+
+    @param instrument: The value of the C{instrument} keyword argument
+        supplied to the codec. C{None} uses the installed instrument, subject
+        to sampling. C{False} disables instrumentation.
+    """
+    if instrument is False:
+        return None
+
+    if instrument is None:
+        instrument = _installed
+
+        if instrument is None or not instrument.sample():
+            return None
+
+    return instrument
+
+
+def get_encoding(codec):
+    """
+    Returns the AMF encoding of C{codec}, based on the module that defines
+    its class (C{amf0} or C{amf3}, pure Python or extension).
+    """
+    klass = type(codec)
+
+    try:
+        return _codec_encodings[klass]
+    except KeyError:
+        pass
+
+    encoding = None
+
+    for base in getattr(klass, '__mro__', (klass,)):
+        module = base.__module__.rsplit('.', 1)[-1]
+
+        if module == 'amf0':
+            encoding = pyamf.AMF0
+        elif module == 'amf3':
+            encoding = pyamf.AMF3
+        else:
+            continue
+
+        break
+
+    _codec_encodings[klass] = encoding
+
+    return encoding
+
+
+def get_type_name(encoding, marker):
+    """
+    Returns the name of the AMF type C{marker}, e.g. C{object}.
+    """
+    try:
+        names = _type_names[encoding]
+    except KeyError:
+        names = {}
+
+        if encoding in pyamf.ENCODING_TYPES:
+            module = pyamf._get_amf_module(encoding, use_ext=False)
+
+            for name in dir(module):
+                if name.startswith('TYPE_'):
+                    names[getattr(module, name)] = name[5:].lower()
+
+        _type_names[encoding] = names
+
+    return names.get(marker, repr(marker))
+
+
+def get_alias_name(context, obj):
+    """
+    Returns the alias of the class of C{obj} or its fully qualified name if
+    the class has no alias.
+    """
+    klass = getattr(obj, '__class__', type(obj))
+
+    try:
+        alias = context.getClassAlias(klass)
+    except (pyamf.UnknownClassAlias, TypeError):
+        alias = None
+
+    if alias is not None and alias.alias:
+        return alias.alias
+
+    return '%s.%s' % (klass.__module__, klass.__name__)
+
+
+def _wrap_context(context, instrument, direction, hooks):
+    def wrap(func, table, hit):
+        def wrapper(*args):
+            ret = func(*args)
+
+            if hit is True or hit is False:
+                h = hit
+            else:
+                h = hit(ret)
+
+            if h is not None:
+                instrument.recordReference(direction, table, h)
+
+            return ret
+
+        return wrapper
+
+    for name, (table, hit) in hooks.iteritems():
+        func = getattr(context, name, None)
+
+        if func is not None:
+            setattr(context, name, wrap(func, table, hit))
+
+
+def _get_marker(stream, start, end):
+    stream.seek(start)
+    marker = stream.read(1)
+    stream.seek(end)
+
+    return marker
+
+
+def _attach_encoder(encoder, instrument):
+    write = encoder.writeElement
+
+    def writeElement(data):
+        stream = encoder.stream
+        start = stream.tell()
+
+        write(data)
+
+        end = stream.tell()
+
+        if end > start:
+            instrument.recordWrite(
+                encoder,
+                _get_marker(stream, start, end),
+                end - start,
+                data
+            )
+
+    encoder.writeElement = writeElement
+
+
+def _attach_decoder(decoder, instrument):
+    read = decoder.readElement
+
+    def readElement():
+        stream = decoder.stream
+        start = stream.tell()
+
+        obj = read()
+
+        end = stream.tell()
+
+        instrument.recordRead(
+            decoder,
+            _get_marker(stream, start, end),
+            end - start,
+            obj
+        )
+
+        return obj
+
+    decoder.readElement = readElement
+
+
+def attach(codec, instrument):
+    """
+    Instruments C{codec}. Called by the codecs when they are created.
+
+    The pure Python codecs (and their contexts) have their methods wrapped,
+    the extension codecs check their C{instrument} attribute and report to it
+    directly.
+    """
+    decoding = hasattr(codec, 'readElement')
+    direction = 'decode' if decoding else 'encode'
+    context = codec.context
+
+    if hasattr(context, 'setReferenceHook'):
+        # cpyamf
+        def hook(table, hit):
+            instrument.recordReference(direction, table, hit)
+
+        context.setReferenceHook(hook, decoding)
+
+        return
+
+    if getattr(context, '_pyamf_instrument', None) is not instrument:
+        context._pyamf_instrument = instrument
+
+        _wrap_context(
+            context,
+            instrument,
+            direction,
+            _decode_hooks if decoding else _encode_hooks
+        )
+
+    if decoding:
+        _attach_decoder(codec, instrument)
+    else:
+        _attach_encoder(codec, instrument)
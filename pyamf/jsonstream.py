@@ -0,0 +1,791 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Streaming AMF to JSON transcoding.
+
+Walks an AMF0 or AMF3 byte stream and writes the equivalent JSON straight to
+a writer (any object with a C{write} method). No C{ASObject}s, class instances
+or C{datetime}s are built along the way, as they are when decoding with
+L{pyamf.decode} and then calling C{json.dumps}.
+
+Values are written as:
+
+ - C{null}, C{undefined} and unsupported values as C{null}.
+ - Numbers as they would be by C{json.dumps} after decoding. AMF0 numbers
+   with an integral value become integers and C{NaN} and C{Infinity} are
+   written as the C{json} module writes them.
+ - Dates as ISO 8601 strings.
+ - C{ByteArray}s as the C{base64} encoding of the bytes in the stream.
+ - XML as a string.
+ - Arrays as lists. Arrays with string keys become objects, and their dense
+   portion is keyed by index.
+ - Objects as objects. The alias of a typed object is written as the
+   L{ALIAS_KEY} attribute. C{ArrayCollection}s and C{ObjectProxy}s are
+   written as their contents.
+ - A reference to an object or array that has already been written becomes
+   C{{L{REF_KEY}: index}}. C{index} is the position in the stream's reference
+   table, which holds every object, array, date, C{ByteArray} and XML
+   document in the order they first appear. Referenced dates, C{ByteArray}s
+   and XML are written in full again.
+
+Attributes are written as they appear in the stream. Class aliases are not
+applied, because the data is never turned into class instances. The
+exception is externalised objects (other than C{ArrayCollection} and
+C{ObjectProxy}). Their format is only known to their class, so each one is
+decoded by the pure Python AMF3 decoder and its encodable attributes are
+written. The class must be registered.
+
+The C{cpyamf.jsonstream} extension provides faster transcoders with the same
+output. L{get_transcoder} and L{transcode} use it when it is available.
+
+@since: 0.9
+"""
+
+import uuid
+import base64
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import pyamf
+from pyamf import util, amf0, amf3, xml, python
+
+
+__all__ = [
+    'ALIAS_KEY',
+    'REF_KEY',
+    'AMF0Transcoder',
+    'AMF3Transcoder',
+    'get_transcoder',
+    'transcode',
+    'dumps',
+]
+
+#: The attribute that holds the alias of a typed object.
+ALIAS_KEY = '__alias__'
+
+#: The attribute of the object written in place of a reference.
+REF_KEY = '__ref__'
+
+#: The aliases of the externalised classes whose content is a single value
+#: that is written in their place.
+PROXY_ALIASES = (
+    'flex.messaging.io.ArrayCollection',
+    'flex.messaging.io.ObjectProxy',
+)
+
+#: The number of buffered chunks that causes the buffer to be written out
+#: before the current value has finished.
+FLUSH_CHUNKS = 4096
+
+escape = json.encoder.encode_basestring_ascii
+
+
+def format_number(x):
+    """
+    Returns the JSON representation of the C{float} or C{int} C{x}.
+    """
+    if isinstance(x, float):
+        if x != x:
+            return 'NaN'
+        elif x == python.PosInf:
+            return 'Infinity'
+        elif x == python.NegInf:
+            return '-Infinity'
+
+        return repr(x)
+
+    return str(x)
+
+
+def format_date(ms, timezone_offset=None):
+    """
+    Returns the JSON representation of a date C{ms} milliseconds after the
+    epoch.
+    """
+    d = util.get_datetime(ms / 1000.0)
+
+    if timezone_offset is not None:
+        d += timezone_offset
+
+    return '"%s"' % (d.isoformat(),)
+
+
+def format_bytes(data):
+    """
+    Returns the JSON representation of a C{ByteArray} holding C{data}.
+    """
+    return '"%s"' % (base64.b64encode(data),)
+
+
+def format_ref(idx):
+    """
+    Returns the JSON written for a reference to the object at C{idx}.
+    """
+    return '{%s:%d}' % (escape(REF_KEY), idx)
+
+
+def get_object(objects, idx):
+    """
+    Returns the JSON written for the entry C{idx} of the reference table
+    C{objects}.
+
+    @raise pyamf.ReferenceError: Unknown reference.
+    """
+    try:
+        text = objects[idx]
+    except IndexError:
+        raise pyamf.ReferenceError('Unknown reference %d' % (idx,))
+
+    if text is None:
+        return format_ref(idx)
+
+    return text
+
+
+class _Encoder(json.JSONEncoder):
+    """
+    Writes the objects decoded from externalised objects.
+    """
+
+    def __init__(self, context):
+        json.JSONEncoder.__init__(self, separators=(',', ':'))
+
+        self.context = context
+
+    def default(self, obj):
+        if obj is pyamf.Undefined:
+            return None
+
+        if hasattr(obj, 'isoformat'):
+            return obj.isoformat()
+
+        if isinstance(obj, amf3.ByteArray):
+            return base64.b64encode(obj.getvalue())
+
+        if isinstance(obj, uuid.UUID):
+            return str(obj)
+
+        if xml.is_xml(obj):
+            return xml.tostring(obj)
+
+        if hasattr(obj, '__iter__') and not hasattr(obj, '__dict__'):
+            return list(obj)
+
+        alias = self.context.getClassAlias(type(obj))
+        attrs = alias.getEncodableAttributes(obj)
+
+        if alias.alias:
+            attrs[ALIAS_KEY] = alias.alias
+
+        return attrs
+
+
+def read_external(transcoder, name):
+    """
+    Decodes an externalised object of class C{name} from the stream of the
+    AMF3 C{transcoder} with the pure Python decoder. Returns the JSON for the
+    object.
+
+    The decoder is kept as C{transcoder.external} and its reference tables
+    are brought up to date with those of the transcoder before and after
+    decoding. Objects first seen inside an externalised object are written in
+    full when they are referenced again.
+    """
+    decoder = transcoder.external
+
+    if decoder is None:
+        decoder = transcoder.external = amf3.Decoder(
+            transcoder.stream,
+            strict=transcoder.strict,
+            timezone_offset=transcoder.timezone_offset
+        )
+
+    context = decoder.context
+    objects = transcoder.objects
+    strings = transcoder.strings
+    classes = transcoder.classes
+    object_count, string_count, class_count = context.getReferenceCounts()
+
+    # objects and arrays that have already been written are read as refs
+    for i in xrange(object_count, len(objects)):
+        text = objects[i]
+
+        if text is None:
+            context.addObject(pyamf.ASObject({REF_KEY: i}))
+        else:
+            context.addObject(json.loads(text))
+
+    for i in xrange(string_count, len(strings)):
+        context.addString(strings[i])
+
+    for i in xrange(class_count, len(classes)):
+        class_name, encoding, static = classes[i]
+
+        class_def = amf3.ClassDefinition(_get_alias(class_name, False))
+        class_def.encoding = encoding
+        class_def.attr_len = len(static)
+        class_def.static_properties = list(static)
+
+        context.addClass(class_def, class_def.alias.klass)
+
+    obj = _get_alias(name, True).createInstance(codec=decoder)
+
+    context.addObject(obj)
+    objects.append(None)
+
+    obj.__readamf__(decoder._getDataInput())
+
+    encoder = _Encoder(context)
+    object_count, string_count, class_count = context.getReferenceCounts()
+
+    for i in xrange(len(objects), object_count):
+        objects.append(encoder.encode(context.getObject(i)))
+
+    for i in xrange(len(strings), string_count):
+        strings.append(context.getString(i))
+
+    for i in xrange(len(classes), class_count):
+        class_def = context.getClassByReference(i)
+
+        classes.append((
+            class_def.alias.alias or '',
+            class_def.encoding,
+            list(class_def.static_properties)
+        ))
+
+    return encoder.encode(obj)
+
+
+def _get_alias(name, required):
+    if name == '':
+        return pyamf.get_class_alias(pyamf.ASObject)
+
+    try:
+        return pyamf.get_class_alias(name)
+    except pyamf.UnknownClassAlias:
+        if required:
+            raise
+
+        return pyamf.TypedObjectClassAlias(name)
+
+
+class Transcoder(object):
+    """
+    Base class for the AMF to JSON transcoders.
+
+    @ivar stream: The stream that AMF is read from.
+    @type stream: L{BufferedByteStream<pyamf.util.BufferedByteStream>}
+    @ivar writer: Has the JSON written to its C{write} method.
+    @ivar objects: The reference table. Holds the JSON to write for a
+        reference, or C{None} if the reference is written as a L{REF_KEY}
+        object.
+    @type objects: C{list}
+    """
+
+    def __init__(self, stream, writer, strict=False, timezone_offset=None):
+        if not isinstance(stream, util.BufferedByteStream):
+            stream = util.BufferedByteStream(stream)
+
+        self.stream = stream
+        self.writer = writer
+        self.strict = strict
+        self.timezone_offset = timezone_offset
+
+        self.buffer = []
+        self.objects = []
+
+    def clear(self):
+        """
+        Clears the reference tables.
+        """
+        self.objects = []
+
+    def flush(self):
+        """
+        Writes the buffered JSON to the writer.
+        """
+        if self.buffer:
+            self.writer.write(''.join(self.buffer))
+
+            del self.buffer[:]
+
+    def writeElement(self):
+        """
+        Reads a value from the stream and writes it as JSON.
+
+        @raise EOFError: The end of the stream has been reached.
+        """
+        if self.stream.at_eof():
+            raise EOFError
+
+        self._writeElement()
+        self.flush()
+
+    def _writeElement(self):
+        if len(self.buffer) >= FLUSH_CHUNKS:
+            self.flush()
+
+        t = self.stream.read(1)
+
+        try:
+            func = self.type_map[t]
+        except KeyError:
+            raise pyamf.DecodeError('Unsupported ActionScript type %r' % (t,))
+
+        func(self)
+
+
+class AMF3Transcoder(Transcoder):
+    """
+    Transcodes AMF3 to JSON.
+
+    @ivar strings: The string reference table.
+    @type strings: C{list}
+    @ivar classes: The class reference table of C{(alias, encoding,
+        static_attrs)}.
+    @type classes: C{list}
+    @ivar external: The decoder of externalised objects, see
+        L{read_external}.
+    """
+
+    def __init__(self, *args, **kwargs):
+        Transcoder.__init__(self, *args, **kwargs)
+
+        self.strings = []
+        self.classes = []
+        self.external = None
+
+    def clear(self):
+        Transcoder.clear(self)
+
+        self.strings = []
+        self.classes = []
+        self.external = None
+
+    def _readBytes(self):
+        ref = amf3.decode_int(self.stream)
+
+        if ref & amf3.REFERENCE_BIT == 0:
+            try:
+                return self.strings[ref >> 1]
+            except IndexError:
+                raise pyamf.ReferenceError('Unknown reference %d' % (
+                    ref >> 1,
+                ))
+
+        if ref == amf3.REFERENCE_BIT:
+            return ''
+
+        result = self.stream.read(ref >> 1)
+        self.strings.append(result)
+
+        return result
+
+    def _readReference(self):
+        """
+        Returns the length of the inline value that follows, or writes the
+        referenced value and returns C{None}.
+        """
+        ref = amf3.decode_int(self.stream)
+
+        if ref & amf3.REFERENCE_BIT == 0:
+            self.buffer.append(get_object(self.objects, ref >> 1))
+
+            return None
+
+        return ref >> 1
+
+    def writeNull(self):
+        self.buffer.append('null')
+
+    def writeFalse(self):
+        self.buffer.append('false')
+
+    def writeTrue(self):
+        self.buffer.append('true')
+
+    def writeInteger(self):
+        self.buffer.append(str(amf3.decode_int(self.stream, True)))
+
+    def writeNumber(self):
+        self.buffer.append(format_number(self.stream.read_double()))
+
+    def writeString(self):
+        self.buffer.append(escape(self._readBytes()))
+
+    def writeDate(self):
+        if self._readReference() is None:
+            return
+
+        text = format_date(self.stream.read_double(), self.timezone_offset)
+
+        self.objects.append(text)
+        self.buffer.append(text)
+
+    def writeXML(self):
+        length = self._readReference()
+
+        if length is None:
+            return
+
+        text = escape(self.stream.read(length))
+
+        self.objects.append(text)
+        self.buffer.append(text)
+
+    def writeByteArray(self):
+        length = self._readReference()
+
+        if length is None:
+            return
+
+        text = format_bytes(self.stream.read(length))
+
+        self.objects.append(text)
+        self.buffer.append(text)
+
+    def writeArray(self):
+        size = self._readReference()
+
+        if size is None:
+            return
+
+        self.objects.append(None)
+
+        out = self.buffer.append
+        key = self._readBytes()
+
+        if key == '':
+            out('[')
+
+            for i in xrange(size):
+                if i:
+                    out(',')
+
+                self._writeElement()
+
+            out(']')
+
+            return
+
+        out('{')
+
+        while key:
+            out(escape(key))
+            out(':')
+            self._writeElement()
+
+            key = self._readBytes()
+
+            if key:
+                out(',')
+
+        for i in xrange(size):
+            out(',"%d":' % (i,))
+            self._writeElement()
+
+        out('}')
+
+    def _readClassDefinition(self, ref):
+        if ref & amf3.REFERENCE_BIT == 0:
+            try:
+                return self.classes[ref >> 1]
+            except IndexError:
+                raise pyamf.ReferenceError('Unknown class reference %d' % (
+                    ref >> 1,
+                ))
+
+        ref >>= 1
+        name = self._readBytes()
+        static = [self._readBytes() for i in xrange(ref >> 2)]
+        class_def = (name, ref & 0x03, static)
+
+        self.classes.append(class_def)
+
+        return class_def
+
+    def writeObject(self):
+        ref = self._readReference()
+
+        if ref is None:
+            return
+
+        name, encoding, static = self._readClassDefinition(ref)
+
+        if encoding & amf3.ObjectEncoding.EXTERNAL:
+            if name in PROXY_ALIASES:
+                self.objects.append(None)
+                self._writeElement()
+            else:
+                self.buffer.append(read_external(self, name))
+
+            return
+
+        self.objects.append(None)
+
+        out = self.buffer.append
+        sep = '{'
+
+        if name:
+            out('{%s:%s' % (escape(ALIAS_KEY), escape(name)))
+            sep = ','
+
+        for key in static:
+            out(sep)
+            out(escape(key))
+            out(':')
+            self._writeElement()
+
+            sep = ','
+
+        if encoding == amf3.ObjectEncoding.DYNAMIC:
+            key = self._readBytes()
+
+            while key:
+                out(sep)
+                out(escape(key))
+                out(':')
+                self._writeElement()
+
+                sep = ','
+                key = self._readBytes()
+
+        if sep == '{':
+            out('{')
+
+        out('}')
+
+    type_map = {
+        amf3.TYPE_UNDEFINED: writeNull,
+        amf3.TYPE_NULL: writeNull,
+        amf3.TYPE_BOOL_FALSE: writeFalse,
+        amf3.TYPE_BOOL_TRUE: writeTrue,
+        amf3.TYPE_INTEGER: writeInteger,
+        amf3.TYPE_NUMBER: writeNumber,
+        amf3.TYPE_STRING: writeString,
+        amf3.TYPE_XML: writeXML,
+        amf3.TYPE_DATE: writeDate,
+        amf3.TYPE_ARRAY: writeArray,
+        amf3.TYPE_OBJECT: writeObject,
+        amf3.TYPE_XMLSTRING: writeXML,
+        amf3.TYPE_BYTEARRAY: writeByteArray,
+    }
+
+
+class AMF0Transcoder(Transcoder):
+    """
+    Transcodes AMF0 to JSON.
+    """
+
+    def __init__(self, *args, **kwargs):
+        Transcoder.__init__(self, *args, **kwargs)
+
+        self.amf3 = None
+
+    def clear(self):
+        Transcoder.clear(self)
+
+        if self.amf3 is not None:
+            self.amf3.clear()
+
+    def _readBytes(self):
+        return self.stream.read(self.stream.read_ushort())
+
+    def writeNumber(self):
+        self.buffer.append(format_number(
+            amf0._check_for_int(self.stream.read_double())
+        ))
+
+    def writeBoolean(self):
+        if self.stream.read_uchar():
+            self.buffer.append('true')
+        else:
+            self.buffer.append('false')
+
+    def writeString(self):
+        self.buffer.append(escape(self._readBytes()))
+
+    def writeLongString(self):
+        self.buffer.append(escape(self.stream.read(self.stream.read_ulong())))
+
+    def writeNull(self):
+        self.buffer.append('null')
+
+    def writeReference(self):
+        self.buffer.append(get_object(
+            self.objects,
+            self.stream.read_ushort()
+        ))
+
+    def _writeAttributes(self, sep='{'):
+        out = self.buffer.append
+        key = self._readBytes()
+
+        while self.stream.peek() != amf0.TYPE_OBJECTTERM:
+            out(sep)
+            out(escape(key))
+            out(':')
+            self._writeElement()
+
+            sep = ','
+            key = self._readBytes()
+
+        # discard the end marker
+        self.stream.read(1)
+
+        if sep == '{':
+            out('{')
+
+        out('}')
+
+    def writeObject(self):
+        self.objects.append(None)
+        self._writeAttributes()
+
+    def writeMixedArray(self):
+        # the length is not reliable
+        self.stream.read_ulong()
+
+        self.objects.append(None)
+        self._writeAttributes()
+
+    def writeTypedObject(self):
+        name = self._readBytes()
+
+        self.objects.append(None)
+        self.buffer.append('{%s:%s' % (escape(ALIAS_KEY), escape(name)))
+        self._writeAttributes(',')
+
+    def writeList(self):
+        out = self.buffer.append
+
+        self.objects.append(None)
+        out('[')
+
+        for i in xrange(self.stream.read_ulong()):
+            if i:
+                out(',')
+
+            self._writeElement()
+
+        out(']')
+
+    def writeDate(self):
+        text = format_date(self.stream.read_double(), self.timezone_offset)
+
+        # the timezone is ignored
+        self.stream.read_short()
+
+        self.objects.append(text)
+        self.buffer.append(text)
+
+    def writeXML(self):
+        text = escape(self.stream.read(self.stream.read_ulong()))
+
+        self.objects.append(text)
+        self.buffer.append(text)
+
+    def writeAMF3(self):
+        if self.amf3 is None:
+            self.amf3 = AMF3Transcoder(
+                self.stream,
+                self.writer,
+                strict=self.strict,
+                timezone_offset=self.timezone_offset
+            )
+
+        # the AMF3 transcoder has its own buffer
+        self.flush()
+        self.amf3.writeElement()
+
+    type_map = {
+        amf0.TYPE_NUMBER: writeNumber,
+        amf0.TYPE_BOOL: writeBoolean,
+        amf0.TYPE_STRING: writeString,
+        amf0.TYPE_OBJECT: writeObject,
+        amf0.TYPE_NULL: writeNull,
+        amf0.TYPE_UNDEFINED: writeNull,
+        amf0.TYPE_REFERENCE: writeReference,
+        amf0.TYPE_MIXEDARRAY: writeMixedArray,
+        amf0.TYPE_ARRAY: writeList,
+        amf0.TYPE_DATE: writeDate,
+        amf0.TYPE_LONGSTRING: writeLongString,
+        amf0.TYPE_UNSUPPORTED: writeNull,
+        amf0.TYPE_XML: writeXML,
+        amf0.TYPE_TYPEDOBJECT: writeTypedObject,
+        amf0.TYPE_AMF3: writeAMF3,
+    }
+
+
+def _get_module(use_ext):
+    if use_ext is False:
+        return None
+
+    try:
+        from cpyamf import jsonstream
+    except ImportError:
+        if use_ext:
+            raise
+
+        return None
+
+    return jsonstream
+
+
+def get_transcoder(encoding, stream, writer, **kwargs):
+    """
+    Returns a transcoder that writes the AMF[C{encoding}] values in C{stream}
+    as JSON to C{writer}.
+
+    @param use_ext: Whether to use the C{cpyamf} transcoders. If C{None} (the
+        default) they are used when available. If C{True} and they are not
+        available, C{ImportError} is raised.
+    @raise ValueError: Unknown C{encoding}.
+    """
+    module = _get_module(kwargs.pop('use_ext', None))
+
+    if encoding == pyamf.AMF0:
+        klass = module and module.AMF0Transcoder or AMF0Transcoder
+    elif encoding == pyamf.AMF3:
+        klass = module and module.AMF3Transcoder or AMF3Transcoder
+    else:
+        raise ValueError('Unknown encoding %r' % (encoding,))
+
+    return klass(stream, writer, **kwargs)
+
+
+def transcode(stream, writer, encoding=pyamf.AMF0, **kwargs):
+    """
+    Writes every value in C{stream} to C{writer} as a line of JSON.
+
+    @return: The number of values written.
+    @see: L{get_transcoder}
+    """
+    transcoder = get_transcoder(encoding, stream, writer, **kwargs)
+    stream = transcoder.stream
+    count = 0
+
+    while not stream.at_eof():
+        transcoder.writeElement()
+        writer.write('\n')
+
+        count += 1
+
+    return count
+
+
+def dumps(data, encoding=pyamf.AMF0, **kwargs):
+    """
+    Returns the JSON for the first value in C{data}.
+
+    @see: L{get_transcoder}
+    """
+    writer = util.BufferedByteStream()
+
+    get_transcoder(encoding, data, writer, **kwargs).writeElement()
+
+    return writer.getvalue()
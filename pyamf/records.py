@@ -0,0 +1,244 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Compact representations of anonymous objects.
+
+An L{ASObject<pyamf.ASObject>} is a C{dict} and carries its own key storage.
+Decoding large lists of objects that share the same keys (the rows of a
+result set, for example) spends most of the memory on those dicts. Decoders
+created with C{use_records=True} return L{Record}s instead. The keys are
+stored once per class and every record only holds a list of its values.
+
+Records support mapping and attribute access, so they can usually be used in
+place of an L{ASObject<pyamf.ASObject>}. They are encoded as anonymous
+objects.
+
+@since: 0.9
+"""
+
+import weakref
+
+import pyamf
+
+
+#: Maps a C{tuple} of keys to a weak reference to the L{Record} class for
+#: those keys. A class is dropped as soon as there are no more records with its
+#: keys.
+RECORD_CLASSES = {}
+
+
+def _drop_class(keys, ref):
+    if RECORD_CLASSES.get(keys) is ref:
+        del RECORD_CLASSES[keys]
+
+
+def get_record_class(keys):
+    """
+    Returns the L{Record} class that holds the values for C{keys}.
+
+    @type keys: C{tuple}
+    """
+    ref = RECORD_CLASSES.get(keys)
+
+    if ref is not None:
+        klass = ref()
+
+        if klass is not None:
+            return klass
+
+    klass = type('Record', (Record,), {
+        '__slots__': (),
+        '_keys': keys,
+        '_index': dict((key, i) for i, key in enumerate(keys)),
+    })
+
+    RECORD_CLASSES[keys] = weakref.ref(
+        klass,
+        lambda ref: _drop_class(keys, ref)
+    )
+
+    return klass
+
+
+def fill(record, attrs, _set=object.__setattr__):
+    """
+    Replaces the contents of C{record} with the C{dict} C{attrs}. The
+    decoders add empty records to the context before reading the attributes
+    so that they can reference themselves.
+    """
+    keys = tuple(attrs)
+    ref = RECORD_CLASSES.get(keys)
+    klass = ref and ref()
+
+    if klass is None:
+        klass = get_record_class(keys)
+
+    _set(record, '__class__', klass)
+    _set(record, '_values', attrs.values())
+
+
+class Record(object):
+    """
+    A mapping with a fixed layout that shares its keys with every other record
+    that has the same keys.
+
+    Adding or deleting a key moves the record to the class for its new keys.
+    """
+
+    __slots__ = ('_values',)
+
+    _keys = ()
+    _index = {}
+
+    def __init__(self, *args, **kwargs):
+        object.__setattr__(self, '_values', [])
+
+        if args or kwargs:
+            fill(self, dict(*args, **kwargs))
+
+    def _move(self, keys):
+        object.__setattr__(self, '__class__', get_record_class(keys))
+
+    def __getitem__(self, key):
+        return self._values[self._index[key]]
+
+    def __setitem__(self, key, value):
+        try:
+            self._values[self._index[key]] = value
+        except KeyError:
+            self._move(self._keys + (key,))
+            self._values.append(value)
+
+    def __delitem__(self, key):
+        i = self._index[key]
+
+        del self._values[i]
+        self._move(self._keys[:i] + self._keys[i + 1:])
+
+    def __getattr__(self, key):
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError('Unknown attribute \'%s\'' % (key,))
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+    def __delattr__(self, key):
+        try:
+            del self[key]
+        except KeyError:
+            raise AttributeError('Unknown attribute \'%s\'' % (key,))
+
+    def __contains__(self, key):
+        return key in self._index
+
+    has_key = __contains__
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    iterkeys = __iter__
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            other = dict(other.iteritems())
+        elif not isinstance(other, dict):
+            return NotImplemented
+
+        return dict(self.iteritems()) == other
+
+    def __ne__(self, other):
+        ret = self.__eq__(other)
+
+        if ret is NotImplemented:
+            return ret
+
+        return not ret
+
+    def __hash__(self):
+        return id(self)
+
+    def __repr__(self):
+        return repr(dict(self.iteritems()))
+
+    def __reduce__(self):
+        return Record, (dict(self.iteritems()),)
+
+    def keys(self):
+        return list(self._keys)
+
+    def values(self):
+        return list(self._values)
+
+    def itervalues(self):
+        return iter(self._values)
+
+    def items(self):
+        return zip(self._keys, self._values)
+
+    def iteritems(self):
+        return iter(zip(self._keys, self._values))
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def setdefault(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            self[key] = default
+
+            return default
+
+    def pop(self, key, *args):
+        try:
+            value = self[key]
+        except KeyError:
+            if args:
+                return args[0]
+
+            raise
+
+        del self[key]
+
+        return value
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).iteritems():
+            self[key] = value
+
+    def clear(self):
+        object.__setattr__(self, '_values', [])
+        self._move(())
+
+    def copy(self):
+        return Record(self.iteritems())
+
+
+class RecordClassAlias(pyamf.ClassAlias):
+    """
+    Encodes L{Record}s as anonymous objects.
+    """
+
+    def getCustomProperties(self):
+        # the values are held in a slot but records are dynamic
+        self.encodable_properties.clear()
+        self.decodable_properties.clear()
+        self.sealed = False
+        self.dynamic = True
+
+    def _finalise_compile(self):
+        pyamf.ClassAlias._finalise_compile(self)
+
+        self.is_dict = True
+
+
+pyamf.register_alias_type(RecordClassAlias, Record)
@@ -28,6 +28,7 @@ essential for the Adobe Flash Player to understand the response therefore.
 
 import pyamf
 from pyamf import util
+from pyamf.util import pure
 
 
 __all__ = ['Envelope', 'Request', 'Response', 'decode', 'encode']
@@ -602,29 +603,23 @@ def get_fault(data):
     return get_fault_class(level, **e)(**e)
 
 
-def decode(stream, strict=False, logger=None, timezone_offset=None,
-           **kwargs):
+def _read_preamble(stream, strict=False, timezone_offset=None, **kwargs):
     """
-    Decodes the incoming stream as a remoting message.
-
-    @type stream: L{BufferedByteStream<pyamf.util.BufferedByteStream>}
-    @param strict: Enforce strict decoding. Default is C{False}.
-    @type strict: C{boolean}
-    @param logger: Used to log interesting events whilst decoding a remoting
-        message.
-    @type logger: U{logging.Logger<http://
-        docs.python.org/library/logging.html#loggers>}
-    @param timezone_offset: The difference between the current timezone and
-        UTC. Date/times should always be handled in UTC to avoid confusion but
-        this is required for legacy systems.
-    @type timezone_offset: U{datetime.datetime.timedelta<http://
-        docs.python.org/library/datetime.html#datetime.timedelta>}
+    Reads the version, headers and body count of an envelope. Shared by
+    L{decode} and L{parallel.decode<pyamf.remoting.parallel.decode>}.
 
-    @return: Message L{envelope<Envelope>}.
-    @rtype: L{Envelope}
+    @return: A tuple containing the stream (which is wrapped if need be), the
+        AMF0 decoder, the L{Envelope} (holding the headers) and the number of
+        bodies that follow.
+    @since: 0.9
     """
     if not isinstance(stream, util.BufferedByteStream):
-        stream = util.BufferedByteStream(stream)
+        if isinstance(stream, pure.BufferedByteStream):
+            # e.g. a spooled request body. The extension codecs would copy it
+            # into memory so decode it in place with the pure Python codecs.
+            kwargs['use_ext'] = False
+        else:
+            stream = util.BufferedByteStream(stream)
 
     msg = Envelope()
     msg.amfVersion = stream.read_ushort()
@@ -645,7 +640,6 @@ def decode(stream, strict=False, logger=None, timezone_offset=None,
         timezone_offset=timezone_offset,
         **kwargs
     )
-    context = decoder.context
 
     decoder.use_amf3 = msg.amfVersion == pyamf.AMF3
     header_count = stream.read_ushort()
@@ -657,7 +651,97 @@ def decode(stream, strict=False, logger=None, timezone_offset=None,
         if required:
             msg.headers.set_required(name)
 
-    body_count = stream.read_short()
+    return stream, decoder, msg, stream.read_short()
+
+
+def _write_preamble(msg, strict=False, timezone_offset=None, stream=None,
+                    **kwargs):
+    """
+    Writes the version, headers and body count of C{msg}. Shared by
+    L{encode} and L{parallel.encode<pyamf.remoting.parallel.encode>}.
+
+    @return: A tuple containing the stream and the AMF0 encoder.
+    @since: 0.9
+    """
+    if stream is None:
+        stream = util.BufferedByteStream()
+    elif not isinstance(stream, util.BufferedByteStream):
+        kwargs['use_ext'] = False
+
+    encoder = pyamf.get_encoder(
+        pyamf.AMF0,
+        stream,
+        strict=strict,
+        timezone_offset=timezone_offset,
+        **kwargs
+    )
+
+    if msg.amfVersion == pyamf.AMF3:
+        encoder.use_amf3 = True
+
+    stream.write_ushort(msg.amfVersion)
+    stream.write_ushort(len(msg.headers))
+
+    for name, header in msg.headers.iteritems():
+        _write_header(
+            name,
+            header,
+            int(msg.headers.is_required(name)),
+            stream,
+            encoder,
+            strict,
+        )
+
+    stream.write_short(len(msg))
+
+    return stream, encoder
+
+
+def decode(stream, strict=False, logger=None, timezone_offset=None,
+           pool=None, **kwargs):
+    """
+    Decodes the incoming stream as a remoting message.
+
+    @param stream: The stream to decode. Pure Python streams (e.g. a
+        L{FileByteStream<pyamf.remoting.spool.FileByteStream>}) are decoded in
+        place by the pure Python decoder. Since 0.9
+    @type stream: L{BufferedByteStream<pyamf.util.BufferedByteStream>}
+    @param strict: Enforce strict decoding. Default is C{False}.
+    @type strict: C{boolean}
+    @param logger: Used to log interesting events whilst decoding a remoting
+        message.
+    @type logger: U{logging.Logger<http://
+        docs.python.org/library/logging.html#loggers>}
+    @param timezone_offset: The difference between the current timezone and
+        UTC. Date/times should always be handled in UTC to avoid confusion but
+        this is required for legacy systems.
+    @type timezone_offset: U{datetime.datetime.timedelta<http://
+        docs.python.org/library/datetime.html#datetime.timedelta>}
+    @param pool: If supplied, the bodies are decoded in this
+        C{multiprocessing.Pool}. See L{pyamf.remoting.parallel}. Since 0.9
+
+    @return: Message L{envelope<Envelope>}.
+    @rtype: L{Envelope}
+    """
+    if pool is not None:
+        from pyamf.remoting import parallel
+
+        return parallel.decode(
+            stream,
+            pool,
+            strict=strict,
+            logger=logger,
+            timezone_offset=timezone_offset,
+            **kwargs
+        )
+
+    stream, decoder, msg, body_count = _read_preamble(
+        stream,
+        strict,
+        timezone_offset,
+        **kwargs
+    )
+    context = decoder.context
 
     for i in xrange(body_count):
         context.clear()
@@ -671,7 +755,8 @@ def decode(stream, strict=False, logger=None, timezone_offset=None,
     return msg
 
 
-def encode(msg, strict=False, logger=None, timezone_offset=None, **kwargs):
+def encode(msg, strict=False, logger=None, timezone_offset=None, stream=None,
+           pool=None, amf3_bodies=False, **kwargs):
     """
     Encodes and returns the L{msg<Envelope>} as an AMF stream.
 
@@ -688,36 +773,45 @@ def encode(msg, strict=False, logger=None, timezone_offset=None, **kwargs):
         this is required for legacy systems.
     @type timezone_offset: U{datetime.datetime.timedelta<http://
         docs.python.org/library/datetime.html#datetime.timedelta>}
+    @param stream: The stream to write the message to. Defaults to a new
+        L{BufferedByteStream<pyamf.util.BufferedByteStream>}. Any other type
+        of stream (e.g. a L{SpooledByteStream
+        <pyamf.remoting.spool.SpooledByteStream>}) is written to by the pure
+        Python encoder. Since 0.9
+    @param pool: If supplied, the bodies are encoded in this
+        C{multiprocessing.Pool}. See L{pyamf.remoting.parallel}. Since 0.9
+    @param amf3_bodies: Encode the bodies of an AMF0 envelope as AMF3, each
+        one wrapped in an AVM+ marker. AMF3 has string and trait references
+        so the bodies are usually smaller, but only Flash Player 9 (or later)
+        clients can read them. Since 0.9
+    @type amf3_bodies: C{bool}
     @rtype: L{BufferedByteStream<pyamf.util.BufferedByteStream>}
     """
-    stream = util.BufferedByteStream()
+    if pool is not None:
+        from pyamf.remoting import parallel
+
+        return parallel.encode(
+            msg,
+            pool,
+            strict=strict,
+            logger=logger,
+            timezone_offset=timezone_offset,
+            stream=stream,
+            amf3_bodies=amf3_bodies,
+            **kwargs
+        )
 
-    encoder = pyamf.get_encoder(
-        pyamf.AMF0,
+    stream, encoder = _write_preamble(
+        msg,
+        strict,
+        timezone_offset,
         stream,
-        strict=strict,
-        timezone_offset=timezone_offset,
         **kwargs
     )
 
-    if msg.amfVersion == pyamf.AMF3:
+    if amf3_bodies:
         encoder.use_amf3 = True
 
-    stream.write_ushort(msg.amfVersion)
-    stream.write_ushort(len(msg.headers))
-
-    for name, header in msg.headers.iteritems():
-        _write_header(
-            name,
-            header,
-            int(msg.headers.is_required(name)),
-            stream,
-            encoder,
-            strict,
-        )
-
-    stream.write_short(len(msg))
-
     for name, message in msg.iteritems():
         encoder.context.clear()
 
@@ -733,3 +827,19 @@ def get_exception_from_fault(fault):
 
 
 pyamf.register_class(ErrorFault)
+
+
+#: The pure Python framing functions. The C{cpyamf.remoting} versions fall
+#: back to these for streams and codecs that they do not accelerate.
+_py_read_header = _read_header
+_py_write_header = _write_header
+_py_read_body = _read_body
+_py_write_body = _write_body
+
+try:
+    from cpyamf.remoting import read_header as _read_header
+    from cpyamf.remoting import write_header as _write_header
+    from cpyamf.remoting import read_body as _read_body
+    from cpyamf.remoting import write_body as _write_body
+except ImportError:
+    pass
@@ -101,6 +101,8 @@ class RequestProcessor(object):
 
             return self.buildErrorResponse(request)
 
+        timer = self.gateway.getCallTimer(service_request)
+
         # we have a valid service, now attempt authentication
         try:
             authd = self.authenticateRequest(
@@ -118,8 +120,13 @@ class RequestProcessor(object):
                     request.target
                 )
 
+            timer.mark('auth')
+            self.gateway.recordCall(service_request, timer, error=True)
+
             return self.buildErrorResponse(request)
 
+        timer.mark('auth')
+
         if not authd:
             # authentication failed
             response.status = remoting.STATUS_ERROR
@@ -128,6 +135,8 @@ class RequestProcessor(object):
                 description='Authentication failed'
             )
 
+            self.gateway.recordCall(service_request, timer, error=True)
+
             return response
 
         # authentication succeeded, now fire the preprocessor (if there is one)
@@ -142,8 +151,13 @@ class RequestProcessor(object):
                     request.target
                 )
 
+            timer.mark('preprocess')
+            self.gateway.recordCall(service_request, timer, error=True)
+
             return self.buildErrorResponse(request)
 
+        timer.mark('preprocess')
+
         try:
             response.body = self._getBody(
                 request,
@@ -153,6 +167,9 @@ class RequestProcessor(object):
                 **kwargs
             )
 
+            timer.mark('call')
+            self.gateway.recordCall(service_request, timer)
+
             return response
         except (SystemExit, KeyboardInterrupt):
             raise
@@ -163,6 +180,9 @@ class RequestProcessor(object):
                     request.target
                 )
 
+            timer.mark('call')
+            self.gateway.recordCall(service_request, timer, error=True)
+
             return self.buildErrorResponse(request)
 
 
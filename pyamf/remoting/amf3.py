@@ -188,18 +188,35 @@ class RequestProcessor(object):
             service_name
         )
 
-        # fire the preprocessor (if there is one)
-        self.gateway.preprocessRequest(
-            service_request,
-            *ro_request.body,
-            **kwargs
-        )
+        timer = self.gateway.getCallTimer(service_request)
+        phase = 'preprocess'
 
-        ro_response.body = self.gateway.callServiceRequest(
-            service_request,
-            *ro_request.body,
-            **kwargs
-        )
+        try:
+            # fire the preprocessor (if there is one)
+            self.gateway.preprocessRequest(
+                service_request,
+                *ro_request.body,
+                **kwargs
+            )
+
+            timer.mark(phase)
+            phase = 'call'
+
+            ro_response.body = self.gateway.callServiceRequest(
+                service_request,
+                *ro_request.body,
+                **kwargs
+            )
+        except:
+            exc_info = sys.exc_info()
+
+            timer.mark(phase)
+            self.gateway.recordCall(service_request, timer, error=True)
+
+            raise exc_info[0], exc_info[1], exc_info[2]
+
+        timer.mark(phase)
+        self.gateway.recordCall(service_request, timer)
 
         return remoting.Response(ro_response)
 
@@ -0,0 +1,214 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Service result caching for remoting gateways.
+
+Service methods that are marked as cacheable (see
+L{cacheable<pyamf.remoting.gateway.cacheable>} and the C{cache_ttl} argument
+to L{addService<pyamf.remoting.gateway.BaseGateway.addService>}) have their
+results stored in a cache backend, keyed on the service name, method name and
+the AMF encoded arguments of the call.
+
+The default backend is L{LocalCache}, an in-process LRU cache. Shared caches
+can be plugged in by subclassing L{BaseCache} and supplying an instance to the
+gateway via the C{cache} keyword argument.
+
+@since: 0.9
+"""
+
+import time
+import threading
+
+from hashlib import sha1
+
+import pyamf
+
+
+__all__ = [
+    'BaseCache',
+    'LocalCache',
+    'get_key',
+]
+
+#: The default maximum number of results held by L{LocalCache}.
+DEFAULT_MAX_SIZE = 1000
+
+
+def get_key(service_name, method, args):
+    """
+    Returns the cache key for a call to a service method.
+
+    The arguments are encoded as AMF3 to get a canonical byte representation
+    of the call. C{dict} ordering is not normalised so logically equal
+    arguments may produce different keys (resulting in a cache miss).
+
+    @param service_name: The name of the service.
+    @type service_name: C{str}
+    @param method: The name of the method or C{None} if the service is called
+        directly.
+    @param args: The arguments of the call.
+    @type args: C{tuple}
+    @rtype: C{str}
+    @raise pyamf.EncodeError: The arguments could not be encoded.
+    """
+    data = pyamf.encode(*args, encoding=pyamf.AMF3).getvalue()
+
+    return '%s.%s:%s' % (service_name, method or '', sha1(data).hexdigest())
+
+
+class BaseCache(object):
+    """
+    The interface for a service result cache backend.
+
+    Implementations must be thread safe.
+    """
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored for C{key} or C{default} if it is not in
+        the cache (or has expired).
+        """
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=0):
+        """
+        Stores C{value} for C{key}.
+
+        @param ttl: The number of seconds until the value expires. C{0} means
+            that the value does not expire (but may still be evicted).
+        @type ttl: C{int}
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        """
+        Removes C{key} from the cache. Unknown keys are ignored.
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """
+        Removes all values from the cache.
+        """
+        raise NotImplementedError
+
+
+class LocalCache(BaseCache):
+    """
+    An in-process, thread safe, least recently used cache.
+
+    @ivar max_size: The maximum number of values held by the cache. When this
+        is exceeded, the least recently used value is evicted.
+    @type max_size: C{int}
+    """
+
+    # indexes into the entries of the doubly linked list
+    PREV, NEXT, KEY, VALUE, EXPIRES = range(5)
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        if max_size < 1:
+            raise ValueError('max_size must be a positive integer')
+
+        self.max_size = max_size
+
+        self._lock = threading.Lock()
+        self._entries = {}
+        # sentinel of the circular list, most recently used is root[NEXT]
+        self._root = root = []
+        root[:] = [root, root, None, None, None]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
+
+    def _unlink(self, entry):
+        prev, next = entry[self.PREV], entry[self.NEXT]
+
+        prev[self.NEXT] = next
+        next[self.PREV] = prev
+
+    def _link(self, entry):
+        root = self._root
+        first = root[self.NEXT]
+
+        entry[self.PREV] = root
+        entry[self.NEXT] = first
+        first[self.PREV] = entry
+        root[self.NEXT] = entry
+
+    def get(self, key, default=None):
+        self._lock.acquire()
+
+        try:
+            entry = self._entries.get(key, None)
+
+            if entry is None:
+                return default
+
+            expires = entry[self.EXPIRES]
+
+            if expires is not None and expires <= time.time():
+                self._unlink(entry)
+                del self._entries[key]
+
+                return default
+
+            self._unlink(entry)
+            self._link(entry)
+
+            return entry[self.VALUE]
+        finally:
+            self._lock.release()
+
+    def set(self, key, value, ttl=0):
+        expires = None
+
+        if ttl:
+            expires = time.time() + ttl
+
+        self._lock.acquire()
+
+        try:
+            entry = self._entries.get(key, None)
+
+            if entry is not None:
+                self._unlink(entry)
+                entry[self.VALUE] = value
+                entry[self.EXPIRES] = expires
+            else:
+                entry = [None, None, key, value, expires]
+                self._entries[key] = entry
+
+            self._link(entry)
+
+            while len(self._entries) > self.max_size:
+                oldest = self._root[self.PREV]
+
+                self._unlink(oldest)
+                del self._entries[oldest[self.KEY]]
+        finally:
+            self._lock.release()
+
+    def delete(self, key):
+        self._lock.acquire()
+
+        try:
+            entry = self._entries.pop(key, None)
+
+            if entry is not None:
+                self._unlink(entry)
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self._lock.acquire()
+
+        try:
+            self._entries.clear()
+            root = self._root
+            root[:] = [root, root, None, None, None]
+        finally:
+            self._lock.release()
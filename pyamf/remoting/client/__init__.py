@@ -12,6 +12,7 @@ import urlparse
 
 import pyamf
 from pyamf import remoting
+from pyamf.remoting import compression
 
 try:
     from gzip import GzipFile
@@ -208,6 +209,16 @@ class RemotingService(object):
         server. Defaults to U{urllib2.urlopen<http://
         docs.python.org/library/urllib2.html#urllib2.urlopen>}.
     @type opener: C{function}
+    @ivar compression: The content-coding used to compress request bodies,
+        one of L{ENCODINGS<pyamf.remoting.compression.ENCODINGS>}. The
+        default of C{None} sends requests uncompressed. Only use this if the
+        remote gateway is known to support compressed requests.
+    @type compression: C{str} or C{None}
+    @ivar compression_level: The zlib compression level for request bodies.
+    @type compression_level: C{int}
+    @ivar accept_compression: Whether to advertise support for compressed
+        responses via the C{Accept-Encoding} HTTP header.
+    @type accept_compression: C{bool}
     """
 
     def __init__(self, url, amf_version=pyamf.AMF0, **kwargs):
@@ -226,6 +237,18 @@ class RemotingService(object):
         self.logger = kwargs.pop('logger', None)
         self.opener = kwargs.pop('opener', urllib2.urlopen)
 
+        self.compression = kwargs.pop('compression', None)
+        self.compression_level = kwargs.pop(
+            'compression_level',
+            compression.DEFAULT_LEVEL
+        )
+        self.accept_compression = kwargs.pop('accept_compression', False)
+
+        if self.compression not in (None,) + compression.ENCODINGS:
+            raise ValueError(
+                'Unsupported compression %r' % (self.compression,)
+            )
+
         if kwargs:
             raise TypeError('Unexpected keyword arguments %r' % (kwargs,))
 
@@ -381,8 +404,32 @@ class RemotingService(object):
         if self.referer is not None:
             headers['Referer'] = self.referer
 
+        if self.compression is not None:
+            headers['Content-Encoding'] = self.compression
+
+        if self.accept_compression:
+            headers['Accept-Encoding'] = ', '.join(compression.ENCODINGS)
+
         return headers
 
+    def _get_request_body(self, stream):
+        """
+        Returns the body of the HTTP request, compressing the encoded AMF
+        request if required.
+
+        @since: 0.9
+        """
+        body = stream.getvalue()
+
+        if self.compression is None:
+            return body
+
+        return compression.compress(
+            body,
+            self.compression,
+            self.compression_level
+        )
+
     def execute_single(self, request):
         """
         Builds, sends and handles the response to a single request, returning
@@ -399,7 +446,7 @@ class RemotingService(object):
         )
 
         http_request = urllib2.Request(
-            self._root_url, body.getvalue(),
+            self._root_url, self._get_request_body(body),
             self._get_execute_headers()
         )
 
@@ -426,7 +473,7 @@ class RemotingService(object):
         )
 
         http_request = urllib2.Request(
-            self._root_url, body.getvalue(),
+            self._root_url, self._get_request_body(body),
             self._get_execute_headers()
         )
 
@@ -488,6 +535,12 @@ class RemotingService(object):
             gzipper = GzipFile(fileobj=compressedstream)
             bytes = gzipper.read()
             gzipper.close()
+        elif content_encoding and \
+                content_encoding.strip().lower() == 'deflate':
+            try:
+                bytes = compression.decompress(bytes, 'deflate')
+            except IOError, e:
+                raise remoting.RemotingError(str(e))
 
         response = remoting.decode(bytes, strict=self.strict)
 
@@ -0,0 +1,314 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+HTTP content-coding support for remoting requests and responses.
+
+AMF payloads contain many repeated class and property names and typically
+compress very well. The gateways use these helpers to negotiate a
+C{Content-Encoding} with the client via the C{Accept-Encoding} header and the
+client uses them to compress request bodies.
+
+@since: 0.9
+"""
+
+import zlib
+
+
+__all__ = [
+    'ENCODINGS',
+    'get_accepted_encoding',
+    'compress',
+    'decompress',
+    'iter_compress',
+    'Decompressor',
+    'get_decompressor',
+    'is_compressed',
+    'SizeLimitError',
+]
+
+#: Supported content-codings, in order of preference.
+ENCODINGS = ('gzip', 'deflate')
+
+#: Default zlib compression level (1 is fastest, 9 is smallest).
+DEFAULT_LEVEL = 6
+
+#: Responses smaller than this number of bytes are not worth compressing.
+DEFAULT_THRESHOLD = 1024
+
+#: Number of bytes read from the encoded stream and compressed in one go.
+CHUNK_SIZE = 64 * 1024
+
+#: Compressed request bodies that expand beyond this number of bytes are
+#: rejected. A small compressed body can otherwise inflate to gigabytes.
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+
+class SizeLimitError(IOError):
+    """
+    Raised when decompressed data grows beyond the permitted size.
+    """
+
+
+def _get_wbits(encoding):
+    """
+    Returns the zlib window bits value for the supplied content-coding.
+
+    @raise ValueError: Unsupported C{encoding}.
+    """
+    if encoding == 'gzip':
+        return 16 + zlib.MAX_WBITS
+    elif encoding == 'deflate':
+        return zlib.MAX_WBITS
+
+    raise ValueError('Unsupported content-coding %r' % (encoding,))
+
+
+def get_accepted_encoding(accept_encoding):
+    """
+    Parses the value of an HTTP C{Accept-Encoding} header and returns the
+    preferred supported content-coding, or C{None} if the client does not
+    accept any of L{ENCODINGS}.
+
+    A content-coding with a quality value of C{0} is never selected.
+
+    @param accept_encoding: The value of the C{Accept-Encoding} header.
+    @type accept_encoding: C{str} or C{None}
+    @rtype: C{str} or C{None}
+    """
+    if not accept_encoding:
+        return None
+
+    accepted = {}
+
+    for part in accept_encoding.split(','):
+        params = part.split(';')
+        coding = params[0].strip().lower()
+
+        if not coding:
+            continue
+
+        q = 1.0
+
+        for param in params[1:]:
+            name, _, value = param.partition('=')
+
+            if name.strip().lower() != 'q':
+                continue
+
+            try:
+                q = float(value)
+            except ValueError:
+                q = 0.0
+
+        accepted[coding] = q
+
+    for encoding in ENCODINGS:
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+
+        if q > 0:
+            return encoding
+
+    return None
+
+
+def compress(data, encoding, level=DEFAULT_LEVEL):
+    """
+    Compresses C{data} using the supplied content-coding.
+
+    @type data: C{str}
+    @param encoding: One of L{ENCODINGS}.
+    @param level: The zlib compression level.
+    @rtype: C{str}
+    """
+    c = zlib.compressobj(level, zlib.DEFLATED, _get_wbits(encoding))
+
+    return c.compress(data) + c.flush()
+
+
+def iter_compress(stream, encoding, level=DEFAULT_LEVEL,
+                  chunk_size=CHUNK_SIZE):
+    """
+    A generator that compresses the remaining contents of C{stream} in chunks
+    of C{chunk_size} bytes, yielding the compressed output as it becomes
+    available. This allows a gateway to hand the compressed response to the
+    server without ever holding a second complete copy of it.
+
+    @param stream: The encoded response.
+    @type stream: L{BufferedByteStream<pyamf.util.BufferedByteStream>}
+    @param encoding: One of L{ENCODINGS}.
+    @param level: The zlib compression level.
+    """
+    c = zlib.compressobj(level, zlib.DEFLATED, _get_wbits(encoding))
+
+    while stream.remaining() > 0:
+        data = c.compress(stream.read(min(chunk_size, stream.remaining())))
+
+        if data:
+            yield data
+
+    yield c.flush()
+
+
+def _inflate(data, wbits, max_size):
+    """
+    Decompresses C{data}, producing at most one byte more than C{max_size}.
+    """
+    d = zlib.decompressobj(wbits)
+
+    if max_size is None:
+        return d.decompress(data) + d.flush()
+
+    ret = d.decompress(data, max_size + 1)
+
+    if len(ret) <= max_size and not d.unconsumed_tail:
+        ret += d.flush()
+
+    if len(ret) > max_size or d.unconsumed_tail:
+        raise SizeLimitError(
+            'Decompressed data exceeds %d bytes' % (max_size,))
+
+    return ret
+
+
+def decompress(data, encoding, max_size=None):
+    """
+    Decompresses C{data} that was compressed using the supplied content-coding.
+
+    C{None} or C{identity} return C{data} untouched. Some clients send raw
+    deflate streams (without the zlib header) for C{deflate} so both are
+    accepted.
+
+    @param max_size: The maximum number of decompressed bytes or C{None} for
+        no limit.
+    @type max_size: C{int} or C{None}
+    @raise SizeLimitError: The decompressed data is larger than C{max_size}.
+    @raise IOError: C{data} could not be decompressed or C{encoding} is not
+        supported.
+    """
+    if encoding is not None:
+        encoding = encoding.strip().lower()
+
+    if not encoding or encoding == 'identity':
+        return data
+
+    try:
+        wbits = _get_wbits(encoding)
+    except ValueError, e:
+        raise IOError(str(e))
+
+    try:
+        return _inflate(data, wbits, max_size)
+    except zlib.error, e:
+        if encoding == 'deflate':
+            try:
+                return _inflate(data, -zlib.MAX_WBITS, max_size)
+            except zlib.error:
+                pass
+
+        raise IOError('Unable to decompress %s data: %s' % (encoding, e))
+
+
+class Decompressor(object):
+    """
+    Incrementally decompresses data that was compressed using a
+    content-coding, allowing a request body to be decompressed as it is read.
+
+    As with L{decompress}, raw deflate streams are accepted for C{deflate}.
+
+    @ivar max_size: The maximum number of decompressed bytes or C{None} for no
+        limit.
+    @type max_size: C{int} or C{None}
+    @since: 0.9
+    """
+
+    def __init__(self, encoding, max_size=None):
+        """
+        @raise IOError: C{encoding} is not supported.
+        """
+        try:
+            wbits = _get_wbits(encoding)
+        except ValueError, e:
+            raise IOError(str(e))
+
+        self.encoding = encoding
+        self.max_size = max_size
+        self._obj = zlib.decompressobj(wbits)
+        self._started = False
+        self._size = 0
+
+    def _check(self, data):
+        self._size += len(data)
+
+        if self.max_size is not None and (
+                self._size > self.max_size or self._obj.unconsumed_tail):
+            raise SizeLimitError(
+                'Decompressed data exceeds %d bytes' % (self.max_size,))
+
+        return data
+
+    def decompress(self, data):
+        """
+        Returns the decompressed data that is available after feeding it
+        C{data}.
+
+        @raise SizeLimitError: More than L{max_size} bytes were decompressed.
+        @raise IOError: C{data} could not be decompressed.
+        """
+        try:
+            if self.max_size is None:
+                ret = self._obj.decompress(data)
+            else:
+                ret = self._obj.decompress(
+                    data,
+                    self.max_size - self._size + 1
+                )
+        except zlib.error, e:
+            if self.encoding == 'deflate' and not self._started:
+                self._started = True
+                self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+
+                return self.decompress(data)
+
+            raise IOError('Unable to decompress %s data: %s' % (
+                self.encoding, e))
+
+        self._started = True
+
+        return self._check(ret)
+
+    def flush(self):
+        """
+        Returns any remaining decompressed data.
+
+        @raise SizeLimitError: More than L{max_size} bytes were decompressed.
+        """
+        return self._check(self._obj.flush())
+
+
+def is_compressed(encoding):
+    """
+    Whether C{encoding}, the value of a C{Content-Encoding} header, denotes a
+    compressed body.
+
+    @since: 0.9
+    """
+    if encoding is not None:
+        encoding = encoding.strip().lower()
+
+    return bool(encoding) and encoding != 'identity'
+
+
+def get_decompressor(encoding, max_size=None):
+    """
+    Returns a L{Decompressor} for the supplied content-coding or C{None} if
+    the data is not compressed (C{encoding} is C{None} or C{identity}).
+
+    @param max_size: See L{Decompressor.max_size}.
+    @raise IOError: C{encoding} is not supported.
+    @since: 0.9
+    """
+    if not is_compressed(encoding):
+        return None
+
+    return Decompressor(encoding.strip().lower(), max_size)
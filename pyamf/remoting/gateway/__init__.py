@@ -10,9 +10,11 @@ Remoting server implementations.
 import sys
 import types
 import datetime
+import threading
 
 import pyamf
-from pyamf import remoting, util, python
+from pyamf import remoting, util, python, encoded
+from pyamf.remoting import compression, cache, metrics, spool
 
 try:
     from platform import python_implementation
@@ -25,6 +27,19 @@ SERVER_NAME = 'PyAMF/%s %s/%s' % (
     '.'.join(map(lambda x: str(x), sys.version_info[0:3]))
 )
 
+#: A new instance of a class based service is created for every call.
+INSTANCE_PER_CALL = 'call'
+#: A single instance of a class based service is shared by all calls.
+INSTANCE_SINGLETON = 'singleton'
+#: Each thread creates (and then reuses) its own instance of a class based
+#: service.
+INSTANCE_PER_THREAD = 'thread'
+
+INSTANCE_MODES = (INSTANCE_PER_CALL, INSTANCE_SINGLETON, INSTANCE_PER_THREAD)
+
+#: The first Flash Player version that can read AMF3 (AVM+) data.
+AMF3_FLASH_VERSION = 9
+
 
 class BaseServiceError(pyamf.BaseError):
     """
@@ -61,21 +76,85 @@ class ServiceWrapper(object):
     @type service: C{callable}
     @ivar description: A description of the service.
     @type description: C{str}
+    @ivar cache_ttl: The number of seconds the results of the service are
+        cached for. C{0} caches results until they are evicted, C{None} (the
+        default) disables caching. Since 0.9
+    @type cache_ttl: C{int} or C{None}
+    @ivar name: The name the service was registered with. Since 0.9
+    @type name: C{str} or C{None}
+    @ivar instance_mode: How instances of a class based service are created,
+        one of L{INSTANCE_MODES}. Since 0.9
+    @type instance_mode: C{str}
     """
     def __init__(self, service, description=None, authenticator=None,
-                 expose_request=None, preprocessor=None):
+                 expose_request=None, preprocessor=None, cache_ttl=None,
+                 name=None, instance_mode=INSTANCE_PER_CALL):
+        if instance_mode not in INSTANCE_MODES:
+            raise ValueError('Unknown instance mode %r' % (instance_mode,))
+
         self.service = service
         self.description = description
         self.authenticator = authenticator
         self.expose_request = expose_request
         self.preprocessor = preprocessor
+        self.cache_ttl = cache_ttl
+        self.name = name
+        self.instance_mode = instance_mode
+
+        self._instance = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
 
     def __cmp__(self, other):
         if isinstance(other, ServiceWrapper):
-            return cmp(self.__dict__, other.__dict__)
+            return cmp(self._getState(), other._getState())
 
         return cmp(self.service, other)
 
+    def _getState(self):
+        return dict([
+            (k, v) for k, v in self.__dict__.iteritems()
+            if not k.startswith('_')
+        ])
+
+    def getInstance(self):
+        """
+        Returns the object that the service methods are looked up on. Class
+        based services are instantiated according to L{instance_mode}.
+
+        @since: 0.9
+        """
+        service = self.service
+
+        if not isinstance(service, (type, types.ClassType)):
+            return service
+
+        if self.instance_mode == INSTANCE_SINGLETON:
+            instance = self._instance
+
+            if instance is None:
+                self._lock.acquire()
+
+                try:
+                    if self._instance is None:
+                        self._instance = service()
+
+                    instance = self._instance
+                finally:
+                    self._lock.release()
+
+            return instance
+
+        if self.instance_mode == INSTANCE_PER_THREAD:
+            instance = getattr(self._local, 'instance', None)
+
+            if instance is None:
+                instance = self._local.instance = service()
+
+            return instance
+
+        return service()
+
     def _get_service_func(self, method, params):
         """
         @raise InvalidServiceMethodError: Calls to private methods are not
@@ -83,12 +162,7 @@ class ServiceWrapper(object):
         @raise UnknownServiceMethodError: Unknown method.
         @raise InvalidServiceMethodError: Service method must be callable.
         """
-        service = None
-
-        if isinstance(self.service, (type, types.ClassType)):
-            service = self.service()
-        else:
-            service = self.service
+        service = self.getInstance()
 
         if method is not None:
             method = str(method)
@@ -119,7 +193,8 @@ class ServiceWrapper(object):
         """
         Executes the service.
 
-        If the service is a class, it will be instantiated.
+        If the service is a class, it will be instantiated (see
+        L{instance_mode}).
 
         @param method: The method to call on the service.
         @type method: C{None} or C{mixed}
@@ -149,6 +224,31 @@ class ServiceWrapper(object):
 
         return callables
 
+    def getDispatchTable(self):
+        """
+        Returns a C{dict} mapping each target that the service answers to
+        (its L{name} if the service itself is callable and C{name.method} for
+        each public method) to a L{DispatchEntry}.
+
+        @since: 0.9
+        """
+        table = {}
+        service = self.service
+        is_class = isinstance(service, (type, types.ClassType))
+
+        if not is_class and python.callable(service):
+            table[self.name] = DispatchEntry(self, None, service, service)
+
+        for method, func in self.getMethods().iteritems():
+            table['%s.%s' % (self.name, method)] = DispatchEntry(
+                self,
+                method,
+                func,
+                None if is_class else func
+            )
+
+        return table
+
     def getAuthenticator(self, service_request=None):
         if service_request is None:
             return self.authenticator
@@ -211,6 +311,76 @@ class ServiceWrapper(object):
 
         return self.preprocessor
 
+    def getCacheTTL(self, service_request=None):
+        """
+        @since: 0.9
+        """
+        if service_request is None:
+            return self.cache_ttl
+
+        methods = self.getMethods()
+
+        if service_request.method is None:
+            if hasattr(self.service, '_pyamf_cache_ttl'):
+                return self.service._pyamf_cache_ttl
+
+        if service_request.method not in methods:
+            return self.cache_ttl
+
+        method = methods[service_request.method]
+
+        if hasattr(method, '_pyamf_cache_ttl'):
+            return method._pyamf_cache_ttl
+
+        return self.cache_ttl
+
+
+class DispatchEntry(object):
+    """
+    A precompiled target of a L{ServiceWrapper}. The service level settings
+    (set by the decorators in this module or supplied to
+    L{BaseGateway.addService}) are resolved once, when the service is added
+    to the gateway.
+
+    @ivar wrapper: The service.
+    @type wrapper: L{ServiceWrapper}
+    @ivar method: The name of the method or C{None} if the service itself is
+        called.
+    @ivar func: The callable or C{None} if the method is looked up on an
+        L{instance<ServiceWrapper.getInstance>} of a class based service.
+    @since: 0.9
+    """
+
+    def __init__(self, wrapper, method, source, func=None):
+        """
+        @param source: The object that the settings are read from, i.e. the
+            service or the (unbound) method.
+        """
+        self.wrapper = wrapper
+        self.method = method
+        self.func = func
+
+        self.authenticator = getattr(
+            source, '_pyamf_authenticator', wrapper.authenticator)
+        self.preprocessor = getattr(
+            source, '_pyamf_preprocessor', wrapper.preprocessor)
+        self.expose_request = getattr(
+            source, '_pyamf_expose_request', wrapper.expose_request)
+        self.cache_ttl = getattr(
+            source, '_pyamf_cache_ttl', wrapper.cache_ttl)
+
+    def __call__(self, args):
+        func = self.func
+
+        if func is None:
+            wrapper = self.wrapper
+            func = getattr(wrapper.getInstance(), self.method)
+
+            if wrapper.instance_mode == INSTANCE_SINGLETON:
+                self.func = func
+
+        return func(*args)
+
 
 class ServiceRequest(object):
     """
@@ -223,13 +393,20 @@ class ServiceRequest(object):
     @ivar method: The method to call on the service. A value of C{None}
         means that the service will be called directly.
     @type method: C{None} or C{str}
+    @ivar entry: The entry of the gateway's dispatch table that matched the
+        request, if any. Since 0.9
+    @type entry: L{DispatchEntry} or C{None}
     """
-    def __init__(self, amf_request, service, method):
+    def __init__(self, amf_request, service, method, entry=None):
         self.request = amf_request
         self.service = service
         self.method = method
+        self.entry = entry
 
     def __call__(self, *args):
+        if self.entry is not None:
+            return self.entry(args)
+
         return self.service(self.method, args)
 
 
@@ -268,6 +445,57 @@ class BaseGateway(object):
     @ivar debug: Provides debugging information when an error occurs. Use only
         in non production settings.
     @type debug: C{bool}
+    @ivar compression: Whether responses may be compressed with a
+        content-coding accepted by the client (see
+        L{pyamf.remoting.compression}). Default is C{False}.
+    @type compression: C{bool}
+    @ivar compression_level: The zlib compression level (1-9).
+    @type compression_level: C{int}
+    @ivar compression_threshold: Responses smaller than this number of bytes
+        are sent uncompressed.
+    @type compression_threshold: C{int}
+    @ivar compressed_requests: Whether request bodies compressed with a
+        supported C{Content-Encoding} are accepted. Other requests with a
+        C{Content-Encoding} are rejected with C{415 Unsupported Media Type}.
+        Default is C{False}.
+    @type compressed_requests: C{bool}
+    @ivar max_decompressed_size: Compressed request bodies that expand beyond
+        this number of bytes are rejected with C{413 Request Entity Too
+        Large}. C{None} disables the limit. Default is
+        L{DEFAULT_MAX_SIZE<pyamf.remoting.compression.DEFAULT_MAX_SIZE>}.
+    @type max_decompressed_size: C{int} or C{None}
+    @ivar cache: The backend that stores the results of cacheable service
+        methods. Defaults to a L{LocalCache<pyamf.remoting.cache.LocalCache>}
+        holding at most C{cache_size} results.
+    @type cache: L{BaseCache<pyamf.remoting.cache.BaseCache>}
+    @ivar metrics: Collects request and per service call metrics. Supplying
+        C{True} creates a L{Metrics<pyamf.remoting.metrics.Metrics>}
+        instance. Default is C{None} (disabled).
+    @type metrics: L{Metrics<pyamf.remoting.metrics.Metrics>} or C{None}
+    @ivar slow_request_threshold: Requests that take longer than this number
+        of seconds to handle are logged (with a breakdown of the time spent
+        in each phase) as a warning to L{logger}. Default is C{None}
+        (disabled).
+    @type slow_request_threshold: C{float} or C{None}
+    @ivar instance_mode: The default L{instance mode<INSTANCE_MODES>} of
+        class based services. Default is L{INSTANCE_PER_CALL}.
+    @type instance_mode: C{str}
+    @ivar response_spool_size: If set, responses are encoded to a
+        L{SpooledByteStream<pyamf.remoting.spool.SpooledByteStream>} that
+        moves to a temporary file once it grows beyond this number of bytes
+        and is then streamed to the client from disk. Default is C{None}
+        (responses are held in memory).
+    @type response_spool_size: C{int} or C{None}
+    @ivar pool: If set, the bodies of requests and responses are decoded and
+        encoded in this C{multiprocessing.Pool}. Only worthwhile for envelopes
+        that batch several large bodies, see L{pyamf.remoting.parallel}.
+        Default is C{None}.
+    @ivar amf3_responses: Encode the response bodies of AMF0 requests as AMF3
+        (wrapped in an AVM+ marker) for clients that declare Flash Player
+        L{AMF3_FLASH_VERSION} or later in the C{x-flash-version} header. AMF3
+        sends repeated strings and property names as references, so the
+        responses are smaller. Default is C{False}.
+    @type amf3_responses: C{bool}
     """
 
     _request_class = ServiceRequest
@@ -280,6 +508,7 @@ class BaseGateway(object):
             raise TypeError("dict type required for services")
 
         self.services = ServiceCollection()
+        self._dispatch = {}
         self.authenticator = kwargs.pop('authenticator', None)
         self.preprocessor = kwargs.pop('preprocessor', None)
         self.expose_request = kwargs.pop('expose_request', False)
@@ -289,6 +518,44 @@ class BaseGateway(object):
 
         self.debug = kwargs.pop('debug', False)
 
+        self.compression = kwargs.pop('compression', False)
+        self.compression_level = kwargs.pop(
+            'compression_level',
+            compression.DEFAULT_LEVEL
+        )
+        self.compression_threshold = kwargs.pop(
+            'compression_threshold',
+            compression.DEFAULT_THRESHOLD
+        )
+        self.compressed_requests = kwargs.pop('compressed_requests', False)
+        self.max_decompressed_size = kwargs.pop(
+            'max_decompressed_size',
+            compression.DEFAULT_MAX_SIZE
+        )
+
+        self.cache = kwargs.pop('cache', None)
+        cache_size = kwargs.pop('cache_size', cache.DEFAULT_MAX_SIZE)
+
+        if self.cache is None:
+            self.cache = cache.LocalCache(cache_size)
+
+        self.metrics = kwargs.pop('metrics', None)
+
+        if self.metrics is True:
+            self.metrics = metrics.Metrics(logger=self.logger)
+        elif self.metrics is False:
+            self.metrics = None
+
+        self.slow_request_threshold = kwargs.pop(
+            'slow_request_threshold',
+            None
+        )
+
+        self.instance_mode = kwargs.pop('instance_mode', INSTANCE_PER_CALL)
+        self.response_spool_size = kwargs.pop('response_spool_size', None)
+        self.pool = kwargs.pop('pool', None)
+        self.amf3_responses = kwargs.pop('amf3_responses', False)
+
         if kwargs:
             raise TypeError('Unknown kwargs: %r' % (kwargs,))
 
@@ -296,14 +563,28 @@ class BaseGateway(object):
             self.addService(service, name)
 
     def addService(self, service, name=None, description=None,
-                   authenticator=None, expose_request=None, preprocessor=None):
+                   authenticator=None, expose_request=None, preprocessor=None,
+                   cache_ttl=None, instance_mode=None):
         """
         Adds a service to the gateway.
 
+        The targets the service answers to are compiled into a dispatch table
+        so that the settings of each method (see L{authenticate},
+        L{expose_request}, L{preprocess} and L{cacheable}) must be applied
+        before the service is added.
+
         @param service: The service to add to the gateway.
         @type service: C{callable}, class instance, or a module
         @param name: The name of the service.
         @type name: C{str}
+        @param cache_ttl: If not C{None}, the results of calls to the service
+            are cached for this number of seconds (C{0} means until evicted).
+            Only use this for services without side effects whose results
+            depend solely on their arguments. Since 0.9
+        @type cache_ttl: C{int} or C{None}
+        @param instance_mode: How instances of a class based service are
+            created, one of L{INSTANCE_MODES}. Defaults to
+            L{BaseGateway.instance_mode}. Since 0.9
         @raise pyamf.remoting.RemotingError: Service already exists.
         @raise TypeError: C{service} cannot be a scalar value.
         @raise TypeError: C{service} must be C{callable} or a module.
@@ -338,14 +619,40 @@ class BaseGateway(object):
         if name in self.services:
             raise remoting.RemotingError("Service %s already exists" % name)
 
-        self.services[name] = ServiceWrapper(
+        if instance_mode is None:
+            instance_mode = self.instance_mode
+
+        wrapper = self.services[name] = ServiceWrapper(
             service,
             description,
             authenticator,
             expose_request,
-            preprocessor
+            preprocessor,
+            cache_ttl,
+            name,
+            instance_mode
         )
 
+        self._addDispatchEntries(wrapper)
+
+    def _addDispatchEntries(self, wrapper):
+        # a service registered under the exact target takes precedence over
+        # the method of another service (see getServiceRequest)
+        self._dispatch.pop(wrapper.name, None)
+
+        for target, entry in wrapper.getDispatchTable().iteritems():
+            if target != wrapper.name and \
+                    self.services.get(target, None) is not None:
+                continue
+
+            self._dispatch[target] = entry
+
+    def _buildDispatchTable(self):
+        self._dispatch = {}
+
+        for wrapper in self.services.values():
+            self._addDispatchEntries(wrapper)
+
     def _get_timezone_offset(self):
         if self.timezone_offset is None:
             return None
@@ -367,6 +674,8 @@ class BaseGateway(object):
         for name, wrapper in self.services.iteritems():
             if service in (name, wrapper.service):
                 del self.services[name]
+                self._buildDispatchTable()
+
                 return
 
         raise NameError("Service %r not found" % (service,))
@@ -380,6 +689,18 @@ class BaseGateway(object):
         @type request: L{Request<pyamf.remoting.Request>}
         @rtype: L{ServiceRequest}
         """
+        entry = self._dispatch.get(target, None)
+
+        # the services may have been changed without using removeService
+        if entry is not None and \
+                self.services.get(entry.wrapper.name, None) is entry.wrapper:
+            return self._request_class(
+                request.envelope,
+                entry.wrapper,
+                entry.method,
+                entry=entry
+            )
+
         try:
             return self._request_class(
                 request.envelope, self.services[target], None)
@@ -427,6 +748,158 @@ class BaseGateway(object):
         """
         raise NotImplementedError
 
+    def acceptsRequestEncoding(self, content_encoding):
+        """
+        Whether a request body sent with the C{Content-Encoding}
+        C{content_encoding} may be decoded. See L{compressed_requests}.
+
+        @type content_encoding: C{str} or C{None}
+        @rtype: C{bool}
+        @since: 0.9
+        """
+        if not compression.is_compressed(content_encoding):
+            return True
+
+        return self.compressed_requests
+
+    def getResponseEncoding(self, accept_encoding, size):
+        """
+        Decides which content-coding (if any) should be applied to a response
+        of C{size} bytes, based on the C{Accept-Encoding} header sent by the
+        client.
+
+        @param accept_encoding: The value of the C{Accept-Encoding} header.
+        @type accept_encoding: C{str} or C{None}
+        @param size: The size of the encoded response in bytes.
+        @type size: C{int}
+        @return: The content-coding to use or C{None} to send the response
+            uncompressed.
+        @rtype: C{str} or C{None}
+        @since: 0.9
+        """
+        if not self.compression or size < self.compression_threshold:
+            return None
+
+        return compression.get_accepted_encoding(accept_encoding)
+
+    def useAMF3Bodies(self, amf_response, flash_version):
+        """
+        Decides whether the bodies of C{amf_response} should be encoded as
+        AMF3. See L{amf3_responses}.
+
+        @param amf_response: The AMF response.
+        @type amf_response: L{Envelope<pyamf.remoting.Envelope>}
+        @param flash_version: The value of the C{x-flash-version} header sent
+            by the client.
+        @type flash_version: C{str} or C{None}
+        @rtype: C{bool}
+        @since: 0.9
+        """
+        if not self.amf3_responses:
+            return False
+
+        if amf_response.amfVersion != pyamf.AMF0:
+            # AMF3 envelopes are already encoded as AMF3
+            return False
+
+        version = get_flash_version(flash_version)
+
+        return version is not None and version >= AMF3_FLASH_VERSION
+
+    def getResponseStream(self):
+        """
+        Returns the stream that a response is encoded to or C{None} to use a
+        new in memory stream. See L{response_spool_size}.
+
+        @since: 0.9
+        """
+        if self.response_spool_size is None:
+            return None
+
+        return spool.SpooledByteStream(self.response_spool_size)
+
+    def getTimer(self):
+        """
+        Returns a L{Timer<pyamf.remoting.metrics.Timer>} for the phases of a
+        request. If neither metrics nor slow request logging are enabled, a
+        timer that does nothing is returned.
+
+        @since: 0.9
+        """
+        if self.metrics is None and self.slow_request_threshold is None:
+            return metrics.NULL_TIMER
+
+        return metrics.Timer()
+
+    def getCallTimer(self, service_request):
+        """
+        Returns a L{Timer<pyamf.remoting.metrics.Timer>} for the phases of a
+        call to a service (authentication, preprocessing and the call itself).
+
+        @since: 0.9
+        """
+        if self.metrics is None:
+            return metrics.NULL_TIMER
+
+        return metrics.Timer()
+
+    def recordCall(self, service_request, timer, error=False):
+        """
+        Records the timed phases of a call to a service.
+
+        @param error: Whether the call resulted in an error response.
+        @since: 0.9
+        """
+        if self.metrics is None or timer is metrics.NULL_TIMER:
+            return
+
+        self.metrics.recordCall(
+            service_request.service.name,
+            service_request.method,
+            timer,
+            error
+        )
+
+    def recordRequest(self, timer, request_bytes=None, response_bytes=None,
+                      error=False, request=None):
+        """
+        Records the timed phases of a request and logs it if it was slower
+        than L{slow_request_threshold}.
+
+        @param timer: The timer returned by L{getTimer}.
+        @param request_bytes: The size of the request body, as received.
+        @param response_bytes: The size of the encoded response, before any
+            compression.
+        @param error: Whether the request failed.
+        @param request: The decoded request, if available. Used to describe
+            a slow request.
+        @type request: L{Envelope<pyamf.remoting.Envelope>}
+        @since: 0.9
+        """
+        if timer is metrics.NULL_TIMER:
+            return
+
+        if self.metrics is not None:
+            self.metrics.recordRequest(
+                timer,
+                request_bytes,
+                response_bytes,
+                error
+            )
+
+        threshold = self.slow_request_threshold
+        elapsed = timer.getElapsed()
+
+        if threshold is None or not self.logger or elapsed < threshold:
+            return
+
+        self.logger.warning(
+            'Slow AMF request (%.3fs, %s): %s',
+            elapsed,
+            ', '.join(['%s=%.3fs' % x for x in timer.phases]),
+            ', '.join(get_targets(request)) or 'unknown'
+        )
+
     def mustExposeRequest(self, service_request):
         """
         Decides whether the underlying http request should be exposed as the
@@ -436,9 +909,14 @@ class BaseGateway(object):
 
         @rtype: C{bool}
         """
-        expose_request = service_request.service.mustExposeRequest(
-            service_request
-        )
+        entry = getattr(service_request, 'entry', None)
+
+        if entry is not None:
+            expose_request = entry.expose_request
+        else:
+            expose_request = service_request.service.mustExposeRequest(
+                service_request
+            )
 
         if expose_request is None:
             if self.expose_request is None:
@@ -455,7 +933,12 @@ class BaseGateway(object):
         level and finally to see if there is a global authenticator function
         for the gateway. Returns C{None} if one could not be found.
         """
-        auth = service_request.service.getAuthenticator(service_request)
+        entry = getattr(service_request, 'entry', None)
+
+        if entry is not None:
+            auth = entry.authenticator
+        else:
+            auth = service_request.service.getAuthenticator(service_request)
 
         if auth is None:
             return self.authenticator
@@ -493,7 +976,12 @@ class BaseGateway(object):
         level and finally to see if there is a global preprocessor function
         for the gateway. Returns C{None} if one could not be found.
         """
-        preproc = service_request.service.getPreprocessor(service_request)
+        entry = getattr(service_request, 'entry', None)
+
+        if entry is not None:
+            preproc = entry.preprocessor
+        else:
+            preproc = service_request.service.getPreprocessor(service_request)
 
         if preproc is None:
             return self.preprocessor
@@ -517,15 +1005,104 @@ class BaseGateway(object):
 
         return processor(*args)
 
+    def getCacheTTL(self, service_request):
+        """
+        Returns the number of seconds the result of the service_request may
+        be cached for or C{None} if it is not cacheable. This is granular,
+        looking at the service method first and then at the service level.
+
+        @since: 0.9
+        """
+        entry = getattr(service_request, 'entry', None)
+
+        if entry is not None:
+            return entry.cache_ttl
+
+        return service_request.service.getCacheTTL(service_request)
+
+    def getCacheKey(self, service_request, args):
+        """
+        Returns the key used to cache the result of the service_request or
+        C{None} if the arguments cannot be reliably keyed.
+
+        @since: 0.9
+        """
+        try:
+            return cache.get_key(
+                service_request.service.name,
+                service_request.method,
+                args
+            )
+        except (pyamf.EncodeError, TypeError):
+            if self.logger:
+                self.logger.debug(
+                    'Unable to build cache key for %r',
+                    service_request.method
+                )
+
+            return None
+
     def callServiceRequest(self, service_request, *args, **kwargs):
         """
-        Executes the service_request call
+        Executes the service_request call. If the service method is cacheable,
+        the result is returned from (or stored in) L{cache}. Cached results
+        are stored as AMF0 and AMF3 L{pre-encoded fragments
+        <pyamf.encoded.Encoded>} so that they do not need to be encoded again
+        when the response is written, whichever encoding the response
+        bodies are written in (see L{amf3_responses}).
         """
+        ttl = self.getCacheTTL(service_request)
+        key = None
+
+        if ttl is not None:
+            key = self.getCacheKey(service_request, args)
+
+        if key is not None:
+            result = self.cache.get(key, self)
+
+            if result is not self:
+                return result
+
         if self.mustExposeRequest(service_request):
             http_request = kwargs.get('http_request', None)
             args = (http_request,) + args
 
-        return service_request(*args)
+        result = service_request(*args)
+
+        if key is None:
+            return result
+
+        timezone_offset = self._get_timezone_offset()
+
+        def store(result):
+            amf3 = encoded.encode(
+                result,
+                pyamf.AMF3,
+                timezone_offset=timezone_offset
+            )
+
+            try:
+                fragment = encoded.encode(
+                    result,
+                    pyamf.AMF0,
+                    timezone_offset=timezone_offset
+                )
+            except pyamf.EncodeError:
+                # the result contains AMF3 only data, AMF0 encoders write
+                # the AMF3 fragment instead
+                fragment = amf3
+            else:
+                fragment.amf3 = amf3
+
+            self.cache.set(key, fragment, ttl)
+
+            return fragment
+
+        if hasattr(result, 'addCallback'):
+            # a deferred result (e.g. Twisted) is stored once it has fired
+            return result.addCallback(store)
+
+        return store(result)
 
 
 def authenticate(func, c, expose_request=False):
@@ -603,6 +1180,77 @@ def preprocess(func, c, expose_request=False):
     return func
 
 
+def cacheable(func, ttl=0):
+    """
+    A decorator that marks a service method as cacheable. The result of the
+    method is cached by the gateway for C{ttl} seconds (C{0} means until it is
+    evicted) based on the arguments of the call.
+
+    @raise TypeError: C{func} must be callable.
+    @since: 0.9
+    """
+    if not python.callable(func):
+        raise TypeError('func must be callable')
+
+    if isinstance(func, types.UnboundMethodType):
+        setattr(func.im_func, '_pyamf_cache_ttl', ttl)
+    else:
+        setattr(func, '_pyamf_cache_ttl', ttl)
+
+    return func
+
+
+def get_targets(request):
+    """
+    Returns a list of the services targeted by the messages of an AMF
+    request. For Flex RemoteObject messages, the destination and operation
+    are used.
+
+    @type request: L{Envelope<pyamf.remoting.Envelope>} or C{None}
+    @since: 0.9
+    """
+    from pyamf.flex import messaging
+
+    if request is None:
+        return []
+
+    targets = []
+
+    for name, message in request:
+        target = message.target
+
+        body = message.body
+
+        if isinstance(body, (list, tuple)) and body and isinstance(
+                body[0], messaging.RemotingMessage):
+            from pyamf.remoting import amf3
+
+            target = amf3.get_service_name(body[0])
+
+        targets.append(target)
+
+    return targets
+
+
+def get_flash_version(header):
+    """
+    Returns the major version of the Flash Player from the value of the
+    C{x-flash-version} header (e.g. C{'10,1,53,64'}) or C{None} if it could
+    not be determined.
+
+    @type header: C{str} or C{None}
+    @rtype: C{int} or C{None}
+    @since: 0.9
+    """
+    if not header:
+        return None
+
+    try:
+        return int(header.split(',', 1)[0].strip())
+    except ValueError:
+        return None
+
+
 def format_exception():
     import traceback
 
@@ -13,7 +13,7 @@ servers.
 
 import pyamf
 from pyamf import remoting
-from pyamf.remoting import gateway
+from pyamf.remoting import gateway, compression, spool
 
 
 django = __import__('django.http')
@@ -94,21 +94,60 @@ class DjangoGateway(gateway.BaseGateway):
 
         stream = None
         timezone_offset = self._get_timezone_offset()
+        timer = self.getTimer()
 
         try:
             body = http_request.body
         except AttributeError:
             body = http_request.raw_post_data
 
+        request_bytes = len(body)
+        content_encoding = http_request.META.get('HTTP_CONTENT_ENCODING', None)
+
+        if not self.acceptsRequestEncoding(content_encoding):
+            http_response = http.HttpResponse(
+                content_type='text/plain',
+                content="415 Unsupported Media Type\n\nCompressed request "
+                    "bodies are not accepted"
+            )
+            http_response.status_code = 415
+
+            return http_response
+
         # Decode the request
         try:
+            body = compression.decompress(
+                body,
+                content_encoding,
+                self.max_decompressed_size
+            )
+
             request = remoting.decode(
                 body,
                 strict=self.strict,
                 logger=self.logger,
-                timezone_offset=timezone_offset
+                timezone_offset=timezone_offset,
+                pool=self.pool
+            )
+        except compression.SizeLimitError:
+            timer.mark('decode')
+            self.recordRequest(timer, request_bytes, error=True)
+
+            if self.logger:
+                self.logger.exception('Decompressed AMF request too large')
+
+            http_response = http.HttpResponse(
+                content_type='text/plain',
+                content="413 Request Entity Too Large\n\nThe decompressed "
+                    "request body is too large"
             )
+            http_response.status_code = 413
+
+            return http_response
         except (pyamf.DecodeError, IOError):
+            timer.mark('decode')
+            self.recordRequest(timer, request_bytes, error=True)
+
             if self.logger:
                 self.logger.exception('Error decoding AMF request')
 
@@ -132,6 +171,9 @@ class DjangoGateway(gateway.BaseGateway):
         except (KeyboardInterrupt, SystemExit):
             raise
         except:
+            timer.mark('decode')
+            self.recordRequest(timer, request_bytes, error=True)
+
             if self.logger:
                 self.logger.exception('Unexpected error decoding AMF request')
 
@@ -148,12 +190,22 @@ class DjangoGateway(gateway.BaseGateway):
                 content=response
             )
 
+        timer.mark('decode')
+
         # Process the request
         try:
             response = self.getResponse(http_request, request)
         except (KeyboardInterrupt, SystemExit):
             raise
         except:
+            timer.mark('process')
+            self.recordRequest(
+                timer,
+                request_bytes,
+                error=True,
+                request=request
+            )
+
             if self.logger:
                 self.logger.exception('Error processing AMF request')
 
@@ -170,15 +222,31 @@ class DjangoGateway(gateway.BaseGateway):
                 content=response
             )
 
+        timer.mark('process')
+
         # Encode the response
         try:
             stream = remoting.encode(
                 response,
                 strict=self.strict,
                 logger=self.logger,
-                timezone_offset=timezone_offset
+                timezone_offset=timezone_offset,
+                stream=self.getResponseStream(),
+                pool=self.pool,
+                amf3_bodies=self.useAMF3Bodies(
+                    response,
+                    http_request.META.get('HTTP_X_FLASH_VERSION', None)
+                )
             )
         except:
+            timer.mark('encode')
+            self.recordRequest(
+                timer,
+                request_bytes,
+                error=True,
+                request=request
+            )
+
             if self.logger:
                 self.logger.exception('Error encoding AMF request')
 
@@ -193,12 +261,73 @@ class DjangoGateway(gateway.BaseGateway):
             return http.HttpResponseServerError(
                 content_type='text/plain', content=response)
 
+        timer.mark('encode')
+        self.recordRequest(
+            timer,
+            request_bytes,
+            len(stream),
+            request=request
+        )
+
+        encoding = self.getResponseEncoding(
+            http_request.META.get('HTTP_ACCEPT_ENCODING', None),
+            len(stream)
+        )
+
+        if encoding is not None:
+            stream.seek(0)
+
+            content = compression.iter_compress(
+                stream,
+                encoding,
+                self.compression_level
+            )
+
+            # StreamingHttpResponse is only available in Django 1.5+
+            response_class = getattr(
+                http, 'StreamingHttpResponse', http.HttpResponse
+            )
+
+            http_response = response_class(
+                content,
+                content_type=remoting.CONTENT_TYPE
+            )
+            http_response['Server'] = gateway.SERVER_NAME
+            http_response['Content-Encoding'] = encoding
+            http_response['Vary'] = 'Accept-Encoding'
+
+            return http_response
+
+        vary = None
+
+        if self.compression:
+            # uncompressed responses still depend on Accept-Encoding
+            vary = 'Accept-Encoding'
+
+        if getattr(stream, 'rolled', False) and \
+                hasattr(http, 'StreamingHttpResponse'):
+            # the response was spooled to disk
+            http_response = http.StreamingHttpResponse(
+                spool.iter_stream(stream),
+                content_type=remoting.CONTENT_TYPE
+            )
+            http_response['Server'] = gateway.SERVER_NAME
+            http_response['Content-Length'] = str(len(stream))
+
+            if vary:
+                http_response['Vary'] = vary
+
+            return http_response
+
         buf = stream.getvalue()
 
         http_response = http.HttpResponse(content_type=remoting.CONTENT_TYPE)
         http_response['Server'] = gateway.SERVER_NAME
         http_response['Content-Length'] = str(len(buf))
 
+        if vary:
+            http_response['Vary'] = vary
+
         http_response.write(buf)
 
         return http_response
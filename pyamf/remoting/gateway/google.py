@@ -150,7 +150,11 @@ class WebAppGateway(webapp.RequestHandler, gateway.BaseGateway):
                 response,
                 strict=self.strict,
                 logger=self.logger,
-                timezone_offset=timezone_offset
+                timezone_offset=timezone_offset,
+                amf3_bodies=self.useAMF3Bodies(
+                    response,
+                    self.request.headers.get('X-Flash-Version', None)
+                )
             )
         except:
             if self.logger:
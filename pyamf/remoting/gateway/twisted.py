@@ -15,7 +15,7 @@ import sys
 import os.path
 
 from pyamf import remoting
-from pyamf.remoting import gateway, amf0, amf3
+from pyamf.remoting import gateway, amf0, amf3, compression, spool
 
 try:
     sys.path.remove('')
@@ -29,17 +29,240 @@ except ValueError:
 
 twisted = __import__('twisted')
 __import__('twisted.internet.defer')
+__import__('twisted.internet.interfaces')
 __import__('twisted.internet.threads')
 __import__('twisted.web.resource')
 __import__('twisted.web.server')
 
+from zope.interface import implementer
+
 defer = twisted.internet.defer
+interfaces = twisted.internet.interfaces
 threads = twisted.internet.threads
 resource = twisted.web.resource
 server = twisted.web.server
 
 __all__ = ['TwistedGateway']
 
+#: Requests (and responses) smaller than this number of bytes are decoded
+#: (and encoded) on the reactor thread, larger ones are offloaded.
+DEFAULT_OFFLOAD_THRESHOLD = 64 * 1024
+
+
+def estimate_size(obj, limit):
+    """
+    Returns a rough estimate of the number of bytes C{obj} encodes to. The
+    object graph is only walked until the estimate reaches C{limit}, so the
+    cost of this function is bounded.
+
+    @since: 0.9
+    """
+    size = 0
+    stack = [obj]
+    seen = set()
+
+    while stack and size < limit:
+        obj = stack.pop()
+
+        if isinstance(obj, basestring):
+            size += len(obj) + 3
+
+            continue
+
+        if id(obj) in seen:
+            size += 3
+
+            continue
+
+        if isinstance(obj, (list, tuple)):
+            seen.add(id(obj))
+            size += 5
+            stack.extend(obj)
+        elif isinstance(obj, dict):
+            seen.add(id(obj))
+            size += 5
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif hasattr(obj, '__dict__'):
+            seen.add(id(obj))
+            size += 5
+            stack.append(obj.__dict__)
+        else:
+            size += 9
+
+    return size
+
+
+def decode_request(body, content_encoding=None, max_size=None, **kwargs):
+    """
+    Decompresses (if required) and decodes a request body. L{TwistedGateway}
+    offloads this function for large requests. It only takes and returns
+    picklable values so that C{offload} may run it in another process.
+
+    @param body: The request body.
+    @type body: C{str}
+    @param content_encoding: The C{Content-Encoding} of the body.
+    @param max_size: The maximum size of a compressed body once it has been
+        decompressed, see L{compression.decompress}.
+    @param kwargs: Passed to L{remoting.decode<pyamf.remoting.decode>}.
+    @rtype: L{Envelope<pyamf.remoting.Envelope>}
+    @since: 0.9
+    """
+    body = compression.decompress(body, content_encoding, max_size)
+
+    return remoting.decode(body, **kwargs)
+
+
+def encode_response(amf_response, encoding=None, compression_threshold=0,
+                    compression_level=compression.DEFAULT_LEVEL, **kwargs):
+    """
+    Encodes and compresses (if required) a response. L{TwistedGateway}
+    offloads this function for large responses when C{offload_to_process} is
+    set. It only takes and returns picklable values so that C{offload} may
+    run it in another process, so the whole response is returned as a
+    C{str}.
+
+    @param amf_response: The AMF response.
+    @type amf_response: L{Envelope<pyamf.remoting.Envelope>}
+    @param encoding: The content-coding accepted by the client or C{None}.
+    @param compression_threshold: Encoded responses smaller than this number
+        of bytes are not compressed.
+    @param compression_level: The zlib compression level.
+    @param kwargs: Passed to L{remoting.encode<pyamf.remoting.encode>}.
+    @return: A tuple containing the content-coding that was applied (or
+        C{None}), the response body and the size of the encoded response
+        (before compression).
+    @since: 0.9
+    """
+    body = remoting.encode(amf_response, **kwargs).getvalue()
+    size = len(body)
+
+    if encoding is None or size < compression_threshold:
+        return None, body, size
+
+    body = compression.compress(body, encoding, compression_level)
+
+    return encoding, body, size
+
+
+def stream_response(amf_response, encoding=None, compression_threshold=0,
+                    compression_level=compression.DEFAULT_LEVEL, **kwargs):
+    """
+    Encodes a response that is written to the client by a L{ResponseProducer}
+    in this process. Unlike L{encode_response}, the response is never held
+    as a C{str}: the encoded stream (which may be spooled to disk, see
+    C{stream}) or a generator that compresses it chunk by chunk is returned.
+
+    @param kwargs: Passed to L{remoting.encode<pyamf.remoting.encode>}.
+    @return: A tuple containing the content-coding that will be applied (or
+        C{None}), the response body and the size of the encoded response
+        (before compression).
+    @since: 0.9
+    """
+    stream = remoting.encode(amf_response, **kwargs)
+    size = len(stream)
+
+    stream.seek(0)
+
+    if encoding is None or size < compression_threshold:
+        return None, stream, size
+
+    return encoding, _iter_compress(stream, encoding, compression_level), size
+
+
+def _iter_compress(stream, encoding, level):
+    """
+    Compresses C{stream} with L{compression.iter_compress}, closing it once
+    it has been exhausted (or the client has gone away).
+    """
+    try:
+        for chunk in compression.iter_compress(stream, encoding, level):
+            yield chunk
+    finally:
+        spool.close_stream(stream)
+
+
+def _iter_string(body, chunk_size):
+    """
+    Yields C{body} in chunks of C{chunk_size} bytes. Only one chunk is copied
+    at a time (C{buffer} objects cannot be written to a Twisted transport).
+    """
+    for i in xrange(0, len(body), chunk_size):
+        yield body[i:i + chunk_size]
+
+
+@implementer(interfaces.IPushProducer)
+class ResponseProducer(object):
+    """
+    Writes an encoded response to the client in chunks, pausing whenever the
+    transport's buffer is full so that a slow client does not cause the whole
+    response to be buffered in memory.
+
+    @ivar deferred: Fires once the response has been written (or the client
+        has gone away).
+    @since: 0.9
+    """
+
+    def __init__(self, request, body, chunk_size=spool.CHUNK_SIZE):
+        """
+        @param request: The HTTP request.
+        @param body: The response body. A stream positioned at the start, a
+            C{str} or a generator of chunks (see L{stream_response}).
+        """
+        self.request = request
+
+        if isinstance(body, str):
+            self.chunks = _iter_string(body, chunk_size)
+        elif hasattr(body, 'read'):
+            self.chunks = spool.iter_stream(body, chunk_size)
+        else:
+            self.chunks = body
+        self.paused = False
+        self.deferred = defer.Deferred()
+
+    def start(self):
+        """
+        Registers with the request and starts writing the response.
+
+        @rtype: C{Deferred}
+        """
+        self.request.registerProducer(self, True)
+        self.resumeProducing()
+
+        return self.deferred
+
+    def _done(self):
+        if self.deferred.called:
+            return
+
+        close = getattr(self.chunks, 'close', None)
+
+        if close is not None:
+            close()
+        self.request.unregisterProducer()
+        self.deferred.callback(None)
+
+    def resumeProducing(self):
+        self.paused = False
+
+        while not self.paused and not self.deferred.called:
+            try:
+                chunk = self.chunks.next()
+            except StopIteration:
+                self._done()
+                self.request.finish()
+
+                return
+
+            # may call pauseProducing
+            self.request.write(chunk)
+
+    def pauseProducing(self):
+        self.paused = True
+
+    def stopProducing(self):
+        self._done()
+
 
 class AMF0RequestProcessor(amf0.RequestProcessor):
     """
@@ -62,6 +285,9 @@ class AMF0RequestProcessor(amf0.RequestProcessor):
 
         response = remoting.Response(None)
         deferred_response = defer.Deferred()
+        timer = self.gateway.getCallTimer(service_request)
+        # the phase that is running, for the errback
+        phase = ['auth']
 
         def eb(failure):
             errMesg = "%s: %s" % (failure.type, failure.getErrorMessage())
@@ -70,15 +296,24 @@ class AMF0RequestProcessor(amf0.RequestProcessor):
                 self.gateway.logger.error(errMesg)
                 self.gateway.logger.info(failure.getTraceback())
 
+            timer.mark(phase[0])
+            self.gateway.recordCall(service_request, timer, error=True)
+
             deferred_response.callback(self.buildErrorResponse(
                 request, (failure.type, failure.value, failure.tb)))
 
         def response_cb(result):
             response.body = result
 
+            timer.mark('call')
+            self.gateway.recordCall(service_request, timer)
+
             deferred_response.callback(response)
 
         def preprocess_cb(result):
+            timer.mark('preprocess')
+            phase[0] = 'call'
+
             d = defer.maybeDeferred(
                 self._getBody,
                 request,
@@ -90,6 +325,8 @@ class AMF0RequestProcessor(amf0.RequestProcessor):
             d.addCallback(response_cb).addErrback(eb)
 
         def auth_cb(result):
+            timer.mark('auth')
+
             if result is not True:
                 response.status = remoting.STATUS_ERROR
                 response.body = remoting.ErrorFault(
@@ -97,10 +334,14 @@ class AMF0RequestProcessor(amf0.RequestProcessor):
                     description='Authentication failed'
                 )
 
+                self.gateway.recordCall(service_request, timer, error=True)
+
                 deferred_response.callback(response)
 
                 return
 
+            phase[0] = 'preprocess'
+
             d = defer.maybeDeferred(
                 self.gateway.preprocessRequest,
                 service_request,
@@ -141,6 +382,9 @@ class AMF3RequestProcessor(amf3.RequestProcessor):
                 status=remoting.STATUS_ERROR))
 
         deferred_response = defer.Deferred()
+        timer = self.gateway.getCallTimer(service_request)
+        # the phase that is running, for the errback
+        phase = ['preprocess']
 
         def eb(failure):
             errMesg = "%s: %s" % (failure.type, failure.getErrorMessage())
@@ -149,6 +393,9 @@ class AMF3RequestProcessor(amf3.RequestProcessor):
                 self.gateway.logger.error(errMesg)
                 self.gateway.logger.error(failure.getTraceback())
 
+            timer.mark(phase[0])
+            self.gateway.recordCall(service_request, timer, error=True)
+
             ro_response = self.buildErrorResponse(ro_request, (failure.type,
                                                   failure.value, failure.tb))
             deferred_response.callback(
@@ -159,9 +406,15 @@ class AMF3RequestProcessor(amf3.RequestProcessor):
             ro_response.body = result
             res = remoting.Response(ro_response)
 
+            timer.mark('call')
+            self.gateway.recordCall(service_request, timer)
+
             deferred_response.callback(res)
 
         def process_cb(result):
+            timer.mark('preprocess')
+            phase[0] = 'call'
+
             d = defer.maybeDeferred(
                 self.gateway.callServiceRequest,
                 service_request,
@@ -225,6 +478,28 @@ class TwistedGateway(gateway.BaseGateway, resource.Resource):
     @ivar expose_request: Forces the underlying HTTP request to be the first
         argument to any service call.
     @type expose_request: C{bool}
+    @ivar offload: Called as C{offload(func, *args, **kwargs)} to run the
+        decoding or encoding of large requests/responses away from the
+        reactor, must return a C{Deferred}. C{func} is L{decode_request} and
+        L{stream_response} (or L{encode_response} if C{offload_to_process}
+        is set). Defaults to C{threads.deferToThread}. Since 0.9
+    @ivar offload_to_process: Set if C{offload} runs C{func} in another
+        process (e.g. a C{multiprocessing} pool, in which case the gateway's
+        C{pool} must not be set). The arguments and results of the offloaded
+        functions are then picklable, so large responses are returned to
+        the reactor as a C{str} rather than a (spooled) stream and
+        L{response_spool_size
+        <pyamf.remoting.gateway.BaseGateway.response_spool_size>} cannot be
+        used. Default is C{False}. Since 0.9
+    @type offload_to_process: C{bool}
+    @ivar offload_threshold: Requests and (estimated) responses smaller than
+        this number of bytes are decoded and encoded on the reactor thread.
+        C{0} offloads everything, C{None} nothing. Default is
+        L{DEFAULT_OFFLOAD_THRESHOLD}. Since 0.9
+    @type offload_threshold: C{int} or C{None}
+    @ivar chunk_size: Responses are written to the client in chunks of this
+        number of bytes by a L{ResponseProducer}. Since 0.9
+    @type chunk_size: C{int}
     """
 
     allowedMethods = ('POST',)
@@ -233,9 +508,22 @@ class TwistedGateway(gateway.BaseGateway, resource.Resource):
         if 'expose_request' not in kwargs:
             kwargs['expose_request'] = True
 
+        self.offload = kwargs.pop('offload', threads.deferToThread)
+        self.offload_to_process = kwargs.pop('offload_to_process', False)
+        self.offload_threshold = kwargs.pop(
+            'offload_threshold',
+            DEFAULT_OFFLOAD_THRESHOLD
+        )
+        self.chunk_size = kwargs.pop('chunk_size', spool.CHUNK_SIZE)
+
         gateway.BaseGateway.__init__(self, *args, **kwargs)
         resource.Resource.__init__(self)
 
+        if self.offload_to_process and self.response_spool_size is not None:
+            raise ValueError(
+                'response_spool_size cannot be used with offload_to_process'
+            )
+
     def _finaliseRequest(self, request, status, content,
                          mimetype='text/plain'):
         """
@@ -259,6 +547,38 @@ class TwistedGateway(gateway.BaseGateway, resource.Resource):
         request.write(content)
         request.finish()
 
+    def _offload(self, size, func, *args, **kwargs):
+        """
+        Calls C{func} on the reactor thread if C{size} is below
+        L{offload_threshold}, otherwise via L{offload}.
+
+        @rtype: C{Deferred}
+        @since: 0.9
+        """
+        threshold = self.offload_threshold
+
+        if threshold is None or size < threshold:
+            return defer.maybeDeferred(func, *args, **kwargs)
+
+        return self.offload(func, *args, **kwargs)
+
+    def _getCodecOptions(self):
+        """
+        Returns the options passed to L{decode_request} and
+        L{encode_response}. The logger is left out as it cannot be pickled.
+
+        @since: 0.9
+        """
+        options = {
+            'strict': self.strict,
+            'timezone_offset': self._get_timezone_offset(),
+        }
+
+        if self.pool is not None:
+            options['pool'] = self.pool
+
+        return options
+
     def render_POST(self, request):
         """
         Read remoting request from the client.
@@ -266,10 +586,28 @@ class TwistedGateway(gateway.BaseGateway, resource.Resource):
         @type request: The HTTP Request.
         @param request: C{twisted.web.http.Request}
         """
+        timer = self.getTimer()
+
         def handleDecodeError(failure):
             """
             Return HTTP 400 Bad Request.
             """
+            timer.mark('decode')
+            self.recordRequest(timer, request_bytes, error=True)
+
+            if failure.check(compression.SizeLimitError):
+                if self.logger:
+                    self.logger.error('Decompressed AMF request too large')
+
+                self._finaliseRequest(
+                    request,
+                    413,
+                    "413 Request Entity Too Large\n\nThe decompressed "
+                    "request body is too large"
+                )
+
+                return
+
             errMesg = "%s: %s" % (failure.type, failure.getErrorMessage())
 
             if self.logger:
@@ -284,40 +622,106 @@ class TwistedGateway(gateway.BaseGateway, resource.Resource):
 
             self._finaliseRequest(request, 400, body)
 
+        content_encoding = request.getHeader('Content-Encoding')
+
+        if not self.acceptsRequestEncoding(content_encoding):
+            self._finaliseRequest(
+                request,
+                415,
+                "415 Unsupported Media Type\n\nCompressed request bodies "
+                "are not accepted"
+            )
+
+            return server.NOT_DONE_YET
+
         request.content.seek(0, 0)
-        timezone_offset = self._get_timezone_offset()
-
-        d = threads.deferToThread(
-            remoting.decode,
-            request.content.read(),
-            strict=self.strict,
-            logger=self.logger,
-            timezone_offset=timezone_offset
+        body = request.content.read()
+        request_bytes = len(body)
+
+        d = self._offload(
+            request_bytes,
+            decode_request,
+            body,
+            content_encoding,
+            self.max_decompressed_size,
+            **self._getCodecOptions()
         )
 
         def cb(amf_request):
+            timer.mark('decode')
+
             x = self.getResponse(request, amf_request)
 
-            x.addCallback(self.sendResponse, request)
+            x.addCallback(
+                self.sendResponse,
+                request,
+                timer=timer,
+                amf_request=amf_request,
+                request_bytes=request_bytes
+            )
 
         # Process the request
         d.addCallback(cb).addErrback(handleDecodeError)
 
         return server.NOT_DONE_YET
 
-    def sendResponse(self, amf_response, request):
+    def sendResponse(self, amf_response, request, timer=None,
+                     amf_request=None, request_bytes=None):
+        """
+        Encodes the response in a separate thread and writes it to the
+        client.
+
+        @param timer: Times the phases of the request. Since 0.9
+        @param amf_request: The decoded request. Since 0.9
+        @param request_bytes: The size of the request body. Since 0.9
+        """
+        if timer is None:
+            timer = self.getTimer()
+
+        timer.mark('process')
+
         def cb(result):
-            self._finaliseRequest(
-                request,
-                200,
-                result.getvalue(),
-                remoting.CONTENT_TYPE
+            encoding, body, size = result
+
+            timer.mark('encode')
+            self.recordRequest(
+                timer,
+                request_bytes,
+                size,
+                request=amf_request
             )
 
+            request.setResponseCode(200)
+
+            request.setHeader('Content-Type', remoting.CONTENT_TYPE)
+            request.setHeader('Server', gateway.SERVER_NAME)
+
+            if encoding is None or isinstance(body, str):
+                # the length of a response that is compressed as it is
+                # written is not known
+                request.setHeader('Content-Length', str(len(body)))
+
+            if encoding is not None:
+                request.setHeader('Content-Encoding', encoding)
+
+            if self.compression:
+                # uncompressed responses still depend on Accept-Encoding
+                request.setHeader('Vary', 'Accept-Encoding')
+
+            return ResponseProducer(request, body, self.chunk_size).start()
+
         def eb(failure):
             """
             Return 500 Internal Server Error.
             """
+            timer.mark('encode')
+            self.recordRequest(
+                timer,
+                request_bytes,
+                error=True,
+                request=amf_request
+            )
+
             errMesg = "%s: %s" % (failure.type, failure.getErrorMessage())
 
             if self.logger:
@@ -334,14 +738,42 @@ class TwistedGateway(gateway.BaseGateway, resource.Resource):
 
             self._finaliseRequest(request, 500, body)
 
-        timezone_offset = self._get_timezone_offset()
-        d = threads.deferToThread(
-            remoting.encode,
+        threshold = self.offload_threshold
+        size = 0
+
+        if threshold:
+            size = estimate_size(
+                [message.body for name, message in amf_response],
+                threshold
+            )
+
+        encoding = None
+
+        if self.compression:
+            encoding = compression.get_accepted_encoding(
+                request.getHeader('Accept-Encoding')
+            )
+
+        args = (
             amf_response,
-            strict=self.strict,
-            logger=self.logger,
-            timezone_offset=timezone_offset
+            encoding,
+            self.compression_threshold,
+            self.compression_level
         )
+        options = self._getCodecOptions()
+        options['amf3_bodies'] = self.useAMF3Bodies(
+            amf_response,
+            request.getHeader('X-Flash-Version')
+        )
+
+        if self.offload_to_process and not (
+                threshold is None or size < threshold):
+            # the response has to be pickled to return it to the reactor
+            d = self.offload(encode_response, *args, **options)
+        else:
+            options['stream'] = self.getResponseStream()
+
+            d = self._offload(size, stream_response, *args, **options)
 
         d.addCallback(cb).addErrback(eb)
 
@@ -24,16 +24,60 @@ of view.
 
 import pyamf
 from pyamf import remoting
-from pyamf.remoting import gateway
+from pyamf.remoting import gateway, compression, spool
 
 __all__ = ['WSGIGateway']
 
 
+def get_content_length(environ):
+    """
+    Returns the length of the request body or C{None} if the body is chunked,
+    in which case it must be read until C{wsgi.input} is exhausted.
+
+    @raise ValueError: The length of the body is missing or invalid.
+    @since: 0.9
+    """
+    length = environ.get('CONTENT_LENGTH', None)
+
+    if length:
+        length = int(length)
+
+        if length < 0:
+            raise ValueError('Invalid Content-Length %r' % (length,))
+
+        return length
+
+    transfer_encoding = environ.get('HTTP_TRANSFER_ENCODING', '')
+
+    if environ.get('wsgi.input_terminated', False) or \
+            'chunked' in transfer_encoding.lower():
+        return None
+
+    raise ValueError('Content-Length required')
+
+
 class WSGIGateway(gateway.BaseGateway):
     """
     WSGI Remoting Gateway.
+
+    The request body is read from C{wsgi.input} in chunks and decoded from a
+    single buffer (see L{pyamf.remoting.spool}).
+
+    @ivar read_size: The maximum number of bytes read from C{wsgi.input} in
+        one go. Since 0.9
+    @type read_size: C{int}
+    @ivar spool_size: Request bodies larger than this number of bytes are
+        spooled to a temporary file. C{None} keeps all bodies in memory.
+        Since 0.9
+    @type spool_size: C{int} or C{None}
     """
 
+    def __init__(self, *args, **kwargs):
+        self.read_size = kwargs.pop('read_size', spool.READ_SIZE)
+        self.spool_size = kwargs.pop('spool_size', spool.SPOOL_SIZE)
+
+        gateway.BaseGateway.__init__(self, *args, **kwargs)
+
     def getResponse(self, request, environ):
         """
         Processes the AMF request, returning an AMF response.
@@ -67,6 +111,58 @@ class WSGIGateway(gateway.BaseGateway):
 
         return [response]
 
+    def lengthRequired(self, environ, start_response):
+        """
+        Return HTTP 411 Length Required.
+
+        @since: 0.9
+        """
+        response = "411 Length Required\n\nA valid Content-Length is " \
+            "required or the request body must be chunked"
+
+        start_response('411 Length Required', [
+            ('Content-Type', 'text/plain'),
+            ('Content-Length', str(len(response))),
+            ('Server', gateway.SERVER_NAME),
+        ])
+
+        return [response]
+
+    def unsupportedMediaType(self, environ, start_response):
+        """
+        Return HTTP 415 Unsupported Media Type for compressed request bodies
+        that are not accepted.
+
+        @since: 0.9
+        """
+        response = "415 Unsupported Media Type\n\nCompressed request " \
+            "bodies are not accepted"
+
+        start_response('415 Unsupported Media Type', [
+            ('Content-Type', 'text/plain'),
+            ('Content-Length', str(len(response))),
+            ('Server', gateway.SERVER_NAME),
+        ])
+
+        return [response]
+
+    def requestEntityTooLarge(self, environ, start_response):
+        """
+        Return HTTP 413 Request Entity Too Large.
+
+        @since: 0.9
+        """
+        response = "413 Request Entity Too Large\n\nThe decompressed " \
+            "request body is too large"
+
+        start_response('413 Request Entity Too Large', [
+            ('Content-Type', 'text/plain'),
+            ('Content-Length', str(len(response))),
+            ('Server', gateway.SERVER_NAME),
+        ])
+
+        return [response]
+
     def __call__(self, environ, start_response):
         """
         @rtype: C{StringIO}
@@ -75,19 +171,54 @@ class WSGIGateway(gateway.BaseGateway):
         if environ['REQUEST_METHOD'] != 'POST':
             return self.badRequestMethod(environ, start_response)
 
-        body = environ['wsgi.input'].read(int(environ['CONTENT_LENGTH']))
+        timer = self.getTimer()
+        input = environ['wsgi.input']
+
+        try:
+            length = get_content_length(environ)
+        except ValueError:
+            return self.lengthRequired(environ, start_response)
+
+        content_encoding = environ.get('HTTP_CONTENT_ENCODING', None)
+
+        if not self.acceptsRequestEncoding(content_encoding):
+            return self.unsupportedMediaType(environ, start_response)
+
+        request_bytes = None
         stream = None
+        body = None
         timezone_offset = self._get_timezone_offset()
 
         # Decode the request
         try:
+            body, request_bytes = spool.read_body(
+                input,
+                length,
+                content_encoding,
+                self.read_size,
+                self.spool_size,
+                self.max_decompressed_size
+            )
+
             request = remoting.decode(
                 body,
                 strict=self.strict,
                 logger=self.logger,
-                timezone_offset=timezone_offset
+                timezone_offset=timezone_offset,
+                pool=self.pool
             )
+        except compression.SizeLimitError:
+            timer.mark('decode')
+            self.recordRequest(timer, request_bytes, error=True)
+
+            if self.logger:
+                self.logger.exception('Decompressed AMF request too large')
+
+            return self.requestEntityTooLarge(environ, start_response)
         except (pyamf.DecodeError, IOError):
+            timer.mark('decode')
+            self.recordRequest(timer, request_bytes, error=True)
+
             if self.logger:
                 self.logger.exception('Error decoding AMF request')
 
@@ -107,6 +238,9 @@ class WSGIGateway(gateway.BaseGateway):
         except (KeyboardInterrupt, SystemExit):
             raise
         except:
+            timer.mark('decode')
+            self.recordRequest(timer, request_bytes, error=True)
+
             if self.logger:
                 self.logger.exception('Unexpected error decoding AMF request')
 
@@ -125,6 +259,10 @@ class WSGIGateway(gateway.BaseGateway):
             ])
 
             return [response]
+        finally:
+            spool.close_stream(body)
+
+        timer.mark('decode')
 
         # Process the request
         try:
@@ -132,6 +270,14 @@ class WSGIGateway(gateway.BaseGateway):
         except (KeyboardInterrupt, SystemExit):
             raise
         except:
+            timer.mark('process')
+            self.recordRequest(
+                timer,
+                request_bytes,
+                error=True,
+                request=request
+            )
+
             if self.logger:
                 self.logger.exception('Error processing AMF request')
 
@@ -151,14 +297,30 @@ class WSGIGateway(gateway.BaseGateway):
 
             return [response]
 
+        timer.mark('process')
+
         # Encode the response
         try:
             stream = remoting.encode(
                 response,
                 strict=self.strict,
-                timezone_offset=timezone_offset
+                timezone_offset=timezone_offset,
+                stream=self.getResponseStream(),
+                pool=self.pool,
+                amf3_bodies=self.useAMF3Bodies(
+                    response,
+                    environ.get('HTTP_X_FLASH_VERSION', None)
+                )
             )
         except:
+            timer.mark('encode')
+            self.recordRequest(
+                timer,
+                request_bytes,
+                error=True,
+                request=request
+            )
+
             if self.logger:
                 self.logger.exception('Error encoding AMF request')
 
@@ -178,12 +340,53 @@ class WSGIGateway(gateway.BaseGateway):
 
             return [response]
 
+        timer.mark('encode')
+        self.recordRequest(
+            timer,
+            request_bytes,
+            len(stream),
+            request=request
+        )
+
+        encoding = self.getResponseEncoding(
+            environ.get('HTTP_ACCEPT_ENCODING', None),
+            len(stream)
+        )
+        headers = [
+            ('Content-Type', remoting.CONTENT_TYPE),
+            ('Server', gateway.SERVER_NAME),
+        ]
+
+        if self.compression:
+            # the response depends on Accept-Encoding whether it is
+            # compressed or not
+            headers.append(('Vary', 'Accept-Encoding'))
+
+        if encoding is not None:
+            stream.seek(0)
+
+            start_response('200 OK', headers + [
+                ('Content-Encoding', encoding),
+            ])
+
+            return compression.iter_compress(
+                stream,
+                encoding,
+                self.compression_level
+            )
+
+        if getattr(stream, 'rolled', False):
+            # the response was spooled to disk
+            start_response('200 OK', headers + [
+                ('Content-Length', str(len(stream))),
+            ])
+
+            return spool.iter_stream(stream)
+
         response = stream.getvalue()
 
-        start_response('200 OK', [
-            ('Content-Type', remoting.CONTENT_TYPE),
+        start_response('200 OK', headers + [
             ('Content-Length', str(len(response))),
-            ('Server', gateway.SERVER_NAME),
         ])
 
         return [response]
@@ -0,0 +1,515 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Request metrics for remoting gateways.
+
+When a gateway is created with C{metrics=True} (or a L{Metrics} instance), it
+records:
+
+ - the number of requests, failed requests and the time spent decoding,
+   processing and encoding each request (C{pyamf_requests_total},
+   C{pyamf_request_errors_total} and C{pyamf_request_seconds});
+ - the size of the request and response bodies (C{pyamf_request_bytes} and
+   C{pyamf_response_bytes});
+ - per service and method, the number of calls, the number of calls that
+   resulted in an error and the time spent authenticating, preprocessing and
+   calling the service (C{pyamf_calls_total}, C{pyamf_call_errors_total} and
+   C{pyamf_call_seconds}).
+
+The recorded data can be dumped in the Prometheus text format via
+L{format_text}, served over WSGI with L{MetricsApplication} or pushed
+periodically to an L{exporter<BaseExporter>}.
+
+@since: 0.9
+"""
+
+import time
+import logging
+import threading
+
+
+__all__ = [
+    'Metrics',
+    'Histogram',
+    'Timer',
+    'BaseExporter',
+    'LoggingExporter',
+    'MetricsApplication',
+    'format_text',
+]
+
+#: Upper bounds (in seconds) of the latency histogram buckets.
+DEFAULT_LATENCY_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+#: Upper bounds (in bytes) of the body size histogram buckets.
+DEFAULT_SIZE_BUCKETS = (
+    256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304
+)
+
+#: The default number of seconds between pushes to an exporter.
+DEFAULT_EXPORT_INTERVAL = 60
+
+#: The content type of L{format_text} output.
+TEXT_CONTENT_TYPE = 'text/plain; version=0.0.4'
+
+
+class Histogram(object):
+    """
+    A cumulative histogram of observed values.
+
+    @ivar buckets: The upper bound of each bucket, in ascending order.
+    @ivar counts: The number of observations in each bucket. The last entry
+        holds the observations that are larger than all of the bounds.
+    @ivar count: The total number of observations.
+    @ivar sum: The sum of all observations.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        i = 0
+
+        for bound in self.buckets:
+            if value <= bound:
+                break
+
+            i += 1
+
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def copy(self):
+        h = Histogram(self.buckets)
+
+        h.counts = list(self.counts)
+        h.count = self.count
+        h.sum = self.sum
+
+        return h
+
+
+class Timer(object):
+    """
+    Times the consecutive phases of a request or service call.
+
+    @ivar phases: A list of C{(name, seconds)} tuples, in the order that the
+        phases were marked.
+    """
+
+    def __init__(self):
+        self.start = self.last = time.time()
+        self.phases = []
+
+    def mark(self, phase):
+        """
+        Ends the current phase and records its duration against C{phase}.
+        """
+        now = time.time()
+
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def getElapsed(self):
+        """
+        Returns the number of seconds between the creation of the timer and
+        the last marked phase.
+        """
+        return self.last - self.start
+
+
+class NullTimer(object):
+    """
+    A L{Timer} that does nothing, used when metrics are disabled.
+    """
+
+    phases = ()
+
+    def mark(self, phase):
+        pass
+
+    def getElapsed(self):
+        return 0
+
+
+#: Shared instance of L{NullTimer}.
+NULL_TIMER = NullTimer()
+
+
+class Metrics(object):
+    """
+    A thread safe collection of counters and histograms.
+
+    Each metric is identified by a name and a tuple of C{(label, value)}
+    pairs.
+
+    @ivar exporter: If set, the collected data is pushed to this
+        L{exporter<BaseExporter>} at most once every C{export_interval}
+        seconds.
+    @ivar export_in_thread: By default the export runs on the request that
+        happens to cross the C{export_interval}, delaying its response by
+        however long the exporter takes. If C{True}, the export is run in a
+        daemon thread instead, so slow exporters (e.g. ones that push over
+        the network) stay off the request path.
+    @ivar logger: Errors raised by the exporter are logged to this logger (or
+        the C{logging} module if it is C{None}) rather than failing the
+        request that triggered the export.
+    """
+
+    def __init__(self, latency_buckets=DEFAULT_LATENCY_BUCKETS,
+                 size_buckets=DEFAULT_SIZE_BUCKETS, exporter=None,
+                 export_interval=DEFAULT_EXPORT_INTERVAL,
+                 export_in_thread=False, logger=None):
+        self.latency_buckets = tuple(latency_buckets)
+        self.size_buckets = tuple(size_buckets)
+        self.exporter = exporter
+        self.export_interval = export_interval
+        self.export_in_thread = export_in_thread
+        self.logger = logger
+
+        self._lock = threading.Lock()
+        self._last_export = time.time()
+
+        self.reset()
+
+    def reset(self):
+        """
+        Discards all of the collected data.
+        """
+        self._lock.acquire()
+
+        try:
+            self._counters = {}
+            self._histograms = {}
+        finally:
+            self._lock.release()
+
+    def _increment(self, name, labels=(), value=1):
+        key = (name, labels)
+
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def _observe(self, name, value, labels, buckets):
+        key = (name, labels)
+        h = self._histograms.get(key, None)
+
+        if h is None:
+            h = self._histograms[key] = Histogram(buckets)
+
+        h.observe(value)
+
+    def increment(self, name, labels=(), value=1):
+        """
+        Adds C{value} to a counter.
+        """
+        self._lock.acquire()
+
+        try:
+            self._increment(name, labels, value)
+        finally:
+            self._lock.release()
+
+    def observe(self, name, value, labels=(), buckets=None):
+        """
+        Adds an observation to a histogram. The latency buckets are used if
+        C{buckets} is not supplied.
+        """
+        self._lock.acquire()
+
+        try:
+            self._observe(
+                name,
+                value,
+                labels,
+                buckets or self.latency_buckets
+            )
+        finally:
+            self._lock.release()
+
+    def recordRequest(self, timer, request_bytes=None, response_bytes=None,
+                      error=False):
+        """
+        Records a request handled by a gateway.
+
+        @param timer: The timed phases of the request.
+        @type timer: L{Timer}
+        @param request_bytes: The size of the request body.
+        @param response_bytes: The size of the encoded response.
+        @param error: Whether the request failed.
+        """
+        self._lock.acquire()
+
+        try:
+            self._increment('pyamf_requests_total')
+
+            if error:
+                self._increment('pyamf_request_errors_total')
+
+            for phase, elapsed in timer.phases:
+                self._observe(
+                    'pyamf_request_seconds',
+                    elapsed,
+                    (('phase', phase),),
+                    self.latency_buckets
+                )
+
+            self._observe(
+                'pyamf_request_seconds',
+                timer.getElapsed(),
+                (('phase', 'total'),),
+                self.latency_buckets
+            )
+
+            if request_bytes is not None:
+                self._observe(
+                    'pyamf_request_bytes',
+                    request_bytes,
+                    (),
+                    self.size_buckets
+                )
+
+            if response_bytes is not None:
+                self._observe(
+                    'pyamf_response_bytes',
+                    response_bytes,
+                    (),
+                    self.size_buckets
+                )
+        finally:
+            self._lock.release()
+
+        self._checkExport()
+
+    def recordCall(self, service, method, timer, error=False):
+        """
+        Records a call to a service method.
+
+        @param service: The name of the service.
+        @param method: The name of the method or C{None}.
+        @param timer: The timed phases of the call.
+        @type timer: L{Timer}
+        @param error: Whether the call resulted in an error response.
+        """
+        labels = (('service', service or ''), ('method', method or ''))
+
+        self._lock.acquire()
+
+        try:
+            self._increment('pyamf_calls_total', labels)
+
+            if error:
+                self._increment('pyamf_call_errors_total', labels)
+
+            for phase, elapsed in timer.phases:
+                self._observe(
+                    'pyamf_call_seconds',
+                    elapsed,
+                    labels + (('phase', phase),),
+                    self.latency_buckets
+                )
+        finally:
+            self._lock.release()
+
+    def snapshot(self):
+        """
+        Returns a consistent copy of the collected data.
+
+        @return: A tuple containing a C{dict} of counters and a C{dict} of
+            L{Histogram}s, both keyed on C{(name, labels)}.
+        """
+        self._lock.acquire()
+
+        try:
+            histograms = {}
+
+            for key, h in self._histograms.iteritems():
+                histograms[key] = h.copy()
+
+            return dict(self._counters), histograms
+        finally:
+            self._lock.release()
+
+    def _checkExport(self):
+        if self.exporter is None:
+            return
+
+        now = time.time()
+
+        # check and set under the lock so that only one of the requests
+        # crossing the interval triggers the export
+        self._lock.acquire()
+
+        try:
+            if now - self._last_export < self.export_interval:
+                return
+
+            self._last_export = now
+        finally:
+            self._lock.release()
+
+        if not self.export_in_thread:
+            self._export()
+
+            return
+
+        t = threading.Thread(target=self._export, name='pyamf-metrics-export')
+        t.setDaemon(True)
+        t.start()
+
+    def _export(self):
+        """
+        Calls L{export}, logging any error instead of raising it.
+        """
+        try:
+            self.export()
+        except Exception:
+            (self.logger or logging).exception(
+                'Unable to export metrics to %r', self.exporter
+            )
+
+    def export(self):
+        """
+        Pushes a snapshot of the collected data to L{exporter}.
+        """
+        if self.exporter is None:
+            return
+
+        counters, histograms = self.snapshot()
+
+        self.exporter.export(counters, histograms)
+
+
+def _format_labels(labels, extra=()):
+    labels = labels + extra
+
+    if not labels:
+        return ''
+
+    return '{%s}' % (','.join([
+        '%s="%s"' % (name, str(value).replace('\\', '\\\\').replace(
+            '"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    ]),)
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        return repr(value)
+
+    return str(value)
+
+
+def format_text(counters, histograms):
+    """
+    Formats a L{snapshot<Metrics.snapshot>} in the Prometheus text exposition
+    format.
+
+    @rtype: C{str}
+    """
+    lines = []
+    seen = set()
+
+    for (name, labels), value in sorted(counters.iteritems()):
+        if name not in seen:
+            seen.add(name)
+            lines.append('# TYPE %s counter' % (name,))
+
+        lines.append('%s%s %s' % (
+            name,
+            _format_labels(labels),
+            _format_number(value)
+        ))
+
+    for (name, labels), h in sorted(histograms.iteritems()):
+        if name not in seen:
+            seen.add(name)
+            lines.append('# TYPE %s histogram' % (name,))
+
+        total = 0
+
+        for bound, count in zip(h.buckets + ('+Inf',), h.counts):
+            total += count
+
+            lines.append('%s_bucket%s %d' % (
+                name,
+                _format_labels(labels, (('le', bound),)),
+                total
+            ))
+
+        lines.append('%s_sum%s %s' % (
+            name,
+            _format_labels(labels),
+            _format_number(h.sum)
+        ))
+        lines.append('%s_count%s %d' % (
+            name,
+            _format_labels(labels),
+            h.count
+        ))
+
+    return '\n'.join(lines) + '\n'
+
+
+class BaseExporter(object):
+    """
+    The interface for pushing collected metrics to an external system.
+    """
+
+    def export(self, counters, histograms):
+        """
+        Called periodically with a L{snapshot<Metrics.snapshot>} of the
+        collected data.
+        """
+        raise NotImplementedError
+
+
+class LoggingExporter(BaseExporter):
+    """
+    Writes the collected metrics to a logger in the text format.
+    """
+
+    def __init__(self, logger, level=20):
+        """
+        @param level: The level to log at. Defaults to C{logging.INFO}.
+        """
+        self.logger = logger
+        self.level = level
+
+    def export(self, counters, histograms):
+        self.logger.log(
+            self.level,
+            'PyAMF metrics:\n%s',
+            format_text(counters, histograms)
+        )
+
+
+class MetricsApplication(object):
+    """
+    A WSGI application that serves the collected metrics in the text format.
+
+    Mount it alongside the gateway, e.g. at C{/metrics}.
+    """
+
+    def __init__(self, metrics):
+        """
+        @type metrics: L{Metrics}
+        """
+        self.metrics = metrics
+
+    def __call__(self, environ, start_response):
+        counters, histograms = self.metrics.snapshot()
+        body = format_text(counters, histograms)
+
+        start_response('200 OK', [
+            ('Content-Type', TEXT_CONTENT_TYPE),
+            ('Content-Length', str(len(body))),
+        ])
+
+        return [body]
@@ -0,0 +1,296 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Encoding and decoding the bodies of a remoting envelope in parallel.
+
+The AMF reference tables are cleared before each body of an envelope is
+encoded or decoded, so the bodies are independent of each other and can be
+handled by a C{multiprocessing} pool. The bodies are encoded in the pool
+and concatenated in order. When decoding, the envelope is split using the
+length prefix of each body. Only strict encoders write these lengths, so
+envelopes without them are decoded serially.
+
+Values (and any codec options, such as C{use_records}) are pickled on their
+way to and from the pool, and any body that cannot be pickled is handled in
+the calling process. The same goes for all of the bodies if the codec
+options cannot be pickled. This only pays off for
+envelopes with several large bodies. Use L{pyamf.benchmarks.parallel} to
+compare it with the serial path on the target machine.
+
+Example::
+
+    import multiprocessing
+
+    pool = multiprocessing.Pool()
+
+    stream = remoting.encode(envelope, pool=pool)
+    envelope = remoting.decode(stream, pool=pool)
+
+@since: 0.9
+"""
+
+import cPickle
+
+import pyamf
+from pyamf import util, remoting
+
+
+__all__ = [
+    'encode',
+    'decode',
+]
+
+#: Envelopes with fewer bodies than this are handled serially.
+MIN_BODIES = 2
+
+#: The value of the length prefix written by non strict encoders.
+_UNKNOWN_LENGTHS = (0, 0xffffffff)
+
+
+def _dumps(obj):
+    try:
+        return cPickle.dumps(obj, cPickle.HIGHEST_PROTOCOL)
+    except (cPickle.PicklingError, TypeError, AttributeError):
+        return None
+
+
+def _get_options(kwargs):
+    """
+    Returns the codec options that are sent to the workers, or C{None} if
+    they cannot be pickled.
+    """
+    options = dict(kwargs)
+
+    # the workers create their own streams
+    options.pop('use_ext', None)
+
+    if _dumps(options) is None:
+        return None
+
+    return options
+
+
+def _encode_body(args):
+    """
+    Encodes a single body, called in a worker process.
+
+    @return: The encoded body, including its target and length prefix.
+    """
+    name, payload, use_amf3, strict, timezone_offset, options = args
+
+    message = cPickle.loads(payload)
+    stream = util.BufferedByteStream()
+    encoder = pyamf.get_encoder(
+        pyamf.AMF0,
+        stream,
+        strict=strict,
+        timezone_offset=timezone_offset,
+        **options
+    )
+    encoder.use_amf3 = use_amf3
+
+    remoting._write_body(name, message, stream, encoder, strict)
+
+    return stream.getvalue()
+
+
+def _decode_body(args):
+    """
+    Decodes a single body, called in a worker process.
+
+    @return: The pickled C{(name, message)} tuple or C{None} if the decoded
+        body could not be pickled.
+    """
+    data, use_amf3, strict, timezone_offset, options = args
+
+    stream = util.BufferedByteStream(data)
+    decoder = pyamf.get_decoder(
+        pyamf.AMF0,
+        stream,
+        strict=strict,
+        timezone_offset=timezone_offset,
+        **options
+    )
+    decoder.use_amf3 = use_amf3
+
+    return _dumps(remoting._read_body(stream, decoder, strict))
+
+
+def encode(msg, pool, strict=False, logger=None, timezone_offset=None,
+           stream=None, amf3_bodies=False, **kwargs):
+    """
+    Encodes the L{msg<remoting.Envelope>}, encoding its bodies in C{pool}.
+    The result is identical to L{remoting.encode}.
+
+    @param pool: A C{multiprocessing.Pool}.
+    @rtype: L{BufferedByteStream<pyamf.util.BufferedByteStream>}
+    """
+    options = _get_options(kwargs)
+
+    if len(msg) < MIN_BODIES or options is None:
+        return remoting.encode(
+            msg,
+            strict=strict,
+            logger=logger,
+            timezone_offset=timezone_offset,
+            stream=stream,
+            amf3_bodies=amf3_bodies,
+            **kwargs
+        )
+
+    stream, encoder = remoting._write_preamble(
+        msg,
+        strict,
+        timezone_offset,
+        stream,
+        **kwargs
+    )
+
+    if amf3_bodies:
+        encoder.use_amf3 = True
+
+    use_amf3 = encoder.use_amf3
+
+    tasks = []
+    bodies = []
+
+    for name, message in msg.iteritems():
+        if isinstance(message, remoting.Request):
+            detached = remoting.Request(message.target, message.body)
+        elif isinstance(message, remoting.Response):
+            detached = remoting.Response(message.body, message.status)
+        else:
+            raise TypeError("Unknown message type")
+
+        payload = _dumps(detached)
+
+        if payload is None:
+            bodies.append((name, message))
+        else:
+            bodies.append(len(tasks))
+            tasks.append(
+                (name, payload, use_amf3, strict, timezone_offset, options)
+            )
+
+    results = pool.map(_encode_body, tasks)
+
+    for body in bodies:
+        if isinstance(body, tuple):
+            # could not be pickled
+            encoder.context.clear()
+            remoting._write_body(body[0], body[1], stream, encoder, strict)
+        else:
+            stream.write(results[body])
+
+    stream.seek(0)
+
+    return stream
+
+
+def _split_bodies(stream, count):
+    """
+    Returns the byte ranges of C{count} bodies, starting at the current
+    position of C{stream}, or C{None} if they are not all length prefixed.
+    """
+    ranges = []
+    total = len(stream)
+
+    for i in xrange(count):
+        start = stream.tell()
+
+        for j in xrange(2):
+            # target and response
+            stream.seek(stream.read_ushort(), 1)
+
+        data_len = stream.read_ulong()
+        end = stream.tell() + data_len
+
+        if data_len in _UNKNOWN_LENGTHS or end > total:
+            return None
+
+        stream.seek(end)
+        ranges.append((start, end))
+
+    return ranges
+
+
+def decode(stream, pool, strict=False, logger=None, timezone_offset=None,
+           **kwargs):
+    """
+    Decodes the incoming stream as a remoting message, decoding its bodies in
+    C{pool}. The result is identical to L{remoting.decode}.
+
+    @param pool: A C{multiprocessing.Pool}.
+    @rtype: L{Envelope<remoting.Envelope>}
+    """
+    options = _get_options(kwargs)
+
+    stream, decoder, msg, body_count = remoting._read_preamble(
+        stream,
+        strict,
+        timezone_offset,
+        **kwargs
+    )
+    context = decoder.context
+    use_amf3 = decoder.use_amf3
+    pos = stream.tell()
+    ranges = None
+
+    if body_count >= MIN_BODIES and options is not None:
+        try:
+            ranges = _split_bodies(stream, body_count)
+        except IOError:
+            ranges = None
+
+    stream.seek(pos)
+
+    if ranges is None:
+        for i in xrange(body_count):
+            context.clear()
+
+            target, payload = remoting._read_body(
+                stream,
+                decoder,
+                strict,
+                logger
+            )
+            msg[target] = payload
+    else:
+        tasks = []
+
+        for start, end in ranges:
+            stream.seek(start)
+            tasks.append((
+                stream.read(end - start),
+                use_amf3,
+                strict,
+                timezone_offset,
+                options
+            ))
+
+        results = pool.map(_decode_body, tasks)
+
+        for (start, end), result in zip(ranges, results):
+            if result is None:
+                # could not be pickled
+                stream.seek(start)
+                context.clear()
+
+                target, payload = remoting._read_body(
+                    stream,
+                    decoder,
+                    strict,
+                    logger
+                )
+            else:
+                target, payload = cPickle.loads(result)
+
+            msg[target] = payload
+
+        stream.seek(ranges[-1][1])
+
+    if strict and stream.remaining() > 0:
+        raise RuntimeError("Unable to fully consume the buffer")
+
+    return msg
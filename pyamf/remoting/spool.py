@@ -0,0 +1,259 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Reading and writing (and spooling) large remoting bodies.
+
+Request bodies are read from the server's input in chunks of at most
+L{READ_SIZE} bytes and written straight into the stream that is decoded
+(decompressing them on the way if required), so that a gateway holds a single
+copy of the body. Bodies that are larger than L{SPOOL_SIZE} bytes are written
+to a temporary file instead of memory.
+
+Responses can be encoded to a L{SpooledByteStream}, which moves to a
+temporary file once it grows beyond a threshold, and sent to the client in
+chunks using L{iter_stream}.
+
+@since: 0.9
+"""
+
+import tempfile
+
+from pyamf import util
+from pyamf.util import pure
+from pyamf.remoting import compression
+
+
+__all__ = [
+    'FileByteStream',
+    'SpooledByteStream',
+    'read_body',
+    'iter_stream',
+    'close_stream',
+]
+
+#: The maximum number of bytes read from the input in one go.
+READ_SIZE = 64 * 1024
+
+#: Bodies larger than this number of bytes are spooled to a temporary file.
+SPOOL_SIZE = 4 * 1024 * 1024
+
+#: The number of bytes read from a stream per chunk by L{iter_stream}.
+CHUNK_SIZE = 64 * 1024
+
+
+class FileByteStream(pure.BufferedByteStream):
+    """
+    A L{BufferedByteStream<pyamf.util.pure.BufferedByteStream>} that is backed
+    by a file instead of memory.
+
+    The pure Python codecs read from the file directly.
+    L{remoting.decode<pyamf.remoting.decode>} always decodes this stream with
+    them, as the extension codecs would copy its contents into memory.
+    """
+
+    def __init__(self, file=None):
+        """
+        @param file: The backing file, must support C{read}, C{write},
+            C{seek}, C{tell} and C{truncate}. Defaults to a new temporary file
+            that is deleted when the stream is closed.
+        """
+        if file is None:
+            file = tempfile.TemporaryFile()
+
+        self._buffer = file
+        self._len_changed = True
+
+    def getvalue(self):
+        pos = self._buffer.tell()
+
+        self._buffer.seek(0)
+
+        try:
+            return self._buffer.read()
+        finally:
+            self._buffer.seek(pos)
+
+    def truncate(self, size=0):
+        self._buffer.truncate(size)
+        self._len_changed = True
+
+        if size == 0:
+            self._buffer.seek(0)
+
+    def close(self):
+        """
+        Closes the backing file.
+        """
+        self._buffer.close()
+
+
+class SpooledByteStream(FileByteStream):
+    """
+    A stream that is held in memory until it grows beyond C{max_size} bytes,
+    after which its contents are moved to a temporary file.
+
+    Seeking back and overwriting (as strict mode does to write the length of
+    each header and body) works before and after the contents have been
+    moved. The extension codecs cannot write to this stream, so
+    L{remoting.encode<pyamf.remoting.encode>} uses the pure Python encoder
+    when it is supplied one.
+
+    @ivar max_size: The number of bytes the stream may occupy in memory.
+    @type max_size: C{int}
+    """
+
+    def __init__(self, max_size=SPOOL_SIZE):
+        FileByteStream.__init__(self, pure.StringIO())
+
+        self.max_size = max_size
+        self._rolled = False
+
+    @property
+    def rolled(self):
+        """
+        Whether the contents of the stream have been moved to a file.
+        """
+        return self._rolled
+
+    def write(self, s, size=None):
+        FileByteStream.write(self, s)
+
+        if not self._rolled and self._buffer.tell() > self.max_size:
+            self.rollover()
+
+    def rollover(self):
+        """
+        Moves the contents of the stream to a temporary file.
+        """
+        if self._rolled:
+            return
+
+        file = tempfile.TemporaryFile()
+        pos = self._buffer.tell()
+
+        file.write(self._buffer.getvalue())
+        file.seek(pos)
+
+        self._buffer = file
+        self._rolled = True
+        self._len_changed = True
+
+    def getvalue(self):
+        if not self._rolled:
+            return self._buffer.getvalue()
+
+        return FileByteStream.getvalue(self)
+
+
+def _write(stream, data, spool_size):
+    """
+    Appends C{data} to C{stream}, moving the contents of C{stream} to a
+    L{FileByteStream} first if it would grow beyond C{spool_size} bytes.
+
+    @return: The stream that C{data} was written to.
+    """
+    if not data:
+        return stream
+
+    if spool_size is not None and not isinstance(stream, FileByteStream):
+        if len(stream) + len(data) > spool_size:
+            spooled = FileByteStream()
+            spooled.write(stream.getvalue())
+
+            stream = spooled
+
+    stream.write(data)
+
+    return stream
+
+
+def read_body(input, length=None, encoding=None, read_size=READ_SIZE,
+              spool_size=SPOOL_SIZE, max_size=None):
+    """
+    Reads a request body from C{input} into a stream that can be decoded.
+
+    @param input: A file-like object, e.g. C{wsgi.input}.
+    @param length: The number of bytes to read or C{None} to read until
+        C{input} is exhausted (e.g. a chunked request body).
+    @type length: C{int} or C{None}
+    @param encoding: The C{Content-Encoding} of the body. A compressed body is
+        decompressed as it is read.
+    @param read_size: The maximum number of bytes read in one go.
+    @param spool_size: Bodies that are (once decompressed) larger than this
+        number of bytes are written to a temporary file. C{None} keeps all
+        bodies in memory.
+    @param max_size: The maximum size of a compressed body once it has been
+        decompressed or C{None} for no limit.
+    @return: A tuple containing the body, positioned at the start, and the
+        number of bytes that were read from C{input}.
+    @rtype: C{tuple} of L{BufferedByteStream<pyamf.util.BufferedByteStream>}
+        and C{int}
+    @raise SizeLimitError: The decompressed body is larger than C{max_size},
+        see L{compression.SizeLimitError}.
+    @raise IOError: The body is shorter than C{length} or it could not be
+        decompressed.
+    """
+    decompressor = compression.get_decompressor(encoding, max_size)
+    stream = util.BufferedByteStream()
+    received = 0
+
+    try:
+        while length is None or received < length:
+            size = read_size
+
+            if length is not None:
+                size = min(size, length - received)
+
+            data = input.read(size)
+
+            if not data:
+                break
+
+            received += len(data)
+
+            if decompressor is not None:
+                data = decompressor.decompress(data)
+
+            stream = _write(stream, data, spool_size)
+
+        if length is not None and received < length:
+            raise IOError(
+                'Request body truncated (received %d of %d bytes)' % (
+                    received, length)
+            )
+
+        if decompressor is not None:
+            stream = _write(stream, decompressor.flush(), spool_size)
+    except:
+        close_stream(stream)
+
+        raise
+
+    stream.seek(0)
+
+    return stream, received
+
+
+def iter_stream(stream, chunk_size=CHUNK_SIZE):
+    """
+    A generator that yields the remaining contents of C{stream} in chunks of
+    C{chunk_size} bytes. The stream is closed (if it supports it) once it has
+    been exhausted, which deletes the file behind a spooled stream.
+    """
+    try:
+        while stream.remaining() > 0:
+            yield stream.read(min(chunk_size, stream.remaining()))
+    finally:
+        close_stream(stream)
+
+
+def close_stream(stream):
+    """
+    Closes C{stream} if it supports it, which deletes the file behind a
+    spooled stream. C{None} is ignored.
+    """
+    close = getattr(stream, 'close', None)
+
+    if close is not None:
+        close()
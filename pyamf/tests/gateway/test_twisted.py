@@ -7,6 +7,9 @@ Twisted gateway tests.
 @since: 0.1.0
 """
 
+import multiprocessing
+import signal
+
 try:
     from twisted.internet import reactor, defer
     from twisted.python import failure
@@ -20,8 +23,8 @@ except ImportError:
     import unittest
 
 import pyamf
-from pyamf import remoting
-from pyamf.remoting import gateway
+from pyamf import remoting, util
+from pyamf.remoting import gateway, compression
 from pyamf.flex import messaging
 
 
@@ -41,6 +44,25 @@ class BaseTestCase(unittest.TestCase):
         if not twisted:
             self.skipTest("'twisted' is not available")
 
+    def run(self, result=None):
+        # running the reactor installs its signal handlers, which would
+        # otherwise stay installed for the rest of the test run and be
+        # inherited by the workers of any multiprocessing pool, stopping
+        # Pool.terminate from killing them.
+        handlers = []
+
+        for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGCHLD):
+            handler = signal.getsignal(signum)
+
+            if handler is not None:
+                handlers.append((signum, handler))
+
+        try:
+            return unittest.TestCase.run(self, result)
+        finally:
+            for signum, handler in handlers:
+                signal.signal(signum, handler)
+
 
 class TwistedServerTestCase(BaseTestCase):
     """
@@ -380,6 +402,33 @@ class TwistedServerTestCase(BaseTestCase):
 
         return d.addCallback(cb)
 
+    def test_large_response(self):
+        """
+        Large responses are spooled and compressed as they are written.
+        """
+        value = ['spam' * 100] * 100
+
+        self.gw.compression = True
+        self.gw.compression_threshold = 0
+        self.gw.offload_threshold = 0
+        self.gw.response_spool_size = 1024
+        self.gw.addService(lambda: value, 'large')
+
+        env = remoting.Envelope(pyamf.AMF3)
+        env['/1'] = remoting.Request('large', body=[])
+
+        d = self.getPage(
+            remoting.encode(env).getvalue(),
+            headers={'Accept-Encoding': 'gzip'}
+        )
+
+        def cb(result):
+            result = remoting.decode(compression.decompress(result, 'gzip'))
+
+            self.assertEqual(result['/1'].body, value)
+
+        return d.addCallback(cb)
+
 
 class DummyHTTPRequest:
     def __init__(self):
@@ -399,6 +448,267 @@ class DummyHTTPRequest:
         self.finished = True
 
 
+class ProducerHTTPRequest(DummyHTTPRequest):
+    """
+    A request that pauses its producer after every write.
+    """
+
+    def __init__(self):
+        DummyHTTPRequest.__init__(self)
+
+        self.chunks = []
+        self.producer = None
+
+    def registerProducer(self, producer, streaming):
+        self.producer = producer
+        self.streaming = streaming
+
+    def unregisterProducer(self):
+        self.producer = None
+
+    def write(self, s):
+        self.chunks.append(s)
+        self.producer.pauseProducing()
+
+
+class ResponseProducerTestCase(BaseTestCase):
+    """
+    Tests for L{twisted.ResponseProducer}.
+
+    @since: 0.9
+    """
+
+    def test_chunks(self):
+        request = ProducerHTTPRequest()
+        stream = util.BufferedByteStream('spam and eggs')
+        producer = twisted.ResponseProducer(request, stream, 5)
+
+        d = producer.start()
+
+        self.assertTrue(request.streaming)
+        self.assertEqual(request.chunks, ['spam '])
+        self.assertFalse(d.called)
+
+        producer.resumeProducing()
+        producer.resumeProducing()
+
+        self.assertEqual(request.chunks, ['spam ', 'and e', 'ggs'])
+        self.assertFalse(request.finished)
+
+        producer.resumeProducing()
+
+        self.assertTrue(request.finished)
+        self.assertTrue(d.called)
+        self.assertEqual(request.producer, None)
+
+    def test_string(self):
+        request = ProducerHTTPRequest()
+        producer = twisted.ResponseProducer(request, 'spam and eggs', 5)
+
+        producer.start()
+
+        while not request.finished:
+            producer.resumeProducing()
+
+        self.assertEqual(request.chunks, ['spam ', 'and e', 'ggs'])
+
+    def test_generator(self):
+        request = ProducerHTTPRequest()
+        chunks = iter(['spam', 'eggs'])
+        producer = twisted.ResponseProducer(request, chunks, 5)
+
+        producer.start()
+
+        while not request.finished:
+            producer.resumeProducing()
+
+        self.assertEqual(request.chunks, ['spam', 'eggs'])
+
+    def test_stop(self):
+        request = ProducerHTTPRequest()
+        stream = util.BufferedByteStream('spam and eggs')
+        producer = twisted.ResponseProducer(request, stream, 5)
+
+        d = producer.start()
+        producer.stopProducing()
+
+        self.assertTrue(d.called)
+        self.assertFalse(request.finished)
+        self.assertEqual(request.chunks, ['spam '])
+
+
+class EstimateSizeTestCase(BaseTestCase):
+    """
+    Tests for L{twisted.estimate_size}.
+
+    @since: 0.9
+    """
+
+    def test_estimate(self):
+        self.assertEqual(twisted.estimate_size('spam', 100), 7)
+        self.assertEqual(twisted.estimate_size([1, 'a'], 100), 18)
+
+        x = ['spam'] * 10000
+
+        self.assertTrue(twisted.estimate_size(x, 100) < 200)
+        self.assertTrue(twisted.estimate_size(x, 10 ** 6) > 70000)
+
+    def test_references(self):
+        x = []
+        x.append(x)
+
+        self.assertEqual(twisted.estimate_size(x, 100), 8)
+
+
+class OffloadTestCase(BaseTestCase):
+    """
+    Tests for offloading the decoding and encoding of large messages.
+
+    @since: 0.9
+    """
+
+    offload_to_process = False
+    encoder = 'stream_response'
+
+    def setUp(self):
+        BaseTestCase.setUp(self)
+
+        self.offloaded = []
+
+        self.gw = twisted.TwistedGateway(
+            expose_request=False,
+            offload=self.offload,
+            offload_to_process=self.offload_to_process,
+            offload_threshold=1024,
+            chunk_size=64
+        )
+        self.gw.addService(lambda x: x, 'echo')
+
+    def offload(self, func, *args, **kwargs):
+        self.offloaded.append(func.__name__)
+
+        return defer.maybeDeferred(func, *args, **kwargs)
+
+    def doRequest(self, value, headers=None):
+        env = remoting.Envelope(pyamf.AMF0)
+        env['/1'] = remoting.Request('echo', body=[value])
+
+        self.request = request = ProducerHTTPRequest()
+        request.content = util.BufferedByteStream(
+            remoting.encode(env).getvalue()
+        )
+        request.getHeader = (headers or {}).get
+
+        self.gw.render_POST(request)
+
+        while not request.finished:
+            request.producer.resumeProducing()
+
+        body = ''.join(request.chunks)
+
+        if 'Content-Encoding' in request.headers:
+            body = compression.decompress(
+                body,
+                request.headers['Content-Encoding']
+            )
+
+        return remoting.decode(body)['/1'].body
+
+    def test_small(self):
+        self.assertEqual(self.doRequest('spam'), 'spam')
+        self.assertEqual(self.offloaded, [])
+
+    def test_large(self):
+        value = ['spam' * 100] * 10
+
+        self.assertEqual(self.doRequest(value), value)
+        self.assertEqual(self.offloaded, ['decode_request', self.encoder])
+        self.assertEqual(
+            self.request.headers['Content-Length'],
+            str(len(''.join(self.request.chunks)))
+        )
+
+    def test_compressed(self):
+        self.gw.compression = True
+        self.gw.compression_threshold = 0
+
+        value = ['spam' * 100] * 10
+
+        self.assertEqual(
+            self.doRequest(value, {'Accept-Encoding': 'gzip'}),
+            value
+        )
+        self.assertEqual(self.request.headers['Content-Encoding'], 'gzip')
+
+        if self.offload_to_process:
+            self.assertEqual(
+                self.request.headers['Content-Length'],
+                str(len(''.join(self.request.chunks)))
+            )
+        else:
+            # compressed as it is written
+            self.assertFalse('Content-Length' in self.request.headers)
+
+    def test_spooled(self):
+        """
+        Responses are written from the spooled stream, once it has been
+        moved to disk.
+        """
+        streams = []
+        base = self.gw.getResponseStream
+
+        def getResponseStream():
+            streams.append(base())
+
+            return streams[-1]
+
+        self.gw.response_spool_size = 1024
+        self.gw.getResponseStream = getResponseStream
+
+        value = ['spam' * 100] * 10
+
+        self.assertEqual(self.doRequest(value), value)
+        self.assertEqual(len(streams), 1)
+        self.assertTrue(streams[0].rolled)
+        self.assertTrue(streams[0]._buffer.closed)
+
+
+class ProcessOffloadTestCase(OffloadTestCase):
+    """
+    Offloading to a C{multiprocessing} pool, which requires the offloaded
+    functions and their arguments to be picklable.
+
+    @since: 0.9
+    """
+
+    offload_to_process = True
+    encoder = 'encode_response'
+
+    def setUp(self):
+        OffloadTestCase.setUp(self)
+
+        self.pool = multiprocessing.Pool(1)
+
+    def tearDown(self):
+        self.pool.close()
+        self.pool.join()
+
+        OffloadTestCase.tearDown(self)
+
+    def offload(self, func, *args, **kwargs):
+        self.offloaded.append(func.__name__)
+
+        return defer.succeed(self.pool.apply(func, args, kwargs))
+
+    def test_spooled(self):
+        self.assertRaises(
+            ValueError,
+            twisted.TwistedGateway,
+            offload_to_process=True,
+            response_spool_size=1024
+        )
+
+
 class TwistedGatewayTestCase(BaseTestCase):
     def test_finalise_request(self):
         request = DummyHTTPRequest()
@@ -890,3 +1200,125 @@ class AMF3RequestProcessorTestCase(BaseTestCase):
         proc(request).addCallback(cb).addErrback(lambda failure: d.errback())
 
         return d
+
+
+class MetricsTestCase(BaseTestCase):
+    """
+    The Twisted request processors record per service call metrics.
+    """
+
+    def getRequest(self, target, body=()):
+        return remoting.Request(
+            target,
+            body=list(body),
+            envelope=remoting.Envelope()
+        )
+
+    def getCounters(self, gw):
+        return gw.metrics.snapshot()[0]
+
+    def assertPhases(self, gw, name, phases):
+        histograms = gw.metrics.snapshot()[1]
+        labels = (('service', name), ('method', ''))
+
+        for phase in phases:
+            key = ('pyamf_call_seconds', labels + (('phase', phase),))
+
+            self.assertEqual(histograms[key].count, 1)
+
+    def test_amf0(self):
+        def fail():
+            raise ValueError
+
+        gw = twisted.TwistedGateway(
+            {'echo': lambda x: x, 'fail': fail},
+            expose_request=False,
+            metrics=True
+        )
+        proc = twisted.AMF0RequestProcessor(gw)
+
+        proc(self.getRequest('echo', ['foo']))
+        proc(self.getRequest('fail'))
+
+        echo = (('service', 'echo'), ('method', ''))
+        fail = (('service', 'fail'), ('method', ''))
+
+        self.assertEqual(self.getCounters(gw), {
+            ('pyamf_calls_total', echo): 1,
+            ('pyamf_calls_total', fail): 1,
+            ('pyamf_call_errors_total', fail): 1,
+        })
+        self.assertPhases(gw, 'echo', ('auth', 'preprocess', 'call'))
+        self.assertPhases(gw, 'fail', ('auth', 'preprocess', 'call'))
+
+    def test_amf0_auth_fail(self):
+        gw = twisted.TwistedGateway(
+            {'echo': lambda x: x},
+            authenticator=lambda u, p: False,
+            expose_request=False,
+            metrics=True
+        )
+        proc = twisted.AMF0RequestProcessor(gw)
+
+        proc(self.getRequest('echo'))
+
+        labels = (('service', 'echo'), ('method', ''))
+
+        self.assertEqual(self.getCounters(gw), {
+            ('pyamf_calls_total', labels): 1,
+            ('pyamf_call_errors_total', labels): 1,
+        })
+        self.assertPhases(gw, 'echo', ('auth',))
+
+    def test_amf0_deferred(self):
+        """
+        A call is recorded when the deferred returned by the service fires.
+        """
+        result = defer.Deferred()
+
+        gw = twisted.TwistedGateway(
+            {'echo': lambda: result},
+            expose_request=False,
+            metrics=True
+        )
+        proc = twisted.AMF0RequestProcessor(gw)
+
+        d = proc(self.getRequest('echo'))
+
+        self.assertEqual(self.getCounters(gw), {})
+
+        result.callback('foo')
+
+        self.assertEqual(d.result.body, 'foo')
+        self.assertEqual(
+            self.getCounters(gw),
+            {('pyamf_calls_total', (('service', 'echo'), ('method', ''))): 1}
+        )
+        self.assertPhases(gw, 'echo', ('auth', 'preprocess', 'call'))
+
+    def test_amf3(self):
+        def fail():
+            raise ValueError
+
+        gw = twisted.TwistedGateway(
+            {'echo': lambda x: x, 'fail': fail},
+            expose_request=False,
+            metrics=True
+        )
+        proc = twisted.AMF3RequestProcessor(gw)
+
+        for operation, body in (('echo', ['foo']), ('fail', [])):
+            proc(self.getRequest('null', [
+                messaging.RemotingMessage(operation=operation, body=body)
+            ]))
+
+        echo = (('service', 'echo'), ('method', ''))
+        fail = (('service', 'fail'), ('method', ''))
+
+        self.assertEqual(self.getCounters(gw), {
+            ('pyamf_calls_total', echo): 1,
+            ('pyamf_calls_total', fail): 1,
+            ('pyamf_call_errors_total', fail): 1,
+        })
+        self.assertPhases(gw, 'echo', ('preprocess', 'call'))
+        self.assertPhases(gw, 'fail', ('preprocess', 'call'))
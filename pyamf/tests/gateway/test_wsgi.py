@@ -10,9 +10,11 @@ WSGI gateway tests.
 """
 
 import unittest
+from StringIO import StringIO
 
 import pyamf
 from pyamf import remoting, util
+from pyamf.remoting import cache, compression, metrics
 from pyamf.remoting.gateway.wsgi import WSGIGateway
 
 
@@ -188,3 +190,578 @@ class WSGIServerTestCase(unittest.TestCase):
         message = envelope['/1']
 
         self.assertEqual(message.body, now)
+
+
+class CompressionTestCase(unittest.TestCase):
+    """
+    Tests for compressed requests and responses.
+
+    @since: 0.9
+    """
+
+    def setUp(self):
+        self.gw = WSGIGateway(
+            compression=True,
+            compression_threshold=0,
+            compressed_requests=True
+        )
+        self.gw.addService(lambda x: x, 'echo')
+
+    def doRequest(self, body, **kwargs):
+        self.status = None
+        self.headers = None
+
+        kwargs.setdefault('REQUEST_METHOD', 'POST')
+        kwargs.setdefault('CONTENT_LENGTH', str(len(body)))
+
+        kwargs['wsgi.input'] = util.BufferedByteStream(body)
+
+        def start_response(status, headers):
+            self.status = status
+            self.headers = dict(headers)
+
+        return ''.join(self.gw(kwargs, start_response))
+
+    def makeRequest(self, body):
+        e = remoting.Envelope(pyamf.AMF3)
+        e['/1'] = remoting.Request('echo', body=[body])
+
+        return remoting.encode(e).getvalue()
+
+    def test_gzip_response(self):
+        response = self.doRequest(
+            self.makeRequest('foo' * 1000),
+            HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+
+        self.assertEqual(self.status, '200 OK')
+        self.assertEqual(self.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(self.headers['Vary'], 'Accept-Encoding')
+        self.assertFalse('Content-Length' in self.headers)
+
+        envelope = remoting.decode(compression.decompress(response, 'gzip'))
+
+        self.assertEqual(envelope['/1'].body, 'foo' * 1000)
+
+    def test_deflate_response(self):
+        response = self.doRequest(
+            self.makeRequest('foo'),
+            HTTP_ACCEPT_ENCODING='deflate'
+        )
+
+        self.assertEqual(self.headers['Content-Encoding'], 'deflate')
+
+        envelope = remoting.decode(compression.decompress(response, 'deflate'))
+
+        self.assertEqual(envelope['/1'].body, 'foo')
+
+    def test_not_accepted(self):
+        response = self.doRequest(self.makeRequest('foo'))
+
+        self.assertFalse('Content-Encoding' in self.headers)
+        self.assertEqual(self.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(self.headers['Content-Length'], str(len(response)))
+        self.assertEqual(remoting.decode(response)['/1'].body, 'foo')
+
+    def test_disabled(self):
+        self.gw.compression = False
+
+        self.doRequest(self.makeRequest('foo'), HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertFalse('Content-Encoding' in self.headers)
+        self.assertFalse('Vary' in self.headers)
+
+    def test_threshold(self):
+        self.gw.compression_threshold = 1024
+
+        self.doRequest(self.makeRequest('foo'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse('Content-Encoding' in self.headers)
+
+        self.doRequest(
+            self.makeRequest('foo' * 1000),
+            HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(self.headers['Content-Encoding'], 'gzip')
+
+    def test_compressed_request(self):
+        body = compression.compress(self.makeRequest('foo'), 'gzip')
+
+        response = self.doRequest(body, HTTP_CONTENT_ENCODING='gzip')
+
+        self.assertEqual(self.status, '200 OK')
+        self.assertEqual(remoting.decode(response)['/1'].body, 'foo')
+
+    def test_bad_compressed_request(self):
+        self.doRequest(self.makeRequest('foo'), HTTP_CONTENT_ENCODING='gzip')
+
+        self.assertEqual(self.status, '400 Bad Request')
+
+    def test_compressed_requests_disabled(self):
+        self.gw.compressed_requests = False
+        body = compression.compress(self.makeRequest('foo'), 'gzip')
+
+        self.doRequest(body, HTTP_CONTENT_ENCODING='gzip')
+
+        self.assertEqual(self.status, '415 Unsupported Media Type')
+
+    def test_max_decompressed_size(self):
+        request = self.makeRequest('foo' * 1000)
+        body = compression.compress(request, 'gzip')
+
+        self.gw.max_decompressed_size = len(request) - 1
+        self.doRequest(body, HTTP_CONTENT_ENCODING='gzip')
+
+        self.assertEqual(self.status, '413 Request Entity Too Large')
+
+        self.gw.max_decompressed_size = len(request)
+        self.doRequest(body, HTTP_CONTENT_ENCODING='gzip')
+
+        self.assertEqual(self.status, '200 OK')
+
+
+class AMF3ResponsesTestCase(unittest.TestCase):
+    """
+    Tests for encoding the response bodies of AMF0 requests as AMF3.
+
+    @since: 0.9
+    """
+
+    def setUp(self):
+        self.gw = WSGIGateway(amf3_responses=True)
+        self.gw.addService(lambda x: x, 'echo')
+
+    def doRequest(self, body, **kwargs):
+        kwargs.setdefault('REQUEST_METHOD', 'POST')
+        kwargs.setdefault('CONTENT_LENGTH', str(len(body)))
+
+        kwargs['wsgi.input'] = util.BufferedByteStream(body)
+
+        return ''.join(self.gw(kwargs, lambda status, headers: None))
+
+    def makeRequest(self, body):
+        e = remoting.Envelope(pyamf.AMF0)
+        e['/1'] = remoting.Request('echo', body=[body])
+
+        return remoting.encode(e).getvalue()
+
+    def test_upgrade(self):
+        rows = [{'spam': 'eggs'}] * 2
+        request = self.makeRequest(rows)
+
+        legacy = self.doRequest(request, HTTP_X_FLASH_VERSION='8,0,42,0')
+        response = self.doRequest(request, HTTP_X_FLASH_VERSION='10,1,53,64')
+
+        self.assertFalse('\x11' in legacy)
+        self.assertTrue('\x11' in response)
+        self.assertTrue(len(response) < len(legacy))
+
+        for data in (legacy, response):
+            envelope = remoting.decode(data)
+
+            self.assertEqual(envelope.amfVersion, pyamf.AMF0)
+            self.assertEqual(envelope['/1'].body, rows)
+
+    def test_no_version(self):
+        response = self.doRequest(self.makeRequest('foo'))
+
+        self.assertFalse('\x11' in response)
+
+
+class RequestBodyTestCase(unittest.TestCase):
+    """
+    Tests for reading the request body.
+
+    @since: 0.9
+    """
+
+    def setUp(self):
+        self.gw = WSGIGateway(read_size=16)
+        self.gw.addService(lambda x: x, 'echo')
+
+        e = remoting.Envelope(pyamf.AMF3)
+        e['/1'] = remoting.Request('echo', body=['foo' * 100])
+
+        self.body = remoting.encode(e).getvalue()
+
+    def doRequest(self, environ):
+        self.status = None
+
+        environ.setdefault('REQUEST_METHOD', 'POST')
+        environ.setdefault('wsgi.input', StringIO(self.body))
+
+        def start_response(status, headers):
+            self.status = status
+
+        return ''.join(self.gw(environ, start_response))
+
+    def test_content_length(self):
+        response = self.doRequest({'CONTENT_LENGTH': str(len(self.body))})
+
+        self.assertEqual(self.status, '200 OK')
+        self.assertEqual(remoting.decode(response)['/1'].body, 'foo' * 100)
+
+    def test_chunked(self):
+        response = self.doRequest({'HTTP_TRANSFER_ENCODING': 'chunked'})
+
+        self.assertEqual(self.status, '200 OK')
+        self.assertEqual(remoting.decode(response)['/1'].body, 'foo' * 100)
+
+        response = self.doRequest({
+            'CONTENT_LENGTH': '',
+            'wsgi.input_terminated': True
+        })
+
+        self.assertEqual(self.status, '200 OK')
+
+    def test_length_required(self):
+        self.doRequest({})
+
+        self.assertEqual(self.status, '411 Length Required')
+
+        self.doRequest({'CONTENT_LENGTH': 'foo'})
+
+        self.assertEqual(self.status, '411 Length Required')
+
+    def test_truncated(self):
+        self.doRequest({'CONTENT_LENGTH': str(len(self.body) + 1)})
+
+        self.assertEqual(self.status, '400 Bad Request')
+
+    def test_spooled(self):
+        self.gw.spool_size = 64
+
+        response = self.doRequest({'CONTENT_LENGTH': str(len(self.body))})
+
+        self.assertEqual(self.status, '200 OK')
+        self.assertEqual(remoting.decode(response)['/1'].body, 'foo' * 100)
+
+
+class SpooledResponseTestCase(unittest.TestCase):
+    """
+    Tests for spooling large responses to disk.
+
+    @since: 0.9
+    """
+
+    def setUp(self):
+        self.gw = WSGIGateway(response_spool_size=1024)
+        self.gw.addService(lambda x: x, 'echo')
+
+    def doRequest(self, value):
+        e = remoting.Envelope(pyamf.AMF0)
+        e['/1'] = remoting.Request('echo', body=[value])
+        body = remoting.encode(e).getvalue()
+
+        def start_response(status, headers):
+            self.status = status
+            self.headers = dict(headers)
+
+        return self.gw({
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': StringIO(body),
+        }, start_response)
+
+    def test_small(self):
+        response = self.doRequest('foo')
+
+        self.assertTrue(isinstance(response, list))
+        self.assertEqual(remoting.decode(response[0])['/1'].body, 'foo')
+
+    def test_large(self):
+        value = ['foo' * 100] * 100
+        response = self.doRequest(value)
+
+        self.assertFalse(isinstance(response, list))
+
+        response = ''.join(response)
+
+        self.assertEqual(self.status, '200 OK')
+        self.assertEqual(self.headers['Content-Length'], str(len(response)))
+        self.assertEqual(remoting.decode(response)['/1'].body, value)
+
+
+class CacheTestCase(unittest.TestCase):
+    """
+    Tests for cached service results.
+
+    @since: 0.9
+    """
+
+    def setUp(self):
+        self.calls = []
+        self.gw = WSGIGateway()
+        self.gw.addService(self.echo, 'echo', cache_ttl=0)
+
+    def echo(self, x):
+        self.calls.append(x)
+
+        return [{'spam': x, 'eggs': u'eggs'}] * 2
+
+    def doRequest(self, envelope, **kwargs):
+        body = remoting.encode(envelope).getvalue()
+
+        kwargs.update({
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': util.BufferedByteStream(body)
+        })
+
+        self.response = ''.join(self.gw(kwargs, lambda *args: None))
+
+        return remoting.decode(self.response)
+
+    def test_amf0(self):
+        expected = [{'spam': u'foo', 'eggs': u'eggs'}] * 2
+
+        for i in xrange(2):
+            envelope = remoting.Envelope(pyamf.AMF0)
+            envelope['/1'] = remoting.Request('echo', body=[u'foo'])
+
+            self.assertEqual(self.doRequest(envelope)['/1'].body, expected)
+
+        self.assertEqual(self.calls, [u'foo'])
+
+    def test_remoting_message(self):
+        from pyamf.flex import messaging
+
+        expected = [{'spam': u'foo', 'eggs': u'eggs'}] * 2
+
+        for i in xrange(2):
+            envelope = remoting.Envelope(pyamf.AMF3)
+            envelope['/1'] = remoting.Request('null', body=[
+                messaging.RemotingMessage(
+                    operation='echo',
+                    body=[u'foo'],
+                    messageId='message-%d' % (i,),
+                    headers={'DSId': 'foo'}
+                )
+            ])
+
+            response = self.doRequest(envelope)['/1']
+
+            self.assertEqual(response.body.body, expected)
+            self.assertEqual(response.body.correlationId, 'message-%d' % (i,))
+
+        self.assertEqual(self.calls, [u'foo'])
+
+    def test_amf3_responses(self):
+        self.gw.amf3_responses = True
+
+        expected = [{'spam': u'foo', 'eggs': u'eggs'}] * 2
+        envelope = remoting.Envelope(pyamf.AMF0)
+        envelope['/1'] = remoting.Request('echo', body=[u'foo'])
+
+        self.doRequest(envelope)
+
+        # cached hits must not re-encode the result
+        fragment = self.gw.cache.get(cache.get_key('echo', None, [u'foo']))
+        fragment.value = fragment.amf3.value = None
+
+        for flash_version, amf3 in [('8,0,42,0', False), ('10,1,53,64', True)]:
+            response = self.doRequest(
+                envelope,
+                HTTP_X_FLASH_VERSION=flash_version
+            )
+
+            self.assertEqual(response['/1'].status, remoting.STATUS_OK)
+            self.assertEqual(response['/1'].body, expected)
+            self.assertEqual('\x11' in self.response, amf3)
+
+        self.assertEqual(self.calls, [u'foo'])
+
+
+class MetricsTestCase(unittest.TestCase):
+    """
+    Tests for gateway metrics and slow request logging.
+
+    @since: 0.9
+    """
+
+    def setUp(self):
+        import logging
+
+        self.records = []
+
+        class Handler(logging.Handler):
+            def emit(handler, record):
+                self.records.append(record)
+
+        self.logger = logging.getLogger('pyamf.tests.metrics')
+        self.logger.propagate = False
+        self.handler = Handler()
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+
+    def doRequest(self, gw, envelope):
+        body = remoting.encode(envelope).getvalue()
+
+        response = gw({
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': util.BufferedByteStream(body)
+        }, lambda *args: None)
+
+        return ''.join(response), body
+
+    def test_disabled(self):
+        gw = WSGIGateway({'echo': lambda x: x})
+
+        self.assertEqual(gw.metrics, None)
+        self.assertEqual(gw.slow_request_threshold, None)
+
+    def test_request(self):
+        def fail():
+            raise ValueError
+
+        gw = WSGIGateway(
+            {'echo': lambda x: x, 'fail': fail},
+            metrics=True
+        )
+
+        envelope = remoting.Envelope(pyamf.AMF0)
+        envelope['/1'] = remoting.Request('echo', body=['foo'])
+        envelope['/2'] = remoting.Request('fail')
+        envelope['/3'] = remoting.Request('unknown')
+
+        response, body = self.doRequest(gw, envelope)
+
+        counters, histograms = gw.metrics.snapshot()
+        echo = (('service', 'echo'), ('method', ''))
+        fail = (('service', 'fail'), ('method', ''))
+
+        self.assertEqual(counters, {
+            ('pyamf_requests_total', ()): 1,
+            ('pyamf_calls_total', echo): 1,
+            ('pyamf_calls_total', fail): 1,
+            ('pyamf_call_errors_total', fail): 1,
+        })
+
+        for phase in ('auth', 'preprocess', 'call'):
+            key = ('pyamf_call_seconds', echo + (('phase', phase),))
+
+            self.assertEqual(histograms[key].count, 1)
+
+        for phase in ('decode', 'process', 'encode', 'total'):
+            key = ('pyamf_request_seconds', (('phase', phase),))
+
+            self.assertEqual(histograms[key].count, 1)
+
+        self.assertEqual(
+            histograms[('pyamf_request_bytes', ())].sum,
+            len(body)
+        )
+        self.assertEqual(
+            histograms[('pyamf_response_bytes', ())].sum,
+            len(response)
+        )
+
+    def test_remoting_message(self):
+        from pyamf.flex import messaging
+
+        class Service(object):
+            def echo(self, x):
+                return x
+
+        gw = WSGIGateway({'svc': Service}, metrics=True)
+
+        envelope = remoting.Envelope(pyamf.AMF3)
+        envelope['/1'] = remoting.Request('null', body=[
+            messaging.RemotingMessage(
+                destination='svc',
+                operation='echo',
+                body=['foo']
+            )
+        ])
+
+        self.doRequest(gw, envelope)
+
+        counters, histograms = gw.metrics.snapshot()
+        labels = (('service', 'svc'), ('method', 'echo'))
+
+        self.assertEqual(counters[('pyamf_calls_total', labels)], 1)
+        self.assertEqual(
+            histograms[('pyamf_call_seconds', labels + (('phase', 'call'),))]
+            .count,
+            1
+        )
+
+    def test_decode_error(self):
+        gw = WSGIGateway(metrics=True)
+
+        gw({
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_LENGTH': '3',
+            'wsgi.input': util.BufferedByteStream('foo')
+        }, lambda *args: None)
+
+        counters, histograms = gw.metrics.snapshot()
+
+        self.assertEqual(counters, {
+            ('pyamf_requests_total', ()): 1,
+            ('pyamf_request_errors_total', ()): 1,
+        })
+
+    def test_export_error(self):
+        """
+        An exporter that raises is logged and does not fail the request.
+        """
+        class Exporter(metrics.BaseExporter):
+            def export(self, counters, histograms):
+                raise RuntimeError('exporter down')
+
+        gw = WSGIGateway(
+            {'echo': lambda x: x},
+            metrics=True,
+            logger=self.logger
+        )
+        gw.metrics.exporter = Exporter()
+        gw.metrics.export_interval = 0
+
+        envelope = remoting.Envelope(pyamf.AMF0)
+        envelope['/1'] = remoting.Request('echo', body=['foo'])
+
+        response, body = self.doRequest(gw, envelope)
+
+        self.assertEqual(remoting.decode(response)['/1'].body, 'foo')
+        self.assertEqual(len(self.records), 1)
+        self.assertEqual(
+            self.records[0].exc_info[1].args,
+            ('exporter down',)
+        )
+
+    def test_slow_request(self):
+        gw = WSGIGateway(
+            {'echo': lambda x: x},
+            slow_request_threshold=0,
+            logger=self.logger
+        )
+
+        envelope = remoting.Envelope(pyamf.AMF0)
+        envelope['/1'] = remoting.Request('echo', body=['foo'])
+
+        self.doRequest(gw, envelope)
+
+        self.assertEqual(len(self.records), 1)
+
+        message = self.records[0].getMessage()
+
+        self.assertTrue(message.startswith('Slow AMF request'))
+        self.assertTrue('decode=' in message)
+        self.assertTrue(message.endswith(': echo'))
+
+    def test_fast_request(self):
+        gw = WSGIGateway(
+            {'echo': lambda x: x},
+            slow_request_threshold=60,
+            logger=self.logger
+        )
+
+        envelope = remoting.Envelope(pyamf.AMF0)
+        envelope['/1'] = remoting.Request('echo', body=['foo'])
+
+        self.doRequest(gw, envelope)
+
+        self.assertEqual(self.records, [])
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Tests for L{pyamf.remoting.cache}.
+
+@since: 0.9
+"""
+
+import unittest
+
+from pyamf.remoting import cache
+
+
+class GetKeyTestCase(unittest.TestCase):
+    """
+    Tests for L{cache.get_key}.
+    """
+
+    def test_stable(self):
+        self.assertEqual(
+            cache.get_key('svc', 'meth', (1, 'foo', [1, 2])),
+            cache.get_key('svc', 'meth', (1, 'foo', [1, 2]))
+        )
+
+    def test_differs(self):
+        key = cache.get_key('svc', 'meth', (1,))
+
+        self.assertNotEqual(key, cache.get_key('svc', 'meth', (2,)))
+        self.assertNotEqual(key, cache.get_key('svc', 'other', (1,)))
+        self.assertNotEqual(key, cache.get_key('other', 'meth', (1,)))
+        self.assertNotEqual(key, cache.get_key('svc', None, (1,)))
+
+    def test_prefix(self):
+        self.assertTrue(cache.get_key('svc', 'meth', ()).startswith(
+            'svc.meth:'))
+        self.assertTrue(cache.get_key('svc', None, ()).startswith('svc.:'))
+
+
+class LocalCacheTestCase(unittest.TestCase):
+    """
+    Tests for L{cache.LocalCache}.
+    """
+
+    def setUp(self):
+        self.time = cache.time
+        self.now = 1000.0
+
+        test = self
+
+        class Time(object):
+            def time(self):
+                return test.now
+
+        cache.time = Time()
+
+    def tearDown(self):
+        cache.time = self.time
+
+    def test_create(self):
+        c = cache.LocalCache()
+
+        self.assertEqual(c.max_size, cache.DEFAULT_MAX_SIZE)
+        self.assertEqual(len(c), 0)
+
+        self.assertRaises(ValueError, cache.LocalCache, 0)
+
+    def test_get_set(self):
+        c = cache.LocalCache()
+
+        self.assertEqual(c.get('foo'), None)
+        self.assertEqual(c.get('foo', 'bar'), 'bar')
+
+        c.set('foo', None)
+
+        self.assertEqual(c.get('foo', 'bar'), None)
+        self.assertTrue('foo' in c)
+
+        c.set('foo', 'spam')
+
+        self.assertEqual(c.get('foo'), 'spam')
+        self.assertEqual(len(c), 1)
+
+    def test_delete(self):
+        c = cache.LocalCache()
+
+        c.set('foo', 'bar')
+        c.delete('foo')
+        c.delete('baz')
+
+        self.assertFalse('foo' in c)
+        self.assertEqual(len(c), 0)
+
+    def test_clear(self):
+        c = cache.LocalCache()
+
+        c.set('foo', 'bar')
+        c.set('baz', 'gak')
+        c.clear()
+
+        self.assertEqual(len(c), 0)
+
+        c.set('foo', 'bar')
+
+        self.assertEqual(c.get('foo'), 'bar')
+
+    def test_ttl(self):
+        c = cache.LocalCache()
+
+        c.set('foo', 'bar', 10)
+        c.set('baz', 'gak')
+
+        self.now += 9
+
+        self.assertEqual(c.get('foo'), 'bar')
+
+        self.now += 1
+
+        self.assertEqual(c.get('foo'), None)
+        self.assertEqual(c.get('baz'), 'gak')
+        self.assertEqual(len(c), 1)
+
+    def test_lru(self):
+        c = cache.LocalCache(3)
+
+        c.set('a', 1)
+        c.set('b', 2)
+        c.set('c', 3)
+
+        # 'a' is now the most recently used
+        c.get('a')
+
+        c.set('d', 4)
+
+        self.assertFalse('b' in c)
+        self.assertEqual(len(c), 3)
+
+        c.set('c', 5)
+        c.set('e', 6)
+
+        self.assertFalse('a' in c)
+        self.assertEqual(c.get('c'), 5)
+        self.assertEqual(c.get('d'), 4)
+        self.assertEqual(c.get('e'), 6)
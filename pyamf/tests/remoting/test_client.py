@@ -14,7 +14,7 @@ import urllib2
 
 import pyamf
 from pyamf import remoting, util
-from pyamf.remoting import client
+from pyamf.remoting import client, compression
 
 
 class ServiceMethodProxyTestCase(unittest.TestCase):
@@ -661,3 +661,66 @@ class GZipTestCase(BaseServiceTestCase):
         self.setResponse(200, 'foobar', self.headers)
 
         self.assertRaises(IOError, self.gw._getResponse, None)
+
+
+class CompressionTestCase(BaseServiceTestCase):
+    """
+    Tests for compressed requests and deflated responses.
+
+    @since: 0.9
+    """
+
+    def test_create(self):
+        self.assertEqual(self.gw.compression, None)
+        self.assertFalse(self.gw.accept_compression)
+
+        self.assertRaises(
+            ValueError,
+            client.RemotingService,
+            'http://example.org',
+            compression='br'
+        )
+
+    def test_compressed_request(self):
+        self.gw.compression = 'gzip'
+
+        self.gw.execute()
+
+        request = self.opener.request
+
+        self.assertEqual(request.headers['Content-encoding'], 'gzip')
+
+        envelope = remoting.decode(
+            compression.decompress(request.data, 'gzip')
+        )
+
+        self.assertEqual(len(envelope), 0)
+
+    def test_accept_compression(self):
+        self.gw.accept_compression = True
+
+        self.gw.execute()
+
+        request = self.opener.request
+
+        self.assertEqual(
+            request.headers['Accept-encoding'],
+            'gzip, deflate'
+        )
+
+    def test_deflate_response(self):
+        body = compression.compress(self.canned_response, 'deflate')
+
+        self.headers['Content-Encoding'] = 'deflate'
+        self.headers['Content-Length'] = len(body)
+        self.setResponse(200, body, self.headers)
+
+        response = self.gw._getResponse(None)
+
+        self.assertEqual(response['/1'].body, [1, 2, 3])
+
+    def test_bad_deflate_response(self):
+        self.headers['Content-Encoding'] = 'deflate'
+        self.setResponse(200, self.canned_response, self.headers)
+
+        self.assertRaises(remoting.RemotingError, self.gw._getResponse, None)
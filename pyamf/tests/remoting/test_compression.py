@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Tests for L{pyamf.remoting.compression}.
+
+@since: 0.9
+"""
+
+import gzip
+import unittest
+import zlib
+from StringIO import StringIO
+
+from pyamf import util
+from pyamf.remoting import compression
+
+
+class AcceptedEncodingTestCase(unittest.TestCase):
+    """
+    Tests for L{compression.get_accepted_encoding}.
+    """
+
+    def test_empty(self):
+        self.assertEqual(compression.get_accepted_encoding(None), None)
+        self.assertEqual(compression.get_accepted_encoding(''), None)
+
+    def test_simple(self):
+        self.assertEqual(compression.get_accepted_encoding('gzip'), 'gzip')
+        self.assertEqual(
+            compression.get_accepted_encoding('deflate'),
+            'deflate'
+        )
+
+    def test_preference(self):
+        self.assertEqual(
+            compression.get_accepted_encoding('deflate, gzip'),
+            'gzip'
+        )
+
+    def test_unsupported(self):
+        self.assertEqual(compression.get_accepted_encoding('br, sdch'), None)
+
+    def test_quality(self):
+        self.assertEqual(
+            compression.get_accepted_encoding('gzip;q=0, deflate;q=0.5'),
+            'deflate'
+        )
+        self.assertEqual(
+            compression.get_accepted_encoding('gzip;q=0,deflate;q=0'),
+            None
+        )
+        self.assertEqual(
+            compression.get_accepted_encoding('gzip;q=foo'),
+            None
+        )
+
+    def test_wildcard(self):
+        self.assertEqual(compression.get_accepted_encoding('*'), 'gzip')
+        self.assertEqual(
+            compression.get_accepted_encoding('gzip;q=0, *'),
+            'deflate'
+        )
+
+
+class CompressTestCase(unittest.TestCase):
+    """
+    Tests for L{compression.compress} and L{compression.decompress}.
+    """
+
+    data = 'spam and eggs ' * 1000
+
+    def test_gzip(self):
+        compressed = compression.compress(self.data, 'gzip')
+
+        self.assertTrue(len(compressed) < len(self.data))
+        self.assertEqual(
+            gzip.GzipFile(fileobj=StringIO(compressed)).read(),
+            self.data
+        )
+        self.assertEqual(
+            compression.decompress(compressed, 'gzip'),
+            self.data
+        )
+
+    def test_deflate(self):
+        compressed = compression.compress(self.data, 'deflate')
+
+        self.assertEqual(zlib.decompress(compressed), self.data)
+        self.assertEqual(
+            compression.decompress(compressed, 'deflate'),
+            self.data
+        )
+
+    def test_raw_deflate(self):
+        c = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        compressed = c.compress(self.data) + c.flush()
+
+        self.assertEqual(
+            compression.decompress(compressed, 'deflate'),
+            self.data
+        )
+
+    def test_identity(self):
+        self.assertEqual(compression.decompress('foo', None), 'foo')
+        self.assertEqual(compression.decompress('foo', ''), 'foo')
+        self.assertEqual(compression.decompress('foo', 'identity'), 'foo')
+
+    def test_bad_data(self):
+        self.assertRaises(IOError, compression.decompress, 'foo', 'gzip')
+        self.assertRaises(IOError, compression.decompress, 'foo', 'deflate')
+
+    def test_unsupported(self):
+        self.assertRaises(ValueError, compression.compress, 'foo', 'br')
+        self.assertRaises(IOError, compression.decompress, 'foo', 'br')
+
+    def test_max_size(self):
+        size = len(self.data)
+
+        for encoding in compression.ENCODINGS:
+            compressed = compression.compress(self.data, encoding)
+
+            self.assertEqual(
+                compression.decompress(compressed, encoding, size),
+                self.data
+            )
+            self.assertRaises(
+                compression.SizeLimitError,
+                compression.decompress,
+                compressed,
+                encoding,
+                size - 1
+            )
+
+
+class IterCompressTestCase(unittest.TestCase):
+    """
+    Tests for L{compression.iter_compress}.
+    """
+
+    def test_chunks(self):
+        data = ''.join([str(i) for i in xrange(20000)])
+        stream = util.BufferedByteStream(data)
+
+        chunks = list(compression.iter_compress(
+            stream,
+            'deflate',
+            chunk_size=1024
+        ))
+
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(zlib.decompress(''.join(chunks)), data)
+        self.assertTrue(stream.at_eof())
+
+    def test_empty(self):
+        stream = util.BufferedByteStream()
+
+        chunks = list(compression.iter_compress(stream, 'gzip'))
+
+        self.assertEqual(compression.decompress(''.join(chunks), 'gzip'), '')
+
+
+class DecompressorTestCase(unittest.TestCase):
+    """
+    Tests for L{compression.Decompressor}.
+    """
+
+    data = 'spam and eggs ' * 1000
+
+    def decompress(self, compressed, encoding, max_size=None):
+        d = compression.get_decompressor(encoding, max_size)
+        chunks = [
+            d.decompress(compressed[i:i + 100])
+            for i in xrange(0, len(compressed), 100)
+        ]
+
+        return ''.join(chunks) + d.flush()
+
+    def test_gzip(self):
+        compressed = compression.compress(self.data, 'gzip')
+
+        self.assertEqual(self.decompress(compressed, 'gzip'), self.data)
+
+    def test_raw_deflate(self):
+        c = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        compressed = c.compress(self.data) + c.flush()
+
+        self.assertEqual(self.decompress(compressed, 'deflate'), self.data)
+
+    def test_identity(self):
+        self.assertEqual(compression.get_decompressor(None), None)
+        self.assertEqual(compression.get_decompressor(' Identity'), None)
+
+    def test_max_size(self):
+        compressed = compression.compress(self.data, 'gzip')
+        size = len(self.data)
+
+        self.assertEqual(
+            self.decompress(compressed, 'gzip', size),
+            self.data
+        )
+        self.assertRaises(
+            compression.SizeLimitError,
+            self.decompress,
+            compressed,
+            'gzip',
+            size - 1
+        )
+
+    def test_bad_data(self):
+        d = compression.get_decompressor('gzip')
+
+        self.assertRaises(IOError, d.decompress, 'foo')
+        self.assertRaises(IOError, compression.get_decompressor, 'br')
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Tests for L{pyamf.remoting.metrics}.
+
+@since: 0.9
+"""
+
+import unittest
+import threading
+
+from pyamf.remoting import metrics
+
+
+class MockTimer(object):
+    def __init__(self, elapsed=0.5, phases=()):
+        self.elapsed = elapsed
+        self.phases = list(phases)
+
+    def getElapsed(self):
+        return self.elapsed
+
+
+class MockExporter(metrics.BaseExporter):
+    def __init__(self):
+        self.exported = []
+
+    def export(self, counters, histograms):
+        self.exported.append((counters, histograms))
+
+
+class HistogramTestCase(unittest.TestCase):
+    """
+    Tests for L{metrics.Histogram}.
+    """
+
+    def test_observe(self):
+        h = metrics.Histogram((1, 5))
+
+        for value in (0, 1, 2, 5, 6, 100):
+            h.observe(value)
+
+        self.assertEqual(h.counts, [2, 2, 2])
+        self.assertEqual(h.count, 6)
+        self.assertEqual(h.sum, 114)
+
+    def test_copy(self):
+        h = metrics.Histogram((1,))
+        h.observe(1)
+
+        c = h.copy()
+        h.observe(2)
+
+        self.assertEqual(c.counts, [1, 0])
+        self.assertEqual(c.count, 1)
+
+
+class TimerTestCase(unittest.TestCase):
+    """
+    Tests for L{metrics.Timer}.
+    """
+
+    def test_mark(self):
+        t = metrics.Timer()
+
+        t.mark('decode')
+        t.mark('encode')
+
+        self.assertEqual([x[0] for x in t.phases], ['decode', 'encode'])
+        self.assertAlmostEqual(
+            sum([x[1] for x in t.phases]),
+            t.getElapsed()
+        )
+
+    def test_null(self):
+        metrics.NULL_TIMER.mark('decode')
+
+        self.assertEqual(metrics.NULL_TIMER.phases, ())
+        self.assertEqual(metrics.NULL_TIMER.getElapsed(), 0)
+
+
+class MetricsTestCase(unittest.TestCase):
+    """
+    Tests for L{metrics.Metrics}.
+    """
+
+    def setUp(self):
+        self.metrics = metrics.Metrics(
+            latency_buckets=(0.1, 1),
+            size_buckets=(100,)
+        )
+
+    def test_request(self):
+        timer = MockTimer(0.5, [('decode', 0.05), ('encode', 0.45)])
+
+        self.metrics.recordRequest(timer, 10, 200)
+        self.metrics.recordRequest(timer, error=True)
+
+        counters, histograms = self.metrics.snapshot()
+
+        self.assertEqual(counters, {
+            ('pyamf_requests_total', ()): 2,
+            ('pyamf_request_errors_total', ()): 1,
+        })
+
+        h = histograms[('pyamf_request_seconds', (('phase', 'decode'),))]
+        self.assertEqual(h.counts, [2, 0, 0])
+
+        h = histograms[('pyamf_request_seconds', (('phase', 'total'),))]
+        self.assertEqual(h.counts, [0, 2, 0])
+
+        self.assertEqual(
+            histograms[('pyamf_request_bytes', ())].counts,
+            [1, 0]
+        )
+        self.assertEqual(
+            histograms[('pyamf_response_bytes', ())].counts,
+            [0, 1]
+        )
+
+    def test_call(self):
+        timer = MockTimer(phases=[('auth', 0.01), ('call', 2)])
+
+        self.metrics.recordCall('echo', None, timer)
+        self.metrics.recordCall('echo', None, timer, error=True)
+
+        counters, histograms = self.metrics.snapshot()
+        labels = (('service', 'echo'), ('method', ''))
+
+        self.assertEqual(counters, {
+            ('pyamf_calls_total', labels): 2,
+            ('pyamf_call_errors_total', labels): 1,
+        })
+        self.assertEqual(
+            histograms[('pyamf_call_seconds', labels + (('phase', 'call'),))]
+            .counts,
+            [0, 0, 2]
+        )
+
+    def test_snapshot_copy(self):
+        self.metrics.recordRequest(MockTimer(), 10)
+
+        counters, histograms = self.metrics.snapshot()
+
+        self.metrics.recordRequest(MockTimer(), 10)
+
+        self.assertEqual(counters[('pyamf_requests_total', ())], 1)
+        self.assertEqual(histograms[('pyamf_request_bytes', ())].count, 1)
+
+    def test_reset(self):
+        self.metrics.increment('foo')
+        self.metrics.observe('bar', 1)
+        self.metrics.reset()
+
+        self.assertEqual(self.metrics.snapshot(), ({}, {}))
+
+    def test_export(self):
+        exporter = MockExporter()
+
+        self.metrics.exporter = exporter
+        self.metrics.export_interval = 0
+
+        self.metrics.recordRequest(MockTimer())
+
+        self.assertEqual(len(exporter.exported), 1)
+        self.assertEqual(
+            exporter.exported[0][0],
+            {('pyamf_requests_total', ()): 1}
+        )
+
+    def test_export_interval(self):
+        exporter = MockExporter()
+
+        self.metrics.exporter = exporter
+        self.metrics.export_interval = 3600
+
+        self.metrics.recordRequest(MockTimer())
+
+        self.assertEqual(exporter.exported, [])
+
+    def test_export_once_per_interval(self):
+        exporter = MockExporter()
+
+        self.metrics.exporter = exporter
+        self.metrics.export_interval = 3600
+        self.metrics._last_export = 0
+
+        threads = [
+            threading.Thread(target=self.metrics.recordRequest,
+                             args=(MockTimer(),))
+            for i in xrange(10)
+        ]
+
+        for t in threads:
+            t.start()
+
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(exporter.exported), 1)
+
+    def test_export_in_thread(self):
+        exporter = MockExporter()
+        exported = threading.Event()
+        threads = []
+
+        def export(counters, histograms):
+            threads.append(threading.currentThread())
+            exported.set()
+
+        exporter.export = export
+
+        self.metrics.exporter = exporter
+        self.metrics.export_interval = 0
+        self.metrics.export_in_thread = True
+
+        self.metrics.recordRequest(MockTimer())
+
+        exported.wait(5)
+
+        self.assertTrue(exported.isSet())
+        self.assertNotEqual(threads, [threading.currentThread()])
+
+    def test_export_error(self):
+        """
+        Errors raised by the exporter are logged, not raised.
+        """
+        logged = []
+
+        class Logger(object):
+            def exception(self, *args):
+                logged.append(args)
+
+        def export(counters, histograms):
+            raise RuntimeError('exporter down')
+
+        exporter = MockExporter()
+        exporter.export = export
+
+        self.metrics.exporter = exporter
+        self.metrics.export_interval = 0
+        self.metrics.logger = Logger()
+
+        self.metrics.recordRequest(MockTimer())
+
+        self.assertEqual(len(logged), 1)
+        self.assertRaises(RuntimeError, self.metrics.export)
+
+
+class FormatTextTestCase(unittest.TestCase):
+    """
+    Tests for L{metrics.format_text}.
+    """
+
+    def test_format(self):
+        m = metrics.Metrics()
+
+        m.increment('pyamf_calls_total', (('service', 'a"b'),), 3)
+        m.observe('pyamf_request_bytes', 300, buckets=(256, 1024))
+        m.observe('pyamf_request_bytes', 100, buckets=(256, 1024))
+
+        self.assertEqual(metrics.format_text(*m.snapshot()), '\n'.join([
+            '# TYPE pyamf_calls_total counter',
+            'pyamf_calls_total{service="a\\"b"} 3',
+            '# TYPE pyamf_request_bytes histogram',
+            'pyamf_request_bytes_bucket{le="256"} 1',
+            'pyamf_request_bytes_bucket{le="1024"} 2',
+            'pyamf_request_bytes_bucket{le="+Inf"} 2',
+            'pyamf_request_bytes_sum 400',
+            'pyamf_request_bytes_count 2',
+        ]) + '\n')
+
+    def test_application(self):
+        m = metrics.Metrics()
+        m.increment('pyamf_requests_total')
+
+        app = metrics.MetricsApplication(m)
+        headers = []
+
+        def start_response(status, response_headers):
+            headers.append((status, response_headers))
+
+        body = ''.join(app({}, start_response))
+
+        self.assertEqual(
+            body,
+            '# TYPE pyamf_requests_total counter\npyamf_requests_total 1\n'
+        )
+        self.assertEqual(headers[0][0], '200 OK')
+        self.assertTrue(
+            ('Content-Type', metrics.TEXT_CONTENT_TYPE) in headers[0][1]
+        )
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Tests for L{pyamf.remoting.parallel}.
+
+@since: 0.9
+"""
+
+import unittest
+import multiprocessing
+
+import pyamf
+from pyamf import remoting
+from pyamf.remoting import parallel
+
+
+class Spam(object):
+    def __init__(self, eggs=None):
+        self.eggs = eggs
+
+
+class SerialPool(object):
+    """
+    Maps in the calling process but pickles like a real pool.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def map(self, func, tasks):
+        self.calls.append(len(tasks))
+
+        return map(func, tasks)
+
+
+def build_envelope(bodies=4):
+    envelope = remoting.Envelope(pyamf.AMF3)
+    envelope.headers['foo'] = 'bar'
+
+    for i in xrange(bodies):
+        envelope['/%d' % (i,)] = remoting.Response(
+            [{'spam': 'eggs', 'i': i}, u'ƒøø' * i, Spam(i)]
+        )
+
+    return envelope
+
+
+class BaseTestCase(unittest.TestCase):
+    def setUp(self):
+        pyamf.register_class(Spam, 'test.Spam')
+
+    def tearDown(self):
+        pyamf.unregister_class(Spam)
+
+    def assertDecoded(self, envelope, expected):
+        self.assertEqual(envelope.amfVersion, expected.amfVersion)
+        self.assertEqual(envelope.headers, expected.headers)
+        self.assertEqual(envelope.keys(), expected.keys())
+
+        for name, message in envelope:
+            body = message.body
+
+            self.assertEqual(message.status, expected[name].status)
+            self.assertEqual(body[:2], expected[name].body[:2])
+            self.assertTrue(isinstance(body[2], Spam))
+            self.assertEqual(body[2].eggs, expected[name].body[2].eggs)
+            self.assertTrue(message.envelope is envelope)
+
+
+class EncodeTestCase(BaseTestCase):
+    """
+    Tests for L{parallel.encode}.
+    """
+
+    def test_identical(self):
+        envelope = build_envelope()
+        pool = SerialPool()
+
+        for strict in (True, False):
+            self.assertEqual(
+                parallel.encode(envelope, pool, strict=strict).getvalue(),
+                remoting.encode(envelope, strict=strict).getvalue()
+            )
+
+        self.assertEqual(pool.calls, [4, 4])
+
+    def test_single_body(self):
+        envelope = build_envelope(1)
+        pool = SerialPool()
+
+        self.assertEqual(
+            remoting.encode(envelope, pool=pool).getvalue(),
+            remoting.encode(envelope).getvalue()
+        )
+        self.assertEqual(pool.calls, [])
+
+    def test_unpicklable(self):
+        class Local(object):
+            pass
+
+        envelope = build_envelope(3)
+        envelope['/1'].body = Local()
+        pool = SerialPool()
+
+        self.assertEqual(
+            parallel.encode(envelope, pool, strict=True).getvalue(),
+            remoting.encode(envelope, strict=True).getvalue()
+        )
+        self.assertEqual(pool.calls, [2])
+
+
+class DecodeTestCase(BaseTestCase):
+    """
+    Tests for L{parallel.decode}.
+    """
+
+    def test_strict(self):
+        expected = build_envelope()
+        data = remoting.encode(expected, strict=True).getvalue()
+        pool = SerialPool()
+
+        self.assertDecoded(
+            remoting.decode(data, strict=True, pool=pool),
+            expected
+        )
+        self.assertEqual(pool.calls, [4])
+
+    def test_unknown_lengths(self):
+        expected = build_envelope()
+        data = remoting.encode(expected).getvalue()
+        pool = SerialPool()
+
+        self.assertDecoded(parallel.decode(data, pool), expected)
+        self.assertEqual(pool.calls, [])
+
+    def test_unpicklable_options(self):
+        expected = build_envelope()
+        data = remoting.encode(expected, strict=True).getvalue()
+        pool = SerialPool()
+
+        self.assertDecoded(
+            parallel.decode(
+                data,
+                pool,
+                strict=True,
+                object_hooks={'test.Spam': lambda attrs: Spam(**attrs)}
+            ),
+            expected
+        )
+        self.assertEqual(pool.calls, [])
+
+    def test_truncated(self):
+        data = remoting.encode(build_envelope(), strict=True).getvalue()
+
+        self.assertRaises(
+            IOError,
+            parallel.decode,
+            data[:-10],
+            SerialPool()
+        )
+
+
+class PoolTestCase(BaseTestCase):
+    """
+    Round trips an envelope through a real pool.
+    """
+
+    def setUp(self):
+        BaseTestCase.setUp(self)
+
+        self.pool = multiprocessing.Pool(2)
+
+    def tearDown(self):
+        self.pool.terminate()
+        self.pool.join()
+
+        BaseTestCase.tearDown(self)
+
+    def test_round_trip(self):
+        envelope = build_envelope()
+
+        data = remoting.encode(envelope, strict=True, pool=self.pool)
+
+        self.assertEqual(
+            data.getvalue(),
+            remoting.encode(envelope, strict=True).getvalue()
+        )
+
+        self.assertDecoded(
+            remoting.decode(data, strict=True, pool=self.pool),
+            envelope
+        )
+
+    def test_options(self):
+        """
+        Codec options are passed to the workers.
+        """
+        envelope = remoting.Envelope(pyamf.AMF3)
+
+        for i in xrange(4):
+            envelope['/%d' % (i,)] = remoting.Response(
+                [{'spam': 'eggs', 'i': i}, {'spam': 'ham', 'i': -i}] +
+                [[0.5, 1.5, float(i)]]
+            )
+
+        data = remoting.encode(envelope, strict=True, infer_traits=True)
+
+        self.assertEqual(
+            remoting.encode(
+                envelope,
+                strict=True,
+                infer_traits=True,
+                pool=self.pool
+            ).getvalue(),
+            data.getvalue()
+        )
+
+        options = {'strict': True, 'use_records': True, 'number_array': True}
+        expected = remoting.decode(data.getvalue(), **options)
+        decoded = remoting.decode(data.getvalue(), pool=self.pool, **options)
+
+        for name, message in expected:
+            body = decoded[name].body
+
+            self.assertEqual(
+                [type(x) for x in body],
+                [type(x) for x in message.body]
+            )
+            self.assertEqual(
+                [dict(x) for x in body[:2]],
+                [dict(x) for x in message.body[:2]]
+            )
+            self.assertEqual(body[2], message.body[2])
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Tests for L{pyamf.remoting.spool}.
+
+@since: 0.9
+"""
+
+import unittest
+from StringIO import StringIO
+
+import pyamf
+from pyamf import remoting
+from pyamf.remoting import spool, compression
+
+
+class FileByteStreamTestCase(unittest.TestCase):
+    """
+    Tests for L{spool.FileByteStream}.
+    """
+
+    def test_stream(self):
+        stream = spool.FileByteStream()
+
+        stream.write('\x00\x01spam')
+        stream.seek(0)
+
+        self.assertEqual(len(stream), 6)
+        self.assertEqual(stream.read_ushort(), 1)
+        self.assertEqual(stream.getvalue(), '\x00\x01spam')
+        self.assertEqual(stream.read(4), 'spam')
+        self.assertTrue(stream.at_eof())
+        self.assertRaises(IOError, stream.read, 1)
+
+        stream.truncate()
+
+        self.assertEqual(len(stream), 0)
+        self.assertEqual(stream.tell(), 0)
+
+        stream.close()
+
+    def test_decode(self):
+        envelope = remoting.Envelope(pyamf.AMF3)
+        envelope['/1'] = remoting.Request('echo', body=['spam'])
+
+        stream = spool.FileByteStream()
+        stream.write(remoting.encode(envelope).getvalue())
+        stream.seek(0)
+
+        self.assertEqual(remoting.decode(stream)['/1'].body, ['spam'])
+        # decoded in place, rather than from a copy
+        self.assertTrue(stream.at_eof())
+
+
+class ReadBodyTestCase(unittest.TestCase):
+    """
+    Tests for L{spool.read_body}.
+    """
+
+    data = ''.join([str(i) for i in xrange(1000)])
+
+    def test_length(self):
+        input = StringIO(self.data + 'trailing')
+
+        stream, received = spool.read_body(
+            input,
+            len(self.data),
+            read_size=100
+        )
+
+        self.assertEqual(received, len(self.data))
+        self.assertEqual(stream.getvalue(), self.data)
+        self.assertEqual(stream.tell(), 0)
+        self.assertEqual(input.read(), 'trailing')
+
+    def test_chunked(self):
+        stream, received = spool.read_body(StringIO(self.data), read_size=7)
+
+        self.assertEqual(received, len(self.data))
+        self.assertEqual(stream.getvalue(), self.data)
+
+    def test_truncated(self):
+        self.assertRaises(
+            IOError,
+            spool.read_body,
+            StringIO(self.data),
+            len(self.data) + 1
+        )
+
+    def test_spool(self):
+        stream, received = spool.read_body(
+            StringIO(self.data),
+            len(self.data),
+            read_size=100,
+            spool_size=1000
+        )
+
+        self.assertTrue(isinstance(stream, spool.FileByteStream))
+        self.assertEqual(stream.getvalue(), self.data)
+        self.assertEqual(stream.tell(), 0)
+
+        stream, received = spool.read_body(
+            StringIO(self.data),
+            spool_size=None
+        )
+
+        self.assertFalse(isinstance(stream, spool.FileByteStream))
+
+    def test_compressed(self):
+        compressed = compression.compress(self.data, 'gzip')
+
+        stream, received = spool.read_body(
+            StringIO(compressed),
+            len(compressed),
+            'gzip',
+            read_size=64,
+            spool_size=1000
+        )
+
+        self.assertEqual(received, len(compressed))
+        self.assertTrue(isinstance(stream, spool.FileByteStream))
+        self.assertEqual(stream.getvalue(), self.data)
+
+    def test_close_on_error(self):
+        compressed = compression.compress(self.data, 'gzip')
+        streams = []
+        base = spool.FileByteStream
+
+        class FileByteStream(base):
+            def __init__(self, *args, **kwargs):
+                base.__init__(self, *args, **kwargs)
+
+                streams.append(self)
+
+        self.patch(spool, 'FileByteStream', FileByteStream)
+
+        self.assertRaises(
+            compression.SizeLimitError,
+            spool.read_body,
+            StringIO(compressed),
+            len(compressed),
+            'gzip',
+            read_size=64,
+            spool_size=1000,
+            max_size=len(self.data) - 1
+        )
+
+        self.assertEqual(len(streams), 1)
+        self.assertTrue(streams[0]._buffer.closed)
+
+    def patch(self, obj, name, value):
+        old = getattr(obj, name)
+        setattr(obj, name, value)
+
+        self.addCleanup(setattr, obj, name, old)
+
+
+class SpooledByteStreamTestCase(unittest.TestCase):
+    """
+    Tests for L{spool.SpooledByteStream}.
+    """
+
+    def test_rollover(self):
+        stream = spool.SpooledByteStream(8)
+
+        stream.write('spam')
+
+        self.assertFalse(stream.rolled)
+
+        stream.write_ulong(0)
+        stream.write('eggs')
+
+        self.assertTrue(stream.rolled)
+        self.assertEqual(len(stream), 12)
+
+        # back-patch
+        stream.seek(4)
+        stream.write_ulong(1)
+        stream.seek(0, 2)
+
+        self.assertEqual(stream.getvalue(), 'spam\x00\x00\x00\x01eggs')
+        self.assertEqual(stream.tell(), 12)
+
+    def test_encode(self):
+        for encoding in pyamf.ENCODING_TYPES:
+            envelope = remoting.Envelope(encoding)
+            envelope['/1'] = remoting.Response(['spam' * 100, {'a': 1}])
+            envelope['/2'] = remoting.Response(u'eggs')
+
+            for strict in (False, True):
+                expected = remoting.encode(envelope, strict=strict).getvalue()
+                stream = remoting.encode(
+                    envelope,
+                    strict=strict,
+                    stream=spool.SpooledByteStream(16)
+                )
+
+                self.assertTrue(stream.rolled)
+                self.assertEqual(stream.tell(), 0)
+                self.assertEqual(stream.getvalue(), expected)
+
+    def test_iter_stream(self):
+        stream = spool.SpooledByteStream(4)
+        stream.write('spam and eggs')
+        stream.seek(0)
+
+        self.assertEqual(
+            list(spool.iter_stream(stream, 5)),
+            ['spam ', 'and e', 'ggs']
+        )
+        self.assertTrue(stream._buffer.closed)
@@ -12,7 +12,7 @@ to have them in one file.
 import unittest
 
 import pyamf
-from pyamf import ClassAlias
+from pyamf import ClassAlias, alias
 from pyamf.tests.util import ClassCacheClearingTestCase, Spam, get_fqcn
 
 try:
@@ -676,6 +676,89 @@ class SimpleCompliationTestCase(unittest.TestCase):
 
         self.assertEquals(x.synonym_attrs, {'foo': 'bar'})
 
+    def test_schema(self):
+        x = ClassAlias(
+            Spam,
+            static_attrs=['foo', 'bar', 'baz', 'gak'],
+            schema={'foo': 'int', 'bar': Spam, 'baz': [Spam]},
+            defer=True
+        )
+
+        x.compile()
+
+        self.assertEqual(x.schema, {
+            'foo': (1, None),
+            'bar': (alias.SCHEMA_OBJECT, Spam),
+            'baz': (alias.SCHEMA_LIST, Spam),
+        })
+        self.assertEqual(x.static_types, [
+            (alias.SCHEMA_OBJECT, Spam),
+            (alias.SCHEMA_LIST, Spam),
+            (1, None),
+            None,
+        ])
+
+    def test_schema_alias(self):
+        """
+        Classes named by alias in the schema are resolved on first use.
+        """
+        x = ClassAlias(
+            Spam,
+            static_attrs=['foo', 'bar'],
+            schema={'foo': 'spam.Eggs', 'bar': ['spam.Eggs']},
+        )
+
+        self.assertEqual(x.static_types, [
+            (alias.SCHEMA_LIST, 'spam.Eggs'),
+            (alias.SCHEMA_OBJECT, 'spam.Eggs'),
+        ])
+        self.assertRaises(pyamf.UnknownClassAlias, x.getStaticTypes)
+
+        class Eggs(object):
+            pass
+
+        pyamf.register_class(Eggs, 'spam.Eggs')
+
+        try:
+            self.assertEqual(x.getStaticTypes(), [
+                (alias.SCHEMA_LIST, Eggs),
+                (alias.SCHEMA_OBJECT, Eggs),
+            ])
+            self.assertEqual(x.schema, {
+                'foo': (alias.SCHEMA_OBJECT, Eggs),
+                'bar': (alias.SCHEMA_LIST, Eggs),
+            })
+        finally:
+            pyamf.unregister_class(Eggs)
+
+    def test_no_schema(self):
+        x = ClassAlias(Spam, static_attrs=['foo'])
+
+        self.assertEqual(x.schema, None)
+        self.assertEqual(x.static_types, None)
+
+    def test_bad_schema(self):
+        self.assertRaises(
+            ValueError,
+            ClassAlias,
+            Spam,
+            schema={'foo': 'int'}
+        )
+        self.assertRaises(
+            ValueError,
+            ClassAlias,
+            Spam,
+            static_attrs=['foo'],
+            schema={'foo': [Spam, Spam]}
+        )
+        self.assertRaises(
+            TypeError,
+            ClassAlias,
+            Spam,
+            static_attrs=['foo'],
+            schema={'foo': 1}
+        )
+
 
 class CompilationInheritanceTestCase(ClassCacheClearingTestCase):
     """
@@ -997,6 +1080,31 @@ class CompilationInheritanceTestCase(ClassCacheClearingTestCase):
         self.assertEquals(b.synonym_attrs, {'foo': 'bar', 'bar': 'baz'})
         self.assertEquals(c.synonym_attrs, {'foo': 'bar', 'bar': 'spam'})
 
+    def test_schema(self):
+        class A(object):
+            pass
+
+        class B(A):
+            pass
+
+        a = self._register(ClassAlias(
+            A, 'a', static_attrs=['foo', 'bar'],
+            schema={'foo': 'int', 'bar': A}, defer=True
+        ))
+        b = self._register(ClassAlias(
+            B, 'b', static_attrs=['baz'], schema={'foo': 'double'},
+            defer=True
+        ))
+
+        b.compile()
+
+        self.assertEqual(a.static_types, [(alias.SCHEMA_OBJECT, A), (1, None)])
+        self.assertEqual(b.static_types, [
+            (alias.SCHEMA_OBJECT, A),
+            None,
+            (2, None),
+        ])
+
 
 class CompilationIntegrationTestCase(unittest.TestCase):
     """
@@ -1203,3 +1311,52 @@ class UnregisterClassTestCase(ClassCacheClearingTestCase):
         self.assertTrue('foo' in pyamf.CLASS_CACHE)
         self.assertFalse(Spam in pyamf.CLASS_CACHE)
         self.assertTrue(ret is alias)
+
+
+class BaseClassAliasTestCase(unittest.TestCase):
+    """
+    Tests for L{pyamf.alias.BaseClassAlias}, which may be provided by
+    C{cpyamf.alias}.
+    """
+
+    def test_ext(self):
+        try:
+            from cpyamf import alias
+        except ImportError:
+            self.skipTest('alias extension not available')
+
+        self.assertTrue(issubclass(ClassAlias, alias.BaseClassAlias))
+
+    def test_override_get_attribute(self):
+        class Alias(ClassAlias):
+            def getAttribute(self, obj, attr, codec=None):
+                return attr.upper()
+
+        alias = Alias(Spam, static_attrs=['foo'], defer=True)
+        x = Spam()
+        x.bar = 'baz'
+
+        self.assertEqual(
+            alias.getEncodableAttributes(x),
+            {'foo': 'FOO', 'bar': 'BAR'}
+        )
+
+    def test_override_decodable(self):
+        class Alias(ClassAlias):
+            def getDecodableAttributes(self, obj, attrs, codec=None):
+                attrs = ClassAlias.getDecodableAttributes(
+                    self,
+                    obj,
+                    attrs,
+                    codec=codec
+                )
+                attrs['spam'] = 'eggs'
+
+                return attrs
+
+        alias = Alias(Spam, exclude_attrs=['foo'], defer=True)
+        x = Spam()
+
+        alias.applyAttributes(x, {'foo': 1, 'bar': 2})
+
+        self.assertEqual(x.__dict__, {'bar': 2, 'spam': 'eggs'})
@@ -9,11 +9,13 @@ Tests for AMF0 Implementation.
 @since: 0.1.0
 """
 
+import array
 import unittest
 import datetime
+import struct
 
 import pyamf
-from pyamf import amf0, util, xml, python
+from pyamf import amf0, util, xml, python, instrumentation
 from pyamf.tests.util import (
     EncoderMixIn, DecoderMixIn, ClassCacheClearingTestCase, Spam, ClassicSpam)
 
@@ -94,6 +96,30 @@ class EncoderTestCase(ClassCacheClearingTestCase, EncoderMixIn):
             '\x00\x00\x00\x00\x00\x00\x00\x00\x40\x08\x00\x00\x00\x00\x00\x00'
         )
 
+    def test_number_list(self):
+        """
+        Lists of numbers are written in bulk.
+        """
+        x = [0, -1, 2 ** 40, 1.5] + range(-600, 600)
+        x += [float(i) / 3 for i in range(600)]
+
+        for value in (x, tuple(x), x + [True]):
+            expected = self.encode(*value)
+            self.context.clear()
+
+            self.assertEqual(
+                self.encode(value),
+                '\x0a' + struct.pack('>L', len(value)) + expected
+            )
+
+    def test_string_list(self):
+        x = ['spam', u'eggs', 'spam', u'ƒ', '']
+
+        expected = self.encode(*x)
+        self.context.clear()
+
+        self.assertEqual(self.encode(x), '\x0a\x00\x00\x00\x05' + expected)
+
     def test_list_references(self):
         x = []
 
@@ -449,6 +475,20 @@ class EncoderTestCase(ClassCacheClearingTestCase, EncoderMixIn):
             ('\x01\x07foo\x06\x07bar', '\x07baz\x06\x07gak\x01')
         )
 
+    def test_infer_traits(self):
+        """
+        The option is passed on to the AMF3 encoder.
+        """
+        self.encoder = pyamf.get_encoder(pyamf.AMF0, infer_traits=True)
+        self.encoder.use_amf3 = True
+        self.buf = self.encoder.stream
+        self.context = self.encoder.context
+
+        self.assertEncoded(
+            {'foo': 'bar'},
+            '\x11\x0a\x13\x01\x07foo\x06\x07bar'
+        )
+
     def test_static_attrs(self):
         class Foo(object):
             class __amf__:
@@ -630,6 +670,98 @@ class DecoderTestCase(ClassCacheClearingTestCase, DecoderMixIn):
             '\x00\x00\x00\x00\x00\x00\x00\x00\x40\x08\x00\x00\x00\x00\x00\x00'
         )
 
+    def test_number_list(self):
+        """
+        Numbers at the start of a list are read in bulk.
+        """
+        x = [1, 2.5, -3, 1e300, float('inf')] + range(-600, 600)
+        x += [0.1] * 600
+        y = x[:3] + ['spam', 4]
+        data = pyamf.encode(x, y, x, encoding=pyamf.AMF0).getvalue()
+        ret = self.decode(data)
+
+        self.assertEqual(ret, [x, y, x])
+        self.assertTrue(ret[2] is ret[0])
+        self.assertEqual(
+            [type(v) for v in ret[1]],
+            [int, float, int, unicode, int]
+        )
+
+    def test_number_array(self):
+        x = [1, 2.5, -3]
+        data = pyamf.encode(
+            x, [1, 'spam'], [], x,
+            encoding=pyamf.AMF0
+        ).getvalue()
+
+        for kwargs in ({}, {'instrument': instrumentation.Instrument()}):
+            for use_ext in (False, None):
+                ret = list(pyamf.decode(
+                    data,
+                    encoding=pyamf.AMF0,
+                    number_array=True,
+                    use_ext=use_ext,
+                    **kwargs
+                ))
+
+                self.assertEqual(ret[0], array.array('d', x))
+                self.assertEqual(ret[1:3], [[1, 'spam'], []])
+                self.assertTrue(ret[3] is ret[0])
+
+    def test_number_array_callable(self):
+        self.decoder.number_array = lambda a: ('spam', a.tolist())
+
+        self.assertDecoded(
+            ('spam', [1.0, 2.5]),
+            pyamf.encode([1, 2.5], encoding=pyamf.AMF0).getvalue()
+        )
+
+    def test_numpy_number_array(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest('numpy is not available')
+
+        self.decoder.number_array = numpy.frombuffer
+        data = pyamf.encode([1, 2.5], encoding=pyamf.AMF0).getvalue()
+        ret = self.decode(data)
+
+        self.assertEqual(ret.dtype, numpy.float64)
+        self.assertEqual(ret.tolist(), [1.0, 2.5])
+
+    def test_object_hooks(self):
+        self.decoder.strict = True
+        self.decoder.object_hooks = {
+            'spam.Eggs': lambda attrs: ['eggs', sorted(attrs.items())],
+            '': lambda attrs: ['anonymous', sorted(attrs.items())],
+        }
+
+        ret = self.decode(
+            '\x0a\x00\x00\x00\x03'
+            '\x10\x00\x09spam.Eggs'
+            '\x00\x01a\x00\x3f\xf0\x00\x00\x00\x00\x00\x00'
+            '\x00\x01b\x02\x00\x03foo\x00\x00\x09'
+            '\x07\x00\x01'
+            '\x03\x00\x01c\x00\x40\x00\x00\x00\x00\x00\x00\x00'
+            '\x00\x00\x09'
+        )
+
+        self.assertEqual(ret, [
+            ['eggs', [('a', 1), ('b', u'foo')]],
+            ['eggs', [('a', 1), ('b', u'foo')]],
+            ['anonymous', [('c', 2)]],
+        ])
+        self.assertTrue(ret[0] is ret[1])
+
+    def test_object_hooks_self_reference(self):
+        self.decoder.object_hooks = {'spam.Eggs': dict}
+
+        self.assertRaises(
+            pyamf.ReferenceError,
+            self.decode,
+            '\x10\x00\x09spam.Eggs\x00\x01a\x07\x00\x00\x00\x00\x09'
+        )
+
     def test_dict(self):
         bytes = '\x08\x00\x00\x00\x00\x00\x01\x61\x02\x00\x01\x61\x00\x00\x09'
 
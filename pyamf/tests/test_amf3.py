@@ -9,11 +9,12 @@ Tests for AMF3 Implementation.
 @since: 0.1.0
 """
 
+import array
 import unittest
 import datetime
 
 import pyamf
-from pyamf import amf3, util, xml, python
+from pyamf import amf3, util, xml, python, instrumentation, records
 from pyamf.tests.util import (
     Spam, EncoderMixIn, DecoderMixIn, ClassCacheClearingTestCase)
 
@@ -262,6 +263,70 @@ class EncoderTestCase(ClassCacheClearingTestCase, EncoderMixIn):
         self.assertEncoded(y, '\x09\x00', clear=False)
         self.assertEncoded(y, '\x09\x00', clear=False)
 
+    def test_number_list(self):
+        """
+        Lists of numbers are written in bulk.
+        """
+        x = [0, -1, 0x0fffffff, 0x10000000, -0x10000001, 1.5, 2 ** 40]
+        x += range(-600, 600) + [float(i) / 3 for i in range(600)]
+
+        for value in (x, tuple(x), x + [True]):
+            expected = self.encode(*value)
+            self.context.clear()
+
+            self.assertEqual(
+                self.encode(value),
+                '\x09' + amf3.encode_int(len(value) << 1 | 1) + '\x01' +
+                expected
+            )
+
+    def test_string_list(self):
+        x = ['spam', u'eggs', 'spam', u'ƒ', u'eggs', '']
+
+        expected = self.encode(*x)
+        self.context.clear()
+
+        self.assertEqual(self.encode(x), '\x09\x0d\x01' + expected)
+
+    def test_infer_traits(self):
+        self.encoder.infer_traits = True
+
+        self.assertEncoded(
+            [{'a': 1}, pyamf.ASObject(a=2), records.Record(a=3), {'a': 4}],
+            '\x09\x09\x01\x0a\x13\x01\x03a\x04\x01\x0a\x01\x04\x02'
+            '\x0a\x01\x04\x03\x0a\x01\x04\x04'
+        )
+
+    def test_infer_traits_keys(self):
+        """
+        Objects with keys that cannot be sealed stay dynamic.
+        """
+        self.encoder.infer_traits = True
+
+        self.assertEncoded({1: 2}, '\x0a\x0b\x01\x031\x04\x02\x01')
+        self.assertEncoded({}, '\x0a\x03\x01')
+
+    def test_infer_traits_decode(self):
+        rows = [{'id': i, 'name': u'row', 'sub': {'id': i}} for i in range(5)]
+
+        for use_ext in (False, None):
+            encoded = pyamf.encode(
+                rows,
+                encoding=pyamf.AMF3,
+                infer_traits=True,
+                use_ext=use_ext
+            ).getvalue()
+
+            self.assertTrue(len(encoded) < len(pyamf.encode(
+                rows,
+                encoding=pyamf.AMF3,
+                use_ext=use_ext
+            ).getvalue()))
+            self.assertEqual(
+                pyamf.decode(encoded, encoding=pyamf.AMF3).next(),
+                rows
+            )
+
     def test_list_proxy_references(self):
         self.encoder.use_proxies = True
         y = [0, 1, 2, 3]
@@ -723,6 +788,95 @@ class DecoderTestCase(ClassCacheClearingTestCase, DecoderMixIn):
             '\x04\x05'
         )
 
+    def test_number_list(self):
+        """
+        Numbers at the start of a list are read in bulk.
+        """
+        x = [1, 2.5, -3, 1e300, float('inf')] + range(-600, 600)
+        x += [0.1] * 600
+        y = x[:3] + ['spam', 4]
+        data = pyamf.encode(x, y, x, encoding=pyamf.AMF3).getvalue()
+        ret = self.decode(data)
+
+        self.assertEqual(ret, [x, y, x])
+        self.assertTrue(ret[2] is ret[0])
+        self.assertEqual(
+            [type(v) for v in ret[1]],
+            [int, float, int, unicode, int]
+        )
+
+    def test_number_array(self):
+        x = [1, 2.5, -3]
+        data = pyamf.encode(
+            x, [1, 'spam'], [], x,
+            encoding=pyamf.AMF3
+        ).getvalue()
+
+        for kwargs in ({}, {'instrument': instrumentation.Instrument()}):
+            for use_ext in (False, None):
+                ret = list(pyamf.decode(
+                    data,
+                    encoding=pyamf.AMF3,
+                    number_array=True,
+                    use_ext=use_ext,
+                    **kwargs
+                ))
+
+                self.assertEqual(ret[0], array.array('d', x))
+                self.assertEqual(ret[1:3], [[1, 'spam'], []])
+                self.assertTrue(ret[3] is ret[0])
+
+    def test_number_array_callable(self):
+        self.decoder.number_array = lambda a: ('spam', a.tolist())
+
+        self.assertDecoded(
+            ('spam', [1.0, 2.5]),
+            pyamf.encode([1, 2.5], encoding=pyamf.AMF3).getvalue()
+        )
+
+    def test_numpy_number_array(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest('numpy is not available')
+
+        self.decoder.number_array = numpy.frombuffer
+        data = pyamf.encode([1, 2.5], encoding=pyamf.AMF3).getvalue()
+        ret = self.decode(data)
+
+        self.assertEqual(ret.dtype, numpy.float64)
+        self.assertEqual(ret.tolist(), [1.0, 2.5])
+
+    def test_object_hooks(self):
+        self.decoder.strict = True
+        self.decoder.object_hooks = {
+            'spam.Eggs': lambda attrs: ['eggs', sorted(attrs.items())],
+            '': lambda attrs: ['anonymous', sorted(attrs.items())],
+        }
+
+        ret = self.decode(
+            '\x09\x07\x01'
+            '\x0a\x23\x13spam.Eggs\x03a\x03b\x04\x01\x06\x07foo'
+            '\x0a\x02'
+            '\x0a\x0b\x01\x03c\x04\x02\x01'
+        )
+
+        self.assertEqual(ret, [
+            ['eggs', [('a', 1), ('b', u'foo')]],
+            ['eggs', [('a', 1), ('b', u'foo')]],
+            ['anonymous', [('c', 2)]],
+        ])
+        self.assertTrue(ret[0] is ret[1])
+
+    def test_object_hooks_self_reference(self):
+        self.decoder.object_hooks = {'spam.Eggs': dict}
+
+        self.assertRaises(
+            pyamf.ReferenceError,
+            self.decode,
+            '\x0a\x13\x13spam.Eggs\x03a\x0a\x00'
+        )
+
     def test_list_references(self):
         y = [0, 1, 2, 3]
         z = [0, 1, 2]
@@ -804,6 +958,28 @@ class DecoderTestCase(ClassCacheClearingTestCase, DecoderMixIn):
     def test_byte_array(self):
         self.assertDecoded(amf3.ByteArray('hello'), '\x0c\x0bhello')
 
+    def test_byte_array_view(self):
+        self.decoder.byte_array_view = memoryview
+
+        view, ref = self.decode('\x09\x05\x01\x0c\x0bhello\x0c\x02')
+
+        self.assertTrue(isinstance(view, memoryview))
+        self.assertTrue(view.readonly)
+        self.assertEqual(view.tobytes(), 'hello')
+        self.assertTrue(ref is view)
+
+    def test_byte_array_numpy_view(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest('numpy is not available')
+
+        self.decoder.byte_array_view = numpy.frombuffer
+        view = self.decode('\x0c\x0bhello')
+
+        self.assertEqual(view.tostring(), 'hello')
+        self.assertFalse(view.flags.writeable)
+
     def test_date(self):
         import datetime
 
@@ -1026,6 +1202,28 @@ class ObjectEncodingTestCase(ClassCacheClearingTestCase, EncoderMixIn):
             '\n\x13\x0fabc.xyz\tspam\x06\teggs'
         )
 
+    def test_static_property(self):
+        """
+        A static attribute whose value is only referenced by the encodable
+        attributes (e.g. one created by a property) must survive encoding.
+        """
+        class Foo(object):
+            class __amf__:
+                static = ('spam',)
+                dynamic = False
+
+            spam = property(lambda self: pyamf.ASObject(eggs=[1, 2]))
+
+        pyamf.register_class(Foo, 'abc.xyz')
+
+        self.encoder.writeElement(Foo())
+
+        self.assertEqual(
+            self.buf.getvalue(),
+            '\n\x13\x0fabc.xyz\tspam\n\x0b\x01\teggs\t\x05\x01\x04\x01'
+            '\x04\x02\x01'
+        )
+
     def test_dynamic(self):
         pyamf.register_class(Spam, 'abc.xyz')
 
@@ -1184,6 +1382,97 @@ class ObjectDecodingTestCase(ClassCacheClearingTestCase, DecoderMixIn):
         self.assertEqual(x.__dict__, {})
 
 
+class SchemaTestCase(ClassCacheClearingTestCase):
+    """
+    Objects with a L{ClassAlias<pyamf.ClassAlias>} schema are encoded and
+    decoded exactly as they are without one.
+    """
+
+    def register(self, schema):
+        meta = {
+            'static': [
+                'id', 'ratio', 'name', 'flag', 'created', 'parent', 'kids'
+            ]
+        }
+
+        if schema:
+            meta['schema'] = {
+                'id': 'int',
+                'ratio': 'double',
+                'name': 'string',
+                'flag': 'boolean',
+                'created': 'date',
+                'parent': 'spam.Node',
+                'kids': ['spam.Node'],
+            }
+
+        class Node(object):
+            __amf__ = meta
+
+        pyamf.register_class(Node, 'spam.Node')
+
+        return Node
+
+    def build(self, schema):
+        Node = self.register(schema)
+        root = Node()
+        date = datetime.datetime(2009, 8, 19, 11, 24, 43)
+
+        root.__dict__.update(
+            id=1,
+            ratio=0.5,
+            name=u'root',
+            flag=True,
+            created=date,
+            parent=None,
+            kids=[]
+        )
+
+        for i in xrange(3):
+            kid = Node()
+
+            kid.__dict__.update(
+                id=i % 2 and 2 ** 40 or i,
+                ratio=i,
+                name=i % 2 and 'kid' or None,
+                flag=i % 2 == 0,
+                created=i % 2 and date or None,
+                parent=root,
+                kids=i % 2 and root.kids or ('spam',)
+            )
+
+            root.kids.append(kid)
+
+        return root
+
+    def test_encode(self):
+        plain = pyamf.encode(self.build(False), encoding=pyamf.AMF3)
+        typed = pyamf.encode(self.build(True), encoding=pyamf.AMF3)
+
+        self.assertEqual(typed.getvalue(), plain.getvalue())
+
+    def test_decode(self):
+        data = pyamf.encode(self.build(True), encoding=pyamf.AMF3).getvalue()
+        root = pyamf.decode(data, encoding=pyamf.AMF3).next()
+
+        self.assertEqual(root.name, u'root')
+        self.assertEqual(
+            root.created,
+            datetime.datetime(2009, 8, 19, 11, 24, 43)
+        )
+        self.assertEqual(
+            [(kid.id, kid.ratio, kid.name, kid.flag) for kid in root.kids],
+            [
+                (0, 0, None, True),
+                (2 ** 40, 1, u'kid', False),
+                (2, 2, None, True),
+            ]
+        )
+        self.assertTrue(root.kids[0].parent is root)
+        self.assertTrue(root.kids[1].kids is root.kids)
+        self.assertEqual(root.kids[2].kids, ['spam'])
+
+
 class DataOutputTestCase(unittest.TestCase, EncoderMixIn):
     """
     """
@@ -1743,6 +2032,25 @@ class ByteArrayTestCase(unittest.TestCase):
         self.assertEqual(obj, b.readObject())
         self.assertRaises(pyamf.ReferenceError, b.readObject)
 
+    def test_lazy_codecs(self):
+        """
+        The context and codecs are only created when they are needed and are
+        shared from then on.
+        """
+        b = amf3.ByteArray('spam')
+
+        self.assertEqual(b._context, None)
+        self.assertEqual(b._decoder, None)
+        self.assertEqual(b._encoder, None)
+
+        self.assertEqual(b.readUTFBytes(4), 'spam')
+        self.assertEqual(b._decoder, None)
+
+        self.assertTrue(b.decoder.context is b.context)
+        self.assertTrue(b.encoder.context is b.context)
+        self.assertTrue(b.decoder.stream is b)
+        self.assertTrue(b.decoder is b.decoder)
+
     def test_compressed(self):
         """
         ByteArrays can be compressed. Test the C{compressed} attribute for
@@ -1766,3 +2074,85 @@ class ByteArrayTestCase(unittest.TestCase):
         ba = amf3.ByteArray(z)
 
         self.assertTrue(ba.compressed)
+
+    def test_compressed_cache(self):
+        """
+        The compressed bytes are reused until the byte array changes.
+        """
+        try:
+            import zlib
+        except ImportError:
+            self.skipTest('zlib is missing')
+
+        ba = amf3.ByteArray('spam' * 100)
+        ba.compress()
+
+        s = str(ba)
+
+        self.assertTrue(str(ba) is s)
+
+        ba.seek(0, 2)
+        ba.write('eggs')
+
+        self.assertEqual(zlib.decompress(str(ba)), 'spam' * 100 + 'eggs')
+
+        # a change that keeps the length is picked up too
+        ba.seek(0)
+        ba.write('SPAM')
+
+        self.assertEqual(
+            zlib.decompress(str(ba)), 'SPAM' + 'spam' * 99 + 'eggs'
+        )
+
+        ba.truncate(4)
+
+        self.assertEqual(zlib.decompress(str(ba)), 'SPAM')
+
+        ba.writeUnsignedInt(1)
+
+        self.assertEqual(zlib.decompress(str(ba)), 'SPAM\x00\x00\x00\x01')
+
+    def test_compressed_cache_borrowed(self):
+        """
+        Changes made to a wrapped buffer are always compressed.
+        """
+        try:
+            import zlib
+        except ImportError:
+            self.skipTest('zlib is missing')
+
+        source = bytearray('spam')
+        ba = amf3.ByteArray(source)
+        ba.compress()
+
+        self.assertEqual(zlib.decompress(str(ba)), 'spam')
+
+        source[0] = 'S'
+
+        self.assertEqual(zlib.decompress(str(ba)), ba.getvalue())
+
+    def test_buffer(self):
+        """
+        Objects that support the buffer protocol are encoded like C{str}.
+        """
+        source = bytearray('spam')
+        ba = amf3.ByteArray(source)
+
+        self.assertEqual(ba.getvalue(), 'spam')
+        self.assertEqual(
+            pyamf.encode(ba, encoding=pyamf.AMF3).getvalue(),
+            '\x0c\x09spam'
+        )
+
+        ba.seek(0, 2)
+        ba.write('eggs')
+
+        self.assertEqual(ba.getvalue(), 'spameggs')
+        self.assertEqual(source, bytearray('spam'))
+
+        ba = amf3.ByteArray(memoryview('spam'))
+
+        self.assertEqual(
+            pyamf.encode(ba, encoding=pyamf.AMF3).getvalue(),
+            '\x0c\x09spam'
+        )
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Tests for L{pyamf.benchmarks}.
+
+@since: 0.9
+"""
+
+import unittest
+from StringIO import StringIO
+
+import pyamf
+from pyamf import benchmarks
+from pyamf.benchmarks import corpus, cli, threads
+
+
+class CorpusTestCase(unittest.TestCase):
+    """
+    Tests for L{corpus}.
+    """
+
+    def test_deterministic(self):
+        for payload in corpus.PAYLOADS:
+            for encoding in payload.encodings:
+                a = pyamf.encode(payload.build(), encoding=encoding)
+                b = pyamf.encode(payload.build(), encoding=encoding)
+
+                self.assertEqual(a.getvalue(), b.getvalue(), payload.name)
+
+    def test_decode(self):
+        for payload in corpus.PAYLOADS:
+            value = payload.build()
+
+            for encoding in payload.encodings:
+                stream = pyamf.encode(value, encoding=encoding)
+                stream.seek(0)
+
+                pyamf.decode(stream, encoding=encoding).next()
+
+                self.assertTrue(stream.at_eof(), payload.name)
+
+    def test_get_payloads(self):
+        self.assertEqual(corpus.get_payloads(), corpus.PAYLOADS)
+        self.assertEqual(
+            [p.name for p in corpus.get_payloads(['dates'])],
+            ['dates']
+        )
+        self.assertRaises(ValueError, corpus.get_payloads, ['foo'])
+
+
+class RunTestCase(unittest.TestCase):
+    """
+    Tests for L{benchmarks.run}.
+    """
+
+    def test_run(self):
+        seen = []
+
+        results = benchmarks.run(
+            ['dates'],
+            ['pure'],
+            [pyamf.AMF3],
+            min_time=0.0,
+            repeat=1,
+            callback=seen.append
+        )
+
+        self.assertEqual(seen, results)
+        self.assertEqual([r.name for r in results], [
+            'dates/amf3/pure/encode',
+            'dates/amf3/pure/decode',
+        ])
+
+        for result in results:
+            self.assertTrue(result.ops > 0)
+            self.assertTrue(result.size > 0)
+            self.assertTrue(result.allocations >= 0)
+
+    def test_all(self):
+        """
+        Every payload runs on every available backend and encoding.
+        """
+        results = benchmarks.run(min_time=0.0, repeat=1)
+        expected = []
+
+        for payload in corpus.PAYLOADS:
+            for encoding in payload.encodings:
+                for backend in benchmarks.get_backends():
+                    for operation in benchmarks.OPERATIONS:
+                        expected.append('%s/amf%d/%s/%s' % (
+                            payload.name, encoding, backend, operation
+                        ))
+
+        self.assertEqual(sorted([r.name for r in results]), sorted(expected))
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, benchmarks.get_backends, ['foo'])
+
+    def test_main(self):
+        out = StringIO()
+
+        ret = cli.main(
+            ['-b', 'pure', '-e', '0', '-o', 'encode', '-t', '0', '-r', '1',
+             'dates'],
+            out=out
+        )
+
+        self.assertEqual(ret, 0)
+        self.assertTrue(out.getvalue().startswith('dates/amf0/pure/encode '))
+
+
+class ThreadsTestCase(unittest.TestCase):
+    """
+    Tests for L{threads}.
+    """
+
+    def test_run(self):
+        results = threads.run(
+            ['dates'],
+            [2],
+            ['pure'],
+            jobs=2,
+            operations=['decode'],
+            min_time=0.0,
+            repeat=1
+        )
+
+        self.assertEqual([r.name for r in results], [
+            'dates/pure/decode/serial',
+            'dates/pure/decode/t2',
+        ])
+        self.assertEqual(results[0].size, results[1].size)
+
+        for result in results:
+            self.assertTrue(result.ops > 0)
+
+
+class CompareTestCase(unittest.TestCase):
+    """
+    Tests for L{benchmarks.compare}.
+    """
+
+    def test_compare(self):
+        results = [
+            benchmarks.Result('a', 100.0, 10, 0),
+            benchmarks.Result('b', 85.0, 10, 0),
+            benchmarks.Result('c', 50.0, 10, 0),
+        ]
+        baseline = {
+            'a': benchmarks.Result('a', 50.0, 10, 0).toDict(),
+            'b': benchmarks.Result('b', 100.0, 10, 0).toDict(),
+        }
+
+        self.assertEqual(benchmarks.compare(results, baseline, 0.1), [
+            (results[0], 2.0, False),
+            (results[1], 0.85, True),
+            (results[2], None, False),
+        ])
+        self.assertFalse(benchmarks.compare(results, baseline, 0.2)[1][2])
@@ -74,6 +74,16 @@ class IndexedCollectionTestCase(unittest.TestCase):
         self.assertEqual(0, idx)
         self.assertEqual(-1, self.collection.getReferenceTo(TestObject()))
 
+    def test_replace(self):
+        a, b = TestObject(), TestObject()
+
+        self.collection.append(a)
+        self.collection.replace(0, b)
+
+        self.assertTrue(self.collection.getByReference(0) is b)
+        self.assertEqual(self.collection.getReferenceTo(b), 0)
+        self.assertEqual(self.collection.getReferenceTo(a), -1)
+
     def test_get_by_reference(self):
         test_obj = TestObject()
         idx = self.collection.append(test_obj)
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Tests for pre-encoded AMF fragments.
+
+@since: 0.9
+"""
+
+import unittest
+
+import pyamf
+from pyamf import encoded
+
+
+class ValidateTestCase(unittest.TestCase):
+    """
+    Tests for L{encoded.validate}.
+    """
+
+    def test_reference_free(self):
+        x = encoded.validate('\x06\x07foo', pyamf.AMF3)
+
+        self.assertEqual(x.bytes, '\x06\x07foo')
+        self.assertEqual(x.encoding, pyamf.AMF3)
+        self.assertEqual(x.value, None)
+        self.assertEqual(x._fragments, [
+            ((None, None, None), '\x06\x07foo', (0, 1, 0))
+        ])
+
+    def test_references(self):
+        bytes = pyamf.encode(['foo', 'foo'], encoding=pyamf.AMF3).getvalue()
+        x = encoded.validate(bytes, pyamf.AMF3)
+
+        self.assertEqual(x._fragments, [
+            ((None, 0, None), bytes, (1, 1, 0))
+        ])
+
+    def test_amf0(self):
+        bytes = pyamf.encode({'a': 1}, encoding=pyamf.AMF0).getvalue()
+        x = encoded.validate(bytes, pyamf.AMF0)
+
+        self.assertEqual(x._fragments, [
+            ((None, None, None), bytes, (1, 0, 0))
+        ])
+
+    def test_amf0_amf3(self):
+        self.assertRaises(
+            pyamf.EncodeError,
+            encoded.validate,
+            '\x11\x06\x07foo',
+            pyamf.AMF0
+        )
+
+    def test_multiple_elements(self):
+        self.assertRaises(
+            pyamf.EncodeError,
+            encoded.validate,
+            '\x06\x07foo\x01',
+            pyamf.AMF3
+        )
+
+    def test_bad_encoding(self):
+        self.assertRaises(ValueError, encoded.Encoded, '', 2)
+
+
+class EncoderTestCase(unittest.TestCase):
+    """
+    Tests for writing L{pyamf.Encoded} fragments.
+    """
+
+    value = [{'a': u'spam', 'b': 1}, {'a': u'eggs', 'b': 2}]
+
+    def roundtrip(self, data, encoding):
+        bytes = pyamf.encode(*data, encoding=encoding).getvalue()
+
+        return list(pyamf.decode(bytes, encoding=encoding))
+
+    def test_amf3(self):
+        x = encoded.encode(self.value, pyamf.AMF3)
+        data = [u'spam', x, u'eggs', x, u'spam']
+
+        self.assertEqual(
+            self.roundtrip(data, pyamf.AMF3),
+            [u'spam', self.value, u'eggs', self.value, u'spam']
+        )
+
+    def test_splice(self):
+        x = encoded.encode(u'foo', pyamf.AMF3)
+        bytes = pyamf.encode(
+            u'bar', x, u'bar', u'baz', u'baz',
+            encoding=pyamf.AMF3
+        ).getvalue()
+
+        # 'foo' takes string reference 1 so 'baz' is 2
+        self.assertEqual(
+            bytes,
+            '\x06\x07bar\x06\x07foo\x06\x00\x06\x07baz\x06\x04'
+        )
+        self.assertEqual(
+            list(pyamf.decode(bytes, encoding=pyamf.AMF3)),
+            [u'bar', u'foo', u'bar', u'baz', u'baz']
+        )
+
+    def test_reencode(self):
+        x = encoded.encode(self.value, pyamf.AMF3)
+
+        pyamf.encode(u'spam', x, encoding=pyamf.AMF3)
+
+        self.assertEqual(len(x._fragments), 2)
+
+        # the re-encoded fragment is reused at the same offsets
+        pyamf.encode(u'spam', x, encoding=pyamf.AMF3)
+
+        self.assertEqual(len(x._fragments), 2)
+
+    def test_no_value(self):
+        x = encoded.encode(self.value, pyamf.AMF3, keep_value=False)
+
+        self.assertEqual(self.roundtrip([x], pyamf.AMF3), [self.value])
+        self.assertRaises(
+            pyamf.EncodeError,
+            pyamf.encode,
+            u'spam',
+            x,
+            encoding=pyamf.AMF3
+        )
+
+    def test_amf0(self):
+        x = encoded.encode(self.value, pyamf.AMF0)
+        y = encoded.encode(self.value, pyamf.AMF3)
+        data = [self.value, x, y, x]
+
+        self.assertEqual(
+            self.roundtrip(data, pyamf.AMF0),
+            [self.value] * 4
+        )
+
+    def test_amf0_in_amf3(self):
+        x = encoded.encode(self.value, pyamf.AMF0)
+
+        self.assertEqual(self.roundtrip([x], pyamf.AMF3), [self.value])
+
+        x = encoded.encode(self.value, pyamf.AMF0, keep_value=False)
+
+        self.assertRaises(pyamf.EncodeError, pyamf.encode, x)
+
+    def test_use_amf3(self):
+        x = encoded.encode(self.value, pyamf.AMF0)
+        y = encoded.encode(self.value, pyamf.AMF3)
+
+        encoder = pyamf.get_encoder(pyamf.AMF0)
+        encoder.use_amf3 = True
+
+        for data in [u'spam', x, y, self.value]:
+            encoder.writeElement(data)
+
+        self.assertEqual(
+            list(pyamf.decode(encoder.stream.getvalue(), encoding=pyamf.AMF0)),
+            [u'spam'] + [self.value] * 3
+        )
+
+    def test_amf3_counterpart(self):
+        x = encoded.encode(self.value, pyamf.AMF0, keep_value=False)
+        x.amf3 = encoded.encode(self.value, pyamf.AMF3, keep_value=False)
+
+        self.assertEqual(self.roundtrip([x], pyamf.AMF0), [self.value])
+        self.assertEqual(self.roundtrip([x], pyamf.AMF3), [self.value])
+
+        encoder = pyamf.get_encoder(pyamf.AMF0)
+        encoder.use_amf3 = True
+        encoder.writeElement(x)
+
+        self.assertEqual(encoder.stream.getvalue(), '\x11' + x.amf3.bytes)
+
+
+class EncodedCacheTestCase(unittest.TestCase):
+    """
+    Tests for L{encoded.EncodedCache}.
+    """
+
+    def test_identity(self):
+        cache = encoded.EncodedCache()
+        value = {'foo': 'bar'}
+
+        x = cache.get(value)
+
+        self.assertEqual(x.value, value)
+        self.assertEqual(x.encoding, pyamf.DEFAULT_ENCODING)
+        self.assertTrue(cache.get(value) is x)
+        self.assertFalse(cache.get({'foo': 'bar'}) is x)
+        self.assertFalse(cache.get(value, pyamf.AMF0) is x)
+
+    def test_version(self):
+        cache = encoded.EncodedCache()
+        value = {'foo': 'bar'}
+
+        x = cache.get(value, version=1)
+
+        self.assertTrue(cache.get(value, version=1) is x)
+
+        value['foo'] = 'baz'
+
+        y = cache.get(value, version=2)
+
+        self.assertFalse(y is x)
+        self.assertEqual(y.value, {'foo': 'baz'})
+
+    def test_key(self):
+        cache = encoded.EncodedCache()
+
+        x = cache.get({'foo': 'bar'}, key='config', version=1)
+
+        self.assertTrue(cache.get({}, key='config', version=1) is x)
+        self.assertFalse(cache.get({}, key='config', version=2) is x)
+
+    def test_remove(self):
+        cache = encoded.EncodedCache()
+        value = {'foo': 'bar'}
+
+        cache.get(value, pyamf.AMF0)
+        cache.get(value, pyamf.AMF3)
+        cache.get([], key='foo')
+
+        self.assertEqual(len(cache), 3)
+
+        cache.remove(value)
+
+        self.assertEqual(len(cache), 1)
+
+        cache.clear()
+
+        self.assertEqual(len(cache), 0)
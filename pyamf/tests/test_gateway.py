@@ -12,7 +12,8 @@ import sys
 
 import pyamf
 from pyamf import remoting
-from pyamf.remoting import gateway, amf0
+from pyamf.remoting import gateway, amf0, cache
+from pyamf.amf3 import ByteArray
 
 
 class TestService(object):
@@ -468,6 +469,24 @@ class BaseGatewayTestCase(unittest.TestCase):
 
         self.assertTrue(isinstance(processor, amf3.RequestProcessor))
 
+    def test_amf3_bodies(self):
+        gw = gateway.BaseGateway()
+        response = remoting.Envelope(pyamf.AMF0)
+
+        self.assertFalse(gw.useAMF3Bodies(response, '10,1,53,64'))
+
+        gw = gateway.BaseGateway(amf3_responses=True)
+
+        self.assertTrue(gw.useAMF3Bodies(response, '10,1,53,64'))
+        self.assertTrue(gw.useAMF3Bodies(response, '9,0,28,0'))
+        self.assertFalse(gw.useAMF3Bodies(response, '8,0,42,0'))
+        self.assertFalse(gw.useAMF3Bodies(response, 'spam'))
+        self.assertFalse(gw.useAMF3Bodies(response, None))
+
+        response = remoting.Envelope(pyamf.AMF3)
+
+        self.assertFalse(gw.useAMF3Bodies(response, '10,1,53,64'))
+
 
 class QueryBrowserTestCase(unittest.TestCase):
     def test_request(self):
@@ -815,3 +834,343 @@ class PreProcessingTestCase(unittest.TestCase):
 
         self.assertTrue(isinstance(response, remoting.Response))
         self.assertEqual(response.status, remoting.STATUS_ERROR)
+
+
+class CacheTestCase(unittest.TestCase):
+    """
+    Tests for caching the results of service methods.
+
+    @since: 0.9
+    """
+
+    def setUp(self):
+        self.calls = []
+        self.gw = gateway.BaseGateway()
+
+    def echo(self, x):
+        self.calls.append(x)
+
+        return [x]
+
+    def getServiceRequest(self, target):
+        envelope = remoting.Envelope()
+        envelope['/1'] = remoting.Request(target)
+
+        return self.gw.getServiceRequest(envelope['/1'], target)
+
+    def test_default(self):
+        self.gw.addService(self.echo, 'test')
+
+        sr = self.getServiceRequest('test')
+
+        self.assertEqual(self.gw.getCacheTTL(sr), None)
+
+        self.gw.callServiceRequest(sr, 'foo')
+        self.gw.callServiceRequest(sr, 'foo')
+
+        self.assertEqual(self.calls, ['foo', 'foo'])
+        self.assertEqual(len(self.gw.cache), 0)
+
+    def test_service(self):
+        self.gw.addService(self.echo, 'test', cache_ttl=60)
+
+        sr = self.getServiceRequest('test')
+
+        self.assertEqual(self.gw.getCacheTTL(sr), 60)
+
+        self.assertEqual(self.gw.callServiceRequest(sr, 'foo').value, ['foo'])
+        self.assertEqual(self.gw.callServiceRequest(sr, 'foo').value, ['foo'])
+        self.assertEqual(self.gw.callServiceRequest(sr, 'bar').value, ['bar'])
+
+        self.assertEqual(self.calls, ['foo', 'bar'])
+
+    def test_encoded(self):
+        self.gw.addService(self.echo, 'test', cache_ttl=0)
+
+        sr = self.getServiceRequest('test')
+        result = self.gw.callServiceRequest(sr, 'foo')
+
+        self.assertTrue(isinstance(result, pyamf.Encoded))
+        self.assertEqual(result.encoding, pyamf.AMF0)
+        self.assertEqual(result.bytes, pyamf.encode(
+            ['foo'], encoding=pyamf.AMF0).getvalue())
+        self.assertEqual(result.amf3.encoding, pyamf.AMF3)
+        self.assertEqual(result.amf3.bytes, pyamf.encode(
+            ['foo'], encoding=pyamf.AMF3).getvalue())
+        self.assertTrue(self.gw.callServiceRequest(sr, 'foo') is result)
+
+        # requests in an AMF3 envelope share the cached result
+        sr.request.amfVersion = pyamf.AMF3
+
+        self.assertTrue(self.gw.callServiceRequest(sr, 'foo') is result)
+        self.assertEqual(self.calls, ['foo'])
+
+    def test_amf3_only(self):
+        self.gw.addService(lambda: ByteArray('foo'), 'test', cache_ttl=0)
+
+        sr = self.getServiceRequest('test')
+        result = self.gw.callServiceRequest(sr)
+
+        self.assertEqual(result.encoding, pyamf.AMF3)
+        self.assertEqual(result.amf3, None)
+        self.assertEqual(
+            pyamf.encode(result, encoding=pyamf.AMF0).getvalue(),
+            '\x11\x0c\x07foo'
+        )
+
+    def test_decorator(self):
+        calls = self.calls
+
+        class Service(object):
+            def cached(self, x):
+                calls.append(x)
+
+                return x
+
+            def uncached(self, x):
+                calls.append(x)
+
+                return x
+
+        gateway.cacheable(Service.cached, 30)
+
+        self.gw.addService(Service, 'test')
+
+        sr = self.getServiceRequest('test.cached')
+
+        self.assertEqual(self.gw.getCacheTTL(sr), 30)
+
+        self.gw.callServiceRequest(sr, 'foo')
+        self.gw.callServiceRequest(sr, 'foo')
+
+        self.assertEqual(calls, ['foo'])
+
+        sr = self.getServiceRequest('test.uncached')
+
+        self.assertEqual(self.gw.getCacheTTL(sr), None)
+
+        self.gw.callServiceRequest(sr, 'foo')
+
+        self.assertEqual(calls, ['foo', 'foo'])
+
+    def test_key(self):
+        self.gw.addService(self.echo, 'test', cache_ttl=0)
+        self.gw.addService(self.echo, 'other', cache_ttl=0)
+
+        self.gw.callServiceRequest(self.getServiceRequest('test'), 'foo')
+        self.gw.callServiceRequest(self.getServiceRequest('other'), 'foo')
+        self.gw.callServiceRequest(self.getServiceRequest('test'), u'foo')
+
+        self.assertEqual(self.calls, ['foo', 'foo'])
+
+    def test_unencodable_args(self):
+        self.gw.addService(self.echo, 'test', cache_ttl=0)
+
+        sr = self.getServiceRequest('test')
+        x = object()
+
+        self.gw.callServiceRequest(sr, x)
+        self.gw.callServiceRequest(sr, x)
+
+        self.assertEqual(self.calls, [x, x])
+
+    def test_custom_backend(self):
+        class Backend(cache.BaseCache):
+            def __init__(self):
+                self.data = {}
+
+            def get(self, key, default=None):
+                return self.data.get(key, default)
+
+            def set(self, key, value, ttl=0):
+                self.data[key] = value
+
+        backend = Backend()
+
+        self.gw = gateway.BaseGateway(cache=backend)
+        self.gw.addService(self.echo, 'test', cache_ttl=0)
+
+        sr = self.getServiceRequest('test')
+
+        self.gw.callServiceRequest(sr, None)
+        self.assertEqual(backend.data.values()[0].value, [None])
+
+        self.gw.callServiceRequest(sr, None)
+        self.assertEqual(self.calls, [None])
+
+    def test_cache_size(self):
+        gw = gateway.BaseGateway(cache_size=5)
+
+        self.assertTrue(isinstance(gw.cache, cache.LocalCache))
+        self.assertEqual(gw.cache.max_size, 5)
+
+    def test_deferred(self):
+        class Deferred(object):
+            def addCallback(self, func):
+                self.callback = func
+
+                return self
+
+        d = Deferred()
+
+        self.gw.addService(lambda: d, 'test', cache_ttl=0)
+
+        sr = self.getServiceRequest('test')
+
+        self.assertTrue(self.gw.callServiceRequest(sr) is d)
+        self.assertEqual(len(self.gw.cache), 0)
+
+        self.assertEqual(d.callback('spam').value, 'spam')
+        self.assertEqual(self.gw.callServiceRequest(sr).value, 'spam')
+
+
+class DispatchTestCase(unittest.TestCase):
+    """
+    Tests for the service dispatch table and instance modes.
+
+    @since: 0.9
+    """
+
+    def setUp(self):
+        self.instances = []
+
+        instances = self.instances
+
+        class Service(object):
+            def __init__(self):
+                instances.append(self)
+
+            def spam(self):
+                return self
+
+        self.Service = Service
+
+    def getServiceRequest(self, gw, target):
+        envelope = remoting.Envelope()
+        envelope['/1'] = remoting.Request(target)
+
+        return gw.getServiceRequest(envelope['/1'], target)
+
+    def test_table(self):
+        def echo(x):
+            return x
+
+        gw = gateway.BaseGateway({'test': TestService, 'echo': echo})
+
+        self.assertEqual(
+            sorted(gw._dispatch.keys()),
+            ['echo', 'test.echo', 'test.spam']
+        )
+
+        sr = self.getServiceRequest(gw, 'test.echo')
+
+        self.assertTrue(sr.entry is gw._dispatch['test.echo'])
+        self.assertEqual(sr.method, 'echo')
+        self.assertEqual(sr('foo'), 'foo')
+
+        # a class based service that is called directly is not precompiled
+        sr = self.getServiceRequest(gw, 'test')
+
+        self.assertEqual(sr.entry, None)
+        self.assertEqual(sr.method, None)
+
+    def test_settings(self):
+        def auth(username, password):
+            return True
+
+        def echo(x):
+            return x
+
+        gateway.authenticate(echo, auth)
+
+        gw = gateway.BaseGateway(authenticator=self.fail)
+        gw.addService(echo, 'echo', expose_request=True, cache_ttl=30)
+
+        sr = self.getServiceRequest(gw, 'echo')
+
+        self.assertTrue(gw.getAuthenticator(sr) is auth)
+        self.assertTrue(gw.mustExposeRequest(sr))
+        self.assertEqual(gw.getCacheTTL(sr), 30)
+        self.assertEqual(gw.getPreprocessor(sr), None)
+
+    def test_precedence(self):
+        gw = gateway.BaseGateway()
+
+        def eggs():
+            return 'eggs'
+
+        gw.addService(TestService, 'foo')
+        gw.addService(eggs, 'foo.spam')
+
+        self.assertEqual(self.getServiceRequest(gw, 'foo.spam')(), 'eggs')
+
+        gw.removeService('foo.spam')
+
+        self.assertEqual(self.getServiceRequest(gw, 'foo.spam')(), 'spam')
+
+        del gw.services['foo']
+
+        self.assertRaises(
+            gateway.UnknownServiceError,
+            self.getServiceRequest,
+            gw,
+            'foo.spam'
+        )
+
+    def test_per_call(self):
+        gw = gateway.BaseGateway({'test': self.Service})
+
+        a = self.getServiceRequest(gw, 'test.spam')()
+        b = self.getServiceRequest(gw, 'test.spam')()
+
+        self.assertFalse(a is b)
+        self.assertEqual(self.instances, [a, b])
+
+    def test_singleton(self):
+        gw = gateway.BaseGateway()
+        gw.addService(
+            self.Service,
+            'test',
+            instance_mode=gateway.INSTANCE_SINGLETON
+        )
+
+        self.assertEqual(self.instances, [])
+
+        a = self.getServiceRequest(gw, 'test.spam')()
+        b = self.getServiceRequest(gw, 'test.spam')()
+
+        self.assertTrue(a is b)
+        self.assertEqual(self.instances, [a])
+
+    def test_per_thread(self):
+        import threading
+
+        gw = gateway.BaseGateway(
+            {'test': self.Service},
+            instance_mode=gateway.INSTANCE_PER_THREAD
+        )
+        results = []
+
+        def call():
+            for i in range(2):
+                results.append(self.getServiceRequest(gw, 'test.spam')())
+
+        call()
+
+        t = threading.Thread(target=call)
+        t.start()
+        t.join()
+
+        self.assertEqual(len(self.instances), 2)
+        self.assertEqual(results, [self.instances[0]] * 2 +
+                         [self.instances[1]] * 2)
+
+    def test_bad_mode(self):
+        gw = gateway.BaseGateway()
+
+        self.assertRaises(
+            ValueError,
+            gw.addService,
+            self.Service,
+            instance_mode='foo'
+        )
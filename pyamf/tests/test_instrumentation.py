@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Tests for L{pyamf.instrumentation}.
+
+@since: 0.9
+"""
+
+import unittest
+
+import pyamf
+from pyamf import instrumentation
+
+
+class Spam(object):
+    pass
+
+
+class BaseTestCase(unittest.TestCase):
+    def setUp(self):
+        pyamf.register_class(Spam, 'org.pyamf.spam')
+
+        self.instrument = instrumentation.Instrument()
+
+    def tearDown(self):
+        pyamf.unregister_class(Spam)
+        instrumentation.uninstall()
+
+    def getEncoder(self, encoding, **kwargs):
+        kwargs.setdefault('instrument', self.instrument)
+
+        return pyamf.get_encoder(encoding, use_ext=False, **kwargs)
+
+    def getDecoder(self, encoding, data, **kwargs):
+        kwargs.setdefault('instrument', self.instrument)
+
+        return pyamf.get_decoder(encoding, data, use_ext=False, **kwargs)
+
+
+class ResolveTestCase(BaseTestCase):
+    """
+    Tests for selecting the instrument of a codec.
+    """
+
+    def test_disabled(self):
+        encoder = pyamf.get_encoder(pyamf.AMF3, use_ext=False)
+
+        self.assertEqual(encoder.instrument, None)
+        self.assertFalse('writeElement' in encoder.__dict__)
+
+    def test_explicit(self):
+        encoder = self.getEncoder(pyamf.AMF3)
+
+        self.assertTrue(encoder.instrument is self.instrument)
+        self.assertTrue('writeElement' in encoder.__dict__)
+
+    def test_installed(self):
+        instrumentation.install(self.instrument)
+
+        encoder = pyamf.get_encoder(pyamf.AMF3, use_ext=False)
+
+        self.assertTrue(encoder.instrument is self.instrument)
+
+        encoder = pyamf.get_encoder(
+            pyamf.AMF3,
+            use_ext=False,
+            instrument=False
+        )
+
+        self.assertEqual(encoder.instrument, None)
+
+    def test_sampling(self):
+        self.instrument.sample_rate = 0
+        instrumentation.install(self.instrument)
+
+        decoder = pyamf.get_decoder(pyamf.AMF0, use_ext=False)
+
+        self.assertEqual(decoder.instrument, None)
+
+
+class EncodeTestCase(BaseTestCase):
+    """
+    Tests for instrumented encoders.
+    """
+
+    def test_amf3(self):
+        spam = Spam()
+        spam.foo = u'bar'
+
+        encoder = self.getEncoder(pyamf.AMF3)
+        encoder.writeElement([spam, spam, {'foo': u'bar'}, 1.5])
+
+        stats = self.instrument.encoded
+
+        self.assertEqual(stats.types, {
+            (pyamf.AMF3, 'array'): 1,
+            (pyamf.AMF3, 'object'): 3,
+            (pyamf.AMF3, 'string'): 2,
+            (pyamf.AMF3, 'number'): 1,
+        })
+        self.assertEqual(stats.aliases, {
+            'org.pyamf.spam': 2,
+            '__builtin__.dict': 1,
+        })
+
+        # the second object is written as a 2 byte reference
+        size = len(pyamf.encode(spam, encoding=pyamf.AMF3).getvalue())
+
+        self.assertEqual(stats.alias_bytes['org.pyamf.spam'], size + 2)
+        self.assertEqual(stats.references['object'], [1, 3])
+        # the alias, 'foo' and 'bar' are misses, the dict key and value hit
+        self.assertEqual(stats.getHitRate('string'), 0.4)
+
+    def test_amf0(self):
+        encoder = self.getEncoder(pyamf.AMF0)
+        encoder.writeElement({'foo': 'bar'})
+
+        stats = self.instrument.encoded
+
+        self.assertEqual(stats.types, {
+            (pyamf.AMF0, 'object'): 1,
+            (pyamf.AMF0, 'string'): 1,
+        })
+        self.assertEqual(
+            stats.alias_bytes,
+            {'__builtin__.dict': len(encoder.stream)}
+        )
+
+    def test_use_amf3(self):
+        encoder = self.getEncoder(pyamf.AMF0)
+        encoder.use_amf3 = True
+
+        encoder.writeElement(u'foo')
+
+        self.assertEqual(self.instrument.encoded.types, {
+            (pyamf.AMF0, 'amf3'): 1,
+            (pyamf.AMF3, 'string'): 1,
+        })
+
+    def test_encoded(self):
+        x = pyamf.encoded.encode([u'foo'], pyamf.AMF3)
+
+        encoder = self.getEncoder(pyamf.AMF3)
+        encoder.writeElement(x)
+
+        self.assertEqual(self.instrument.encoded.types, {
+            (pyamf.AMF3, 'array'): 1,
+        })
+
+
+class DecodeTestCase(BaseTestCase):
+    """
+    Tests for instrumented decoders.
+    """
+
+    def test_amf3(self):
+        spam = Spam()
+        spam.foo = u'bar'
+
+        data = pyamf.encode(
+            [spam, spam, Spam()],
+            encoding=pyamf.AMF3
+        ).getvalue()
+
+        decoder = self.getDecoder(pyamf.AMF3, data)
+        decoder.readElement()
+
+        stats = self.instrument.decoded
+
+        self.assertEqual(stats.types, {
+            (pyamf.AMF3, 'array'): 1,
+            (pyamf.AMF3, 'object'): 3,
+            (pyamf.AMF3, 'string'): 1,
+        })
+        self.assertEqual(stats.aliases, {'org.pyamf.spam': 3})
+        self.assertEqual(stats.getHitRate('object'), 0.25)
+        self.assertEqual(stats.getHitRate('class'), 0.5)
+        self.assertEqual(self.instrument.encoded.types, {})
+
+    def test_snapshot(self):
+        decoder = self.getDecoder(pyamf.AMF0, '\x02\x00\x03foo')
+        decoder.readElement()
+
+        encoded, decoded = self.instrument.snapshot()
+
+        self.instrument.reset()
+
+        self.assertEqual(decoded.types, {(pyamf.AMF0, 'string'): 1})
+        self.assertEqual(self.instrument.decoded.types, {})
+
+
+class StatisticsTestCase(unittest.TestCase):
+    """
+    Tests for L{instrumentation.Statistics}.
+    """
+
+    def test_hit_rate(self):
+        stats = instrumentation.Statistics()
+
+        self.assertEqual(stats.getHitRate('object'), None)
+
+        stats.references['object'] = [1, 3]
+
+        self.assertEqual(stats.getHitRate('object'), 0.25)
+
+    def test_copy(self):
+        stats = instrumentation.Statistics()
+        stats.references['object'] = [1, 3]
+
+        copy = stats.copy()
+        stats.references['object'][0] = 2
+
+        self.assertEqual(copy.references['object'], [1, 3])
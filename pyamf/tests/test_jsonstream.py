@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Tests for L{pyamf.jsonstream}.
+
+@since: 0.9
+"""
+
+import uuid
+import datetime
+import unittest
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import pyamf
+from pyamf import jsonstream, amf3, util
+from pyamf.flex import ArrayCollection, messaging
+
+
+class Spam(object):
+    """
+    A registered typed object.
+    """
+
+
+class JSONStreamTestCase(unittest.TestCase):
+    """
+    Tests for the pure Python transcoders.
+    """
+
+    use_ext = False
+
+    def setUp(self):
+        pyamf.register_class(Spam, 'spam.Spam')
+
+        self.date = datetime.datetime(2009, 8, 19, 11, 24, 43)
+
+    def tearDown(self):
+        pyamf.unregister_class(Spam)
+
+    def dumps(self, encoding, *args):
+        data = pyamf.encode(*args, encoding=encoding).getvalue()
+
+        return jsonstream.dumps(data, encoding, use_ext=self.use_ext)
+
+    def loads(self, encoding, *args):
+        return json.loads(self.dumps(encoding, *args))
+
+    def test_get_transcoder(self):
+        for encoding in pyamf.ENCODING_TYPES:
+            transcoder = jsonstream.get_transcoder(
+                encoding,
+                '',
+                None,
+                use_ext=self.use_ext
+            )
+
+            self.assertEqual(type(transcoder).__name__, 'AMF%dTranscoder' % (
+                encoding,
+            ))
+
+        self.assertRaises(ValueError, jsonstream.get_transcoder, 2, '', None)
+
+    def test_scalars(self):
+        for encoding in pyamf.ENCODING_TYPES:
+            self.assertEqual(self.dumps(encoding, None), 'null')
+            self.assertEqual(self.dumps(encoding, pyamf.Undefined), 'null')
+            self.assertEqual(self.dumps(encoding, True), 'true')
+            self.assertEqual(self.dumps(encoding, False), 'false')
+            self.assertEqual(self.dumps(encoding, -3), '-3')
+            self.assertEqual(self.dumps(encoding, 0.5), '0.5')
+            self.assertEqual(self.dumps(encoding, ''), '""')
+            self.assertEqual(self.dumps(encoding, 'spam'), '"spam"')
+            self.assertEqual(
+                self.dumps(encoding, u'ƒ"\n'),
+                '"\\u0192\\"\\n"'
+            )
+            self.assertEqual(
+                self.dumps(encoding, float('inf')),
+                'Infinity'
+            )
+            self.assertEqual(self.dumps(encoding, float('nan')), 'NaN')
+
+        # AMF0 has no integer type
+        self.assertEqual(self.dumps(pyamf.AMF0, 2.0), '2')
+        self.assertEqual(self.dumps(pyamf.AMF0, 2 ** 60), str(2 ** 60))
+        self.assertEqual(self.dumps(pyamf.AMF0, -0.0), '0')
+        self.assertEqual(self.dumps(pyamf.AMF3, 2.0), '2.0')
+        self.assertEqual(
+            self.dumps(pyamf.AMF3, 2 ** 60),
+            '1.152921504606847e+18'
+        )
+        self.assertEqual(self.dumps(pyamf.AMF3, 1e300), '1e+300')
+
+    def test_containers(self):
+        value = {'a': [1, 'b', {}], 'c': Spam()}
+        value['c'].d = self.date
+
+        expected = {
+            'a': [1, 'b', {}],
+            'c': {
+                jsonstream.ALIAS_KEY: 'spam.Spam',
+                'd': '2009-08-19T11:24:43',
+            }
+        }
+
+        for encoding in pyamf.ENCODING_TYPES:
+            self.assertEqual(self.loads(encoding, value), expected)
+
+    def test_mixed_array(self):
+        value = pyamf.MixedArray(a=1)
+        value[0] = 'b'
+
+        self.assertEqual(self.loads(pyamf.AMF3, value), {'a': 1, '0': 'b'})
+
+    def test_bytes(self):
+        value = amf3.ByteArray('\x00\xff')
+
+        self.assertEqual(self.dumps(pyamf.AMF3, value), '"AP8="')
+
+    def test_references(self):
+        spam = Spam()
+        spam.eggs = 'eggs'
+
+        value = [spam, self.date, spam, self.date]
+
+        for encoding in pyamf.ENCODING_TYPES:
+            self.assertEqual(self.loads(encoding, value), [
+                {jsonstream.ALIAS_KEY: 'spam.Spam', 'eggs': 'eggs'},
+                '2009-08-19T11:24:43',
+                {jsonstream.REF_KEY: 1},
+                '2009-08-19T11:24:43',
+            ])
+
+    def test_bad_reference(self):
+        for encoding, data in [(pyamf.AMF0, '\x07\x00\x01'),
+                               (pyamf.AMF3, '\x0a\x02')]:
+            self.assertRaises(
+                pyamf.ReferenceError,
+                jsonstream.dumps,
+                data,
+                encoding,
+                use_ext=self.use_ext
+            )
+
+    def test_unknown_type(self):
+        for encoding in pyamf.ENCODING_TYPES:
+            self.assertRaises(
+                pyamf.DecodeError,
+                jsonstream.dumps,
+                '\xff',
+                encoding,
+                use_ext=self.use_ext
+            )
+
+    def test_amf3_in_amf0(self):
+        encoder = pyamf.get_encoder(pyamf.AMF0)
+        encoder.use_amf3 = True
+        encoder.writeElement({'a': [self.date, self.date]})
+
+        self.assertEqual(
+            jsonstream.dumps(encoder.stream.getvalue(), use_ext=self.use_ext),
+            '{"a":["2009-08-19T11:24:43","2009-08-19T11:24:43"]}'
+        )
+
+    def test_external(self):
+        message = messaging.AcknowledgeMessage(
+            body=ArrayCollection([self.date]),
+            messageId=uuid.UUID(int=5),
+            timestamp=self.date,
+            headers={}
+        ).getSmallMessage()
+
+        result = self.loads(pyamf.AMF3, [message, message, self.date, 'x'])
+
+        self.assertEqual(result[0][jsonstream.ALIAS_KEY], 'DSK')
+        self.assertEqual(result[0]['body'], ['2009-08-19T11:24:43'])
+        self.assertEqual(
+            result[0]['messageId'],
+            '00000000-0000-0000-0000-000000000005'
+        )
+        self.assertEqual(result[1:], [
+            {jsonstream.REF_KEY: 1},
+            '2009-08-19T11:24:43',
+            'x'
+        ])
+
+    def test_transcode(self):
+        data = pyamf.encode('spam', [1], encoding=pyamf.AMF3).getvalue()
+        writer = util.BufferedByteStream()
+
+        self.assertEqual(jsonstream.transcode(
+            data,
+            writer,
+            pyamf.AMF3,
+            use_ext=self.use_ext
+        ), 2)
+        self.assertEqual(writer.getvalue(), '"spam"\n[1]\n')
+
+
+class ExtJSONStreamTestCase(JSONStreamTestCase):
+    """
+    Tests for the C{cpyamf.jsonstream} transcoders.
+    """
+
+    use_ext = True
+
+    def setUp(self):
+        try:
+            from cpyamf import jsonstream
+        except ImportError:
+            self.skipTest('jsonstream extension not available')
+
+        JSONStreamTestCase.setUp(self)
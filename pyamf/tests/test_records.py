@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Tests for L{pyamf.records}.
+
+@since: 0.9
+"""
+
+import copy
+import pickle
+import unittest
+
+import pyamf
+from pyamf import records
+
+
+class RecordTestCase(unittest.TestCase):
+    """
+    Tests for L{records.Record}.
+    """
+
+    def test_create(self):
+        r = records.Record(a=1, b=2)
+
+        self.assertEqual(len(r), 2)
+        self.assertEqual(r['a'], 1)
+        self.assertEqual(r.b, 2)
+        self.assertEqual(sorted(r.keys()), ['a', 'b'])
+        self.assertEqual(sorted(r.items()), [('a', 1), ('b', 2)])
+        self.assertTrue('a' in r)
+        self.assertFalse('c' in r)
+        self.assertEqual(r.get('c', 3), 3)
+
+        self.assertRaises(KeyError, lambda: r['c'])
+        self.assertRaises(AttributeError, getattr, r, 'c')
+
+        self.assertEqual(records.Record(), {})
+
+    def test_shared_class(self):
+        a = records.Record(x=1, y=2)
+        b = records.Record(x=3, y=4)
+
+        self.assertTrue(type(a) is type(b))
+        self.assertFalse(hasattr(a, '__dict__'))
+
+    def test_set(self):
+        r = records.Record(a=1)
+        klass = type(r)
+
+        r['a'] = 2
+        self.assertTrue(type(r) is klass)
+
+        r.b = 3
+        self.assertFalse(type(r) is klass)
+        self.assertEqual(r, {'a': 2, 'b': 3})
+
+        del r['a']
+        self.assertEqual(r, {'b': 3})
+
+        del r.b
+        self.assertEqual(r, {})
+
+        self.assertRaises(KeyError, r.__delitem__, 'a')
+        self.assertRaises(AttributeError, delattr, r, 'a')
+
+    def test_mapping(self):
+        r = records.Record(a=1)
+
+        self.assertEqual(r.setdefault('b', 2), 2)
+        self.assertEqual(r.pop('a'), 1)
+        self.assertEqual(r.pop('a', None), None)
+
+        r.update({'c': 3}, d=4)
+        self.assertEqual(r, {'b': 2, 'c': 3, 'd': 4})
+        self.assertEqual(dict(r), {'b': 2, 'c': 3, 'd': 4})
+        self.assertEqual(r, records.Record(b=2, c=3, d=4))
+        self.assertNotEqual(r, {'b': 2})
+
+        r.clear()
+        self.assertEqual(len(r), 0)
+
+    def test_copy(self):
+        r = records.Record(a=[1])
+
+        copies = [
+            copy.copy(r),
+            copy.deepcopy(r),
+            pickle.loads(pickle.dumps(r)),
+        ]
+
+        for x in copies:
+            self.assertFalse(x is r)
+            self.assertEqual(x, r)
+
+    def test_encode(self):
+        r = records.Record(a=1)
+
+        for encoding in pyamf.ENCODING_TYPES:
+            self.assertEqual(
+                pyamf.encode(r, encoding=encoding).getvalue(),
+                pyamf.encode(pyamf.ASObject(a=1), encoding=encoding).getvalue()
+            )
+
+
+class DecodeTestCase(unittest.TestCase):
+    """
+    Tests for decoding anonymous objects as records.
+    """
+
+    def decode(self, value, encoding, **kwargs):
+        data = pyamf.encode(value, encoding=encoding).getvalue()
+
+        return pyamf.decode(
+            data,
+            encoding=encoding,
+            use_records=True,
+            **kwargs
+        ).next()
+
+    def test_decode(self):
+        rows = [{'id': i, 'name': u'row %d' % (i,)} for i in range(3)]
+
+        for encoding in pyamf.ENCODING_TYPES:
+            for use_ext in (False, None):
+                ret = self.decode(rows, encoding, use_ext=use_ext)
+
+                self.assertEqual(ret, rows)
+                self.assertTrue(isinstance(ret[0], records.Record))
+                self.assertTrue(type(ret[0]) is type(ret[2]))
+
+    def test_references(self):
+        obj = pyamf.ASObject(spam='eggs')
+        obj.self = obj
+
+        for encoding in pyamf.ENCODING_TYPES:
+            for use_ext in (False, None):
+                ret = self.decode([obj, obj], encoding, use_ext=use_ext)
+
+                self.assertTrue(ret[0] is ret[1])
+                self.assertTrue(ret[0].self is ret[0])
+                self.assertEqual(ret[0].spam, 'eggs')
+
+    def test_typed(self):
+        """
+        Only anonymous objects are decoded as records.
+        """
+        for use_ext in (False, None):
+            ret = pyamf.decode(
+                '\x0a\x0b\x13spam.Eggs\x01',
+                encoding=pyamf.AMF3,
+                use_records=True,
+                use_ext=use_ext
+            ).next()
+
+            self.assertTrue(isinstance(ret, pyamf.TypedObject))
+
+    def test_amf3_in_amf0(self):
+        encoder = pyamf.get_encoder(pyamf.AMF0)
+        encoder.use_amf3 = True
+        encoder.writeElement({'a': 1})
+
+        for use_ext in (False, None):
+            ret = pyamf.decode(
+                encoder.stream.getvalue(),
+                encoding=pyamf.AMF0,
+                use_records=True,
+                use_ext=use_ext
+            ).next()
+
+            self.assertTrue(isinstance(ret, records.Record))
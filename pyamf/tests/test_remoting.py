@@ -13,6 +13,7 @@ import unittest
 
 import pyamf
 from pyamf import remoting, util
+from pyamf.util import pure
 
 
 class DecoderTestCase(unittest.TestCase):
@@ -348,6 +349,31 @@ class EncoderTestCase(unittest.TestCase):
             '\x00\x00\x00\x00'
         )
 
+    def test_amf3_bodies(self):
+        """
+        The bodies of an AMF0 envelope are wrapped in an AVM+ marker, the
+        headers are left as AMF0.
+        """
+        msg = remoting.Envelope(pyamf.AMF0)
+
+        msg.headers['spam'] = 'eggs'
+        msg['/1'] = remoting.Response(body=['a', 'a'])
+
+        data = remoting.encode(msg, amf3_bodies=True).getvalue()
+
+        self.assertEqual(
+            data,
+            '\x00\x00\x00\x01\x00\x04spam\x00\x00\x00\x00\x00\x02\x00'
+            '\x04eggs\x00\x01\x00\x0b/1/onResult'
+            '\x00\x04null\x00\x00\x00\x00\x11\t\x05\x01\x06\x03a\x06\x00'
+        )
+
+        response = remoting.decode(data)
+
+        self.assertEqual(response.amfVersion, pyamf.AMF0)
+        self.assertEqual(response.headers['spam'], 'eggs')
+        self.assertEqual(response['/1'].body, ['a', 'a'])
+
 
 class StrictEncodingTestCase(unittest.TestCase):
     def test_request(self):
@@ -455,3 +481,103 @@ class ReprTestCase(unittest.TestCase):
             "BaseFault level=None code=u'\\xe5' type=u'\\xe5' description="
             "u'\\xe5'\nTraceback:\nu'\\xe5'"
         )
+
+
+class FramingTestCase(unittest.TestCase):
+    """
+    The framing functions must produce identical results, whether or not
+    they are accelerated by C{cpyamf.remoting}.
+
+    @since: 0.9
+    """
+
+    def build_envelope(self, amfVersion):
+        msg = remoting.Envelope(amfVersion)
+
+        msg.headers['spam'] = u'€±'
+        msg.headers.set_required('spam')
+        msg.headers['eggs'] = [1, 2]
+
+        msg['/1'] = remoting.Request(u'service.method', [u'å∫ç', 2, None])
+        msg['/2'] = remoting.Response({'a': 'b'})
+        msg['/3'] = remoting.Response(
+            remoting.ErrorFault(code='foo', description='bar'),
+            status=remoting.STATUS_ERROR
+        )
+        msg['/4'] = remoting.Response([], status=remoting.STATUS_DEBUG)
+
+        return msg
+
+    def test_round_trip(self):
+        for amfVersion in pyamf.ENCODING_TYPES:
+            for strict in (True, False):
+                msg = self.build_envelope(amfVersion)
+
+                bytes = remoting.encode(msg, strict=strict).getvalue()
+                expected = remoting.encode(
+                    msg,
+                    strict=strict,
+                    stream=pure.BufferedByteStream()
+                ).getvalue()
+
+                self.assertEqual(bytes, expected)
+
+                decoded = remoting.decode(bytes, strict=strict)
+
+                self.assertEqual(decoded.headers, msg.headers)
+                self.assertTrue(decoded.headers.is_required('spam'))
+                self.assertFalse(decoded.headers.is_required('eggs'))
+                self.assertEqual(decoded.keys(), msg.keys())
+                self.assertEqual(decoded['/1'].target, u'service.method')
+                self.assertEqual(decoded['/1'].body, [u'å∫ç', 2, None])
+                self.assertEqual(decoded['/2'].body, {'a': 'b'})
+                self.assertTrue(
+                    isinstance(decoded['/3'].body, remoting.ErrorFault))
+                self.assertEqual(decoded['/3'].status, remoting.STATUS_ERROR)
+                self.assertEqual(decoded['/4'].status, remoting.STATUS_DEBUG)
+
+    def test_strict_length(self):
+        bytes = remoting.encode(
+            self.build_envelope(pyamf.AMF0),
+            strict=True
+        ).getvalue()
+
+        # corrupt the length of the last body, an empty array
+        bytes = bytes[:-9] + '\x00\x00\x00\x09' + bytes[-5:]
+
+        self.assertRaises(
+            pyamf.DecodeError,
+            remoting.decode,
+            bytes,
+            strict=True
+        )
+
+    def test_ext(self):
+        try:
+            from cpyamf import remoting as ext
+        except ImportError:
+            self.skipTest('remoting extension not available')
+
+        self.assertTrue(remoting._read_body is ext.read_body)
+        self.assertTrue(remoting._write_body is ext.write_body)
+
+    def test_unknown_message(self):
+        encoder = pyamf.get_encoder(pyamf.AMF0)
+
+        self.assertRaises(
+            TypeError,
+            remoting._write_body,
+            '/1',
+            object(),
+            encoder.stream,
+            encoder
+        )
+
+        self.assertRaises(
+            ValueError,
+            remoting._write_body,
+            '/1',
+            remoting.Response(None, status=99),
+            encoder.stream,
+            encoder
+        )
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Tests for L{pyamf.tools}.
+
+@since: 0.9
+"""
+
+import os
+import shutil
+import datetime
+import tempfile
+import unittest
+from StringIO import StringIO
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import pyamf
+from pyamf import remoting, sol, amf3
+from pyamf.tools import transcode
+
+
+class Spam(object):
+    def __init__(self, eggs=None):
+        self.eggs = eggs
+
+
+class ConverterTestCase(unittest.TestCase):
+    """
+    Tests for L{transcode.Converter}.
+    """
+
+    def test_types(self):
+        converter = transcode.Converter()
+
+        self.assertEqual(json.loads(converter.dumps({
+            'date': datetime.datetime(2009, 8, 19, 11, 24, 43),
+            'bytes': amf3.ByteArray('\x00\xff'),
+            'undefined': pyamf.Undefined,
+            'obj': Spam(u'ƒøø'),
+        })), {
+            'date': '2009-08-19T11:24:43',
+            'bytes': 'AP8=',
+            'undefined': None,
+            'obj': {'eggs': u'ƒøø'},
+        })
+
+
+class TranscodeTestCase(unittest.TestCase):
+    """
+    Tests for L{transcode.main}.
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+        envelope = remoting.Envelope(pyamf.AMF3)
+        envelope['/1'] = remoting.Request('echo', [u'foo'])
+        envelope['/2'] = remoting.Response({'spam': 'eggs'})
+        data = remoting.encode(envelope).getvalue()
+
+        self.write('a/capture.amf', data * 2)
+        self.write('b.sol', sol.encode('hello', {'name': 'value'}).getvalue())
+        self.write('c.amf', 'garbage')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def write(self, name, data):
+        name = os.path.join(self.path, name)
+
+        if not os.path.exists(os.path.dirname(name)):
+            os.makedirs(os.path.dirname(name))
+
+        f = open(name, 'wb')
+        f.write(data)
+        f.close()
+
+    def transcode(self, *args):
+        out = StringIO()
+
+        ret = transcode.main(list(args) + [self.path], out=out)
+
+        return ret, [json.loads(x) for x in out.getvalue().splitlines()]
+
+    def check(self, records):
+        self.assertEqual(
+            [(os.path.relpath(r['file'], self.path), r['index'], r['format'])
+             for r in records],
+            [('b.sol', 0, 'sol'),
+             ('c.amf', 0, 'remoting'),
+             ('a/capture.amf', 0, 'remoting'),
+             ('a/capture.amf', 1, 'remoting')]
+        )
+
+        self.assertEqual(records[0]['name'], 'hello')
+        self.assertEqual(records[0]['values'], {'name': 'value'})
+
+        self.assertTrue('error' in records[1])
+
+        self.assertEqual(records[2]['amfVersion'], 3)
+        self.assertEqual(records[2]['headers'], {})
+        self.assertEqual(records[2]['bodies'], [
+            {'name': '/1', 'target': 'echo', 'body': ['foo']},
+            {'name': '/2', 'status': 'onResult', 'body': {'spam': 'eggs'}},
+        ])
+        self.assertEqual(records[3]['bodies'], records[2]['bodies'])
+
+    def test_serial(self):
+        ret, records = self.transcode('-p', '1')
+
+        self.assertEqual(ret, 1)
+        self.check(records)
+
+    def test_pool(self):
+        ret, records = self.transcode('-p', '2')
+
+        self.assertEqual(ret, 1)
+        self.check(records)
+
+    def test_single_path(self):
+        def Pool(*args):
+            self.fail('A pool was created for a single file')
+
+        self.patch(transcode.multiprocessing, 'Pool', Pool)
+
+        out = StringIO()
+        path = os.path.join(self.path, 'a', 'capture.amf')
+
+        self.assertEqual(transcode.main(['-p', '2', path], out=out), 0)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+    def test_early_exit(self):
+        lines = transcode.transcode([self.path], processes=2)
+
+        lines.next()
+        lines.close()
+
+        self.assertEqual(
+            [x for x in os.listdir(tempfile.gettempdir())
+             if x.startswith('pyamf-transcode-')],
+            []
+        )
+
+    def test_default_processes(self):
+        options, args = transcode.get_parser().parse_args([])
+
+        self.assertEqual(options.processes, 1)
+
+    def patch(self, obj, name, value):
+        old = getattr(obj, name)
+        setattr(obj, name, value)
+
+        self.addCleanup(setattr, obj, name, old)
+
+    def test_format(self):
+        data = pyamf.encode(1, u'foo', encoding=pyamf.AMF3).getvalue()
+        self.write('d.amf3', data)
+
+        ret, records = self.transcode('-p', '1', '-f', 'amf3')
+
+        self.assertEqual(
+            [r['value'] for r in records if r['file'].endswith('d.amf3')],
+            [1, 'foo']
+        )
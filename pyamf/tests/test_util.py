@@ -93,6 +93,38 @@ class StringIOTestCase(unittest.TestCase):
 
         self.assertRaises(TypeError, util.BufferedByteStream, self)
 
+    def test_create_buffer(self):
+        import array
+
+        for buf in [bytearray('spam'), memoryview('spam'), buffer('spam'),
+                    array.array('c', 'spam')]:
+            sp = util.BufferedByteStream(buf)
+
+            self.assertEqual(sp.tell(), 0)
+            self.assertEqual(sp.getvalue(), 'spam')
+            self.assertEqual(len(sp), 4)
+            self.assertEqual(sp.read(2), 'sp')
+
+    def test_write_buffer(self):
+        """
+        Writing to a stream created from a buffer does not change the buffer.
+        """
+        buf = bytearray('spam')
+        sp = util.BufferedByteStream(buf)
+
+        sp.write('eggs')
+        sp.write_uchar(0)
+
+        self.assertEqual(sp.getvalue(), 'eggs\x00')
+        self.assertEqual(buf, bytearray('spam'))
+
+        buf = bytearray('spam')
+        sp = util.BufferedByteStream(buf)
+        sp.truncate(2)
+
+        self.assertEqual(sp.getvalue(), 'sp')
+        self.assertEqual(buf, bytearray('spam'))
+
     def test_getvalue(self):
         sp = util.BufferedByteStream()
 
@@ -920,6 +952,55 @@ class BufferedByteStreamTestCase(unittest.TestCase):
         self.assertEqual(len(a), 3)
 
 
+class NoGILTestCase(unittest.TestCase):
+    """
+    Tests for the GIL releasing copies in C{cpyamf.util}.
+    """
+
+    def setUp(self):
+        try:
+            from cpyamf import util as ext
+        except ImportError:
+            self.skipTest('util extension not available')
+
+        self.ext = ext
+        self.threshold = ext.get_nogil_threshold()
+
+    def tearDown(self):
+        self.ext.set_nogil_threshold(self.threshold)
+
+    def test_threshold(self):
+        self.assertRaises(ValueError, self.ext.set_nogil_threshold, -1)
+
+        self.ext.set_nogil_threshold(10)
+
+        self.assertEqual(self.ext.get_nogil_threshold(), 10)
+
+    def test_copies(self):
+        self.ext.set_nogil_threshold(0)
+
+        data = ''.join([chr(i % 256) for i in xrange(100000)])
+        stream = self.ext.BufferedByteStream(data)
+
+        self.assertEqual(stream.getvalue(), data)
+        self.assertEqual(stream.peek(10), data[:10])
+        self.assertEqual(stream.read(50000), data[:50000])
+
+        stream.write(data)
+        expected = data[:50000] + data
+
+        self.assertEqual(stream.getvalue(), expected)
+
+        stream.seek(0)
+        stream.truncate(75000)
+
+        self.assertEqual(stream.getvalue(), expected[:75000])
+
+        stream.seek(70000)
+        stream.consume()
+
+        self.assertEqual(stream.getvalue(), expected[70000:75000])
+
 class DummyAlias(pyamf.ClassAlias):
     pass
 
@@ -1054,6 +1135,7 @@ class GetClassMetaTestCase(unittest.TestCase):
             'readonly_attrs': None,
             'static_attrs': None,
             'synonym_attrs': None,
+            'schema': None,
             'proxy_attrs': None,
             'dynamic': None,
             'alias': None,
@@ -1079,6 +1161,7 @@ class GetClassMetaTestCase(unittest.TestCase):
             'readonly_attrs': None,
             'static_attrs': None,
             'synonym_attrs': None,
+            'schema': None,
             'proxy_attrs': None,
             'dynamic': None,
             'alias': 'foo.bar.Spam',
@@ -1104,6 +1187,7 @@ class GetClassMetaTestCase(unittest.TestCase):
             'readonly_attrs': None,
             'static_attrs': ['foo', 'bar'],
             'synonym_attrs': None,
+            'schema': None,
             'proxy_attrs': None,
             'dynamic': None,
             'alias': None,
@@ -1128,6 +1212,7 @@ class GetClassMetaTestCase(unittest.TestCase):
             'readonly_attrs': None,
             'exclude_attrs': ['foo', 'bar'],
             'synonym_attrs': None,
+            'schema': None,
             'proxy_attrs': None,
             'dynamic': None,
             'alias': None,
@@ -1153,6 +1238,7 @@ class GetClassMetaTestCase(unittest.TestCase):
             'exclude_attrs': None,
             'readonly_attrs': ['foo', 'bar'],
             'synonym_attrs': None,
+            'schema': None,
             'proxy_attrs': None,
             'dynamic': None,
             'alias': None,
@@ -1178,6 +1264,7 @@ class GetClassMetaTestCase(unittest.TestCase):
             'exclude_attrs': None,
             'proxy_attrs': None,
             'synonym_attrs': None,
+            'schema': None,
             'readonly_attrs': None,
             'proxy_attrs': None,
             'dynamic': None,
@@ -1203,6 +1290,7 @@ class GetClassMetaTestCase(unittest.TestCase):
             'exclude_attrs': None,
             'proxy_attrs': None,
             'synonym_attrs': None,
+            'schema': None,
             'readonly_attrs': None,
             'proxy_attrs': None,
             'dynamic': False,
@@ -1228,6 +1316,7 @@ class GetClassMetaTestCase(unittest.TestCase):
             'exclude_attrs': None,
             'proxy_attrs': None,
             'synonym_attrs': None,
+            'schema': None,
             'readonly_attrs': None,
             'proxy_attrs': None,
             'dynamic': None,
@@ -1248,6 +1337,7 @@ class GetClassMetaTestCase(unittest.TestCase):
             'alias': 'spam.eggs',
             'proxy_attrs': None,
             'synonym_attrs': None,
+            'schema': None,
             'amf3': True,
             'static': ['baz'],
             'external': True
@@ -1268,6 +1358,7 @@ class GetClassMetaTestCase(unittest.TestCase):
             'amf3': True,
             'exclude_attrs': ['foo'],
             'synonym_attrs': None,
+            'schema': None,
             'proxy_attrs': None,
             'external': True
         }
@@ -1289,6 +1380,7 @@ class GetClassMetaTestCase(unittest.TestCase):
             'readonly_attrs': None,
             'proxy_attrs': ['foo', 'bar'],
             'synonym_attrs': None,
+            'schema': None,
             'dynamic': None,
             'alias': None,
             'amf3': None,
@@ -1313,6 +1405,7 @@ class GetClassMetaTestCase(unittest.TestCase):
             'readonly_attrs': None,
             'proxy_attrs': None,
             'synonym_attrs': {'foo': 'bar'},
+            'schema': None,
             'dynamic': None,
             'alias': None,
             'amf3': None,
@@ -1322,3 +1415,30 @@ class GetClassMetaTestCase(unittest.TestCase):
 
         self.assertEqual(util.get_class_meta(A), meta)
         self.assertEqual(util.get_class_meta(B), meta)
+
+    def test_schema(self):
+        class A:
+            class __amf__:
+                static = ['foo']
+                schema = {'foo': 'int'}
+
+        class B(object):
+            class __amf__:
+                static = ['foo']
+                schema = {'foo': 'int'}
+
+        meta = {
+            'exclude_attrs': None,
+            'readonly_attrs': None,
+            'proxy_attrs': None,
+            'synonym_attrs': None,
+            'schema': {'foo': 'int'},
+            'dynamic': None,
+            'alias': None,
+            'amf3': None,
+            'static_attrs': ['foo'],
+            'external': None
+        }
+
+        self.assertEqual(util.get_class_meta(A), meta)
+        self.assertEqual(util.get_class_meta(B), meta)
@@ -0,0 +1,8 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Command line tools built on PyAMF.
+
+@since: 0.9
+"""
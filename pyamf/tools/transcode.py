@@ -0,0 +1,401 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Transcodes archives of captured AMF data to a line based format.
+
+Every file (directories are walked recursively) is decoded as a remoting
+envelope, a Local Shared Object or a stream of AMF0/AMF3 values. Files may
+hold any number of concatenated envelopes or values. One line is written per
+envelope, shared object or value as soon as it has been decoded. Files are
+decoded as they are read, so memory use does not grow with their size. With
+C{--processes}, files are spread across a pool of processes and the output
+keeps the order of the input.
+
+Usage::
+
+    python -m pyamf.tools.transcode --processes 4 captures/ > out.jsonl
+
+Each JSON line holds the C{file} and C{index} of the record within it, the
+C{format} it was decoded as and either the decoded data or an C{error}.
+
+@since: 0.9
+"""
+
+import os
+import sys
+import base64
+import datetime
+import optparse
+import tempfile
+import itertools
+import collections
+import multiprocessing
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import pyamf
+from pyamf import remoting, sol, util, amf3, xml
+from pyamf.util import pure
+from pyamf.remoting import spool
+
+
+#: The formats that files may be decoded as. C{auto} decodes files that
+#: start with the L{sol.HEADER_VERSION} as shared objects and everything else
+#: as remoting envelopes.
+FORMATS = ('auto', 'remoting', 'amf0', 'amf3', 'sol')
+
+#: The line formats that records may be written as.
+OUTPUTS = ('json', 'repr')
+
+
+class Converter(object):
+    """
+    Turns decoded values into objects that can be serialised as JSON.
+
+     - C{datetime}s are written in ISO 8601 format.
+     - L{ByteArray<pyamf.amf3.ByteArray>}s are C{base64} encoded.
+     - XML is written as a string.
+     - Typed objects are written as their encodable attributes.
+    """
+
+    def __init__(self):
+        self.context = amf3.Context()
+
+    def default(self, obj):
+        """
+        Suitable as the C{default} argument to C{json.dumps}.
+        """
+        if obj is pyamf.Undefined:
+            return None
+
+        if isinstance(obj, (datetime.date, datetime.time)):
+            return obj.isoformat()
+
+        if isinstance(obj, amf3.ByteArray):
+            return base64.b64encode(str(obj))
+
+        if xml.is_xml(obj):
+            return xml.tostring(obj)
+
+        if hasattr(obj, '__iter__') and not hasattr(obj, '__dict__'):
+            return list(obj)
+
+        alias = self.context.getClassAlias(type(obj))
+
+        return alias.getEncodableAttributes(obj)
+
+    def dumps(self, record):
+        return json.dumps(record, default=self.default, sort_keys=True)
+
+
+def iter_paths(paths):
+    """
+    Yields the files in C{paths}, walking directories in sorted order.
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+
+            continue
+
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+
+            for name in sorted(files):
+                yield os.path.join(root, name)
+
+
+def guess_format(stream):
+    """
+    Returns the format of the data in C{stream} for the C{auto} format.
+    """
+    if stream.peek(2) == sol.HEADER_VERSION:
+        return 'sol'
+
+    return 'remoting'
+
+
+def _envelope_record(envelope):
+    bodies = []
+
+    for name, message in envelope:
+        body = {'name': name, 'body': message.body}
+
+        if isinstance(message, remoting.Request):
+            body['target'] = message.target
+        else:
+            body['status'] = remoting.STATUS_CODES[message.status][1:]
+
+        bodies.append(body)
+
+    return {
+        'amfVersion': envelope.amfVersion,
+        'headers': dict(envelope.headers),
+        'bodies': bodies,
+    }
+
+
+def iter_records(stream, format='auto', strict=False):
+    """
+    Decodes C{stream}, yielding a C{(format, record)} tuple for every
+    envelope, shared object or value.
+
+    Streams other than L{BufferedByteStream<pyamf.util.BufferedByteStream>}s
+    that support its interface (e.g. a file backed
+    L{FileByteStream<pyamf.remoting.spool.FileByteStream>}) are decoded in
+    place by the pure Python codecs, so only one record at a time is held in
+    memory.
+    """
+    use_ext = None
+
+    if not isinstance(stream, util.BufferedByteStream):
+        if isinstance(stream, pure.BufferedByteStream):
+            use_ext = False
+        else:
+            stream = util.BufferedByteStream(stream)
+
+    if format == 'auto':
+        format = guess_format(stream)
+
+    if format == 'sol':
+        name, values = sol.decode(stream, strict=strict)
+
+        yield format, {'name': name, 'values': values}
+    elif format == 'remoting':
+        while not stream.at_eof():
+            yield format, _envelope_record(
+                remoting.decode(stream, strict=strict)
+            )
+    elif format in ('amf0', 'amf3'):
+        encoding = format == 'amf0' and pyamf.AMF0 or pyamf.AMF3
+        decoder = pyamf.decode(
+            stream,
+            encoding=encoding,
+            strict=strict,
+            use_ext=use_ext
+        )
+
+        for value in decoder:
+            yield format, {'value': value}
+    else:
+        raise ValueError('Unknown format %r' % (format,))
+
+
+def iter_lines(path, format='auto', output='json', strict=False):
+    """
+    Decodes the file at C{path}, yielding a C{(line, failed)} tuple for
+    every record. The file is decoded as it is read, rather than read into
+    memory first.
+
+    A record that fails to decode (or serialise) ends the file, its line
+    holds the C{error} instead.
+    """
+    converter = Converter()
+
+    if output == 'json':
+        dumps = converter.dumps
+    else:
+        dumps = repr
+
+    index = 0
+    record = {'file': path, 'index': index, 'format': format}
+    stream = None
+
+    try:
+        stream = spool.FileByteStream(open(path, 'rb'))
+
+        if format == 'auto':
+            format = record['format'] = guess_format(stream)
+
+        for format, value in iter_records(stream, format, strict):
+            record.update(value)
+
+            yield dumps(record), False
+
+            index += 1
+            record = {'file': path, 'index': index, 'format': format}
+    except Exception, e:
+        record['error'] = '%s: %s' % (e.__class__.__name__, e)
+
+        yield dumps(record), True
+    finally:
+        spool.close_stream(stream)
+
+
+def _transcode(args):
+    """
+    Pool worker. Writes the lines of a file to C{out_path} as they are
+    decoded, so that neither the worker nor the parent hold them all.
+
+    @return: Whether the last line is an error.
+    """
+    out_path, path, format, output, strict = args
+
+    failed = False
+    out = open(out_path, 'wb')
+
+    try:
+        for line, failed in iter_lines(path, format, output, strict):
+            out.write(line + '\n')
+    finally:
+        out.close()
+
+    return failed
+
+
+def _read_lines(out_path, failed):
+    """
+    Yields the C{(line, failed)} tuples of a file transcoded by
+    L{_transcode}, and deletes it afterwards.
+    """
+    f = open(out_path, 'rb')
+
+    try:
+        last = None
+
+        for line in f:
+            if last is not None:
+                yield last, False
+
+            last = line[:-1]
+
+        if last is not None:
+            yield last, failed
+    finally:
+        f.close()
+        os.remove(out_path)
+
+
+def transcode(paths, format='auto', output='json', strict=False,
+              processes=1):
+    """
+    Yields a C{(line, failed)} tuple for every record in the files in
+    C{paths}.
+
+    @param processes: If more than C{1} (and there is more than one file),
+        files are decoded in a pool of this many processes. Each worker
+        writes its lines to a temporary file which is read back in order. At
+        most two files per process are in flight, so memory use stays flat
+        however large the files or the archive are.
+    """
+    paths = iter_paths(paths)
+
+    if processes > 1:
+        first = list(itertools.islice(paths, 2))
+        paths = itertools.chain(first, paths)
+
+        if len(first) < 2:
+            processes = 1
+
+    if processes <= 1:
+        for path in paths:
+            for line in iter_lines(path, format, output, strict):
+                yield line
+
+        return
+
+    pool = multiprocessing.Pool(processes)
+    pending = collections.deque()
+    finished = False
+
+    try:
+        for path in paths:
+            fd, out_path = tempfile.mkstemp(prefix='pyamf-transcode-')
+            os.close(fd)
+
+            pending.append((out_path, pool.apply_async(
+                _transcode,
+                ((out_path, path, format, output, strict),)
+            )))
+
+            while len(pending) >= processes * 2:
+                out_path, result = pending.popleft()
+
+                for line in _read_lines(out_path, result.get()):
+                    yield line
+
+        while pending:
+            out_path, result = pending.popleft()
+
+            for line in _read_lines(out_path, result.get()):
+                yield line
+
+        finished = True
+    finally:
+        if finished:
+            pool.close()
+        else:
+            pool.terminate()
+
+        pool.join()
+
+        for out_path, result in pending:
+            os.remove(out_path)
+
+
+def get_parser():
+    parser = optparse.OptionParser(
+        usage='%prog [options] path [path ...]',
+        description='Transcodes captured AMF remoting traffic, shared '
+                    'objects and AMF streams to one record per line.'
+    )
+
+    parser.add_option(
+        '-f', '--format', dest='format', default='auto',
+        choices=list(FORMATS),
+        help='How to decode the files, one of %s [%%default]' % (
+            ', '.join(FORMATS),
+        )
+    )
+    parser.add_option(
+        '-o', '--output', dest='output', default='json',
+        choices=list(OUTPUTS),
+        help='Line format, one of %s [%%default]' % (', '.join(OUTPUTS),)
+    )
+    parser.add_option(
+        '-p', '--processes', type='int', dest='processes',
+        default=1,
+        help='Number of processes decoding files [%default]'
+    )
+    parser.add_option(
+        '-s', '--strict', action='store_true', dest='strict', default=False,
+        help='Decode strictly'
+    )
+
+    return parser
+
+
+def main(args=None, out=sys.stdout):
+    """
+    Transcodes the files. Returns C{1} if any of them failed to decode.
+    """
+    parser = get_parser()
+    options, paths = parser.parse_args(args)
+
+    if not paths:
+        parser.error('At least one path is required')
+
+    ret = 0
+
+    for line, failed in transcode(
+            paths,
+            options.format,
+            options.output,
+            options.strict,
+            options.processes):
+        out.write(line + '\n')
+
+        if failed:
+            ret = 1
+
+    out.flush()
+
+    return ret
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -163,7 +163,8 @@ def get_class_meta(klass):
         'dynamic': None,
         'alias': None,
         'external': None,
-        'synonym_attrs': None
+        'synonym_attrs': None,
+        'schema': None
     }
 
     if not hasattr(klass, '__amf__'):
@@ -183,7 +184,7 @@ def get_class_meta(klass):
         def get_func(x):
             return getattr(a, x)
 
-    for prop in ['alias', 'amf3', 'dynamic', 'external']:
+    for prop in ['alias', 'amf3', 'dynamic', 'external', 'schema']:
         if in_func(prop):
             meta[prop] = get_func(prop)
 
@@ -24,6 +24,26 @@ from pyamf import python
 SYSTEM_ENDIAN = None
 
 
+def get_buffer_bytes(buf):
+    """
+    Returns a copy of the bytes of an object that supports the buffer
+    protocol, e.g. C{bytearray}, C{memoryview}, C{array.array} or a C{numpy}
+    array.
+
+    @raise TypeError: Unable to coerce C{buf} to C{StringIO}.
+    @since: 0.9
+    """
+    try:
+        return str(buffer(buf))
+    except TypeError:
+        pass
+
+    try:
+        return memoryview(buf).tobytes()
+    except (NameError, TypeError):
+        raise TypeError("Unable to coerce buf->StringIO got %r" % (buf,))
+
+
 class StringIOProxy(object):
     """
     I am a C{StringIO} type object containing byte data from the AMF stream.
@@ -32,6 +52,9 @@ class StringIOProxy(object):
         <http://osflash.org/documentation/amf3#x0c_-_bytearray>}
     @see: U{Parsing ByteArrays on OSFlash
         <http://osflash.org/documentation/amf3/parsing_byte_arrays>}
+    @ivar _dirty: Set whenever the contents of the stream change. Cleared by
+        whoever caches something derived from the contents (see
+        L{amf3.ByteArray}).
     """
 
     def __init__(self, buf=None):
@@ -53,10 +76,11 @@ class StringIOProxy(object):
             self._buffer.write(buf.read())
             buf.seek(old_pos)
         elif buf is not None:
-            raise TypeError("Unable to coerce buf->StringIO got %r" % (buf,))
+            self._buffer.write(get_buffer_bytes(buf))
 
         self._get_len()
         self._len_changed = False
+        self._dirty = True
         self._buffer.seek(0, 0)
 
     def getvalue(self):
@@ -104,6 +128,7 @@ class StringIOProxy(object):
         if size == 0:
             self._buffer = StringIO()
             self._len_changed = True
+            self._dirty = True
 
             return
 
@@ -115,6 +140,7 @@ class StringIOProxy(object):
         self._buffer.write(buf)
         self.seek(cur_pos)
         self._len_changed = True
+        self._dirty = True
 
     def write(self, s, size=None):
         """
@@ -124,6 +150,7 @@ class StringIOProxy(object):
         """
         self._buffer.write(s)
         self._len_changed = True
+        self._dirty = True
 
     def _get_len(self):
         """